@@ -3,7 +3,7 @@ from .models import (
     Entreprise, Boutique, User, Categorie, Fournisseur, Produit, Stock,
     MouvementStock, PrixProduit, SequenceFacture, Client, Partenaire,
     Facture, CommandeClient, CommandePartenaire, Versement, HistoriqueStock,
-    Journal, SubscriptionPlan, EntrepriseSubscription, UsageTracking,
+    Journal, JournalArchive, SubscriptionPlan, EntrepriseSubscription, UsageTracking,
     EmailVerification, Inventaire, InventaireProduit
 )
 
@@ -37,6 +37,7 @@ admin.site.register(InventaireProduit)
 
 # Modèles système
 admin.site.register(Journal)
+admin.site.register(JournalArchive)
 admin.site.register(HistoriqueStock)
 
 # Modèles abonnement
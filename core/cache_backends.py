@@ -0,0 +1,281 @@
+# core/cache_backends.py
+"""
+Backend de cache à deux niveaux :
+
+- L1 : petit cache LRU en mémoire, propre à chaque processus (worker WSGI),
+  réservé aux clés « chaudes » (contexte utilisateur, plans, catégories...).
+- L2 : cache partagé entre tous les workers (fichiers, base de données ou Redis),
+  déclaré comme un alias séparé dans ``CACHES``.
+
+L'invalidation entre workers passe par des *tampons de génération* stockés
+dans le L2 :
+
+- chaque préfixe L1 possède une génération ; une suppression d'une clé de ce
+  préfixe (ou ``delete_pattern``) la fait évoluer, et les autres workers
+  abandonnent leurs entrées L1 correspondantes à la prochaine synchronisation
+  (au plus toutes les ``SYNC_INTERVAL`` secondes). Une écriture (``set``) est
+  un simple remplissage et ne touche pas à la génération : remplacer une
+  valeur déjà lue par d'autres workers passe par ``delete`` ;
+- chaque espace de noms (texte avant le premier ``:``) possède aussi une
+  génération intégrée à la clé L2, ce qui permet ``delete_pattern('produits:*')``
+  sans parcourir ni vider tout le cache.
+
+Exemple de configuration :
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.TwoTierCache',
+            'TIMEOUT': 300,
+            'OPTIONS': {
+                'SHARED_ALIAS': 'shared',
+                'L1_PREFIXES': ['user_entreprise_', 'subscription_plan'],
+            },
+        },
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': '/var/tmp/murastorage_cache',
+        },
+    }
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+_MISSING = object()
+
+
+class LRUStore:
+    """Cache LRU thread-safe avec expiration, utilisé comme niveau L1."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, generation):
+        """Retourne la valeur si elle n'a ni expiré ni changé de génération."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires_at, entry_generation = entry
+            if expires_at < time.monotonic() or entry_generation != generation:
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout, generation):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + timeout, generation)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TwoTierCache(BaseCache):
+    """Cache L1 (processus) + L2 (partagé) avec invalidation par génération."""
+
+    GENERATION_PREFIX = '__gen__'
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED_ALIAS', 'shared')
+        self._l1 = LRUStore(int(options.get('L1_MAX_ENTRIES', 512)))
+        # Durée de vie maximale d'une entrée L1 : borne la fraîcheur même
+        # si une écriture n'a pas encore été vue par ce worker
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 30))
+        self._l1_prefixes = tuple(options.get('L1_PREFIXES', ()))
+        self._sync_interval = float(options.get('SYNC_INTERVAL', 1.0))
+        # Générations connues localement : nom -> (valeur, instant de lecture)
+        self._generations = {}
+        self._generations_lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    # ------------------------------------------------------------------
+    # Générations
+    # ------------------------------------------------------------------
+
+    def _generation_key(self, name):
+        return f"{self.GENERATION_PREFIX}:{name}"
+
+    def get_generation(self, name):
+        """Génération courante de ``name``, relue dans le L2 au plus toutes les SYNC_INTERVAL s."""
+        now = time.monotonic()
+        with self._generations_lock:
+            known = self._generations.get(name)
+        if known is not None and now - known[1] < self._sync_interval:
+            return known[0]
+        generation = self.shared.get(self._generation_key(name))
+        if generation is None:
+            generation = 0
+        with self._generations_lock:
+            self._generations[name] = (generation, now)
+        return generation
+
+    def bump_generation(self, name):
+        """Fait évoluer la génération de ``name`` pour tous les workers."""
+        # time_ns évite les collisions entre workers sans incrément atomique
+        generation = time.time_ns()
+        self.shared.set(self._generation_key(name), generation, None)
+        with self._generations_lock:
+            self._generations[name] = (generation, time.monotonic())
+        return generation
+
+    # ------------------------------------------------------------------
+    # Clés
+    # ------------------------------------------------------------------
+
+    def _l1_prefix(self, key):
+        for prefix in self._l1_prefixes:
+            if key.startswith(prefix):
+                return prefix
+        return None
+
+    @staticmethod
+    def _namespace(key):
+        if ':' in key:
+            return key.split(':', 1)[0]
+        return None
+
+    def _shared_key(self, key):
+        """Intègre la génération de l'espace de noms à la clé L2."""
+        namespace = self._namespace(key)
+        if namespace is None or namespace == self.GENERATION_PREFIX:
+            return key
+        generation = self.get_generation(f"ns:{namespace}")
+        if not generation:
+            return key
+        return f"{namespace}@{generation}:{key.split(':', 1)[1]}"
+
+    def _l1_key(self, shared_key, version):
+        return f"{version or self.version}:{shared_key}"
+
+    def _effective_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return timeout
+
+    def _l1_ttl(self, timeout):
+        if timeout is None:
+            return self._l1_timeout
+        return min(self._l1_timeout, timeout)
+
+    # ------------------------------------------------------------------
+    # API BaseCache
+    # ------------------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        shared_key = self._shared_key(key)
+        prefix = self._l1_prefix(key)
+        if prefix is not None:
+            generation = self.get_generation(f"l1:{prefix}")
+            value = self._l1.get(self._l1_key(shared_key, version), generation)
+            if value is not _MISSING:
+                return value
+        value = self.shared.get(shared_key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        if prefix is not None:
+            self._l1.set(self._l1_key(shared_key, version), value, self._l1_ttl(self.default_timeout), generation)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._effective_timeout(timeout)
+        shared_key = self._shared_key(key)
+        self.shared.set(shared_key, value, timeout, version=version)
+        prefix = self._l1_prefix(key)
+        if prefix is not None:
+            # Remplissage après un miss : la génération n'évolue pas, sans quoi
+            # chaque écriture viderait le L1 de tout le préfixe sur tous les workers
+            generation = self.get_generation(f"l1:{prefix}")
+            if timeout is None or timeout > 0:
+                self._l1.set(self._l1_key(shared_key, version), value, self._l1_ttl(timeout), generation)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._effective_timeout(timeout)
+        return self.shared.add(self._shared_key(key), value, timeout, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._effective_timeout(timeout)
+        return self.shared.touch(self._shared_key(key), timeout, version=version)
+
+    def delete(self, key, version=None):
+        shared_key = self._shared_key(key)
+        deleted = self.shared.delete(shared_key, version=version)
+        prefix = self._l1_prefix(key)
+        if prefix is not None:
+            self._l1.delete(self._l1_key(shared_key, version))
+            self.bump_generation(f"l1:{prefix}")
+        return deleted
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def incr(self, key, delta=1, version=None):
+        # Les compteurs ne passent jamais par le L1 : le L2 fait foi
+        return self.shared.incr(self._shared_key(key), delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        return self.shared.decr(self._shared_key(key), delta, version=version)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        for key in keys:
+            value = self.get(key, _MISSING, version=version)
+            if value is not _MISSING:
+                found[key] = value
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        for key, value in data.items():
+            self.set(key, value, timeout, version=version)
+        return []
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self.delete(key, version=version)
+
+    def delete_pattern(self, pattern):
+        """
+        Invalide toutes les clés d'un espace de noms.
+
+        Seul le début du pattern est utilisé (``'produits:*'`` ou ``'produits'``) :
+        la génération de l'espace de noms change, les anciennes clés L2 deviennent
+        inaccessibles et expirent d'elles-mêmes.
+        """
+        namespace = pattern.split('*', 1)[0].split(':', 1)[0]
+        if not namespace:
+            self.clear()
+            return
+        self.bump_generation(f"ns:{namespace}")
+        for prefix in self._l1_prefixes:
+            if prefix.startswith(namespace) or namespace.startswith(prefix):
+                self.bump_generation(f"l1:{prefix}")
+
+    def clear(self):
+        self.shared.clear()
+        self._l1.clear()
+        with self._generations_lock:
+            self._generations.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
@@ -1,73 +1,199 @@
 # core/cache_utils.py
 from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
 from functools import wraps
 import hashlib
 import json
+import logging
+import time
 from typing import Any, Optional, Callable
 from django.http import HttpRequest
 from rest_framework.response import Response
+from .perf import record_cache
 
+logger = logging.getLogger(__name__)
 
-def cache_api_response(timeout: int = 300, key_prefix: str = 'api', vary_on_user: bool = True):
+
+# Politiques déclarées (préfixe:action → options), pour le suivi du taux de hit
+POLITIQUES_CACHE = {}
+
+STATS_KEY = 'api_cache_stats:{endpoint}:{compteur}'
+VERROU_KEY = 'api_cache_lock:{cle}'
+
+# Dimensions de clé disponibles (attributs lus sans requête : *_id plutôt que les FK)
+DIMENSIONS = {
+    'tenant': lambda request: getattr(request.user, 'entreprise_id', None),
+    'boutique': lambda request: getattr(request.user, 'boutique_id', None),
+    'role': lambda request: getattr(request.user, 'role', None),
+    'user': lambda request: request.user.pk,
+    'params': lambda request: sorted((cle, sorted(valeurs)) for cle, valeurs in request.GET.lists()),
+}
+
+
+def _compter(endpoint, compteur):
+    """Compteur partagé entre workers (hit / miss / attente) d'un endpoint mis en cache."""
+    cle = STATS_KEY.format(endpoint=endpoint, compteur=compteur)
+    try:
+        cache.incr(cle)
+    except ValueError:
+        if not cache.add(cle, 1, None):
+            cache.incr(cle)
+    except Exception:
+        logger.exception("Erreur statistiques cache %s", endpoint)
+
+
+def cache_stats():
+    """Hits, misses et taux de hit par endpoint déclaré (toutes les instances confondues)."""
+    cles = {
+        (endpoint, compteur): STATS_KEY.format(endpoint=endpoint, compteur=compteur)
+        for endpoint in POLITIQUES_CACHE
+        for compteur in ('hit', 'miss', 'attente')
+    }
+    valeurs = cache.get_many(list(cles.values()))
+    stats = []
+    for endpoint, politique in sorted(POLITIQUES_CACHE.items()):
+        hits = valeurs.get(cles[(endpoint, 'hit')], 0)
+        misses = valeurs.get(cles[(endpoint, 'miss')], 0)
+        stats.append({
+            'endpoint': endpoint,
+            'ttl': politique['timeout'],
+            'vary_on': list(politique['vary_on']),
+            'tags': list(politique['tags']),
+            'hits': hits,
+            'misses': misses,
+            'attentes': valeurs.get(cles[(endpoint, 'attente')], 0),
+            'hit_ratio': round(hits / (hits + misses), 3) if hits + misses else None,
+        })
+    return stats
+
+
+def cache_api_response(timeout: int = 300, key_prefix: str = 'api', vary_on_user: bool = True,
+                       vary_on: Optional[tuple] = None, tags: tuple = (), stampede_timeout: float = 5.0,
+                       depends_on: tuple = ()):
     """
-    Décorateur pour mettre en cache les réponses d'API.
+    Décorateur pour mettre en cache les réponses d'API (méthodes de ViewSet).
+
+    La clé contient le préfixe (invalidable par ``CacheManager.invalidate_api_prefix``),
+    les dimensions demandées et la génération d'écriture de chaque tag pour
+    l'entreprise (``core.conditional``) : une écriture sur une ressource
+    dépendante invalide la réponse sans suppression explicite.
+
+    Un seul worker recalcule une clé absente (verrou ``cache.add``) ; les autres
+    attendent sa valeur jusqu'à ``stampede_timeout`` secondes avant de calculer eux-mêmes.
+
+    Une politique dont ``vary_on`` omet une dimension de ``depends_on`` est
+    refusée (ImproperlyConfigured) : la réponse d'un utilisateur serait servie
+    à un autre rôle ou à une autre boutique.
 
     Args:
         timeout: Durée du cache en secondes (défaut: 5 minutes)
         key_prefix: Préfixe pour la clé de cache
         vary_on_user: Si True, varie le cache selon l'utilisateur
+        vary_on: Dimensions de clé parmi DIMENSIONS (défaut: tenant, boutique, params)
+        tags: Ressources dont les écritures invalident la réponse (ex: ('produits',))
+        stampede_timeout: Attente max de la valeur calculée par un autre worker
+        depends_on: Dimensions dont dépend la réponse (queryset, sérialiseur), à couvrir par vary_on
     """
+    if vary_on is None:
+        vary_on = ('tenant', 'boutique', 'params') + (('user',) if vary_on_user else ())
+    inconnues = [dimension for dimension in (*vary_on, *depends_on) if dimension not in DIMENSIONS]
+    if inconnues:
+        raise ImproperlyConfigured(f"Dimensions de cache inconnues: {', '.join(inconnues)}")
+    manquantes = [dimension for dimension in depends_on if dimension not in vary_on]
+    if manquantes:
+        raise ImproperlyConfigured(
+            f"Cache {key_prefix}: vary_on doit inclure {', '.join(manquantes)} (dimensions de la réponse)"
+        )
 
     def decorator(view_func: Callable) -> Callable:
+        endpoint = f"{key_prefix}:{view_func.__name__}"
+        POLITIQUES_CACHE[endpoint] = {'timeout': timeout, 'vary_on': tuple(vary_on), 'tags': tuple(tags)}
+
         @wraps(view_func)
         def wrapper(self, request: HttpRequest, *args, **kwargs) -> Response:
-            # Construire la clé de cache
-            cache_key_parts = [key_prefix]
-
-            # Ajouter l'utilisateur si nécessaire
-            if vary_on_user and hasattr(request, 'user') and request.user.is_authenticated:
-                cache_key_parts.append(f"user_{request.user.id}")
+            from .conditional import get_write_generation
+
+            user = getattr(request, 'user', None)
+            entreprise_id = getattr(user, 'entreprise_id', None)
+            # Pas de cache hors GET, ni sans entreprise quand la réponse en dépend (administrateur plateforme)
+            if request.method != 'GET' or not (user and user.is_authenticated) or ('tenant' in vary_on and not entreprise_id):
+                return view_func(self, request, *args, **kwargs)
+
+            empreinte = json.dumps([
+                [dimension, DIMENSIONS[dimension](request)] for dimension in vary_on
+            ] + [
+                request.get_full_path().split('?', 1)[0],
+                request.get_host(),
+                kwargs,
+                [get_write_generation(tag, entreprise_id) for tag in tags],
+            ], sort_keys=True, default=str)
+            cache_key = f"{endpoint}:{hashlib.md5(empreinte.encode()).hexdigest()}"
 
-            # Ajouter les paramètres de requête
-            query_params = dict(request.GET)
-            if query_params:
-                params_str = json.dumps(query_params, sort_keys=True)
-                params_hash = hashlib.md5(params_str.encode()).hexdigest()[:8]
-                cache_key_parts.append(f"params_{params_hash}")
-
-            # Ajouter l'entreprise si disponible
-            if hasattr(request, 'user') and request.user.is_authenticated and getattr(request.user, 'entreprise', None):
-                cache_key_parts.append(f"entreprise_{request.user.entreprise.id}")
-
-            # Ajouter la boutique si disponible
-            if hasattr(request, 'user') and request.user.is_authenticated and getattr(request.user, 'boutique', None):
-                cache_key_parts.append(f"boutique_{request.user.boutique.id}")
+            cached_response = cache.get(cache_key)
+            if cached_response is None:
+                # Stampede : un seul recalcul, les autres requêtes attendent son résultat
+                verrou = VERROU_KEY.format(cle=cache_key)
+                if not cache.add(verrou, 1, int(stampede_timeout) + 1):
+                    _compter(endpoint, 'attente')
+                    limite = time.monotonic() + stampede_timeout
+                    while cached_response is None and time.monotonic() < limite and cache.get(verrou) is not None:
+                        time.sleep(0.05)
+                        cached_response = cache.get(cache_key)
+                    verrou = None
+            record_cache(cached_response is not None)
+            _compter(endpoint, 'hit' if cached_response is not None else 'miss')
+            if cached_response is not None:
+                response = Response(cached_response)
+                response['X-Cache'] = 'HIT'
+                return response
 
-            # Ajouter le chemin de la requête
-            cache_key_parts.append(request.path.replace('/', '_'))
+            try:
+                response = view_func(self, request, *args, **kwargs)
+                if response.status_code == 200 and hasattr(response, 'data'):
+                    cache.set(cache_key, response.data, timeout)
+                response['X-Cache'] = 'MISS'
+                return response
+            finally:
+                if verrou:
+                    cache.delete(verrou)
 
-            cache_key = ':'.join(cache_key_parts)
+        return wrapper
 
-            # Appliquer un TTL max de 30 secondes pour rester temps réel
-            effective_timeout = min(timeout, 30)
+    return decorator
 
-            # Vérifier le cache
-            cached_response = cache.get(cache_key)
-            if cached_response is not None:
-                return Response(cached_response)
 
-            # Exécuter la vue
-            response = view_func(self, request, *args, **kwargs)
+class CachePolicyMixin:
+    """
+    Mixin de ViewSet : politique de cache déclarative par action.
 
-            # Mettre en cache si c'est une réponse valide
-            if response.status_code == 200 and hasattr(response, 'data'):
-                cache.set(cache_key, response.data, effective_timeout)
+        cache_prefix = 'categories'
+        cache_depends_on = ('tenant', 'params')
+        cache_policy = {
+            'list': {'timeout': 300, 'vary_on': ('tenant', 'params'), 'tags': ('categories',)},
+        }
 
-            return response
+    Les options sont celles de ``cache_api_response`` ; le préfixe reste
+    invalidable par ``CacheManager.invalidate_api_prefix(cache_prefix)``.
 
-        return wrapper
+    ``cache_depends_on`` liste les dimensions de la requête lues par
+    ``get_queryset`` et le sérialiseur. Par défaut toutes le sont : un ViewSet
+    ne peut restreindre ``vary_on`` qu'en déclarant ce dont il dépend.
+    """
+    cache_prefix = 'api'
+    cache_depends_on = tuple(DIMENSIONS)
+    cache_policy = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for action, options in cls.cache_policy.items():
+            handler = getattr(cls, action)
+            if getattr(handler, '_politique_cache', None) == (cls.cache_prefix, action):
+                continue
+            options = {'depends_on': cls.cache_depends_on, **options}
+            wrapped = cache_api_response(key_prefix=cls.cache_prefix, **options)(handler)
+            wrapped._politique_cache = (cls.cache_prefix, action)
+            setattr(cls, action, wrapped)
 
-    return decorator
 
 def invalidate_cache_pattern(pattern: str):
     """
@@ -79,13 +205,12 @@ def invalidate_cache_pattern(pattern: str):
     try:
         from django.core.cache import cache
         
-        # Pour LocMemCache, on ne peut pas utiliser delete_pattern
-        # On doit vider tout le cache ou utiliser une approche différente
+        # TwoTierCache (et django-redis) savent invalider un espace de noms :
+        # le cache à deux niveaux change la génération du préfixe, visible par tous les workers
         if hasattr(cache, 'delete_pattern'):
             cache.delete_pattern(pattern)
         else:
-            # Pour cache local, on vide tout le cache
-            # C'est une solution simple mais efficace pour le développement
+            # Backend sans support des patterns : on vide tout le cache
             cache.clear()
     except Exception as e:
         print(f"Erreur lors de l'invalidation du cache: {e}")
@@ -141,6 +266,7 @@ class CacheManager:
         """Cache les données d'entreprise d'un utilisateur"""
         cache_key = f"user_entreprise_{user_id}"
         cached_data = cache.get(cache_key)
+        record_cache(cached_data is not None)
         
         if cached_data is None:
             from .models import User
@@ -169,6 +295,7 @@ class CacheManager:
         """Cache les produits d'une entreprise"""
         cache_key = f"produits_entreprise_{entreprise_id}"
         cached_data = cache.get(cache_key)
+        record_cache(cached_data is not None)
         
         if cached_data is None:
             from .models import Produit
@@ -195,6 +322,7 @@ class CacheManager:
         """Cache les stocks d'un entrepôt"""
         cache_key = f"stocks_entrepot_{entrepot_id}"
         cached_data = cache.get(cache_key)
+        record_cache(cached_data is not None)
         
         if cached_data is None:
             from .models import Stock
@@ -213,6 +341,34 @@ class CacheManager:
         cache_key = f"stocks_entrepot_{entrepot_id}"
         cache.delete(cache_key)
 
+    @staticmethod
+    def get_entreprise_plan_name(entreprise_id: int, timeout: int = 600):
+        """Cache le nom du plan d'abonnement actif d'une entreprise ('free' par défaut)"""
+        cache_key = f"subscription_plan_entreprise_{entreprise_id}"
+        plan_name = cache.get(cache_key)
+        record_cache(plan_name is not None)
+
+        if plan_name is None:
+            from .models import EntrepriseSubscription
+            subscription = (
+                EntrepriseSubscription.objects
+                .select_related('plan')
+                .filter(entreprise_id=entreprise_id)
+                .first()
+            )
+            if subscription and subscription.is_active():
+                plan_name = subscription.plan.name
+            else:
+                plan_name = 'free'
+            cache.set(cache_key, plan_name, timeout)
+
+        return plan_name
+
+    @staticmethod
+    def invalidate_entreprise_plan(entreprise_id: int):
+        """Invalide le plan mis en cache d'une entreprise"""
+        cache.delete(f"subscription_plan_entreprise_{entreprise_id}")
+
     @staticmethod
     def invalidate_api_prefix(prefix: str):
         """Invalide les caches générés par cache_api_response pour un préfixe donné."""
@@ -0,0 +1,137 @@
+# core/categories.py
+"""
+Arborescence des catégories en chemin matérialisé.
+
+``Categorie.chemin`` contient les identifiants des ancêtres puis de la
+catégorie, séparés par des ``/`` (``/3/12/45/``) ; ``profondeur`` vaut 0 pour
+une racine. Les descendants d'une catégorie sont les lignes dont le chemin
+commence par le sien : sélectionnés par intervalle (``>= chemin`` et
+``< chemin suivant``), ce qui utilise l'index ``(entreprise, chemin)`` quel
+que soit le moteur, sans récursion ni requête par niveau.
+
+Le chemin est maintenu par ``Categorie.save`` (création, changement de
+parent) ; la suppression d'une catégorie supprime déjà ses descendants
+(``on_delete=CASCADE``). Les insertions qui contournent ``save()``
+(``bulk_create``, SQL) doivent être suivies de ``reconstruire_chemins``.
+"""
+from django.db.models import F, Q, Value
+from django.db.models.functions import Concat, Substr
+from django.utils import timezone
+
+SEPARATEUR = '/'
+
+
+def construire_chemin(chemin_parent, pk):
+    return f"{chemin_parent or SEPARATEUR}{pk}{SEPARATEUR}"
+
+
+def profondeur_chemin(chemin):
+    return max(chemin.count(SEPARATEUR) - 2, 0)
+
+
+def calculer_chemins(parents):
+    """
+    Chemin de chaque catégorie à partir de ``{id: parent_id}``. Une catégorie
+    dont le parent est absent ou qui forme une boucle devient une racine.
+    """
+    chemins = {}
+    for pk in parents:
+        # Remontée itérative jusqu'à un ancêtre déjà calculé ou une racine
+        pile, vus = [], set()
+        courant = pk
+        while courant not in chemins:
+            parent_id = parents.get(courant)
+            pile.append(courant)
+            vus.add(courant)
+            if parent_id is None or parent_id not in parents or parent_id in vus:
+                chemins[courant] = construire_chemin('', courant)
+                pile.pop()
+                break
+            courant = parent_id
+        while pile:
+            courant = pile.pop()
+            chemins[courant] = construire_chemin(chemins[parents[courant]], courant)
+    return chemins
+
+
+def reconstruire_chemins(entreprise_id=None):
+    """
+    Recalcule chemin et profondeur des catégories (d'une entreprise ou de toutes)
+    après des insertions sans ``save()``. Returns: nombre de catégories corrigées
+    """
+    from .models import Categorie
+
+    categories = Categorie.objects.all()
+    if entreprise_id is not None:
+        categories = categories.filter(entreprise_id=entreprise_id)
+    lignes = list(categories.values_list('id', 'parent_id', 'chemin', 'profondeur'))
+    chemins = calculer_chemins({pk: parent_id for pk, parent_id, _, _ in lignes})
+    a_corriger = [
+        Categorie(pk=pk, chemin=chemins[pk], profondeur=profondeur_chemin(chemins[pk]))
+        for pk, _, chemin, profondeur in lignes
+        if chemin != chemins[pk] or profondeur != profondeur_chemin(chemins[pk])
+    ]
+    Categorie.objects.bulk_update(a_corriger, ['chemin', 'profondeur'], batch_size=500)
+    return len(a_corriger)
+
+
+def bornes_sous_arbre(chemin):
+    """
+    Intervalle ``[debut, fin)`` des chemins de la catégorie et de ses descendants.
+
+    >>> bornes_sous_arbre('/3/12/')
+    ('/3/12/', '/3/120')
+    """
+    # '0' suit immédiatement '/' dans l'ordre des caractères
+    return chemin, chemin[:-1] + chr(ord(SEPARATEUR) + 1)
+
+
+def filtrer_sous_arbre(queryset, chemin, champ='chemin'):
+    """Lignes de ``queryset`` dont ``champ`` (chemin de catégorie) est dans le sous-arbre de ``chemin``."""
+    debut, fin = bornes_sous_arbre(chemin)
+    return queryset.filter(**{f'{champ}__gte': debut, f'{champ}__lt': fin})
+
+
+def deplacer_sous_arbre(ancien_chemin, nouveau_chemin, entreprise_id):
+    """Réécrit en un UPDATE le chemin et la profondeur des descendants d'une catégorie déplacée."""
+    from .models import Categorie
+
+    descendants = filtrer_sous_arbre(
+        Categorie.objects.filter(entreprise_id=entreprise_id), ancien_chemin
+    ).exclude(chemin=ancien_chemin)
+    return descendants.update(
+        chemin=Concat(Value(nouveau_chemin), Substr('chemin', len(ancien_chemin) + 1)),
+        profondeur=F('profondeur') + (profondeur_chemin(nouveau_chemin) - profondeur_chemin(ancien_chemin)),
+        updated_at=timezone.now(),  # UPDATE direct : auto_now n'est pas appliqué
+    )
+
+
+def enfants_par_parent(categories):
+    """{parent_id: [catégories]} dans l'ordre de ``categories``."""
+    enfants = {}
+    for categorie in categories:
+        enfants.setdefault(categorie.parent_id, []).append(categorie)
+    return enfants
+
+
+def charger_sous_arbres(categories):
+    """
+    Descendants de toutes les ``categories`` en une requête, groupés par parent.
+
+    Les catégories dont un ancêtre figure déjà dans la liste ne génèrent pas de
+    condition supplémentaire.
+    """
+    from .models import Categorie
+
+    chemins = sorted({categorie.chemin for categorie in categories if categorie.chemin})
+    racines = []
+    for chemin in chemins:
+        if not racines or not chemin.startswith(racines[-1]):
+            racines.append(chemin)
+    if not racines:
+        return {}
+    condition = Q()
+    for chemin in racines:
+        debut, fin = bornes_sous_arbre(chemin)
+        condition |= Q(chemin__gt=debut, chemin__lt=fin)
+    return enfants_par_parent(Categorie.objects.filter(condition))
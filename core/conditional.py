@@ -0,0 +1,147 @@
+# core/conditional.py
+"""
+Requêtes conditionnelles (ETag / Last-Modified) pour les endpoints par entreprise.
+
+Chaque couple (entreprise, ressource) a une « génération d'écriture » dans le
+cache partagé, remplacée par un horodatage à chaque écriture (signaux). Le
+validateur d'une réponse combine cette génération et le ``max(updated_at)``
+de la ressource ; il est lui-même mis en cache par génération, si bien qu'une
+requête revalidée répond ``304 Not Modified`` sans requête SQL, sans la
+requête principale et sans serializer.
+
+L'ETag et Last-Modified incluent tous deux ``max(updated_at)``, relu après
+``CONDITIONAL_VALIDATOR_TTL`` secondes : une écriture qui contourne les
+signaux (``QuerySet.update()``) est visible au plus tard après ce délai, à
+condition de mettre à jour ``updated_at``. Les écritures de stock par UPDATE
+(core.stock_mutations) incrémentent la génération directement.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+GENERATION_KEY = 'write_gen:{ressource}:{entreprise_id}'
+VALIDATEUR_KEY = 'etag_validator:{ressource}:{entreprise_id}:{generation}'
+
+
+def get_write_generation(ressource, entreprise_id):
+    """Génération d'écriture courante (horodatage en ns de la dernière écriture connue)."""
+    key = GENERATION_KEY.format(ressource=ressource, entreprise_id=entreprise_id)
+    generation = cache.get(key)
+    if generation is None:
+        # Génération inconnue (cache vidé) : on repart de maintenant, jamais d'un état plus ancien
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key) or time.time_ns()
+    return generation
+
+
+def bump_write_generation(entreprise_id, *ressources):
+    """À appeler après chaque écriture touchant les ressources d'une entreprise."""
+    if not entreprise_id:
+        return
+    generation = time.time_ns()
+    cache.set_many({
+        GENERATION_KEY.format(ressource=ressource, entreprise_id=entreprise_id): generation
+        for ressource in ressources
+    }, None)
+
+
+class NotModified(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+    default_detail = ''
+
+
+class ConditionalGetMixin:
+    """
+    Mixin de ViewSet : ETag / Last-Modified et réponse 304 pour les actions listées.
+
+    - ``conditional_resource`` : ressource dont la génération est suivie (ex: ``'produits'``)
+    - ``conditional_actions`` : actions GET concernées (ex: ``('list', 'stats')``)
+    - ``conditional_tenant_lookup`` : filtre entreprise pour ``max(updated_at)``
+    """
+    conditional_resource = None
+    conditional_actions = ('list',)
+    conditional_tenant_lookup = 'entreprise_id'
+    conditional_updated_field = 'updated_at'
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._validateurs = None
+        entreprise_id = getattr(request.user, 'entreprise_id', None)
+        if (
+            request.method not in ('GET', 'HEAD')
+            or self.action not in self.conditional_actions
+            or not entreprise_id
+        ):
+            return
+        self._validateurs = self.get_validateurs(request, entreprise_id)
+        if self._non_modifie(request, *self._validateurs):
+            raise NotModified()
+
+    def get_validateurs(self, request, entreprise_id):
+        """(etag, last_modified) de la réponse pour cet utilisateur et ces paramètres."""
+        generation = get_write_generation(self.conditional_resource, entreprise_id)
+        last_modified = self._derniere_modification(entreprise_id, generation)
+        empreinte = '|'.join(str(part) for part in (
+            self.conditional_resource,
+            entreprise_id,
+            generation,
+            last_modified,
+            request.user.pk,
+            request.get_full_path(),
+            getattr(request, 'accepted_media_type', ''),
+            # Les périodes par défaut (ex: 30 derniers jours) dépendent de la date
+            timezone.localdate().isoformat(),
+        ))
+        etag = f'W/"{hashlib.md5(empreinte.encode()).hexdigest()}"'
+        return etag, last_modified
+
+    def _derniere_modification(self, entreprise_id, generation):
+        key = VALIDATEUR_KEY.format(
+            ressource=self.conditional_resource, entreprise_id=entreprise_id, generation=generation
+        )
+        last_modified = cache.get(key)
+        if last_modified is None:
+            max_updated = self.queryset.model.objects.filter(
+                **{self.conditional_tenant_lookup: entreprise_id}
+            ).aggregate(m=Max(self.conditional_updated_field))['m']
+            # Une suppression ne change pas max(updated_at) : la génération la couvre
+            last_modified = max(
+                max_updated.timestamp() if max_updated else 0,
+                generation / 1e9,
+            )
+            # TTL court : rattrape les update() qui contournent les signaux mais datent updated_at
+            cache.set(key, last_modified, getattr(settings, 'CONDITIONAL_VALIDATOR_TTL', 60))
+        return int(last_modified)
+
+    def _non_modifie(self, request, etag, last_modified):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            # Comparaison faible (RFC 7232) : le préfixe W/ est ignoré
+            demandes = {tag.removeprefix('W/') for tag in parse_etags(if_none_match)}
+            return '*' in demandes or etag.removeprefix('W/') in demandes
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return if_modified_since is not None and last_modified <= if_modified_since
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validateurs = getattr(self, '_validateurs', None)
+        if validateurs and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            etag, last_modified = validateurs
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            # Le navigateur peut garder la réponse mais doit la revalider
+            response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -0,0 +1,159 @@
+# core/creances.py
+"""
+Balance âgée des créances (factures non soldées) par tranche d'ancienneté.
+
+Les tranches (0–30, 31–60, 61–90, plus de 90 jours) sont calculées en SQL par
+agrégats conditionnels sur ``created_at`` : bornes calculées une fois en
+Python, pas d'arithmétique de dates par ligne, une requête pour les totaux et
+une requête groupée pour le détail (client, partenaire ou boutique).
+
+La balance du jour est mise en cache par entreprise (``snapshot_creances``,
+planifiée chaque nuit) : les tableaux de recouvrement la lisent sans requête.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Facture
+from .stock_snapshots import debut_journee
+
+SNAPSHOT_KEY = 'creances:{entreprise_id}:{date}:{par}:{type}'
+
+# (nom, âge minimum en jours, âge maximum inclus)
+TRANCHES = (
+    ('0_30', 0, 30),
+    ('31_60', 31, 60),
+    ('61_90', 61, 90),
+    ('90_plus', 91, None),
+)
+
+# Regroupements possibles : champs de la ligne de détail
+REGROUPEMENTS = {
+    'client': ('client_id', 'client__nom', 'client__prenom'),
+    'partenaire': ('partenaire_id', 'partenaire__nom', 'partenaire__prenom'),
+    'boutique': ('boutique_id', 'boutique__nom'),
+}
+
+
+def factures_ouvertes(queryset):
+    return queryset.filter(reste__gt=0).exclude(status='Annulée')
+
+
+def _filtres_tranches(date_reference):
+    """Filtre ``created_at`` de chaque tranche pour une date de référence."""
+    filtres = {}
+    for nom, age_min, age_max in TRANCHES:
+        # Âge en jours calendaires : facturée le jour J, âge = date_reference - J
+        condition = Q(created_at__lt=debut_journee(date_reference - timedelta(days=age_min - 1)))
+        if age_max is not None:
+            condition &= Q(created_at__gte=debut_journee(date_reference - timedelta(days=age_max)))
+        filtres[nom] = condition
+    return filtres
+
+
+def _agregats(date_reference):
+    agregats = {'reste_total': Sum('reste'), 'nb_factures': Count('id')}
+    for nom, condition in _filtres_tranches(date_reference).items():
+        agregats[f'montant_{nom}'] = Sum('reste', filter=condition)
+        agregats[f'nb_{nom}'] = Count('id', filter=condition)
+    return agregats
+
+
+def _ligne(valeurs):
+    return {
+        'reste_total': round(valeurs['reste_total'] or 0, 2),
+        'nb_factures': valeurs['nb_factures'] or 0,
+        'tranches': {
+            nom: {
+                'montant': round(valeurs[f'montant_{nom}'] or 0, 2),
+                'nb': valeurs[f'nb_{nom}'] or 0,
+            }
+            for nom, _, _ in TRANCHES
+        },
+    }
+
+
+def _libelle(valeurs, champs):
+    nom = ' '.join(str(valeurs[champ]) for champ in champs[2:] + champs[1:2] if valeurs.get(champ))
+    return nom.strip() or None
+
+
+def calculer_balance_agee(queryset, date_reference=None, par=None, limite=None):
+    """
+    Balance âgée des factures ouvertes de ``queryset``.
+
+    Args:
+        par: None, 'client', 'partenaire' ou 'boutique' (détail groupé)
+        limite: nombre max de lignes de détail (plus gros encours d'abord)
+    """
+    date_reference = date_reference or timezone.localdate()
+    ouvertes = factures_ouvertes(queryset)
+    agregats = _agregats(date_reference)
+
+    resultat = {
+        'date_reference': date_reference.isoformat(),
+        'tranches': [nom for nom, _, _ in TRANCHES],
+        'total': _ligne(ouvertes.aggregate(**agregats)),
+    }
+    if par:
+        champs = REGROUPEMENTS[par]
+        lignes = (
+            ouvertes.filter(**{f'{champs[0]}__isnull': False})
+            .values(*champs)
+            .annotate(**agregats)
+            .order_by('-reste_total', champs[0])
+        )
+        if limite:
+            lignes = lignes[:limite]
+        resultat['par'] = par
+        resultat['details'] = [
+            {'id': valeurs[champs[0]], 'nom': _libelle(valeurs, champs), **_ligne(valeurs)}
+            for valeurs in lignes
+        ]
+    resultat['calculated_at'] = timezone.now().isoformat()
+    return resultat
+
+
+def cle_snapshot(entreprise_id, par=None, type_facture=None, date_reference=None):
+    return SNAPSHOT_KEY.format(
+        entreprise_id=entreprise_id,
+        date=(date_reference or timezone.localdate()).isoformat(),
+        par=par or 'total',
+        type=type_facture or 'tous',
+    )
+
+
+def _duree_jusqua_demain():
+    demain = debut_journee(timezone.localdate() + timedelta(days=1))
+    # Marge d'une heure : le snapshot de la veille reste lisible pendant le recalcul nocturne
+    return int((demain - timezone.now()).total_seconds()) + 3600
+
+
+def queryset_entreprise(entreprise_id, type_facture=None):
+    queryset = Facture.objects.filter(boutique__entreprise_id=entreprise_id)
+    if type_facture:
+        queryset = queryset.filter(type=type_facture)
+    return queryset
+
+
+def construire_snapshot(entreprise_id, par=None, type_facture=None):
+    """Calcule la balance du jour d'une entreprise et la met en cache jusqu'au lendemain."""
+    balance = calculer_balance_agee(
+        queryset_entreprise(entreprise_id, type_facture),
+        par=par,
+        limite=getattr(settings, 'CREANCES_SNAPSHOT_LIMITE', 500) if par else None,
+    )
+    balance['snapshot'] = True
+    cache.set(cle_snapshot(entreprise_id, par, type_facture), balance, _duree_jusqua_demain())
+    return balance
+
+
+def get_snapshot(entreprise_id, par=None, type_facture=None):
+    """Balance du jour en cache, calculée à la première lecture si la commande nocturne n'est pas passée."""
+    balance = cache.get(cle_snapshot(entreprise_id, par, type_facture))
+    if balance is None:
+        balance = construire_snapshot(entreprise_id, par, type_facture)
+    return balance
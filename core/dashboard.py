@@ -0,0 +1,356 @@
+# core/dashboard.py
+"""
+Widgets du tableau de bord (endpoint ``dashboard/summary``).
+
+Chaque widget est une fonction enregistrée avec ``@widget`` : durée de cache
+et tags d'invalidation. Un tag correspond à une ressource suivie par les
+générations d'écriture de ``core.conditional`` (``produits``, ``stocks``,
+``factures``, ``abonnement``) : la clé de cache d'un widget contient la
+génération de chacun de ses tags, donc toute écriture sur ces ressources
+invalide le widget sans suppression explicite.
+
+Les widgets absents du cache sont calculés en parallèle dans un pool de threads.
+"""
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .conditional import get_write_generation
+from .models import CommandeClient, CommandePartenaire, Facture, MouvementStock, Produit, Stock
+from .produit_stats import get_stats_produits
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Widget:
+    nom: str
+    fonction: object
+    ttl: int
+    tags: tuple
+
+
+@dataclass
+class ContexteDashboard:
+    """Tenant et filtres résolus une seule fois pour tous les widgets."""
+    entreprise: object
+    boutique_id: int = None
+    params: dict = field(default_factory=dict)
+
+    def produits(self):
+        return Produit.objects.filter(entreprise_id=self.entreprise.id)
+
+    def factures(self):
+        qs = Facture.objects.filter(boutique__entreprise_id=self.entreprise.id)
+        if self.boutique_id:
+            qs = qs.filter(boutique_id=self.boutique_id)
+        return qs
+
+    def stocks(self):
+        qs = Stock.objects.filter(entrepot__entreprise_id=self.entreprise.id)
+        if self.boutique_id:
+            qs = qs.filter(entrepot_id=self.boutique_id)
+        return qs
+
+
+WIDGETS = {}
+
+
+def widget(nom, ttl=60, tags=()):
+    """Enregistre un widget du tableau de bord."""
+    def decorator(fonction):
+        WIDGETS[nom] = Widget(nom, fonction, ttl, tuple(tags))
+        return fonction
+    return decorator
+
+
+# ----------------------------------------------------------------------
+# Calculs partagés avec les endpoints existants
+# ----------------------------------------------------------------------
+
+def periode_analytics(params):
+    """(date_debut, date_fin) depuis les paramètres, 30 derniers jours par défaut."""
+    now = timezone.now()
+    try:
+        date_debut = datetime.strptime(params.get('date_debut') or '', '%Y-%m-%d').date()
+    except ValueError:
+        date_debut = (now - timedelta(days=30)).date()
+    try:
+        date_fin = datetime.strptime(params.get('date_fin') or '', '%Y-%m-%d').date()
+    except ValueError:
+        date_fin = now.date()
+    return date_debut, date_fin
+
+
+def calculer_analytics(queryset, date_debut, date_fin, granularite='jour'):
+    """Statistiques CA par période (FactureViewSet.analytics)."""
+    qs = queryset.exclude(status='Annulée').filter(
+        created_at__date__gte=date_debut, created_at__date__lte=date_fin
+    )
+    trunc_fn = {'semaine': TruncWeek, 'mois': TruncMonth}.get(granularite, TruncDay)
+
+    serie = (
+        qs.annotate(periode=trunc_fn('created_at'))
+        .values('periode')
+        .annotate(
+            ca=Sum('total'),
+            nb_factures=Count('id'),
+            montant_verse=Sum('total') - Sum('reste'),
+        )
+        .order_by('periode')
+    )
+
+    # KPIs globaux de la période (CA clients / partenaires dans le même agrégat)
+    totaux = qs.aggregate(
+        ca_total=Sum('total'),
+        total_verse=Sum('total') - Sum('reste'),
+        total_reste=Sum('reste'),
+        nb_factures=Count('id'),
+        nb_payees=Count('id', filter=Q(status='Payé')),
+        nb_partielles=Count('id', filter=Q(status='Partiellement payé')),
+        nb_attente=Count('id', filter=Q(status='En attente')),
+        ca_clients=Sum('total', filter=Q(type='client')),
+        ca_partenaires=Sum('total', filter=Q(type='partenaire')),
+    )
+
+    # Top 5 produits (par CA) via commandes_client + commandes_partenaire
+    top_par_type = [
+        model.objects.filter(facture__in=qs.values('id'))
+        .values('produit__nom')
+        .annotate(ca=Sum(F('quantite') * F('prix_unitaire_fcfa')), qte=Sum('quantite'))
+        .order_by('-ca')[:5]
+        for model in (CommandeClient, CommandePartenaire)
+    ]
+    produits_dict = {}
+    for p in list(top_par_type[0]) + list(top_par_type[1]):
+        nom = p['produit__nom']
+        if nom not in produits_dict:
+            produits_dict[nom] = {'nom': nom, 'ca': 0, 'qte': 0}
+        produits_dict[nom]['ca'] += p['ca'] or 0
+        produits_dict[nom]['qte'] += p['qte'] or 0
+    top_produits = sorted(produits_dict.values(), key=lambda x: x['ca'], reverse=True)[:5]
+
+    top_clients = (
+        qs.filter(type='client', client__isnull=False)
+        .values('client__nom', 'client__prenom')
+        .annotate(ca=Sum('total'), nb=Count('id'))
+        .order_by('-ca')[:5]
+    )
+    top_partenaires = (
+        qs.filter(type='partenaire', partenaire__isnull=False)
+        .values('partenaire__nom', 'partenaire__prenom')
+        .annotate(ca=Sum('total'), nb=Count('id'))
+        .order_by('-ca')[:5]
+    )
+
+    return {
+        'periode': {'debut': str(date_debut), 'fin': str(date_fin), 'granularite': granularite},
+        'kpis': {
+            'ca_total': round(totaux['ca_total'] or 0, 2),
+            'total_verse': round(totaux['total_verse'] or 0, 2),
+            'total_reste': round(totaux['total_reste'] or 0, 2),
+            'nb_factures': totaux['nb_factures'] or 0,
+            'nb_payees': totaux['nb_payees'] or 0,
+            'nb_partielles': totaux['nb_partielles'] or 0,
+            'nb_attente': totaux['nb_attente'] or 0,
+            'ca_clients': round(totaux['ca_clients'] or 0, 2),
+            'ca_partenaires': round(totaux['ca_partenaires'] or 0, 2),
+        },
+        'serie': [
+            {
+                'date': s['periode'].strftime('%Y-%m-%d') if s['periode'] else None,
+                'ca': round(s['ca'] or 0, 2),
+                'nb_factures': s['nb_factures'] or 0,
+                'montant_verse': round(s['montant_verse'] or 0, 2),
+            }
+            for s in serie
+        ],
+        'top_produits': list(top_produits),
+        'top_clients': [
+            {'nom': f"{c['client__prenom']} {c['client__nom']}".strip(), 'ca': round(c['ca'] or 0, 2), 'nb': c['nb']}
+            for c in top_clients
+        ],
+        'top_partenaires': [
+            {'nom': f"{p['partenaire__prenom']} {p['partenaire__nom']}".strip(), 'ca': round(p['ca'] or 0, 2), 'nb': p['nb']}
+            for p in top_partenaires
+        ],
+    }
+
+
+# ----------------------------------------------------------------------
+# Widgets
+# ----------------------------------------------------------------------
+
+@widget('stats_produits', ttl=300, tags=('produits',))
+def widget_stats_produits(ctx):
+    return get_stats_produits(ctx.entreprise.id)
+
+
+@widget('ventes', ttl=120, tags=('factures',))
+def widget_ventes(ctx):
+    date_debut, date_fin = periode_analytics(ctx.params)
+    return calculer_analytics(ctx.factures(), date_debut, date_fin, ctx.params.get('granularite', 'jour'))
+
+
+@widget('stocks_faibles', ttl=120, tags=('produits', 'stocks'))
+def widget_stocks_faibles(ctx, limite=10):
+    qs = ctx.produits().filter(actif=True, quantite__lte=F('stock_minimum'))
+    return {
+        'total': qs.count(),
+        'produits': list(
+            qs.order_by('quantite', 'nom')
+            .values('id', 'nom', 'sku', 'quantite', 'stock_minimum')[:limite]
+        ),
+    }
+
+
+@widget('stocks_par_entrepot', ttl=300, tags=('stocks',))
+def widget_stocks_par_entrepot(ctx):
+    lignes = (
+        ctx.stocks()
+        .values('entrepot_id', 'entrepot__nom')
+        .annotate(
+            nb_references=Count('id'),
+            unites=Sum('quantite'),
+            valeur=Sum(ExpressionWrapper(F('quantite') * F('produit__prix_vente'), output_field=FloatField())),
+            nb_ruptures=Count('id', filter=Q(quantite__lte=0)),
+        )
+        .order_by('entrepot__nom')
+    )
+    return [
+        {
+            'entrepot': ligne['entrepot_id'],
+            'entrepot_nom': ligne['entrepot__nom'],
+            'nb_references': ligne['nb_references'],
+            'unites': ligne['unites'] or 0,
+            'valeur': round(ligne['valeur'] or 0, 2),
+            'nb_ruptures': ligne['nb_ruptures'],
+        }
+        for ligne in lignes
+    ]
+
+
+@widget('mouvements_recents', ttl=60, tags=('stocks',))
+def widget_mouvements_recents(ctx, limite=10):
+    qs = MouvementStock.objects.filter(entrepot__entreprise_id=ctx.entreprise.id)
+    if ctx.boutique_id:
+        qs = qs.filter(entrepot_id=ctx.boutique_id)
+    mouvements = qs.order_by('-created_at').values(
+        'id', 'type_mouvement', 'quantite', 'quantite_apres', 'created_at',
+        'produit_id', 'produit__nom', 'variante__nom', 'entrepot__nom', 'utilisateur__username',
+    )[:limite]
+    return [
+        {
+            'id': m['id'],
+            'type_mouvement': m['type_mouvement'],
+            'quantite': m['quantite'],
+            'quantite_apres': m['quantite_apres'],
+            'created_at': m['created_at'].isoformat() if m['created_at'] else None,
+            'produit': m['produit_id'],
+            'produit_nom': m['produit__nom'],
+            'variante_nom': m['variante__nom'],
+            'entrepot_nom': m['entrepot__nom'],
+            'utilisateur': m['utilisateur__username'],
+        }
+        for m in mouvements
+    ]
+
+
+@widget('abonnement', ttl=300, tags=('abonnement', 'produits', 'factures'))
+def widget_abonnement(ctx):
+    # Les compteurs d'usage sont recalculés à la lecture : tags des ressources comptées
+    from .subscription_utils import get_current_usage, get_entreprise_subscription
+    subscription = get_entreprise_subscription(ctx.entreprise)
+    return {
+        'plan': subscription.plan.name,
+        'plan_nom': subscription.plan.display_name,
+        'status': subscription.status,
+        'end_date': subscription.end_date.isoformat() if subscription.end_date else None,
+        'usage': get_current_usage(ctx.entreprise),
+    }
+
+
+# ----------------------------------------------------------------------
+# Exécution
+# ----------------------------------------------------------------------
+
+def cle_widget(w, ctx):
+    generations = '-'.join(str(get_write_generation(tag, ctx.entreprise.id)) for tag in w.tags)
+    params = hashlib.md5(repr(sorted(ctx.params.items())).encode()).hexdigest()[:8]
+    # La date du jour : les périodes par défaut sont relatives à aujourd'hui
+    return (
+        f"dashboard:{w.nom}:{ctx.entreprise.id}:{ctx.boutique_id or 0}:{params}:"
+        f"{timezone.localdate().isoformat()}:{generations}"
+    )
+
+
+def _calculer(w, ctx):
+    debut = time.perf_counter()
+    return w.fonction(ctx), (time.perf_counter() - debut) * 1000
+
+
+def _calculer_en_thread(w, ctx):
+    """Calcul d'un widget dans un thread du pool (connexion propre au thread, fermée ensuite)."""
+    try:
+        return _calculer(w, ctx)
+    finally:
+        connection.close()
+
+
+def _appeler(fonction, *args):
+    """(résultat, None) ou (None, exception)."""
+    try:
+        return fonction(*args), None
+    except Exception as e:
+        return None, e
+
+
+def calculer_dashboard(ctx, noms):
+    """
+    Calcule les widgets demandés : lecture groupée du cache, puis calcul
+    concurrent des widgets manquants.
+
+    Returns:
+        (widgets, meta) : données et métadonnées (cache, durée) par widget
+    """
+    cles = {nom: cle_widget(WIDGETS[nom], ctx) for nom in noms}
+    en_cache = cache.get_many(list(cles.values()))
+    widgets, meta = {}, {}
+    manquants = []
+    for nom in noms:
+        if cles[nom] in en_cache:
+            widgets[nom] = en_cache[cles[nom]]
+            meta[nom] = {'cache': 'hit', 'ttl': WIDGETS[nom].ttl}
+        else:
+            manquants.append(nom)
+
+    if manquants:
+        max_workers = min(len(manquants), getattr(settings, 'DASHBOARD_MAX_WORKERS', 4))
+        if max_workers <= 1:
+            # Calcul séquentiel, dans le thread et la transaction de la requête (SQLite, tests)
+            resultats = {nom: _appeler(_calculer, WIDGETS[nom], ctx) for nom in manquants}
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = {nom: pool.submit(_calculer_en_thread, WIDGETS[nom], ctx) for nom in manquants}
+                resultats = {nom: _appeler(future.result) for nom, future in futures.items()}
+        for nom, (resultat, erreur) in resultats.items():
+            if erreur is None:
+                widgets[nom], duree_ms = resultat
+                cache.set(cles[nom], widgets[nom], WIDGETS[nom].ttl)
+                meta[nom] = {'cache': 'miss', 'ttl': WIDGETS[nom].ttl, 'duree_ms': round(duree_ms, 1)}
+            else:
+                logger.error("Erreur widget dashboard %s", nom, exc_info=erreur)
+                widgets[nom] = None
+                # Détail de l'exception (SQL, internes) dans les logs uniquement
+                meta[nom] = {'cache': 'miss', 'erreur': 'indisponible'}
+    return widgets, meta
@@ -0,0 +1,245 @@
+# core/evenements.py
+"""
+Évènements temps réel (flux SSE ``evenements/stream/``) : niveaux de stock et
+nouvelles factures, par entreprise.
+
+Publication
+    Les signaux post_save / post_delete de ``Stock`` et la création d'une
+    ``Facture`` appellent ``signaler_stock`` / ``signaler_facture`` : seuls les
+    identifiants sont notés pour le thread courant. Après validation de la
+    transaction (``transaction.on_commit``), ``_publier_lot`` relit l'état
+    validé en une requête et publie un évènement par (entreprise, entrepôt) :
+    un ajustement d'inventaire de 500 lignes donne un seul évènement, et une
+    transaction annulée ne publie jamais de quantités fausses.
+
+Diffusion
+    Le broker est choisi par ``EVENEMENTS_BACKEND`` (chemin d'une classe) :
+
+    - ``MemoireBackend`` (défaut) : abonnés du processus courant, adapté à un
+      serveur ASGI unique qui reçoit aussi les écritures ;
+    - ``RedisBackend`` : pub/sub Redis (``REDIS_URL``), pour plusieurs
+      processus ou des écritures servies en WSGI.
+
+    Un backend implémente ``publier(canal, message)`` (synchrone, tout thread)
+    et ``ecouter(canal, timeout)`` (générateur asynchrone, ``None`` à chaque
+    ``timeout`` sans message).
+
+Un abonné trop lent perd ses messages en attente et reçoit ``resynchroniser`` :
+le client recharge alors ses données (``sync/``) au lieu d'appliquer un flux
+incomplet.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+TYPE_STOCKS = 'stocks'
+TYPE_FACTURES = 'factures'
+TYPE_RESYNCHRONISER = 'resynchroniser'
+
+_local = threading.local()
+_backend = None
+_verrou_backend = threading.Lock()
+
+
+def canal_entreprise(entreprise_id):
+    return f"evenements:entreprise:{entreprise_id}"
+
+
+class _Abonnement:
+    """File d'un abonné, alimentée depuis n'importe quel thread."""
+
+    def __init__(self, boucle, taille):
+        self.boucle = boucle
+        self.file = asyncio.Queue(maxsize=taille)
+
+    def livrer(self, message):
+        self.boucle.call_soon_threadsafe(self._deposer, message)
+
+    def _deposer(self, message):
+        if self.file.full():
+            # Abonné en retard : on abandonne l'arriéré, le client rechargera tout
+            while not self.file.empty():
+                self.file.get_nowait()
+            message = {'type': TYPE_RESYNCHRONISER, 'boutique': None, 'donnees': {}}
+        self.file.put_nowait(message)
+
+
+class MemoireBackend:
+    """Diffusion aux abonnés du processus courant."""
+
+    def __init__(self):
+        self._abonnes = defaultdict(set)
+        self._verrou = threading.Lock()
+
+    def publier(self, canal, message):
+        with self._verrou:
+            abonnes = list(self._abonnes.get(canal, ()))
+        for abonnement in abonnes:
+            try:
+                abonnement.livrer(message)
+            except RuntimeError:
+                # Boucle de l'abonné fermée : il sera retiré à la fin de son écoute
+                pass
+
+    def nombre_abonnes(self, canal=None):
+        with self._verrou:
+            if canal is not None:
+                return len(self._abonnes.get(canal, ()))
+            return sum(len(abonnes) for abonnes in self._abonnes.values())
+
+    async def ecouter(self, canal, timeout):
+        abonnement = _Abonnement(asyncio.get_running_loop(), getattr(settings, 'SSE_FILE_MAX', 100))
+        with self._verrou:
+            self._abonnes[canal].add(abonnement)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(abonnement.file.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._verrou:
+                self._abonnes[canal].discard(abonnement)
+                if not self._abonnes[canal]:
+                    del self._abonnes[canal]
+
+
+class RedisBackend:
+    """Diffusion entre processus par pub/sub Redis (paquet ``redis``)."""
+
+    def __init__(self, url=None):
+        import redis
+        self.url = url or settings.REDIS_URL
+        self._client = redis.Redis.from_url(self.url)
+
+    def publier(self, canal, message):
+        self._client.publish(canal, json.dumps(message, cls=DjangoJSONEncoder))
+
+    async def ecouter(self, canal, timeout):
+        import redis.asyncio as redis_async
+        client = redis_async.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(canal)
+        try:
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+                yield json.loads(message['data']) if message else None
+        finally:
+            await pubsub.unsubscribe(canal)
+            await pubsub.aclose()
+            await client.aclose()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _verrou_backend:
+            if _backend is None:
+                chemin = getattr(settings, 'EVENEMENTS_BACKEND', 'core.evenements.MemoireBackend')
+                _backend = import_string(chemin)()
+    return _backend
+
+
+def publier(entreprise_id, type_, donnees, boutique_id=None):
+    """Publie immédiatement un évènement pour les abonnés de l'entreprise."""
+    get_backend().publier(canal_entreprise(entreprise_id), {
+        'id': time.time_ns(),
+        'type': type_,
+        'boutique': boutique_id,
+        'donnees': donnees,
+    })
+
+
+# ----------------------------------------------------------------------
+# Regroupement par transaction
+# ----------------------------------------------------------------------
+
+def _lot():
+    lot = getattr(_local, 'lot', None)
+    if lot is None:
+        lot = _local.lot = {'stocks': {}, 'factures': set()}
+    return lot
+
+
+def signaler_stock(stock_id, entrepot_id):
+    """Note un stock modifié ou supprimé ; publié après validation de la transaction."""
+    _lot()['stocks'][stock_id] = entrepot_id
+    transaction.on_commit(_publier_lot)
+
+
+def signaler_facture(facture_id):
+    """Note une facture créée ; publiée après validation de la transaction."""
+    _lot()['factures'].add(facture_id)
+    transaction.on_commit(_publier_lot)
+
+
+def _publier_lot():
+    """
+    Publie les changements notés. Le premier rappel après validation vide le lot,
+    les suivants n'ont plus rien à faire. Les identifiants restés d'une
+    transaction annulée sont relus et publiés avec leur état réel, sans risque.
+    """
+    from .models import Boutique, Facture, Stock
+
+    lot = getattr(_local, 'lot', None)
+    _local.lot = None
+    if not lot or not (lot['stocks'] or lot['factures']):
+        return
+    try:
+        evenements = defaultdict(lambda: {'stocks': [], 'supprimes': []})
+        if lot['stocks']:
+            entreprises = dict(
+                Boutique.objects.filter(id__in=set(lot['stocks'].values())).values_list('id', 'entreprise_id')
+            )
+            lus = set()
+            for stock in Stock.objects.filter(id__in=list(lot['stocks'])).values(
+                'id', 'produit_id', 'variante_id', 'entrepot_id', 'quantite', 'quantite_reservee',
+            ):
+                lus.add(stock['id'])
+                evenements[(entreprises.get(stock['entrepot_id']), stock['entrepot_id'])]['stocks'].append({
+                    'id': stock['id'],
+                    'produit': stock['produit_id'],
+                    'variante': stock['variante_id'],
+                    'quantite': stock['quantite'],
+                    'quantite_reservee': stock['quantite_reservee'],
+                })
+            for stock_id, entrepot_id in lot['stocks'].items():
+                if stock_id not in lus:
+                    evenements[(entreprises.get(entrepot_id), entrepot_id)]['supprimes'].append(stock_id)
+        for (entreprise_id, entrepot_id), donnees in evenements.items():
+            if entreprise_id:
+                publier(entreprise_id, TYPE_STOCKS, {'entrepot': entrepot_id, **donnees}, boutique_id=entrepot_id)
+
+        factures = defaultdict(list)
+        for facture in Facture.objects.filter(id__in=lot['factures']).values(
+            'id', 'numero', 'type', 'status', 'total', 'reste', 'boutique_id', 'boutique__entreprise_id',
+        ):
+            factures[(facture.pop('boutique__entreprise_id'), facture.pop('boutique_id'))].append(facture)
+        for (entreprise_id, boutique_id), liste in factures.items():
+            if entreprise_id:
+                publier(entreprise_id, TYPE_FACTURES, {'boutique': boutique_id, 'factures': liste}, boutique_id=boutique_id)
+    except Exception:
+        logger.exception("Erreur publication des évènements")
+
+
+# ----------------------------------------------------------------------
+# Format SSE
+# ----------------------------------------------------------------------
+
+def format_sse(evenement, donnees, identifiant=None):
+    lignes = []
+    if identifiant is not None:
+        lignes.append(f"id: {identifiant}")
+    lignes.append(f"event: {evenement}")
+    lignes.append(f"data: {json.dumps(donnees, cls=DjangoJSONEncoder, separators=(',', ':'))}")
+    return '\n'.join(lignes) + '\n\n'
@@ -0,0 +1,111 @@
+"""
+Flux Server-Sent Events des changements de stock et des nouvelles factures.
+
+Vue Django asynchrone (pas DRF) : servie par l'application ASGI
+(``storage.asgi``), une connexion ouverte n'occupe pas de worker. Sous WSGI,
+l'endpoint répond 501 : un flux bloquerait un worker entier.
+
+Authentification : en-tête ``Authorization: Bearer <jwt>`` ou, pour
+``EventSource`` qui ne permet pas d'en-têtes, paramètre ``?token=<jwt>`` (jeton
+d'accès, durée de vie courte) ; à défaut, la session Django.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from .evenements import TYPE_RESYNCHRONISER, canal_entreprise, format_sse, get_backend
+from .models import Boutique, Entreprise
+
+
+async def _authentifier(request):
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+    entete = request.headers.get('Authorization', '')
+    jeton = entete[len('Bearer '):] if entete.startswith('Bearer ') else request.GET.get('token')
+    if jeton:
+        authentification = JWTAuthentication()
+        try:
+            valide = authentification.get_validated_token(jeton)
+            return await sync_to_async(authentification.get_user)(valide)
+        except (InvalidToken, TokenError):
+            return None
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+@sync_to_async
+def _perimetre(user, entreprise_param, boutique_param):
+    """(entreprise_id, boutique_id, erreur, statut) autorisés pour l'utilisateur."""
+    entreprise_id = user.entreprise_id
+    if user.role == 'superadmin' and not user.entreprise_id and entreprise_param.isdigit():
+        entreprise_id = Entreprise.objects.filter(id=entreprise_param).values_list('id', flat=True).first()
+    if not entreprise_id:
+        return None, None, 'Aucune entreprise associée', 400
+    if boutique_param:
+        if not boutique_param.isdigit() or not Boutique.objects.filter(id=boutique_param, entreprise_id=entreprise_id).exists():
+            return None, None, 'Boutique introuvable', 404
+        return entreprise_id, int(boutique_param), None, None
+    return entreprise_id, None, None, None
+
+
+async def _flux(entreprise_id, boutique_id):
+    keepalive = getattr(settings, 'SSE_KEEPALIVE', 15)
+    duree_max = getattr(settings, 'SSE_DUREE_MAX', 300)
+    boucle = asyncio.get_running_loop()
+    fin = boucle.time() + duree_max
+
+    # Délai de reconnexion d'EventSource, puis état initial : à chaque (re)connexion,
+    # le client rattrape les changements manqués via sync/ avant d'appliquer le flux
+    yield f"retry: {getattr(settings, 'SSE_RETRY_MS', 3000)}\n\n"
+    yield format_sse('connexion', {
+        'entreprise': entreprise_id,
+        'boutique': boutique_id,
+        'serveur': timezone.now().isoformat(),
+    })
+
+    messages = get_backend().ecouter(canal_entreprise(entreprise_id), keepalive)
+    try:
+        async for message in messages:
+            if message is None:
+                yield ': ping\n\n'
+            elif boutique_id is None or message['boutique'] in (None, boutique_id):
+                yield format_sse(message['type'], message['donnees'], message.get('id'))
+                if message['type'] == TYPE_RESYNCHRONISER:
+                    break
+            if boucle.time() >= fin:
+                # Connexion renouvelée régulièrement (jetons expirés, proxies) : EventSource se reconnecte
+                break
+    finally:
+        await messages.aclose()
+
+
+@require_GET
+async def flux_evenements(request):
+    """
+    Flux SSE des évènements ``stocks`` et ``factures`` de l'entreprise.
+    Params: boutique (évènements d'un seul entrepôt / boutique), token,
+    entreprise (administrateur plateforme uniquement)
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Flux disponible uniquement via le serveur ASGI'}, status=501)
+
+    user = await _authentifier(request)
+    if user is None or not user.is_active:
+        return JsonResponse({'error': 'Authentification requise'}, status=401)
+
+    entreprise_id, boutique_id, erreur, statut = await _perimetre(
+        user, request.GET.get('entreprise', ''), request.GET.get('boutique', '')
+    )
+    if erreur:
+        return JsonResponse({'error': erreur}, status=statut)
+
+    response = StreamingHttpResponse(_flux(entreprise_id, boutique_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,101 @@
+# core/facture_document.py
+"""
+Document complet d'une facture (``FactureViewSet.document``) : en-tête,
+lignes avec produit et variante, versements et totaux calculés.
+
+Nombre de requêtes fixe quel que soit le nombre de lignes : la facture avec
+ses relations (``select_related``), puis ses lignes et ses versements en
+``Prefetch`` — seules les lignes du type de la facture (client ou
+partenaire) sont chargées.
+
+Le document est mis en cache par entreprise ; la clé contient la génération
+d'écriture ``factures``, incrémentée à chaque écriture de facture, de ligne
+ou de versement, si bien qu'un document n'est jamais servi périmé.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch, prefetch_related_objects
+
+from .conditional import get_write_generation
+from .models import CommandeClient, CommandePartenaire, Versement
+from .serializers import (
+    CommandeClientSerializer, CommandePartenaireSerializer, FactureSerializer, VersementSerializer,
+)
+
+DOCUMENT_KEY = 'facture_document:{entreprise_id}:{generation}:{facture_id}'
+
+# Type de facture → (relation des lignes, modèle, serializer)
+LIGNES = {
+    'client': ('commandes_client', CommandeClient, CommandeClientSerializer),
+    'partenaire': ('commandes_partenaire', CommandePartenaire, CommandePartenaireSerializer),
+}
+
+
+def queryset_document(queryset):
+    return queryset.select_related('client', 'partenaire', 'boutique', 'created_by')
+
+
+def charger_lignes_et_versements(facture):
+    """Précharge en deux requêtes les lignes (produit, variante) et les versements de la facture."""
+    relation, modele, _ = LIGNES.get(facture.type, LIGNES['client'])
+    prefetch_related_objects(
+        [facture],
+        Prefetch(relation, queryset=modele.objects.select_related('produit', 'variante')),
+        Prefetch('versements', queryset=Versement.objects.select_related('created_by', 'boutique')),
+    )
+    return facture
+
+
+def calculer_totaux(facture, lignes, versements):
+    total_lignes = sum(ligne.quantite * ligne.prix_unitaire_fcfa for ligne in lignes)
+    remise = sum(
+        (ligne.prix_initial_fcfa - ligne.prix_unitaire_fcfa) * ligne.quantite
+        for ligne in lignes
+        if ligne.prix_initial_fcfa and ligne.prix_initial_fcfa > ligne.prix_unitaire_fcfa
+    )
+    total_verse = sum(versement.montant for versement in versements)
+    return {
+        'nb_lignes': len(lignes),
+        'quantite_totale': sum(ligne.quantite for ligne in lignes),
+        'total_lignes': round(total_lignes, 2),
+        'remise_totale': round(remise, 2),
+        'total': round(facture.total, 2),
+        'nb_versements': len(versements),
+        'total_verse': round(total_verse, 2),
+        'reste': round(facture.reste, 2),
+        'taux_paiement': round(min(total_verse / facture.total, 1) * 100, 1) if facture.total else None,
+    }
+
+
+def construire_document(facture):
+    """Document sérialisé d'une facture chargée par ``queryset_document``."""
+    charger_lignes_et_versements(facture)
+    relation, _, serializer_lignes = LIGNES.get(facture.type, LIGNES['client'])
+    lignes = list(getattr(facture, relation).all())
+    versements = list(facture.versements.all())
+    return {
+        'facture': FactureSerializer(facture).data,
+        'lignes': serializer_lignes(lignes, many=True).data,
+        'versements': VersementSerializer(versements, many=True).data,
+        'totaux': calculer_totaux(facture, lignes, versements),
+    }
+
+
+def get_document(entreprise_id, facture_id, charger):
+    """
+    Document en cache d'une facture de l'entreprise.
+
+    Args:
+        charger: fonction sans argument qui renvoie la facture (filtrée sur
+            l'entreprise, via ``queryset_document``) ou lève Http404
+    """
+    cle = DOCUMENT_KEY.format(
+        entreprise_id=entreprise_id,
+        generation=get_write_generation('factures', entreprise_id),
+        facture_id=facture_id,
+    )
+    document = cache.get(cle)
+    if document is None:
+        document = construire_document(charger())
+        cache.set(cle, document, getattr(settings, 'FACTURE_DOCUMENT_CACHE_TTL', 600))
+    return document
@@ -0,0 +1,196 @@
+# core/images.py
+"""
+Dérivées d'images (miniature, taille moyenne) pour ``Produit.image`` et ``Entreprise.logo``.
+
+À l'enregistrement d'une nouvelle image, les dérivées sont générées avec
+Pillow dans un pool de threads (après validation de la transaction) et
+stockées à côté de l'original :
+
+    produits/images/photo.jpg → produits/images/photo.thumb.webp, photo.thumb.jpg,
+                                produits/images/photo.medium.webp, photo.medium.jpg
+
+Les noms générés sont enregistrés dans le champ ``<champ>_derivees`` du modèle
+avec le nom de l'original (``source``) : tant que les dérivées d'une nouvelle
+image ne sont pas prêtes, ``url_derivee`` renvoie l'URL de l'original.
+
+La commande ``generer_derivees_images`` traite les images déjà en base.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Côté le plus long, en pixels
+TAILLES = {
+    'thumb': 160,
+    'medium': 640,
+}
+
+# Format → (format Pillow, options d'enregistrement)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Modèle → champs image traités
+CHAMPS_IMAGES = {
+    'Produit': ('image',),
+    'Entreprise': ('logo',),
+}
+
+_pool = None
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_DERIVEES_WORKERS', 2),
+            thread_name_prefix='images',
+        )
+    return _pool
+
+
+def champ_derivees(champ):
+    return f'{champ}_derivees'
+
+
+def nom_derivee(nom_original, taille, format_):
+    racine, _ = os.path.splitext(nom_original)
+    return f'{racine}.{taille}.{format_}'
+
+
+def derivees_a_jour(fichier, derivees):
+    """True si les dérivées enregistrées correspondent à l'image actuelle."""
+    return bool(fichier) and bool(derivees) and derivees.get('source') == fichier.name
+
+
+def url_derivee(fichier, derivees, taille, format_='webp', request=None):
+    """
+    URL de la dérivée ``taille`` d'une image, ou de l'original si elle n'est pas
+    (encore) générée. None sans image.
+    """
+    if not fichier:
+        return None
+    nom = (derivees or {}).get(taille, {}).get(format_) if derivees_a_jour(fichier, derivees) else None
+    url = fichier.storage.url(nom) if nom else fichier.url
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def _formats_disponibles():
+    from PIL import features
+    return [format_ for format_ in FORMATS if format_ != 'webp' or features.check('webp')]
+
+
+def _encoder(image, format_):
+    from PIL import Image
+    format_pillow, options = FORMATS[format_]
+    if format_pillow == 'JPEG' and image.mode != 'RGB':
+        # JPEG sans transparence : fond blanc
+        fond = Image.new('RGB', image.size, (255, 255, 255))
+        fond.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = fond
+    tampon = BytesIO()
+    image.save(tampon, format_pillow, **options)
+    return tampon.getvalue()
+
+
+def generer_derivees(fichier):
+    """
+    Génère et stocke les dérivées d'un fichier image.
+
+    Returns:
+        {'source': nom, taille: {format: nom}} à enregistrer dans ``<champ>_derivees``
+    """
+    from PIL import Image, ImageOps
+
+    storage = fichier.storage
+    with storage.open(fichier.name, 'rb') as source:
+        image = Image.open(source)
+        image.draft('RGB', (max(TAILLES.values()),) * 2)  # Décodage JPEG réduit : moins de mémoire
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    derivees = {'source': fichier.name}
+    for taille, cote in TAILLES.items():
+        reduite = image.copy()
+        reduite.thumbnail((cote, cote), Image.Resampling.LANCZOS)
+        derivees[taille] = {}
+        for format_ in _formats_disponibles():
+            nom = nom_derivee(fichier.name, taille, format_)
+            if storage.exists(nom):
+                storage.delete(nom)
+            derivees[taille][format_] = storage.save(nom, ContentFile(_encoder(reduite, format_)))
+    return derivees
+
+
+def supprimer_derivees(storage, derivees, conserver=()):
+    for taille in TAILLES:
+        for nom in (derivees or {}).get(taille, {}).values():
+            if nom not in conserver:
+                try:
+                    storage.delete(nom)
+                except Exception:
+                    logger.exception("Erreur suppression dérivée %s", nom)
+
+
+def traiter_instance(instance, champ):
+    """
+    Génère les dérivées d'une instance et les enregistre si l'image n'a pas
+    changé entre-temps (UPDATE conditionnel, sans signal de sauvegarde).
+    """
+    fichier = getattr(instance, champ)
+    if not fichier:
+        return None
+    anciennes = getattr(instance, champ_derivees(champ)) or {}
+    derivees = generer_derivees(fichier)
+    conserver = {nom for taille in TAILLES for nom in derivees[taille].values()}
+    mis_a_jour = type(instance).objects.filter(pk=instance.pk, **{champ: fichier.name}).update(
+        **{champ_derivees(champ): derivees}
+    )
+    if mis_a_jour:
+        setattr(instance, champ_derivees(champ), derivees)
+        supprimer_derivees(fichier.storage, anciennes, conserver)
+    else:
+        # Image remplacée pendant le traitement : ces dérivées ne servent plus
+        supprimer_derivees(fichier.storage, derivees)
+    return derivees if mis_a_jour else None
+
+
+def _traiter(modele, pk, champ):
+    from django.apps import apps
+    try:
+        instance = apps.get_model('core', modele).objects.filter(pk=pk).first()
+        if instance is not None:
+            traiter_instance(instance, champ)
+    except Exception:
+        logger.exception("Erreur génération des dérivées %s %s (%s)", modele, pk, champ)
+
+
+def _traiter_en_thread(modele, pk, champ):
+    """Traitement dans un thread du pool (connexion propre au thread, fermée ensuite)."""
+    try:
+        _traiter(modele, pk, champ)
+    finally:
+        connection.close()
+
+
+def planifier_derivees(instance, champ):
+    """Programme la génération des dérivées après validation de la transaction en cours."""
+    modele, pk = type(instance).__name__, instance.pk
+
+    def lancer():
+        if getattr(settings, 'IMAGE_DERIVEES_ASYNC', True):
+            _get_pool().submit(_traiter_en_thread, modele, pk, champ)
+        else:
+            _traiter(modele, pk, champ)
+
+    transaction.on_commit(lancer)
@@ -0,0 +1,178 @@
+# core/journal_archive.py
+"""
+Rétention du journal d'activité.
+
+Les entrées plus anciennes que ``JOURNAL_RETENTION_DAYS`` sont déplacées par
+lots de la table ``Journal`` vers ``JournalArchive`` (une transaction courte
+par lot, pas de verrou long). ``JournalViewSet`` interroge ensuite les deux
+tables comme une seule liste : ``JournalChain`` pour un tri par date (toute
+l'archive précède le journal vivant), ``JournalMerge`` pour les autres tris.
+"""
+import heapq
+from datetime import timedelta
+from functools import cmp_to_key
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Journal, JournalArchive
+
+ARCHIVE_GENERATION_KEY = 'journal_archive_generation'
+JOURNAL_FIELDS = (
+    'id', 'utilisateur_id', 'entreprise_id', 'boutique_id', 'type_operation',
+    'description', 'details', 'date_operation', 'ip_address',
+)
+
+
+def get_retention_days():
+    return int(getattr(settings, 'JOURNAL_RETENTION_DAYS', 180))
+
+
+def get_archive_generation():
+    """Génération de l'archive : change à chaque archivage (clé des caches de comptage)."""
+    generation = cache.get(ARCHIVE_GENERATION_KEY)
+    if generation is None:
+        generation = 0
+        cache.set(ARCHIVE_GENERATION_KEY, generation, None)
+    return generation
+
+
+def bump_archive_generation():
+    cache.set(ARCHIVE_GENERATION_KEY, timezone.now().timestamp(), None)
+
+
+def archive_journal_entries(older_than_days=None, chunk_size=2000, dry_run=False, stdout=None):
+    """
+    Déplace les entrées de journal plus anciennes que l'horizon vers l'archive.
+
+    Chaque lot est copié puis supprimé dans sa propre transaction ; en cas
+    d'interruption, les lots déjà traités restent archivés et un lot rejoué
+    est ignoré grâce à l'identifiant d'origine conservé.
+
+    Returns:
+        Nombre d'entrées archivées.
+    """
+    days = get_retention_days() if older_than_days is None else older_than_days
+    cutoff = timezone.now() - timedelta(days=days)
+    candidates = Journal.objects.filter(date_operation__lt=cutoff)
+
+    if dry_run:
+        return candidates.count()
+
+    total = 0
+    while True:
+        with transaction.atomic():
+            rows = list(candidates.order_by('id').values(*JOURNAL_FIELDS)[:chunk_size])
+            if not rows:
+                break
+            archives = []
+            for row in rows:
+                date_operation = timezone.localtime(row['date_operation'])
+                archives.append(JournalArchive(
+                    periode=date_operation.date().replace(day=1),
+                    **row
+                ))
+            JournalArchive.objects.bulk_create(archives, ignore_conflicts=True)
+            Journal.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        total += len(rows)
+        if stdout:
+            stdout.write(f"   ... {total} entrées archivées")
+
+    if total:
+        bump_archive_generation()
+    return total
+
+
+class JournalChain:
+    """
+    Concatène deux querysets triés (journal vivant puis archive, ou l'inverse)
+    en une séquence paginable : ``count()`` additionne les deux tables et le
+    découpage ne lit l'archive que si la page l'atteint.
+    """
+
+    def __init__(self, first, second, first_count=None, second_count=None):
+        self.first = first
+        self.second = second
+        self._first_count = first_count
+        self._second_count = second_count
+
+    def _counts(self):
+        if self._first_count is None:
+            self._first_count = self.first.count()
+        if self._second_count is None:
+            self._second_count = self.second.count()
+        return self._first_count, self._second_count
+
+    def count(self):
+        first_count, second_count = self._counts()
+        return first_count + second_count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            items = self[index:index + 1]
+            if not items:
+                raise IndexError(index)
+            return items[0]
+        start = index.start or 0
+        stop = index.stop if index.stop is not None else self.count()
+        first_count, _ = self._counts()
+        items = []
+        if start < first_count:
+            items.extend(self.first[start:min(stop, first_count)])
+        if stop > first_count:
+            items.extend(self.second[max(start - first_count, 0):stop - first_count])
+        return items
+
+
+class JournalMerge(JournalChain):
+    """
+    Interclasse deux querysets triés selon ``ordering`` (champs, ``-`` pour un
+    tri décroissant), pour les tris où journal vivant et archive s'entremêlent
+    (type d'opération, utilisateur). Une page ``[debut, fin)`` lit au plus
+    ``fin`` lignes de chaque table.
+
+    Le tri est complété par la date puis l'identifiant (conservé à l'archivage)
+    et les valeurs nulles sont placées explicitement, pour que l'ordre SQL et
+    la comparaison en Python soient identiques.
+    """
+
+    def __init__(self, first, second, ordering, first_count=None, second_count=None):
+        champs = [(champ.lstrip('-'), champ.startswith('-')) for champ in ordering]
+        noms = {nom for nom, _ in champs}
+        champs += [(nom, True) for nom in ('date_operation', 'id') if nom not in noms]
+        expressions = [
+            F(nom).desc(nulls_last=True) if decroissant else F(nom).asc(nulls_first=True)
+            for nom, decroissant in champs
+        ]
+        super().__init__(
+            first.order_by(*expressions), second.order_by(*expressions), first_count, second_count
+        )
+        self.cles = [(first.model._meta.get_field(nom).attname, decroissant) for nom, decroissant in champs]
+
+    def _comparer(self, a, b):
+        for attname, decroissant in self.cles:
+            va, vb = getattr(a, attname), getattr(b, attname)
+            if va == vb:
+                continue
+            if va is None or vb is None:
+                resultat = -1 if va is None else 1
+            else:
+                resultat = -1 if va < vb else 1
+            return -resultat if decroissant else resultat
+        return 0
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return super().__getitem__(index)
+        start = index.start or 0
+        stop = index.stop if index.stop is not None else self.count()
+        if stop <= start:
+            return []
+        fusion = heapq.merge(self.first[:stop], self.second[:stop], key=cmp_to_key(self._comparer))
+        return list(fusion)[start:stop]
@@ -0,0 +1,48 @@
+"""
+Management command Django pour archiver les anciennes entrées du journal
+Usage: python manage.py archive_journal [--days 180] [--chunk-size 2000] [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.journal_archive import archive_journal_entries, get_retention_days
+
+
+class Command(BaseCommand):
+    help = 'Déplacer les entrées du journal plus anciennes que l\'horizon de rétention vers JournalArchive'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Horizon de rétention en jours (défaut: JOURNAL_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Nombre d\'entrées déplacées par transaction',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Afficher le nombre d\'entrées concernées sans rien déplacer',
+        )
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else get_retention_days()
+        self.stdout.write(
+            f"🗄️  Archivage du journal ({timezone.now().strftime('%d/%m/%Y %H:%M')}) - entrées de plus de {days} jours"
+        )
+
+        total = archive_journal_entries(
+            older_than_days=days,
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+            stdout=self.stdout,
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"🔎 {total} entrées seraient archivées"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✅ {total} entrées archivées"))
@@ -0,0 +1,71 @@
+"""
+Management command Django pour remplir Client.telephone_normalise sur les lignes existantes
+Usage: python manage.py backfill_telephones [--chunk-size 2000] [--entreprise ID] [--all]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.conditional import bump_write_generation
+from core.models import Client
+from core.telephone import normaliser_telephone
+
+
+class Command(BaseCommand):
+    help = 'Normaliser les téléphones clients existants par lots (index de recherche par préfixe)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Nombre de clients par lot (défaut: 2000)',
+        )
+        parser.add_argument(
+            '--entreprise',
+            type=int,
+            help='Limiter à une entreprise',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recalculer aussi les lignes déjà normalisées (changement de règle)',
+        )
+
+    def handle(self, *args, **options):
+        clients = Client.objects.all()
+        if options['entreprise']:
+            clients = clients.filter(entreprise_id=options['entreprise'])
+        if not options['all']:
+            clients = clients.filter(telephone_normalise='')
+
+        dernier_id = 0
+        traites = modifies = 0
+        entreprises = set()
+        while True:
+            # Pagination par clé primaire : chaque lot est une requête indexée, sans OFFSET
+            lot = list(
+                clients.filter(id__gt=dernier_id)
+                .order_by('id')
+                .only('id', 'entreprise_id', 'telephone', 'telephone_normalise')[:options['chunk_size']]
+            )
+            if not lot:
+                break
+            dernier_id = lot[-1].id
+            a_modifier = []
+            for client in lot:
+                normalise = normaliser_telephone(client.telephone)
+                if normalise != client.telephone_normalise:
+                    client.telephone_normalise = normalise
+                    a_modifier.append(client)
+                    entreprises.add(client.entreprise_id)
+            with transaction.atomic():
+                Client.objects.bulk_update(a_modifier, ['telephone_normalise'])
+            traites += len(lot)
+            modifies += len(a_modifier)
+            self.stdout.write(f"📝 {traites} clients traités ({modifies} mis à jour)")
+
+        # bulk_update ne déclenche pas les signaux : invalider les recherches en cache
+        for entreprise_id in entreprises:
+            bump_write_generation(entreprise_id, 'clients')
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Téléphones normalisés: {modifies} client(s) mis à jour sur {traites}"))
@@ -0,0 +1,244 @@
+# core/management/commands/benchmark_stock_concurrence.py
+"""
+Management command Django pour mesurer la contention sur un produit très vendu.
+
+Plusieurs vendeurs concurrents vendent une unité du même stock, avec trois stratégies :
+
+- ``verrou`` : ``select_for_update`` dès le début de la vente, verrou tenu
+  pendant tout le traitement (ancien chemin de ``create_with_stock``) ;
+- ``sans-verrou`` : lecture, traitement puis ``save()`` (ancien chemin des
+  transferts et annulations) : rapide, mais perd des mises à jour ;
+- ``optimiste`` : traitement puis ``stock_mutations.ajouter`` (UPDATE
+  conditionnel en fin de transaction).
+
+Le traitement de la vente (validation du panier, facture, journal) est simulé
+par ``--travail-ms``. Les chiffres ne sont représentatifs que sur MySQL /
+PostgreSQL : SQLite sérialise toutes les écritures et ignore ``select_for_update``.
+
+Usage:
+    python manage.py benchmark_stock_concurrence --vendeurs 16 --ventes 50
+    python manage.py benchmark_stock_concurrence --mode optimiste --travail-ms 10 --json
+"""
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from core.management.commands.load_test import percentile
+from core.models import Boutique, Produit, Stock
+from core.stock_mutations import StockInsuffisant, ajouter
+
+MODES = ('verrou', 'sans-verrou', 'optimiste')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark de contention : ventes concurrentes sur un même stock, avec et sans verrou'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--vendeurs',
+            type=int,
+            default=16,
+            help='Nombre de vendeurs concurrents (défaut: 16)'
+        )
+        parser.add_argument(
+            '--ventes',
+            type=int,
+            default=50,
+            help='Nombre de ventes par vendeur (défaut: 50)'
+        )
+        parser.add_argument(
+            '--travail-ms',
+            type=float,
+            default=5,
+            help='Durée simulée du traitement d\'une vente, en ms (défaut: 5)'
+        )
+        parser.add_argument(
+            '--mode',
+            choices=MODES + ('tous',),
+            default='tous',
+            help='Stratégie mesurée (défaut: tous)'
+        )
+        parser.add_argument(
+            '--stock-initial',
+            type=int,
+            help='Quantité initiale (défaut: vendeurs × ventes, aucune rupture)'
+        )
+        parser.add_argument(
+            '--entrepot',
+            type=int,
+            help='ID de la boutique / entrepôt utilisé (défaut: la première)'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Afficher le rapport en JSON'
+        )
+
+    def handle(self, *args, **options):
+        boutiques = Boutique.objects.filter(entreprise__isnull=False).order_by('id')
+        if options['entrepot']:
+            boutiques = boutiques.filter(id=options['entrepot'])
+        boutique = boutiques.first()
+        if boutique is None:
+            raise CommandError("Aucune boutique disponible pour le benchmark")
+
+        self.stdout.write("🚀 Benchmark de contention sur un stock")
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                "⚠️  SQLite : écritures sérialisées et select_for_update ignoré, résultats indicatifs"
+            ))
+
+        suffixe = uuid.uuid4().hex[:8]
+        produit = Produit.objects.create(
+            nom=f"Benchmark contention {suffixe}",
+            entreprise_id=boutique.entreprise_id,
+            sku=f"BENCH-CONT-{suffixe}",
+            reference=f"BENCH-CONT-{suffixe}",
+            prix_achat=100,
+            prix_vente=200,
+            quantite=0,
+        )
+        stock = Stock.objects.create(produit=produit, entrepot=boutique, quantite=0)
+        stock_initial = options['stock_initial']
+        if stock_initial is None:
+            stock_initial = options['vendeurs'] * options['ventes']
+
+        modes = MODES if options['mode'] == 'tous' else (options['mode'],)
+        rapport = {
+            'meta': {
+                'started_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'vendeurs': options['vendeurs'],
+                'ventes_par_vendeur': options['ventes'],
+                'travail_ms': options['travail_ms'],
+                'stock_initial': stock_initial,
+            },
+            'modes': {},
+        }
+        try:
+            for mode in modes:
+                Stock.objects.filter(pk=stock.pk).update(quantite=stock_initial)
+                self.stdout.write(f"⏱️  Mode {mode}...")
+                rapport['modes'][mode] = self.mesurer(mode, stock.pk, stock_initial, options)
+        finally:
+            produit.delete()
+
+        if options['json']:
+            self.stdout.write(json.dumps(rapport, indent=2, ensure_ascii=False))
+        else:
+            for mode, resultat in rapport['modes'].items():
+                self.afficher(mode, resultat)
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark terminé"))
+
+    # ------------------------------------------------------------------
+    # Stratégies
+    # ------------------------------------------------------------------
+
+    def vente_verrou(self, stock_id, travail):
+        with transaction.atomic():
+            stock = Stock.objects.select_for_update().get(pk=stock_id)
+            time.sleep(travail)
+            if stock.quantite < 1:
+                return False
+            stock.quantite -= 1
+            stock.save()
+        return True
+
+    def vente_sans_verrou(self, stock_id, travail):
+        with transaction.atomic():
+            stock = Stock.objects.get(pk=stock_id)
+            time.sleep(travail)
+            if stock.quantite < 1:
+                return False
+            stock.quantite -= 1
+            stock.save()
+        return True
+
+    def vente_optimiste(self, stock_id, travail):
+        with transaction.atomic():
+            stock = Stock.objects.get(pk=stock_id)
+            time.sleep(travail)
+            try:
+                ajouter(stock, -1)
+            except StockInsuffisant:
+                return False
+        return True
+
+    # ------------------------------------------------------------------
+    # Mesure
+    # ------------------------------------------------------------------
+
+    def vendeur(self, vente, stock_id, options, resultats, verrou):
+        travail = options['travail_ms'] / 1000
+        close_old_connections()
+        try:
+            for _ in range(options['ventes']):
+                debut = time.perf_counter()
+                try:
+                    issue = 'vendu' if vente(stock_id, travail) else 'refuse'
+                    erreur = None
+                except Exception as e:
+                    issue, erreur = 'erreur', f"{type(e).__name__}: {e}"[:200]
+                duree_ms = (time.perf_counter() - debut) * 1000
+                with verrou:
+                    resultats.append((issue, duree_ms, erreur))
+        finally:
+            connection.close()
+
+    def mesurer(self, mode, stock_id, stock_initial, options):
+        vente = getattr(self, f"vente_{mode.replace('-', '_')}")
+        resultats = []
+        verrou = threading.Lock()
+        debut = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['vendeurs']) as pool:
+            futures = [
+                pool.submit(self.vendeur, vente, stock_id, options, resultats, verrou)
+                for _ in range(options['vendeurs'])
+            ]
+            for future in futures:
+                future.result()
+        duree = time.perf_counter() - debut
+
+        latences = sorted(r[1] for r in resultats)
+        vendus = sum(1 for r in resultats if r[0] == 'vendu')
+        quantite_finale = Stock.objects.filter(pk=stock_id).values_list('quantite', flat=True).get()
+        erreurs = [r[2] for r in resultats if r[0] == 'erreur']
+        return {
+            'duree_s': round(duree, 3),
+            'ventes_par_s': round(vendus / duree, 2) if duree else 0,
+            'latence_ms': {
+                'p50': round(percentile(latences, 50), 2),
+                'p95': round(percentile(latences, 95), 2),
+                'max': round(latences[-1], 2) if latences else 0,
+            },
+            'vendus': vendus,
+            'refuses': sum(1 for r in resultats if r[0] == 'refuse'),
+            'erreurs': len(erreurs),
+            'exemples_erreurs': sorted(set(erreurs))[:3],
+            'quantite_attendue': stock_initial - vendus,
+            'quantite_finale': quantite_finale,
+            # Ventes confirmées au client mais jamais décomptées du stock
+            'mises_a_jour_perdues': quantite_finale - (stock_initial - vendus),
+        }
+
+    def afficher(self, mode, resultat):
+        latence = resultat['latence_ms']
+        self.stdout.write(
+            f"\n📊 {mode}\n"
+            f"   Durée: {resultat['duree_s']} s | {resultat['ventes_par_s']} ventes/s\n"
+            f"   Latence: p50 {latence['p50']} ms | p95 {latence['p95']} ms | max {latence['max']} ms\n"
+            f"   Vendus: {resultat['vendus']} | Refusés: {resultat['refuses']} | Erreurs: {resultat['erreurs']}\n"
+            f"   Stock attendu: {resultat['quantite_attendue']} | final: {resultat['quantite_finale']}"
+        )
+        if resultat['mises_a_jour_perdues']:
+            self.stdout.write(self.style.WARNING(
+                f"   ⚠️  {resultat['mises_a_jour_perdues']} mise(s) à jour perdue(s)"
+            ))
+        for exemple in resultat['exemples_erreurs']:
+            self.stdout.write(f"   ❌ {exemple}")
@@ -0,0 +1,63 @@
+"""
+Management command Django pour construire les snapshots de stock
+Usage: python manage.py build_stock_snapshots [--granularite mois|jour] [--entreprise ID] [--depuis AAAA-MM-JJ] [--jusqua AAAA-MM-JJ]
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Boutique, Entreprise
+from core.stock_snapshots import construire_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Construire (de façon incrémentale) les snapshots de clôture des stocks à partir des mouvements'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--granularite',
+            choices=['jour', 'mois'],
+            default='mois',
+            help='Snapshot à chaque fin de journée ou de mois (défaut: mois)',
+        )
+        parser.add_argument(
+            '--entreprise',
+            type=int,
+            help='Limiter à une entreprise',
+        )
+        parser.add_argument(
+            '--depuis',
+            help='Reconstruire à partir de cette date (AAAA-MM-JJ) au lieu du dernier snapshot',
+        )
+        parser.add_argument(
+            '--jusqua',
+            help='Dernière date de clôture (AAAA-MM-JJ, défaut: hier)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            depuis = date.fromisoformat(options['depuis']) if options['depuis'] else None
+            jusqu_a = date.fromisoformat(options['jusqua']) if options['jusqua'] else None
+        except ValueError:
+            raise CommandError('Format de date invalide, attendu AAAA-MM-JJ')
+
+        entreprises = Entreprise.objects.all()
+        if options['entreprise']:
+            entreprises = entreprises.filter(id=options['entreprise'])
+
+        total = 0
+        for entreprise in entreprises:
+            entrepot_ids = list(Boutique.objects.filter(entreprise=entreprise).values_list('id', flat=True))
+            resultat = construire_snapshots(
+                entrepot_ids,
+                granularite=options['granularite'],
+                depuis=depuis,
+                jusqu_a=jusqu_a,
+            )
+            lignes = sum(resultat.values())
+            total += lignes
+            if resultat:
+                self.stdout.write(
+                    f"📦 {entreprise.nom}: {len(resultat)} date(s) de clôture, {lignes} lignes"
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Snapshots construits: {total} lignes"))
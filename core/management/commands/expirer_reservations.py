@@ -0,0 +1,54 @@
+"""
+Management command Django pour rendre au stock les réservations de panier expirées
+Usage: python manage.py expirer_reservations [--boucle] [--intervalle 30] [--taille-lot 200]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.reservations import TAILLE_LOT, expirer
+
+
+class Command(BaseCommand):
+    help = 'Libérer les réservations de stock dont la durée (RESERVATION_DUREE_MINUTES) est dépassée'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--boucle',
+            action='store_true',
+            help='Tourner en tâche de fond (une passe toutes les --intervalle secondes)',
+        )
+        parser.add_argument(
+            '--intervalle',
+            type=int,
+            default=30,
+            help='Secondes entre deux passes en mode --boucle (défaut: 30)',
+        )
+        parser.add_argument(
+            '--taille-lot',
+            type=int,
+            default=TAILLE_LOT,
+            help=f'Réservations rendues par transaction (défaut: {TAILLE_LOT})',
+        )
+
+    def handle(self, *args, **options):
+        if not options['boucle']:
+            liberees = expirer(taille_lot=options['taille_lot'])
+            self.stdout.write(self.style.SUCCESS(f"✅ {liberees} réservation(s) expirée(s) libérée(s)"))
+            return
+
+        self.stdout.write(f"🔁 Expiration des réservations toutes les {options['intervalle']} s (Ctrl+C pour arrêter)")
+        try:
+            while True:
+                # Connexion éventuellement coupée par la base entre deux passes
+                close_old_connections()
+                try:
+                    liberees = expirer(taille_lot=options['taille_lot'])
+                    if liberees:
+                        self.stdout.write(f"🧹 {liberees} réservation(s) expirée(s) libérée(s)")
+                except Exception as e:
+                    self.stdout.write(self.style.WARNING(f"⚠️  Erreur d'expiration: {e}"))
+                time.sleep(options['intervalle'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS("✅ Arrêt de l'expiration des réservations"))
@@ -0,0 +1,30 @@
+"""
+Management command Django pour générer le schéma OpenAPI dans un fichier statique (déploiement)
+Usage: python manage.py export_openapi [--output chemin/openapi.json]
+"""
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from storage.openapi import fichier_schema, generer_schema
+
+
+class Command(BaseCommand):
+    help = "Générer le schéma OpenAPI servi par /swagger.json, /swagger/ et /redoc/ (à lancer à chaque déploiement)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help='Fichier de sortie (défaut: OPENAPI_SCHEMA_FILE)',
+        )
+
+    def handle(self, *args, **options):
+        fichier = Path(options['output']) if options['output'] else fichier_schema()
+        self.stdout.write("📝 Génération du schéma OpenAPI...")
+        contenu = generer_schema()
+        fichier.parent.mkdir(parents=True, exist_ok=True)
+        # Écriture atomique : un worker ne lit jamais un fichier à moitié écrit
+        temporaire = fichier.with_name(fichier.name + '.tmp')
+        temporaire.write_bytes(contenu)
+        temporaire.replace(fichier)
+        self.stdout.write(self.style.SUCCESS(f"✅ Schéma OpenAPI écrit dans {fichier} ({len(contenu) // 1024} Ko)"))
@@ -0,0 +1,461 @@
+# core/management/commands/generate_dataset.py
+"""
+Génère un jeu de données volumineux et réaliste pour les benchmarks.
+
+N entreprises × M boutiques × K produits (dont une part avec variantes),
+stocks, clients et une période de ventes : factures, commandes, versements,
+mouvements de stock et journal. Les lignes sont insérées par lots avec
+``bulk_create`` (pas de signaux, pas de ``save()`` ligne à ligne). Sur les
+bases qui ne renvoient pas les identifiants insérés (MySQL), ceux des lignes
+référencées ensuite sont relus par une clé unique (email, sku, numéro...).
+
+- Popularité des produits selon une loi de Zipf (quelques best-sellers,
+  une longue traîne) ; clients fidèles selon la même loi.
+- Ventes réparties selon un profil horaire (pics du matin et de fin de journée)
+  et hebdomadaire (samedi fort, dimanche faible).
+- Déterministe : même graine, mêmes données.
+
+Usage:
+    python manage.py generate_dataset --entreprises 2 --boutiques 3 --produits 500
+    python manage.py generate_dataset --seed 7 --jours 365 --ventes-par-jour 120 --reset
+"""
+import math
+import random
+import string
+import time as chrono
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.utils import timezone
+
+from core.categories import reconstruire_chemins
+from core.models import (
+    Boutique, Categorie, Client, CommandeClient, Entreprise, EntrepriseSubscription,
+    Facture, Journal, MouvementStock, Produit, ProduitVariante, SequenceFacture,
+    Stock, SubscriptionPlan, User, Versement,
+)
+
+# Poids des heures d'ouverture (7h-20h) : pic en fin de matinée et en fin de journée
+POIDS_HORAIRES = {
+    7: 2, 8: 5, 9: 8, 10: 11, 11: 12, 12: 9, 13: 6,
+    14: 6, 15: 8, 16: 10, 17: 12, 18: 11, 19: 7, 20: 3,
+}
+# Lundi → dimanche
+POIDS_JOURS = [0.95, 0.9, 0.95, 1.0, 1.15, 1.35, 0.55]
+NB_LIGNES = ([1, 2, 3, 4, 5, 6], [40, 25, 15, 10, 6, 4])
+QUANTITES = ([1, 2, 3, 4, 5, 10], [55, 20, 10, 6, 6, 3])
+NOMS_VARIANTES = [['S', 'M', 'L', 'XL'], ['250ml', '500ml', '1L'], ['Rouge', 'Bleu', 'Noir']]
+CATEGORIES = ['Alimentation', 'Boissons', 'Hygiène', 'Entretien', 'Électronique', 'Textile', 'Quincaillerie', 'Papeterie']
+
+
+@contextmanager
+def dates_historiques(*model_classes):
+    """
+    Désactive temporairement ``auto_now`` / ``auto_now_add`` pour pouvoir
+    insérer des dates passées avec ``bulk_create``.
+    """
+    sauvegarde = []
+    for model in model_classes:
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.DateTimeField) and (field.auto_now or field.auto_now_add):
+                sauvegarde.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in sauvegarde:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def zipf_cum_weights(n, s=1.1):
+    """Poids cumulés d'une loi de Zipf de paramètre ``s`` sur n rangs."""
+    cumul = []
+    total = 0.0
+    for rang in range(1, n + 1):
+        total += 1 / rang ** s
+        cumul.append(total)
+    return cumul
+
+
+class Command(BaseCommand):
+    help = 'Génère un jeu de données volumineux (bulk_create, distributions réalistes, graine fixe)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entreprises', type=int, default=2, help='Nombre d\'entreprises (défaut: 2)')
+        parser.add_argument('--boutiques', type=int, default=3, help='Boutiques par entreprise (défaut: 3)')
+        parser.add_argument('--produits', type=int, default=500, help='Produits par entreprise (défaut: 500)')
+        parser.add_argument('--variantes', type=float, default=0.2, help='Part des produits avec variantes (défaut: 0.2)')
+        parser.add_argument('--clients', type=int, default=200, help='Clients par boutique (défaut: 200)')
+        parser.add_argument('--jours', type=int, default=365, help='Période de ventes en jours (défaut: 365)')
+        parser.add_argument('--ventes-par-jour', type=float, default=60, help='Ventes moyennes par boutique et par jour (défaut: 60)')
+        parser.add_argument('--seed', type=int, default=42, help='Graine aléatoire (défaut: 42)')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Taille des lots d\'insertion (défaut: 5000)')
+        parser.add_argument('--reset', action='store_true', help='Supprimer d\'abord le jeu de données de cette graine')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.seed = options['seed']
+        self.chunk_size = options['chunk_size']
+        self.compteurs = {}
+        self.buffers = {Facture: [], CommandeClient: [], Versement: [], MouvementStock: [], Journal: []}
+        debut = chrono.perf_counter()
+
+        existantes = Entreprise.objects.filter(email__startswith=f"dataset-{self.seed}-")
+        if existantes.exists():
+            if not options['reset']:
+                self.stdout.write(self.style.ERROR(
+                    f"❌ Un jeu de données existe déjà pour la graine {self.seed} (utilisez --reset)"
+                ))
+                return
+            self.supprimer(existantes)
+
+        self.stdout.write(f"🚀 Génération du jeu de données (graine {self.seed})")
+        plan = SubscriptionPlan.objects.filter(name='pro').first()
+        self.password = make_password('dataset')
+        fin = timezone.localdate()
+        self.jours = [fin - timedelta(days=n) for n in range(options['jours'], 0, -1)]
+
+        with dates_historiques(
+            Entreprise, Boutique, User, Categorie, Produit, ProduitVariante, Stock, Client,
+            Facture, CommandeClient, Versement, MouvementStock, Journal,
+        ):
+            for index in range(options['entreprises']):
+                self.generer_entreprise(index, plan, options)
+
+        duree = chrono.perf_counter() - debut
+        total = sum(self.compteurs.values())
+        self.stdout.write("\n📊 Lignes créées:")
+        for nom, nombre in self.compteurs.items():
+            self.stdout.write(f"   {nom}: {nombre}")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {total} lignes en {duree:.1f}s ({total / duree:.0f} lignes/s)"
+        ))
+
+    # ------------------------------------------------------------------
+    # Insertion par lots
+    # ------------------------------------------------------------------
+
+    def inserer(self, model, objets, cle=None, filtre=None):
+        """
+        ``bulk_create`` par lots. ``cle`` : champ unique (dans ``filtre``) des lignes
+        insérées, pour relire leurs identifiants si la base ne les renvoie pas.
+        """
+        model.objects.bulk_create(objets, batch_size=self.chunk_size)
+        if cle and objets and objets[0].pk is None:
+            self.relire_ids(model, objets, cle, filtre or {})
+        nom = model.__name__
+        self.compteurs[nom] = self.compteurs.get(nom, 0) + len(objets)
+        return objets
+
+    def relire_ids(self, model, objets, cle, filtre):
+        for debut in range(0, len(objets), self.chunk_size):
+            lot = objets[debut:debut + self.chunk_size]
+            ids = dict(
+                model.objects.filter(**filtre, **{f'{cle}__in': [getattr(objet, cle) for objet in lot]})
+                .values_list(cle, 'id')
+            )
+            for objet in lot:
+                objet.pk = ids[getattr(objet, cle)]
+
+    def vider_buffers(self, force=False):
+        """Insère les factures en attente puis les lignes qui en dépendent."""
+        if not force and len(self.buffers[Facture]) < self.chunk_size:
+            return
+        with transaction.atomic():
+            # Les factures d'abord : leurs ids sont reportés sur commandes et versements
+            for model in (Facture, CommandeClient, Versement, MouvementStock, Journal):
+                if self.buffers[model]:
+                    if model is Facture:
+                        # Numéros uniques par boutique (séquence de la boutique)
+                        boutiques = {facture.boutique_id for facture in self.buffers[Facture]}
+                        self.inserer(Facture, self.buffers[Facture], 'numero', {'boutique_id__in': boutiques})
+                    else:
+                        self.inserer(model, self.buffers[model])
+                    self.buffers[model] = []
+
+    # ------------------------------------------------------------------
+    # Référentiel
+    # ------------------------------------------------------------------
+
+    def generer_entreprise(self, index, plan, options):
+        rng = self.rng
+        tag = f"DS{self.seed}E{index}"
+        date_creation = timezone.make_aware(datetime.combine(self.jours[0] - timedelta(days=30), time(8)))
+        self.stdout.write(f"\n🏢 Entreprise {index + 1}/{options['entreprises']}")
+
+        entreprise = self.inserer(Entreprise, [Entreprise(
+            id_entreprise=''.join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(10)),
+            nom=f"Dataset {self.seed}-{index}",
+            email=f"dataset-{self.seed}-{index}@example.com",
+            secteur_activite="Commerce",
+            adresse="Benchmark",
+            ville=rng.choice(['Douala', 'Yaoundé', 'Bafoussam', 'Garoua']),
+            annee_creation=2015 + index % 10,
+            pack_type='pro',
+            created_at=date_creation,
+            updated_at=date_creation,
+        )], cle='email')[0]
+        if plan:
+            EntrepriseSubscription.objects.create(entreprise=entreprise, plan=plan, status='active')
+
+        boutiques = self.inserer(Boutique, [
+            Boutique(
+                entreprise=entreprise, nom=f"Boutique {tag}-{b}", ville=entreprise.ville,
+                created_at=date_creation, updated_at=date_creation,
+            )
+            for b in range(options['boutiques'])
+        ], cle='nom', filtre={'entreprise': entreprise})
+        vendeurs = self.inserer(User, [
+            User(
+                username=f"{tag.lower()}_b{b}", password=self.password, role='admin' if b == 0 else 'user',
+                entreprise=entreprise, boutique=boutique, email=f"{tag.lower()}_b{b}@example.com",
+                created_at=date_creation, updated_at=date_creation,
+            )
+            for b, boutique in enumerate(boutiques)
+        ], cle='username')
+        categories = self.inserer(Categorie, [
+            Categorie(nom=f"{nom} {tag}", entreprise=entreprise, created_at=date_creation, updated_at=date_creation)
+            for nom in CATEGORIES
+        ], cle='nom', filtre={'entreprise': entreprise})
+        # bulk_create contourne Categorie.save : chemins de l'arborescence calculés ensuite
+        reconstruire_chemins(entreprise.id)
+
+        # Produits : l'ordre de popularité (Zipf) est indépendant de l'ordre de création
+        produits = self.inserer(Produit, [
+            self.nouveau_produit(entreprise, categories, tag, p, date_creation)
+            for p in range(options['produits'])
+        ], cle='sku', filtre={'entreprise': entreprise})
+        variantes = []
+        articles = []  # (produit, variante ou None, prix de vente)
+        for produit in produits:
+            if rng.random() < options['variantes']:
+                noms = rng.choice(NOMS_VARIANTES)
+                lot = [
+                    ProduitVariante(
+                        produit=produit, nom=nom, attributs={'Option': nom},
+                        sku=f"{produit.sku}-{v}", code_barres=f"{produit.code_barres}{v}",
+                        prix_achat=produit.prix_achat, prix_vente=produit.prix_vente + 100 * v,
+                        created_at=date_creation, updated_at=date_creation,
+                    )
+                    for v, nom in enumerate(noms)
+                ]
+                variantes.extend(lot)
+                articles.append((produit, lot))
+            else:
+                articles.append((produit, None))
+        self.inserer(ProduitVariante, variantes, cle='sku', filtre={'produit__entreprise': entreprise})
+        rng.shuffle(articles)
+        popularite = zipf_cum_weights(len(articles))
+
+        # Stock courant par (boutique, produit, variante), rejoué au fil des ventes
+        self.stocks = {}
+        for boutique, vendeur in zip(boutiques, vendeurs):
+            self.generer_ventes(entreprise, boutique, vendeur, articles, popularite, tag, options)
+
+        # Quantité totale des produits : somme des stocks finaux
+        totaux = {}
+        for (_, produit_id, _), quantite in self.stocks.items():
+            totaux[produit_id] = totaux.get(produit_id, 0) + quantite
+        for produit in produits:
+            produit.quantite = totaux.get(produit.id, 0)
+        Produit.objects.bulk_update(produits, ['quantite'], batch_size=self.chunk_size)
+
+    def nouveau_produit(self, entreprise, categories, tag, p, date_creation):
+        rng = self.rng
+        prix_achat = round(rng.lognormvariate(7.5, 1.0), -1)
+        return Produit(
+            nom=f"Produit {tag}-{p}",
+            entreprise=entreprise,
+            categorie=rng.choice(categories),
+            sku=f"{tag}-P{p:06d}",
+            reference=f"{tag}-P{p:06d}",
+            code_barres=f"{tag}{p:07d}",
+            prix_achat=prix_achat,
+            prix_vente=round(prix_achat * rng.uniform(1.15, 1.6), -1),
+            stock_minimum=rng.choice([0, 5, 10, 20]),
+            created_at=date_creation,
+            updated_at=date_creation,
+        )
+
+    # ------------------------------------------------------------------
+    # Ventes
+    # ------------------------------------------------------------------
+
+    def generer_ventes(self, entreprise, boutique, vendeur, articles, popularite, tag, options):
+        rng = self.rng
+        date_ouverture = timezone.make_aware(datetime.combine(self.jours[0], time(6)))
+        self.stdout.write(f"   🏪 {boutique.nom}")
+
+        clients = self.inserer(Client, [
+            Client(
+                nom=f"Client {c}", prenom=tag, telephone=f"6{boutique.id:04d}{c:05d}",
+                telephone_normalise=f"6{boutique.id:04d}{c:05d}",
+                entreprise=entreprise, boutique=boutique, ville=entreprise.ville,
+                date_creation=date_ouverture, date_modification=date_ouverture,
+            )
+            for c in range(options['clients'])
+        ], cle='telephone', filtre={'boutique': boutique})
+        fidelite = zipf_cum_weights(len(clients), s=0.9)
+
+        # Stock initial : entrée de début de période, proportionnelle à la popularité
+        niveaux = {}
+        for rang, (produit, lot) in enumerate(articles):
+            niveau = max(20, int(2000 / (rang + 1) ** 0.8))
+            for variante in lot or [None]:
+                cle = (boutique.id, produit.id, variante.id if variante else None)
+                niveaux[cle] = niveau
+                self.stocks[cle] = niveau
+                self.buffers[MouvementStock].append(MouvementStock(
+                    produit=produit, variante=variante, entrepot=boutique, type_mouvement='entree',
+                    quantite=niveau, quantite_avant=0, quantite_apres=niveau,
+                    reference_document='STOCK-INITIAL', motif='Stock initial',
+                    utilisateur=vendeur, created_at=date_ouverture,
+                ))
+
+        heures = list(POIDS_HORAIRES)
+        heures_cumul = list(_cumul(POIDS_HORAIRES.values()))
+        sequences = {}
+        for jour in self.jours:
+            moyenne = options['ventes_par_jour'] * POIDS_JOURS[jour.weekday()] * (1.3 if jour.month == 12 else 1.0)
+            nb_ventes = max(0, round(rng.gauss(moyenne, math.sqrt(moyenne or 1))))
+            instants = sorted(
+                timezone.make_aware(datetime.combine(jour, time(
+                    rng.choices(heures, cum_weights=heures_cumul)[0], rng.randrange(60), rng.randrange(60)
+                )))
+                for _ in range(nb_ventes)
+            )
+            if instants:
+                self.buffers[Journal].append(Journal(
+                    utilisateur=vendeur, entreprise=entreprise, boutique=boutique, type_operation='connexion',
+                    description=f"Connexion de {vendeur.username}", date_operation=instants[0] - timedelta(minutes=5),
+                ))
+            for instant in instants:
+                periode = (jour.year, jour.month)
+                sequences[periode] = sequences.get(periode, 0) + 1
+                numero = f"FA{boutique.id}-{jour.year % 100:02d}{jour.month:02d}{jour.day:02d}-{sequences[periode]:04d}"
+                client = clients[_choix(rng, fidelite)]
+                self.generer_facture(entreprise, boutique, vendeur, client, articles, popularite, niveaux, numero, instant)
+            self.vider_buffers()
+        self.vider_buffers(force=True)
+
+        # Stocks finaux et séquences de numérotation (la numérotation réelle reprend à la suite)
+        date_fin = timezone.now()
+        self.inserer(Stock, [
+            Stock(
+                produit_id=produit_id, variante_id=variante_id, entrepot_id=boutique_id, quantite=quantite,
+                created_at=date_ouverture, updated_at=date_fin,
+            )
+            for (boutique_id, produit_id, variante_id), quantite in self.stocks.items()
+            if boutique_id == boutique.id
+        ])
+        SequenceFacture.objects.bulk_create([
+            SequenceFacture(boutique=boutique, annee=annee, mois=mois, dernier_numero=dernier)
+            for (annee, mois), dernier in sequences.items()
+        ])
+
+    def generer_facture(self, entreprise, boutique, vendeur, client, articles, popularite, niveaux, numero, instant):
+        rng = self.rng
+        facture = Facture(
+            type='client', numero=numero, client=client, created_by=vendeur,
+            entreprise=entreprise, boutique=boutique, created_at=instant, updated_at=instant,
+        )
+        total = 0.0
+        nb_lignes = rng.choices(*NB_LIGNES)[0]
+        choisis = set()
+        for _ in range(nb_lignes):
+            produit, lot = articles[_choix(rng, popularite)]
+            variante = rng.choice(lot) if lot else None
+            cle = (boutique.id, produit.id, variante.id if variante else None)
+            if cle in choisis:
+                continue
+            choisis.add(cle)
+            quantite = rng.choices(*QUANTITES)[0]
+            prix = float((variante or produit).prix_vente)
+
+            # Réapprovisionnement juste avant la vente si le stock est insuffisant
+            if self.stocks[cle] < quantite:
+                avant = self.stocks[cle]
+                self.stocks[cle] = niveaux[cle]
+                self.buffers[MouvementStock].append(MouvementStock(
+                    produit=produit, variante=variante, entrepot=boutique, type_mouvement='entree',
+                    quantite=niveaux[cle] - avant, quantite_avant=avant, quantite_apres=niveaux[cle],
+                    reference_document=f"BR-{numero}", motif='Réapprovisionnement',
+                    utilisateur=vendeur, created_at=instant - timedelta(seconds=1),
+                ))
+            avant = self.stocks[cle]
+            self.stocks[cle] = avant - quantite
+            self.buffers[MouvementStock].append(MouvementStock(
+                produit=produit, variante=variante, entrepot=boutique, type_mouvement='sortie',
+                quantite=quantite, quantite_avant=avant, quantite_apres=avant - quantite,
+                reference_document=numero, motif='Vente', utilisateur=vendeur, created_at=instant,
+            ))
+            self.buffers[CommandeClient].append(CommandeClient(
+                facture=facture, produit=produit, variante=variante, quantite=quantite,
+                prix_unitaire_fcfa=prix, prix_initial_fcfa=prix, created_at=instant,
+            ))
+            total += quantite * prix
+
+        # Règlement : 85% payées comptant, 10% avec acompte, 5% à crédit
+        tirage = rng.random()
+        versements = []
+        if tirage < 0.85:
+            versements.append((total, instant))
+        elif tirage < 0.95:
+            acompte = round(total * rng.choice([0.3, 0.5, 0.7]), -1)
+            versements.append((acompte, instant))
+            solde_le = instant + timedelta(days=rng.randint(1, 45))
+            if rng.random() < 0.6 and solde_le < timezone.now():
+                versements.append((total - acompte, solde_le))
+        paye = sum(montant for montant, _ in versements)
+        facture.total = total
+        facture.reste = max(0.0, total - paye)
+        facture.status = 'Payé' if facture.reste == 0 else ('Partiellement payé' if paye else 'En attente')
+        self.buffers[Facture].append(facture)
+        for montant, date_versement in versements:
+            self.buffers[Versement].append(Versement(
+                facture=facture, montant=montant, date_versement=date_versement,
+                created_by=vendeur, boutique=boutique,
+            ))
+        self.buffers[Journal].append(Journal(
+            utilisateur=vendeur, entreprise=entreprise, boutique=boutique, type_operation='vente',
+            description=f"Vente facture {numero}", details={'numero': numero, 'total': total},
+            date_operation=instant,
+        ))
+
+    # ------------------------------------------------------------------
+    # Nettoyage
+    # ------------------------------------------------------------------
+
+    def supprimer(self, entreprises):
+        """Supprime un jeu de données existant, des tables filles vers les parents."""
+        self.stdout.write("🗑️  Suppression du jeu de données existant...")
+        ids = list(entreprises.values_list('id', flat=True))
+        for queryset in (
+            Journal.objects.filter(entreprise_id__in=ids),
+            Versement.objects.filter(facture__entreprise_id__in=ids),
+            CommandeClient.objects.filter(facture__entreprise_id__in=ids),
+            MouvementStock.objects.filter(entrepot__entreprise_id__in=ids),
+            Stock.objects.filter(entrepot__entreprise_id__in=ids),
+            Facture.objects.filter(entreprise_id__in=ids),
+            Client.objects.filter(entreprise_id__in=ids),
+            ProduitVariante.objects.filter(produit__entreprise_id__in=ids),
+            Produit.objects.filter(entreprise_id__in=ids),
+        ):
+            queryset.delete()
+        Entreprise.objects.filter(id__in=ids).delete()
+
+
+def _cumul(poids):
+    total = 0
+    for p in poids:
+        total += p
+        yield total
+
+
+def _choix(rng, cum_weights):
+    """Index tiré selon des poids cumulés (bisect, O(log n))."""
+    return bisect(cum_weights, rng.random() * cum_weights[-1])
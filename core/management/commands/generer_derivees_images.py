@@ -0,0 +1,76 @@
+"""
+Management command Django pour générer les miniatures des images existantes (produits, logos)
+Usage: python manage.py generer_derivees_images [--modele produits|entreprises] [--entreprise ID] [--force] [--chunk-size 200]
+"""
+from django.core.management.base import BaseCommand
+
+from core.images import champ_derivees, derivees_a_jour, traiter_instance
+from core.models import Entreprise, Produit
+
+MODELES = {
+    'produits': (Produit, 'image', 'entreprise_id'),
+    'entreprises': (Entreprise, 'logo', 'id'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Générer les dérivées WebP/JPEG (miniature, taille moyenne) des images déjà enregistrées'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modele',
+            choices=list(MODELES),
+            help='Limiter aux images de produits ou aux logos (défaut: les deux)',
+        )
+        parser.add_argument(
+            '--entreprise',
+            type=int,
+            help='Limiter à une entreprise',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Régénérer aussi les dérivées à jour (changement de tailles ou de qualité)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help="Nombre d'instances lues par lot (défaut: 200)",
+        )
+
+    def handle(self, *args, **options):
+        modeles = [options['modele']] if options['modele'] else list(MODELES)
+        for nom in modeles:
+            modele, champ, champ_entreprise = MODELES[nom]
+            instances = modele.objects.exclude(**{champ: ''}).exclude(**{f'{champ}__isnull': True})
+            if options['entreprise']:
+                instances = instances.filter(**{champ_entreprise: options['entreprise']})
+
+            dernier_id = 0
+            generes = a_jour = erreurs = 0
+            while True:
+                # Pagination par clé primaire : chaque lot est une requête indexée, sans OFFSET
+                lot = list(
+                    instances.filter(id__gt=dernier_id)
+                    .order_by('id')
+                    .only('id', champ, champ_derivees(champ))[:options['chunk_size']]
+                )
+                if not lot:
+                    break
+                dernier_id = lot[-1].id
+                for instance in lot:
+                    if not options['force'] and derivees_a_jour(getattr(instance, champ), getattr(instance, champ_derivees(champ))):
+                        a_jour += 1
+                        continue
+                    try:
+                        if traiter_instance(instance, champ):
+                            generes += 1
+                    except Exception as e:
+                        erreurs += 1
+                        self.stdout.write(self.style.WARNING(f"⚠️  {nom} {instance.id}: {e}"))
+                self.stdout.write(f"🖼️  {nom}: {generes} générée(s), {a_jour} déjà à jour, {erreurs} erreur(s)")
+
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {nom}: dérivées générées pour {generes} image(s) ({a_jour} déjà à jour, {erreurs} erreur(s))"
+            ))
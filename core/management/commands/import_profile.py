@@ -0,0 +1,115 @@
+"""
+Management command Django pour mesurer le coût d'import au démarrage d'un worker
+Usage: python manage.py import_profile [--top 20] [--prefix core] [--budget-ms 1500] [--module core.views]
+"""
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Démarrage d'un worker WSGI : application chargée (apps, middlewares) puis urlconf résolue
+SCRIPT_DEMARRAGE = """
+import json, sys, time
+debut = time.perf_counter()
+import storage.wsgi
+from django.urls import get_resolver
+get_resolver().url_patterns
+for module in sys.argv[1:]:
+    __import__(module)
+print(json.dumps({'total_ms': (time.perf_counter() - debut) * 1000}))
+"""
+
+
+def analyser_importtime(sortie):
+    """Lignes de ``python -X importtime`` → [(module, self_us, cumul_us)]."""
+    modules = []
+    for ligne in sortie.splitlines():
+        if not ligne.startswith('import time:') or 'self [us]' in ligne:
+            continue
+        self_us, cumul_us, nom = ligne[len('import time:'):].split('|')
+        modules.append((nom.strip(), int(self_us), int(cumul_us)))
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Mesurer le coût d'import (par module et par paquet) d'un démarrage de worker, avec budget optionnel"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Nombre de modules les plus coûteux affichés (défaut: 20)',
+        )
+        parser.add_argument(
+            '--prefix',
+            help='Limiter le détail aux modules de ce paquet (ex: core)',
+        )
+        parser.add_argument(
+            '--budget-ms',
+            type=float,
+            default=getattr(settings, 'IMPORT_BUDGET_MS', None),
+            help='Échec si le démarrage dépasse ce budget (défaut: IMPORT_BUDGET_MS)',
+        )
+        parser.add_argument(
+            '--module',
+            action='append',
+            default=[],
+            help='Module supplémentaire importé après le démarrage (répétable)',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Sortie JSON (intégration continue)',
+        )
+
+    def handle(self, *args, **options):
+        # Interpréteur neuf : les modules déjà chargés par manage.py fausseraient la mesure
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'storage.settings'))
+        resultat = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SCRIPT_DEMARRAGE, *options['module']],
+            capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+        )
+        if resultat.returncode != 0:
+            raise CommandError(f"Échec du démarrage mesuré:\n{resultat.stderr[-2000:]}")
+
+        total_ms = json.loads(resultat.stdout.strip().splitlines()[-1])['total_ms']
+        modules = analyser_importtime(resultat.stderr)
+
+        par_paquet = defaultdict(int)
+        for nom, self_us, _ in modules:
+            par_paquet[nom.split('.')[0]] += self_us
+        paquets = sorted(par_paquet.items(), key=lambda item: -item[1])
+
+        detail = [m for m in modules if not options['prefix'] or m[0].split('.')[0] == options['prefix']]
+        detail = sorted(detail, key=lambda m: -m[1])[:options['top']]
+
+        budget = options['budget_ms']
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'total_ms': round(total_ms, 1),
+                'budget_ms': budget,
+                'modules_importes': len(modules),
+                'paquets': [{'paquet': p, 'self_ms': round(us / 1000, 1)} for p, us in paquets],
+                'modules': [
+                    {'module': nom, 'self_ms': round(s / 1000, 1), 'cumul_ms': round(c / 1000, 1)}
+                    for nom, s, c in detail
+                ],
+            }, indent=2))
+        else:
+            self.stdout.write(f"⏱️  Démarrage worker: {total_ms:.0f} ms, {len(modules)} modules importés")
+            self.stdout.write("\n📦 Coût propre par paquet:")
+            for paquet, self_us in paquets[:options['top']]:
+                self.stdout.write(f"   {paquet:<32} {self_us / 1000:8.1f} ms")
+            self.stdout.write("\n📄 Modules les plus coûteux (propre / cumulé):")
+            for nom, self_us, cumul_us in detail:
+                self.stdout.write(f"   {nom:<48} {self_us / 1000:8.1f} ms {cumul_us / 1000:8.1f} ms")
+
+        if budget and total_ms > budget:
+            raise CommandError(f"Budget de démarrage dépassé: {total_ms:.0f} ms > {budget:.0f} ms")
+        if not options['json']:
+            self.stdout.write(self.style.SUCCESS("\n✅ Profil d'import terminé" + (f" (budget {budget:.0f} ms respecté)" if budget else '')))
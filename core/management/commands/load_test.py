@@ -1,258 +1,366 @@
 # core/management/commands/load_test.py
-import time
+"""
+Test de charge de l'API complète (authentification, permissions, serializers, middlewares).
+
+Crée un tenant synthétique, puis exécute des scénarios pondérés en process
+via le client de test DRF, avec un pool de workers. Le rapport JSON
+(débit, latences p50/p95/p99, requêtes SQL par requête) permet de comparer
+les résultats d'un commit à l'autre.
+
+Usage:
+    python manage.py load_test --users 4 --requests 50 --output rapport.json
+    python manage.py load_test --scenarios "pos_sale=5,barcode_scan=10,product_list=3"
+"""
+import json
+import math
+import random
+import subprocess
 import threading
-from django.core.management.base import BaseCommand
-from django.core.cache import cache
-from core.models import Produit, Stock, Entreprise, Boutique, Facture
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
 from django.db import connection
-from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from core.models import (
+    Boutique, Client, Entreprise, EntrepriseSubscription, Facture, Produit,
+    Stock, SubscriptionPlan, User,
+)
+
+# Poids par défaut : reflète l'usage d'une caisse (beaucoup de scans, quelques ventes)
+DEFAULT_WEIGHTS = {
+    'pos_sale': 3,
+    'barcode_scan': 6,
+    'dashboard_analytics': 1,
+    'product_list': 3,
+    'versement': 1,
+}
+
+
+def percentile(sorted_values, p):
+    """Percentile par interpolation linéaire sur une liste triée."""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * p / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+
 
 class Command(BaseCommand):
-    help = 'Test de charge réaliste avec les optimisations'
+    help = 'Test de charge HTTP en process : scénarios pondérés sur l\'API, rapport JSON'
 
     def add_arguments(self, parser):
         parser.add_argument(
             '--users',
             type=int,
-            default=50,
-            help='Nombre d\'utilisateurs virtuels (défaut: 50)'
+            default=4,
+            help='Nombre de workers concurrents (défaut: 4)'
         )
         parser.add_argument(
             '--requests',
             type=int,
-            default=20,
-            help='Nombre de requêtes par utilisateur (défaut: 20)'
+            default=50,
+            help='Nombre de requêtes par worker (défaut: 50)'
+        )
+        parser.add_argument(
+            '--produits',
+            type=int,
+            default=200,
+            help='Nombre de produits du tenant synthétique (défaut: 200)'
+        )
+        parser.add_argument(
+            '--scenarios',
+            default='',
+            help='Poids des scénarios, ex: "pos_sale=3,barcode_scan=6" (défaut: mix caisse)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Graine aléatoire (résultats reproductibles)'
+        )
+        parser.add_argument(
+            '--output',
+            help='Fichier JSON de sortie (défaut: affichage)'
+        )
+        parser.add_argument(
+            '--keep-data',
+            action='store_true',
+            help='Conserver le tenant synthétique après le test'
         )
 
     def handle(self, *args, **options):
-        self.stdout.write("🚀 Test de charge réaliste avec optimisations")
-        
-        # Créer des données de test
-        self.create_test_data()
-        
-        # Test de charge
-        self.run_load_test(options['users'], options['requests'])
-
-    def create_test_data(self):
-        """Créer des données de test si nécessaire"""
-        try:
-            # Vérifier si on a des données
-            if not Entreprise.objects.exists():
-                self.stdout.write("📝 Création de données de test...")
-                
-                # Créer une entreprise de test
-                entreprise = Entreprise.objects.create(
-                    nom="Entreprise Test Performance",
-                    email="test@performance.com",
-                    secteur_activite="Test",
-                    adresse="Adresse test",
-                    ville="Ville test",
-                    pays="Cameroun",
-                    annee_creation=2024
-                )
-                
-                # Créer des boutiques de test
-                for i in range(3):
-                    Boutique.objects.create(
-                        entreprise=entreprise,
-                        nom=f"Boutique Test {i+1}",
-                        ville="Ville test"
-                    )
-                
-                # Créer des produits de test
-                boutique = Boutique.objects.first()
-                for i in range(50):
-                    Produit.objects.create(
-                        nom=f"Produit Test {i+1}",
-                        entreprise=entreprise,
-                        prix_achat=100 + i,
-                        prix_vente=150 + i,
-                        quantite=10 + i,
-                        actif=True
-                    )
-                
-                # Créer des stocks de test
-                produits = Produit.objects.all()[:20]
-                for produit in produits:
-                    Stock.objects.create(
-                        produit=produit,
-                        entrepot=boutique,
-                        quantite=produit.quantite
-                    )
-                
-                self.stdout.write("✅ Données de test créées")
-                
-        except Exception as e:
-            self.stdout.write(f"⚠️  Erreur création données test: {str(e)}")
-
-    def simulate_user_requests(self, user_id, num_requests):
-        """Simuler les requêtes d'un utilisateur"""
-        total_time = 0
-        successful_requests = 0
-        errors = 0
-        
-        for i in range(num_requests):
-            try:
-                start_time = time.time()
-                
-                # Simuler différentes requêtes selon le type
-                request_type = i % 5
-                
-                if request_type == 0:
-                    # Requête produits avec cache
-                    cache_key = f"produits_user_{user_id}_{i}"
-                    cached_data = cache.get(cache_key)
-                    if cached_data is None:
-                        produits = list(Produit.objects.filter(entreprise_id=1, actif=True)[:10])
-                        cache.set(cache_key, produits, 300)
-                    else:
-                        produits = cached_data
-                        
-                elif request_type == 1:
-                    # Requête stocks optimisée
-                    stocks = list(Stock.objects.filter(entrepot_id=1).select_related('produit')[:10])
-                    
-                elif request_type == 2:
-                    # Requête complexe avec jointures
-                    produits = list(Produit.objects.filter(
-                        entreprise_id=1, 
-                        actif=True,
-                        categorie__isnull=False
-                    ).select_related('categorie', 'entreprise')[:5])
-                    
-                elif request_type == 3:
-                    # Requête avec filtrage et tri
-                    produits = list(Produit.objects.filter(
-                        entreprise_id=1,
-                        prix_vente__gte=100
-                    ).order_by('-prix_vente')[:10])
-                    
-                else:
-                    # Requête avec cache et invalidation
-                    cache_key = f"test_user_{user_id}_{i}"
-                    cache.set(cache_key, {"data": f"test_{i}", "timestamp": time.time()}, 60)
-                    cached_data = cache.get(cache_key)
-                    cache.delete(cache_key)
-                
-                end_time = time.time()
-                total_time += (end_time - start_time)
-                successful_requests += 1
-                
-                # Petite pause pour simuler un comportement réaliste
-                time.sleep(0.01)
-                
-            except Exception as e:
-                errors += 1
-                if errors <= 3:  # Limiter les messages d'erreur
-                    self.stdout.write(f"  ⚠️  Erreur utilisateur {user_id}, requête {i}: {str(e)}")
-        
-        return total_time, successful_requests, errors
-
-    def run_load_test(self, num_users, requests_per_user):
-        """Exécuter le test de charge"""
-        self.stdout.write(f"\n🔥 Test de charge: {num_users} utilisateurs, {requests_per_user} requêtes chacun")
-        self.stdout.write(f"📊 Total estimé: {num_users * requests_per_user} requêtes")
-        
-        start_time = time.time()
-        
-        # Créer les threads pour simuler les utilisateurs
-        threads = []
-        results = []
-        
-        def worker(user_id):
-            result = self.simulate_user_requests(user_id, requests_per_user)
-            results.append(result)
-        
-        # Lancer les threads
-        for i in range(num_users):
-            thread = threading.Thread(target=worker, args=(i,))
-            threads.append(thread)
-            thread.start()
-        
-        # Attendre que tous les threads se terminent
-        for thread in threads:
-            thread.join()
-        
-        end_time = time.time()
-        total_test_time = end_time - start_time
-        
-        # Analyser les résultats
-        total_requests = sum(r[1] for r in results)
-        total_errors = sum(r[2] for r in results)
-        total_time = sum(r[0] for r in results)
-        
-        avg_response_time = total_time / total_requests if total_requests > 0 else 0
-        requests_per_second = total_requests / total_test_time if total_test_time > 0 else 0
-        success_rate = (total_requests / (total_requests + total_errors)) * 100 if (total_requests + total_errors) > 0 else 0
-        
-        self.stdout.write(f"\n📈 RÉSULTATS DU TEST DE CHARGE")
-        self.stdout.write(f"⏱️  Durée totale: {total_test_time:.2f}s")
-        self.stdout.write(f"📊 Requêtes totales: {total_requests}")
-        self.stdout.write(f"❌ Erreurs: {total_errors}")
-        self.stdout.write(f"✅ Taux de succès: {success_rate:.1f}%")
-        self.stdout.write(f"🚀 Requêtes/seconde: {requests_per_second:.2f}")
-        self.stdout.write(f"⚡ Temps de réponse moyen: {avg_response_time:.4f}s")
-        
-        # Évaluer les performances
-        self.stdout.write(f"\n🔍 ANALYSE:")
-        if success_rate >= 95:
-            self.stdout.write("✅ Taux de succès: EXCELLENT")
-        elif success_rate >= 90:
-            self.stdout.write("✅ Taux de succès: BON")
-        elif success_rate >= 80:
-            self.stdout.write("⚠️  Taux de succès: ACCEPTABLE")
-        else:
-            self.stdout.write("❌ Taux de succès: INSUFFISANT")
-        
-        if requests_per_second >= 100:
-            self.stdout.write("✅ Débit: EXCELLENT")
-        elif requests_per_second >= 50:
-            self.stdout.write("✅ Débit: BON")
-        elif requests_per_second >= 20:
-            self.stdout.write("⚠️  Débit: ACCEPTABLE")
-        else:
-            self.stdout.write("❌ Débit: INSUFFISANT")
-        
-        if avg_response_time <= 0.1:
-            self.stdout.write("✅ Temps de réponse: EXCELLENT")
-        elif avg_response_time <= 0.2:
-            self.stdout.write("✅ Temps de réponse: BON")
-        elif avg_response_time <= 0.5:
-            self.stdout.write("⚠️  Temps de réponse: ACCEPTABLE")
-        else:
-            self.stdout.write("❌ Temps de réponse: LENT")
-        
-        # Projection pour 100 utilisateurs
-        projected_rps = requests_per_second * (100 / num_users)
-        projected_requests_per_minute = projected_rps * 60
-        
-        self.stdout.write(f"\n📊 PROJECTION POUR 100 UTILISATEURS:")
-        self.stdout.write(f"🚀 Requêtes/seconde estimées: {projected_rps:.1f}")
-        self.stdout.write(f"📈 Requêtes/minute estimées: {projected_requests_per_minute:.0f}")
-        
-        if projected_rps >= 50:
-            self.stdout.write("✅ Le système peut supporter 100 utilisateurs simultanés")
-        elif projected_rps >= 30:
-            self.stdout.write("⚠️  Le système peut supporter 100 utilisateurs avec optimisations")
-        else:
-            self.stdout.write("❌ Le système nécessite des optimisations supplémentaires")
+        weights = self.parse_weights(options['scenarios'])
+        self.stdout.write("🚀 Test de charge HTTP (client DRF en process)")
 
+        ctx = self.seed_tenant(options['produits'], options['seed'])
+        self.stdout.write(f"📝 Tenant synthétique: {ctx['entreprise'].nom} ({len(ctx['produits'])} produits)")
 
+        try:
+            report = self.run(ctx, weights, options)
+        finally:
+            if not options['keep_data']:
+                ctx['entreprise'].delete()
+                ctx['user'].delete()
 
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output)
+            self.stdout.write(self.style.SUCCESS(f"✅ Rapport écrit dans {options['output']}"))
+        else:
+            self.stdout.write(output)
 
+    def parse_weights(self, value):
+        if not value:
+            return dict(DEFAULT_WEIGHTS)
+        weights = {}
+        for part in value.split(','):
+            name, _, weight = part.partition('=')
+            name = name.strip()
+            if name not in DEFAULT_WEIGHTS:
+                raise CommandError(f"Scénario inconnu: {name} (disponibles: {', '.join(DEFAULT_WEIGHTS)})")
+            try:
+                weights[name] = float(weight or 1)
+            except ValueError:
+                raise CommandError(f"Poids invalide pour {name}: {weight}")
+        return weights
+
+    # ------------------------------------------------------------------
+    # Données
+    # ------------------------------------------------------------------
 
+    def seed_tenant(self, nb_produits, seed):
+        """Crée une entreprise (plan pro), une boutique, un admin, des produits en stock et des factures ouvertes."""
+        if not SubscriptionPlan.objects.filter(name='pro').exists():
+            call_command('seed_plans')
+        suffix = uuid.uuid4().hex[:8]
+        entreprise = Entreprise.objects.create(
+            nom=f"Benchmark {suffix}",
+            email=f"bench-{suffix}@example.com",
+            secteur_activite="Benchmark",
+            adresse="Benchmark",
+            ville="Douala",
+            annee_creation=timezone.now().year,
+        )
+        EntrepriseSubscription.objects.update_or_create(
+            entreprise=entreprise,
+            defaults={'plan': SubscriptionPlan.objects.get(name='pro'), 'status': 'active'},
+        )
+        boutique = Boutique.objects.create(entreprise=entreprise, nom=f"Boutique {suffix}", ville="Douala")
+        user = User.objects.create_user(
+            username=f"bench-{suffix}",
+            password=uuid.uuid4().hex,
+            role='admin',
+            entreprise=entreprise,
+            boutique=boutique,
+        )
 
+        rng = random.Random(seed)
+        produits = Produit.objects.bulk_create([
+            Produit(
+                nom=f"Produit {i}",
+                entreprise=entreprise,
+                sku=f"BENCH-{suffix}-{i:05d}",
+                reference=f"BENCH-{suffix}-{i:05d}",
+                code_barres=f"9{suffix[:6]}{i:05d}",
+                prix_achat=rng.randint(100, 5000),
+                prix_vente=rng.randint(5000, 20000),
+                quantite=1_000_000,
+                actif=True,
+            )
+            for i in range(nb_produits)
+        ])
+        Stock.objects.bulk_create([
+            Stock(produit=produit, entrepot=boutique, quantite=1_000_000)
+            for produit in produits
+        ])
+        client = Client.objects.create(
+            nom="Client", prenom="Benchmark", telephone=f"6{suffix[:8]}",
+            entreprise=entreprise, boutique=boutique,
+        )
+        factures_ouvertes = [
+            Facture.objects.create(
+                type='client', total=1e9, reste=1e9, client=client,
+                boutique=boutique, created_by=user, entreprise=entreprise,
+            ).id
+            for _ in range(20)
+        ]
+        return {
+            'entreprise': entreprise,
+            'boutique': boutique,
+            'user': user,
+            'client': client,
+            'produits': [(p.id, p.code_barres, float(p.prix_vente)) for p in produits],
+            'factures_ouvertes': factures_ouvertes,
+        }
 
+    # ------------------------------------------------------------------
+    # Scénarios
+    # ------------------------------------------------------------------
 
+    def scenario_pos_sale(self, client, ctx, rng):
+        lignes = rng.sample(ctx['produits'], k=min(len(ctx['produits']), rng.randint(1, 4)))
+        items = [
+            {'produit': pid, 'quantite': rng.randint(1, 3), 'prix_unitaire_fcfa': prix}
+            for pid, _, prix in lignes
+        ]
+        total = sum(item['quantite'] * item['prix_unitaire_fcfa'] for item in items)
+        reste = 0 if rng.random() < 0.8 else round(total / 2)
+        return client.post('/api/factures/create-with-stock/', {
+            'type': 'client',
+            'client': ctx['client'].id,
+            'boutique': ctx['boutique'].id,
+            'total': total,
+            'reste': reste,
+            'items': items,
+        }, format='json', secure=True)
 
+    def scenario_barcode_scan(self, client, ctx, rng):
+        _, code_barres, _ = rng.choice(ctx['produits'])
+        return client.get('/api/produits/', {'search': code_barres}, secure=True)
 
+    def scenario_dashboard_analytics(self, client, ctx, rng):
+        return client.get('/api/factures/analytics/', secure=True)
 
+    def scenario_product_list(self, client, ctx, rng):
+        page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE') or 25
+        pages = max(1, math.ceil(len(ctx['produits']) / page_size))
+        return client.get('/api/produits/', {'page': rng.randint(1, min(pages, 3))}, secure=True)
 
+    def scenario_versement(self, client, ctx, rng):
+        return client.post('/api/versements/', {
+            'facture': rng.choice(ctx['factures_ouvertes']),
+            'montant': rng.randint(100, 5000),
+            'boutique': ctx['boutique'].id,
+        }, format='json', secure=True)
 
+    # ------------------------------------------------------------------
+    # Exécution
+    # ------------------------------------------------------------------
 
+    def worker(self, index, ctx, weights, nb_requests, seed, results, lock):
+        rng = random.Random(seed * 1000 + index)
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(ctx['user'])
+        names = list(weights)
+        poids = [weights[name] for name in names]
+        try:
+            for _ in range(nb_requests):
+                name = rng.choices(names, weights=poids)[0]
+                scenario = getattr(self, f"scenario_{name}")
+                start = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries:
+                    error = None
+                    try:
+                        response = scenario(client, ctx, rng)
+                        status_code = response.status_code
+                        if status_code >= 400:
+                            error = str(getattr(response, 'data', ''))[:200]
+                    except Exception as e:
+                        status_code = f"exception: {type(e).__name__}"
+                        error = str(e)[:200]
+                end = time.perf_counter()
+                with lock:
+                    results.append((name, (end - start) * 1000, len(queries), status_code, error, start, end))
+        finally:
+            connection.close()
 
+    def run(self, ctx, weights, options):
+        results = []
+        lock = threading.Lock()
+        started_at = timezone.now()
+        start = time.perf_counter()
 
+        # Les throttles limiteraient le débit mesuré : on les désactive pendant le test
+        with mock.patch.object(APIView, 'get_throttles', return_value=[]):
+            with ThreadPoolExecutor(max_workers=options['users']) as pool:
+                futures = [
+                    pool.submit(self.worker, index, ctx, weights, options['requests'], options['seed'], results, lock)
+                    for index in range(options['users'])
+                ]
+                for future in futures:
+                    future.result()
+        duration = time.perf_counter() - start
 
+        par_scenario = defaultdict(list)
+        for result in results:
+            par_scenario[result[0]].append(result)
 
+        return {
+            'meta': {
+                'commit': self.git_commit(),
+                'started_at': started_at.isoformat(),
+                'database': connection.vendor,
+                'workers': options['users'],
+                'requests_per_worker': options['requests'],
+                'produits': options['produits'],
+                'seed': options['seed'],
+                'weights': weights,
+            },
+            'global': self.summarize(results, duration),
+            'scenarios': {
+                name: self.summarize(scenario_results)
+                for name, scenario_results in sorted(par_scenario.items())
+            },
+        }
 
+    def summarize(self, results, duration=None):
+        """
+        Statistiques d'un ensemble de requêtes. Sans ``duration``, le débit est
+        rapporté à la fenêtre du scénario (première requête lancée → dernière terminée).
+        """
+        if duration is None:
+            duration = max(r[6] for r in results) - min(r[5] for r in results) if results else 0
+        latences = sorted(r[1] for r in results)
+        queries = [r[2] for r in results]
+        status_codes = defaultdict(int)
+        for r in results:
+            status_codes[str(r[3])] += 1
+        errors = sum(
+            count for code, count in status_codes.items()
+            if not (code.isdigit() and int(code) < 400)
+        )
+        count = len(results)
+        # Quelques messages d'erreur distincts pour faciliter le diagnostic
+        error_samples = []
+        for r in results:
+            if r[4] and r[4] not in error_samples:
+                error_samples.append(r[4])
+        return {
+            'requests': count,
+            'errors': errors,
+            'throughput_rps': round(count / duration, 2) if duration else 0,
+            'latency_ms': {
+                'mean': round(sum(latences) / count, 2) if count else 0,
+                'p50': round(percentile(latences, 50), 2),
+                'p95': round(percentile(latences, 95), 2),
+                'p99': round(percentile(latences, 99), 2),
+                'max': round(latences[-1], 2) if latences else 0,
+            },
+            'queries_per_request': {
+                'mean': round(sum(queries) / count, 2) if count else 0,
+                'max': max(queries) if queries else 0,
+            },
+            'status_codes': dict(status_codes),
+            'error_samples': error_samples[:5],
+        }
 
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, timeout=5,
+            ).stdout.strip() or None
+        except Exception:
+            return None
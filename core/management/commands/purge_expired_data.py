@@ -0,0 +1,86 @@
+"""
+Management command Django pour purger les données expirées
+Usage: python manage.py purge_expired_data [--verification-days 7] [--payment-days 7] [--sync-days 30] [--dry-run]
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from core.models import EmailVerification, PaymentTransaction, SuppressionSync
+
+
+class Command(BaseCommand):
+    help = 'Purger les vérifications email expirées, les brouillons de paiement abandonnés et les anciennes traces de suppression (sync)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verification-days',
+            type=int,
+            default=7,
+            help='Supprimer les codes de vérification expirés depuis plus de N jours',
+        )
+        parser.add_argument(
+            '--payment-days',
+            type=int,
+            default=7,
+            help='Supprimer les paiements restés en attente depuis plus de N jours',
+        )
+        parser.add_argument(
+            '--sync-days',
+            type=int,
+            default=getattr(settings, 'SYNC_RETENTION_SUPPRESSIONS_JOURS', 30),
+            help='Supprimer les traces de suppression (synchronisation) de plus de N jours',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Afficher ce qui serait supprimé sans rien supprimer',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        dry_run = options['dry_run']
+
+        # 1. Codes de vérification email non utilisés et expirés
+        verifications = EmailVerification.objects.filter(
+            Q(status__in=['pending', 'expired']),
+            expires_at__lt=now - timedelta(days=options['verification_days']),
+        )
+
+        # 2. Paiements jamais finalisés (brouillons). Un paiement 'processing' est en cours
+        # chez le prestataire : son callback en a besoin, il n'est jamais supprimé
+        paiements = PaymentTransaction.objects.filter(
+            status='pending',
+            created_at__lt=now - timedelta(days=options['payment_days']),
+        )
+
+        # 3. Traces de suppression de la synchronisation différentielle : au-delà, les
+        # caisses dont le watermark est plus ancien rechargent la ressource complète
+        suppressions = SuppressionSync.objects.filter(
+            supprime_le__lt=now - timedelta(days=options['sync_days']),
+        )
+
+        # Les jetons de réinitialisation de mot de passe sont signés (HMAC + horodatage)
+        # et ne sont pas stockés en base : ils expirent seuls, rien à purger.
+
+        nb_verifications = verifications.count()
+        nb_paiements = paiements.count()
+        nb_suppressions = suppressions.count()
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(
+                f"🔎 {nb_verifications} vérifications email, {nb_paiements} paiements et "
+                f"{nb_suppressions} traces de suppression seraient supprimés"
+            ))
+            return
+
+        verifications.delete()
+        paiements.delete()
+        suppressions.delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {nb_verifications} vérifications email, {nb_paiements} paiements en attente et "
+            f"{nb_suppressions} traces de suppression supprimés"
+        ))
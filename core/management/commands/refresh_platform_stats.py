@@ -0,0 +1,20 @@
+"""
+Management command Django pour rafraîchir les agrégats de la console plateforme (à planifier, ex: toutes les 15 min)
+Usage: python manage.py refresh_platform_stats
+"""
+from django.core.management.base import BaseCommand
+
+from core.platform_stats import rafraichir_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recalculer et mettre en cache les agrégats plateforme (plans, MRR, utilisateurs actifs, factures par jour)'
+
+    def handle(self, *args, **options):
+        rollups = rafraichir_rollups()
+        entreprises = rollups['entreprises']
+        self.stdout.write(f"🏢 Entreprises: {entreprises['total']} ({entreprises['actives']} actives)")
+        for plan in rollups['plans']:
+            self.stdout.write(f"   {plan['plan_nom']}: {plan['entreprises']} entreprise(s), MRR {plan['mrr']:,.0f} XAF")
+        self.stdout.write(f"👥 Utilisateurs actifs: {rollups['utilisateurs']['actifs']}")
+        self.stdout.write(self.style.SUCCESS(f"✅ Agrégats plateforme rafraîchis (MRR total: {rollups['mrr']:,.0f} XAF)"))
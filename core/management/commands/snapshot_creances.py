@@ -0,0 +1,38 @@
+"""
+Management command Django pour préparer la balance âgée du jour (à planifier chaque nuit)
+Usage: python manage.py snapshot_creances [--entreprise ID]
+"""
+from django.core.management.base import BaseCommand
+
+from core.creances import REGROUPEMENTS, construire_snapshot
+from core.models import Entreprise
+
+
+class Command(BaseCommand):
+    help = 'Calculer et mettre en cache la balance âgée des créances de chaque entreprise (total et détails)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--entreprise',
+            type=int,
+            help='Limiter à une entreprise',
+        )
+
+    def handle(self, *args, **options):
+        entreprises = Entreprise.objects.filter(is_active=True)
+        if options['entreprise']:
+            entreprises = Entreprise.objects.filter(id=options['entreprise'])
+
+        nb = 0
+        for entreprise in entreprises:
+            total = construire_snapshot(entreprise.id)
+            for par in REGROUPEMENTS:
+                construire_snapshot(entreprise.id, par=par)
+            nb += 1
+            if total['total']['nb_factures']:
+                self.stdout.write(
+                    f"💰 {entreprise.nom}: {total['total']['reste_total']:,.0f} XAF "
+                    f"sur {total['total']['nb_factures']} facture(s) ouverte(s)"
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Balance âgée préparée pour {nb} entreprise(s)"))
@@ -0,0 +1,75 @@
+"""
+Management command Django pour vérifier les statistiques de stock en cache (à planifier chaque nuit)
+Usage: python manage.py verifier_stats_produits [--entreprise ID] [--resync-quantites]
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from core.models import Entreprise, Produit, Stock
+from core.produit_stats import (
+    compteurs_depuis_stats, compteurs_en_cache, recalculer_stats_produits,
+)
+
+
+class Command(BaseCommand):
+    help = 'Recalculer les statistiques de stock par entreprise et corriger les compteurs incrémentaux en cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--entreprise',
+            type=int,
+            help='Limiter à une entreprise',
+        )
+        parser.add_argument(
+            '--resync-quantites',
+            action='store_true',
+            help='Recalculer aussi Produit.quantite depuis les stocks (écritures en masse)',
+        )
+
+    def handle(self, *args, **options):
+        entreprises = Entreprise.objects.all()
+        if options['entreprise']:
+            entreprises = entreprises.filter(id=options['entreprise'])
+
+        nb_ecarts = 0
+        for entreprise in entreprises:
+            if options['resync_quantites']:
+                corriges = self.resync_quantites(entreprise)
+                if corriges:
+                    self.stdout.write(f"🔧 {entreprise.nom}: {corriges} quantité(s) produit corrigée(s)")
+
+            en_cache = compteurs_en_cache(entreprise.id)
+            attendus = compteurs_depuis_stats(recalculer_stats_produits(entreprise.id))
+            if en_cache is None:
+                continue
+            ecarts = {
+                compteur: (en_cache[compteur], valeur)
+                for compteur, valeur in attendus.items()
+                if en_cache[compteur] != valeur
+            }
+            if ecarts:
+                nb_ecarts += 1
+                detail = ', '.join(f"{compteur}: {avant} → {apres}" for compteur, (avant, apres) in ecarts.items())
+                self.stdout.write(self.style.WARNING(f"⚠️ {entreprise.nom}: {detail}"))
+
+        if nb_ecarts:
+            self.stdout.write(self.style.SUCCESS(f"✅ Statistiques recalculées, {nb_ecarts} entreprise(s) corrigée(s)"))
+        else:
+            self.stdout.write(self.style.SUCCESS("✅ Statistiques recalculées, aucun écart"))
+
+    def resync_quantites(self, entreprise):
+        total_stocks = Coalesce(
+            Subquery(
+                Stock.objects.filter(produit_id=OuterRef('pk'))
+                .values('produit_id')
+                .annotate(total=Sum('quantite'))
+                .values('total')[:1]
+            ),
+            0,
+        )
+        produits = Produit.objects.filter(entreprise=entreprise).annotate(total_stocks=total_stocks)
+        ids = [pk for pk, quantite, total in produits.values_list('pk', 'quantite', 'total_stocks') if quantite != total]
+        if ids:
+            Produit.objects.filter(pk__in=ids).update(quantite=total_stocks)
+        return len(ids)
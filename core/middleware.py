@@ -1,4 +1,7 @@
 from django.utils import timezone
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
 from .models import Journal
 from django.contrib.auth.models import User
 
@@ -94,4 +97,40 @@ class JournalMiddleware:
             ip = x_forwarded_for.split(',')[0]
         else:
             ip = request.META.get('REMOTE_ADDR')
-        return ip 
\ No newline at end of file
+        return ip 
+
+
+class PerformanceMiddleware:
+    """
+    Instrumentation optionnelle (PERFORMANCE_INSTRUMENTATION=True) :
+    nombre et durée des requêtes SQL, hits/miss de cache, temps de sérialisation
+    et temps total, renvoyés dans l'en-tête Server-Timing et agrégés dans
+    l'histogramme de latence par endpoint (voir core/perf.py).
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFORMANCE_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed()
+        from . import perf
+        self.perf = perf
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics, token = self.perf.start_request()
+        try:
+            with connection.execute_wrapper(self.perf.sql_wrapper), self.perf.serializer_timing():
+                response = self.get_response(request)
+            response['Server-Timing'] = metrics.server_timing()
+            self.perf.histogram.record(
+                self._get_endpoint(request),
+                metrics.total_time * 1000,
+                metrics.sql_count,
+            )
+        finally:
+            self.perf.end_request(token)
+        return response
+
+    def _get_endpoint(self, request):
+        # Route Django (ex: api/produits/<pk>/) pour regrouper les URLs par endpoint
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match and match.route else 'autre'
+        return f"{request.method} {route.lstrip('^').rstrip('$')}"
@@ -0,0 +1,37 @@
+# Generated by Django 5.1 on 2026-10-19 09:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0043_update_pack_choices_to_starter_business_pro'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('type_operation', models.CharField(choices=[('creation', 'Création'), ('modification', 'Modification'), ('suppression', 'Suppression'), ('connexion', 'Connexion'), ('deconnexion', 'Déconnexion'), ('vente', 'Vente'), ('achat', 'Achat'), ('retour', 'Retour')], max_length=20)),
+                ('description', models.TextField()),
+                ('details', models.JSONField(blank=True, null=True)),
+                ('date_operation', models.DateTimeField()),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('periode', models.DateField(help_text="Premier jour du mois de l'opération")),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('boutique', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='journaux_archives', to='core.boutique')),
+                ('entreprise', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='journaux_archives', to='core.entreprise')),
+                ('utilisateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='journaux_archives', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Journal archivé',
+                'verbose_name_plural': 'Journaux archivés',
+                'ordering': ['-date_operation'],
+                'indexes': [models.Index(fields=['periode'], name='core_journa_periode_f1cc5c_idx'), models.Index(fields=['date_operation'], name='core_journa_date_op_726678_idx'), models.Index(fields=['boutique', 'date_operation'], name='core_journa_boutiqu_3ff4ef_idx'), models.Index(fields=['type_operation'], name='core_journa_type_op_20a180_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1 on 2026-10-19 09:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0044_journalarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Date de clôture (fin de journée)')),
+                ('granularite', models.CharField(choices=[('jour', 'Journalier'), ('mois', 'Mensuel')], default='mois', max_length=10)),
+                ('quantite', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('entrepot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='core.boutique')),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='core.produit')),
+                ('variante', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='core.produitvariante')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de stock',
+                'verbose_name_plural': 'Snapshots de stock',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['entrepot', 'date'], name='core_stocks_entrepo_063a61_idx'), models.Index(fields=['produit', 'entrepot', 'date'], name='core_stocks_produit_a89b61_idx'), models.Index(fields=['granularite', 'date'], name='core_stocks_granula_d91f11_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1 on 2026-10-19 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0045_stocksnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='telephone_normalise',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Chiffres du numéro national (recherche par préfixe)', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['entreprise', 'telephone_normalise'], name='core_client_entrepr_5c8727_idx'),
+        ),
+    ]
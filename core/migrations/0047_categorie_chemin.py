@@ -0,0 +1,51 @@
+# Generated by Django 5.1 on 2026-10-19 09:00
+
+from django.db import migrations, models
+
+
+def remplir_chemins(apps, schema_editor):
+    """Calcule chemin et profondeur des catégories existantes, niveau par niveau depuis les racines"""
+    Categorie = apps.get_model('core', 'Categorie')
+    parents = dict(Categorie.objects.values_list('id', 'parent_id'))
+    chemins = {}
+
+    def chemin(pk, vus=()):
+        if pk not in chemins:
+            parent_id = parents.get(pk)
+            # Parent absent ou boucle existante : la catégorie devient une racine
+            if parent_id is None or parent_id not in parents or parent_id in vus:
+                chemins[pk] = f"/{pk}/"
+            else:
+                chemins[pk] = f"{chemin(parent_id, vus + (pk,))}{pk}/"
+        return chemins[pk]
+
+    categories = list(Categorie.objects.only('id'))
+    for categorie in categories:
+        categorie.chemin = chemin(categorie.id)
+        categorie.profondeur = categorie.chemin.count('/') - 2
+    Categorie.objects.bulk_update(categories, ['chemin', 'profondeur'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0046_client_telephone_normalise'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categorie',
+            name='chemin',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Identifiants des ancêtres puis de la catégorie (ex: /3/12/45/)', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='categorie',
+            name='profondeur',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='categorie',
+            index=models.Index(fields=['entreprise', 'chemin'], name='core_catego_entrepr_c153b2_idx'),
+        ),
+        migrations.RunPython(remplir_chemins, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1 on 2026-10-19 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0047_categorie_chemin'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entreprise',
+            name='logo_derivees',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Miniatures du logo (core.images)'),
+        ),
+        migrations.AddField(
+            model_name='produit',
+            name='image_derivees',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text="Miniatures de l'image (core.images)"),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1 on 2026-10-19 09:00
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def dater_produits(apps, schema_editor):
+    """Produits sans updated_at (antérieurs au champ) : sinon jamais livrés par la synchronisation"""
+    Produit = apps.get_model('core', 'Produit')
+    Produit.objects.filter(updated_at__isnull=True).update(
+        updated_at=Coalesce('created_at', django.utils.timezone.now())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0048_image_derivees'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuppressionSync',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ressource', models.CharField(max_length=20)),
+                ('objet_id', models.BigIntegerField()),
+                ('entreprise_id', models.BigIntegerField()),
+                ('supprime_le', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Suppression (synchronisation)',
+                'verbose_name_plural': 'Suppressions (synchronisation)',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='categorie',
+            index=models.Index(fields=['entreprise', 'updated_at'], name='core_catego_entrepr_46d4ed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['entreprise', 'date_modification'], name='core_client_entrepr_b41507_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['entreprise', 'updated_at'], name='core_produi_entrepr_e9814e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produitvariante',
+            index=models.Index(fields=['updated_at'], name='core_produi_updated_ef4bf4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='suppressionsync',
+            index=models.Index(fields=['entreprise_id', 'ressource', 'id'], name='core_suppre_entrepr_f124a4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='suppressionsync',
+            index=models.Index(fields=['supprime_le'], name='core_suppre_supprim_5455f8_idx'),
+        ),
+        migrations.RunPython(dater_produits, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1 on 2026-10-19 09:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0049_sync_differentielle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('panier', models.CharField(help_text='Identifiant du panier (fourni par la caisse)', max_length=64)),
+                ('quantite', models.PositiveIntegerField()),
+                ('expire_le', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservations_stock', to=settings.AUTH_USER_MODEL)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='core.stock')),
+            ],
+            options={
+                'verbose_name': 'Réservation de stock',
+                'verbose_name_plural': 'Réservations de stock',
+                'indexes': [models.Index(fields=['expire_le'], name='core_reserv_expire__f44b7b_idx')],
+                'constraints': [models.UniqueConstraint(fields=('panier', 'stock'), name='unique_reservation_panier_stock')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1 on 2026-10-19 09:00
+
+from django.db import migrations
+
+from core.categories import calculer_chemins, profondeur_chemin
+
+
+def reconstruire_chemins(apps, schema_editor):
+    """Chemins des catégories insérées sans save() depuis 0047 (bulk_create, generate_dataset)"""
+    Categorie = apps.get_model('core', 'Categorie')
+    lignes = list(Categorie.objects.values_list('id', 'parent_id', 'chemin', 'profondeur'))
+    chemins = calculer_chemins({pk: parent_id for pk, parent_id, _, _ in lignes})
+    a_corriger = [
+        Categorie(pk=pk, chemin=chemins[pk], profondeur=profondeur_chemin(chemins[pk]))
+        for pk, _, chemin, profondeur in lignes
+        if chemin != chemins[pk] or profondeur != profondeur_chemin(chemins[pk])
+    ]
+    Categorie.objects.bulk_update(a_corriger, ['chemin', 'profondeur'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0050_reservations_stock'),
+    ]
+
+    operations = [
+        migrations.RunPython(reconstruire_chemins, migrations.RunPython.noop),
+    ]
@@ -48,6 +48,7 @@ class Entreprise(models.Model):
     description = models.TextField(blank=True, help_text="Description de l'entreprise")
     secteur_activite = models.CharField(max_length=100, help_text="Secteur d'activité")
     logo = models.ImageField(upload_to='entreprises/logos/', blank=True, null=True, validators=[validate_image_file], help_text="Logo de l'entreprise")
+    logo_derivees = models.JSONField(default=dict, blank=True, editable=False, help_text="Miniatures du logo (core.images)")
     
     # Informations de contact
     adresse = models.TextField(help_text="Adresse complète")
@@ -173,12 +174,44 @@ class Categorie(models.Model):
     couleur = models.CharField(max_length=7, default='#3B82F6', help_text="Code couleur hexadécimal")
     entreprise = models.ForeignKey(Entreprise, on_delete=models.CASCADE, related_name='categories')
     actif = models.BooleanField(default=True)
+    chemin = models.CharField(
+        max_length=255, blank=True, default='', editable=False,
+        help_text="Identifiants des ancêtres puis de la catégorie (ex: /3/12/45/)"
+    )
+    profondeur = models.PositiveSmallIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.parent.nom} > {self.nom}" if self.parent else self.nom
 
+    def save(self, *args, **kwargs):
+        from .categories import construire_chemin, deplacer_sous_arbre, profondeur_chemin
+        # Chemin relu en base : celui de l'instance est périmé si un ancêtre a été déplacé depuis
+        ancien_chemin = (
+            Categorie.objects.filter(pk=self.pk).values_list('chemin', flat=True).first() or ''
+        ) if self.pk else ''
+        chemin_parent = ''
+        if self.parent_id:
+            chemin_parent = Categorie.objects.filter(pk=self.parent_id).values_list('chemin', flat=True).first() or ''
+            if ancien_chemin and chemin_parent.startswith(ancien_chemin):
+                raise ValidationError("Une catégorie ne peut pas être rangée sous elle-même ou l'une de ses sous-catégories.")
+        if ancien_chemin:
+            self.chemin = construire_chemin(chemin_parent, self.pk)
+            self.profondeur = profondeur_chemin(self.chemin)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'parent' in update_fields:
+                kwargs['update_fields'] = set(update_fields) | {'chemin', 'profondeur'}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if not ancien_chemin:
+                # Création : le chemin contient l'identifiant, connu après l'INSERT
+                self.chemin = construire_chemin(chemin_parent, self.pk)
+                self.profondeur = profondeur_chemin(self.chemin)
+                Categorie.objects.filter(pk=self.pk).update(chemin=self.chemin, profondeur=self.profondeur)
+            elif ancien_chemin != self.chemin:
+                deplacer_sous_arbre(ancien_chemin, self.chemin, self.entreprise_id)
+
     class Meta:
         ordering = ['nom']
         verbose_name = "Catégorie"
@@ -188,6 +221,8 @@ class Categorie(models.Model):
             models.Index(fields=['nom']),
             models.Index(fields=['actif']),
             models.Index(fields=['entreprise', 'actif']),
+            models.Index(fields=['entreprise', 'chemin']),
+            models.Index(fields=['entreprise', 'updated_at']),
         ]
 
 class Fournisseur(models.Model):
@@ -248,6 +283,7 @@ class Produit(models.Model):
     
     # Image
     image = models.ImageField(upload_to='produits/images/', blank=True, null=True, validators=[validate_image_file], help_text="Image du produit")
+    image_derivees = models.JSONField(default=dict, blank=True, editable=False, help_text="Miniatures de l'image (core.images)")
     
     # 2. Informations commerciales essentielles
     prix_achat = models.DecimalField(max_digits=10, decimal_places=2, default=0, help_text="Prix d'achat unitaire")
@@ -319,10 +355,25 @@ class Produit(models.Model):
         if not self.category and self.categorie:
             self.category = self.categorie.nom.lower().replace(' ', '_')
         
+        # État avant écriture, pour l'ajustement incrémental des statistiques de stock
+        avant = None
+        if self.pk:
+            avant = Produit.objects.filter(pk=self.pk).values_list('quantite', 'prix_vente', 'entreprise_id').first()
+        
         super().save(*args, **kwargs)
         
         # Mettre à jour la quantité totale
         self.update_total_quantity()
+        
+        try:
+            from .produit_stats import ajuster_stats_produits, invalider_stats_produits
+            if avant and avant[2] != self.entreprise_id:
+                invalider_stats_produits(avant[2])
+                avant = None
+            ajuster_stats_produits(self.entreprise_id, avant[:2] if avant else None, (self.quantite, self.prix_vente))
+        except Exception:
+            import logging
+            logging.getLogger(__name__).exception("Erreur ajustement statistiques produits (produit %s)", self.pk)
 
     def generate_sku(self):
         """Génère un SKU unique basé sur l'entreprise et un compteur"""
@@ -424,6 +475,7 @@ class Produit(models.Model):
             models.Index(fields=['entreprise', 'categorie']),
             models.Index(fields=['prix_vente']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['entreprise', 'updated_at']),
         ]
 
 class ProduitVariante(models.Model):
@@ -472,6 +524,7 @@ class ProduitVariante(models.Model):
         indexes = [
             models.Index(fields=['produit']),
             models.Index(fields=['actif']),
+            models.Index(fields=['updated_at']),
         ]
 
 class Stock(models.Model):
@@ -524,6 +577,36 @@ class Stock(models.Model):
             models.Index(fields=['updated_at']),
         ]
 
+class ReservationStock(models.Model):
+    """
+    Quantité d'un stock retenue pour un panier en cours (core.reservations).
+    La somme des réservations actives d'un stock est reportée dans
+    Stock.quantite_reservee ; une réservation expirée est libérée par
+    la commande expirer_reservations.
+    """
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='reservations')
+    panier = models.CharField(max_length=64, help_text="Identifiant du panier (fourni par la caisse)")
+    quantite = models.PositiveIntegerField()
+    expire_le = models.DateTimeField()
+    created_by = models.ForeignKey(
+        'User', on_delete=models.SET_NULL, null=True, blank=True, related_name='reservations_stock'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['panier', 'stock'], name='unique_reservation_panier_stock'),
+        ]
+        verbose_name = "Réservation de stock"
+        verbose_name_plural = "Réservations de stock"
+        indexes = [
+            models.Index(fields=['expire_le']),
+        ]
+
+    def __str__(self):
+        return f"Panier {self.panier} - stock {self.stock_id} ({self.quantite}) jusqu'au {self.expire_le}"
+
 class MouvementStock(models.Model):
     """Modèle pour tracer tous les mouvements de stock"""
     TYPE_CHOICES = [
@@ -571,6 +654,42 @@ class MouvementStock(models.Model):
             models.Index(fields=['produit', 'entrepot']),
         ]
 
+
+class StockSnapshot(models.Model):
+    """
+    Quantité de clôture d'un stock (entrepôt, produit, variante) à une date.
+    Construit par la commande build_stock_snapshots à partir des mouvements ;
+    chaque date de snapshot contient l'état complet des stocks de l'entrepôt.
+    """
+    GRANULARITE_CHOICES = [
+        ('jour', 'Journalier'),
+        ('mois', 'Mensuel'),
+    ]
+
+    entrepot = models.ForeignKey(Boutique, on_delete=models.CASCADE, related_name='stock_snapshots')
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='stock_snapshots')
+    variante = models.ForeignKey(
+        'ProduitVariante', on_delete=models.CASCADE,
+        related_name='stock_snapshots', null=True, blank=True
+    )
+    date = models.DateField(help_text="Date de clôture (fin de journée)")
+    granularite = models.CharField(max_length=10, choices=GRANULARITE_CHOICES, default='mois')
+    quantite = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.produit_id} @ {self.entrepot_id} - {self.date} ({self.quantite})"
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name = "Snapshot de stock"
+        verbose_name_plural = "Snapshots de stock"
+        indexes = [
+            models.Index(fields=['entrepot', 'date']),
+            models.Index(fields=['produit', 'entrepot', 'date']),
+            models.Index(fields=['granularite', 'date']),
+        ]
+
 class PrixProduit(models.Model):
     produit = models.OneToOneField(Produit, on_delete=models.CASCADE)
     prix_achat_yen = models.FloatField()
@@ -690,6 +809,10 @@ class Client(models.Model):
     nom = models.CharField(max_length=100)
     prenom = models.CharField(max_length=100, default='')
     telephone = models.CharField(max_length=20)
+    telephone_normalise = models.CharField(
+        max_length=20, blank=True, default='', editable=False,
+        help_text="Chiffres du numéro national (recherche par préfixe)"
+    )
     email = models.EmailField(blank=True, null=True)
     adresse = models.TextField(blank=True, null=True)
     ville = models.CharField(max_length=100, default='Bafoussam')
@@ -702,6 +825,18 @@ class Client(models.Model):
     class Meta:
         unique_together = ['telephone', 'entreprise']
         ordering = ['nom', 'prenom']
+        indexes = [
+            models.Index(fields=['entreprise', 'telephone_normalise']),
+            models.Index(fields=['entreprise', 'date_modification']),
+        ]
+    
+    def save(self, *args, **kwargs):
+        from .telephone import normaliser_telephone
+        self.telephone_normalise = normaliser_telephone(self.telephone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'telephone' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'telephone_normalise'}
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.prenom} {self.nom} - {self.telephone}"
@@ -920,6 +1055,63 @@ class Journal(models.Model):
             self.date_operation = timezone.now()
         super().save(*args, **kwargs)
 
+
+class JournalArchive(models.Model):
+    """
+    Entrées de journal archivées (plus anciennes que JOURNAL_RETENTION_DAYS).
+    Même structure que Journal, partitionnée par mois via `periode`.
+    L'identifiant d'origine est conservé pour rendre l'archivage idempotent.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    utilisateur = models.ForeignKey(User, on_delete=models.CASCADE, related_name='journaux_archives')
+    entreprise = models.ForeignKey(Entreprise, on_delete=models.CASCADE, null=True, blank=True, related_name='journaux_archives')
+    boutique = models.ForeignKey(Boutique, on_delete=models.CASCADE, null=True, blank=True, related_name='journaux_archives')
+    type_operation = models.CharField(max_length=20, choices=Journal.OPERATION_TYPES)
+    description = models.TextField()
+    details = models.JSONField(null=True, blank=True)
+    date_operation = models.DateTimeField()
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    periode = models.DateField(help_text="Premier jour du mois de l'opération")
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-date_operation']
+        verbose_name = 'Journal archivé'
+        verbose_name_plural = 'Journaux archivés'
+        indexes = [
+            models.Index(fields=['periode']),
+            models.Index(fields=['date_operation']),
+            models.Index(fields=['boutique', 'date_operation']),
+            models.Index(fields=['type_operation']),
+        ]
+
+    def __str__(self):
+        return f"[archive] {self.utilisateur_id} - {self.type_operation} - {self.date_operation}"
+
+
+class SuppressionSync(models.Model):
+    """
+    Trace d'une suppression pour la synchronisation différentielle (core.sync) :
+    les clients hors ligne retirent ces identifiants de leur copie locale.
+    Purgée après SYNC_RETENTION_SUPPRESSIONS_JOURS (purge_expired_data).
+    """
+    ressource = models.CharField(max_length=20)
+    objet_id = models.BigIntegerField()
+    # Pas de clé étrangère : la trace doit survivre à la suppression en cascade de l'entreprise
+    entreprise_id = models.BigIntegerField()
+    supprime_le = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Suppression (synchronisation)'
+        verbose_name_plural = 'Suppressions (synchronisation)'
+        indexes = [
+            models.Index(fields=['entreprise_id', 'ressource', 'id']),
+            models.Index(fields=['supprime_le']),
+        ]
+
+    def __str__(self):
+        return f"{self.ressource} {self.objet_id} supprimé le {self.supprime_le}"
+
 class SubscriptionPlan(models.Model):
     """Modèle pour définir les plans d'abonnement"""
     PLAN_CHOICES = [
@@ -1285,6 +1477,8 @@ class Inventaire(models.Model):
         if self.statut != 'en_cours':
             return {'error': 'Cet inventaire doit être en cours pour ajuster les stocks'}
         
+        from .stock_mutations import StockInsuffisant, fixer, trouver_stock
+
         ajustements_faits = 0
         mouvements_crees = 0
         
@@ -1303,16 +1497,10 @@ class Inventaire(models.Model):
                     # S'assurer que l'écart est un entier valide
                     ecart_val = int(ecart) if ecart is not None else 0
                     
-                    # Mettre à jour le stock dans l'entrepôt de l'inventaire
-                    stock, created = Stock.objects.get_or_create(
-                        produit=produit,
-                        entrepot=self.entrepot,
-                        defaults={'quantite': 0}  # Valeur par défaut si création
-                    )
-                    
-                    quantite_avant = stock.quantite  # Sauvegarder AVANT la modification
-                    stock.quantite = quantite_reelle
-                    stock.save()
+                    # Mettre à jour le stock dans l'entrepôt de l'inventaire (créé à 0 si absent),
+                    # par compare-and-swap : une vente pendant l'ajustement n'est pas écrasée en silence
+                    stock = trouver_stock(produit.id, self.entrepot_id, creer=True)
+                    variation = fixer(stock, lambda avant, reservee: quantite_reelle, entreprise_id=self.entreprise_id)
                     
                     # Créer un mouvement de stock pour tracer l'ajustement
                     MouvementStock.objects.create(
@@ -1320,8 +1508,8 @@ class Inventaire(models.Model):
                         entrepot=self.entrepot,
                         type_mouvement='ajustement',
                         quantite=abs(ecart_val),
-                        quantite_avant=quantite_avant,  # Quantité AVANT l'ajustement
-                        quantite_apres=quantite_reelle,
+                        quantite_avant=variation.quantite_avant,  # Quantité AVANT l'ajustement
+                        quantite_apres=variation.quantite_apres,
                         reference_document=f'Inventaire {self.numero}',
                         motif=f'Ajustement suite à inventaire: {self.nom}. Écart: {"+" if ecart_val > 0 else ""}{ecart_val}',
                         utilisateur=utilisateur
@@ -1335,6 +1523,13 @@ class Inventaire(models.Model):
                 self.date_ajustement = timezone.now()
                 self.save()
         
+        except StockInsuffisant as e:
+            # Quantité comptée inférieure aux réservations : aucun stock n'est ajusté
+            return {
+                'error': f"{produit.nom} : quantité comptée ({quantite_reelle}) inférieure aux "
+                         f"réservations des paniers en cours (disponible hors réservations: {e.disponible}). "
+                         f"Réessayez après leur passage en caisse ou leur expiration."
+            }
         except Exception as e:
             import traceback
             error_trace = traceback.format_exc()
@@ -7,15 +7,15 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
-from django.db.models import Sum
 
 from .models import (
     PaymentTransaction, SubscriptionPlan, EntrepriseSubscription,
-    Entreprise, User
+    Entreprise
 )
 from .subscription_utils import get_entreprise_subscription
 from .permissions import IsAdminOrSuperAdmin
 from .pagination import StandardPagination
+from .platform_stats import annoter_metriques, get_rollups, rafraichir_rollups
 
 
 # ─── Serializers inline ───────────────────────────────────────────────────────
@@ -155,7 +155,10 @@ class PlatformAdminViewSet(viewsets.ViewSet):
         """Lister toutes les entreprises avec leur abonnement."""
         self._assert_platform_admin(request.user)
 
-        entreprises = Entreprise.objects.prefetch_related('subscription__plan').order_by('-created_at')
+        # subscription est un one-to-one inverse : jointure (select_related), compteurs en sous-requêtes
+        entreprises = annoter_metriques(
+            Entreprise.objects.select_related('subscription__plan')
+        ).order_by('-created_at')
         paginator = StandardPagination()
         page = paginator.paginate_queryset(entreprises, request)
 
@@ -184,7 +187,10 @@ class PlatformAdminViewSet(viewsets.ViewSet):
                 'is_active': e.is_active,
                 'created_at': e.created_at,
                 'subscription': sub_data,
-                'users_count': User.objects.filter(entreprise=e).count(),
+                'users_count': e.users_count,
+                'boutiques_count': e.boutiques_count,
+                'produits_count': e.produits_count,
+                'factures_30j': e.factures_recentes,
             })
 
         if page is not None:
@@ -241,28 +247,34 @@ class PlatformAdminViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        """Statistiques globales de la plateforme."""
+        """
+        Statistiques globales de la plateforme, servies depuis les agrégats en cache
+        (rafraîchis par ``refresh_platform_stats``, ou ``?refresh=1``).
+        """
         self._assert_platform_admin(request.user)
 
-        total = Entreprise.objects.count()
-        active = Entreprise.objects.filter(is_active=True).count()
+        if request.query_params.get('refresh') in ('1', 'true'):
+            rollups = rafraichir_rollups()
+        else:
+            rollups = get_rollups()
 
+        entreprises = rollups['entreprises']
         plans_dist = {}
-        for sub in EntrepriseSubscription.objects.select_related('plan').all():
-            k = sub.plan.display_name
-            plans_dist[k] = plans_dist.get(k, 0) + 1
-
-        revenue = PaymentTransaction.objects.filter(
-            status='success',
-            method__in=['orange_money', 'mtn_money', 'stripe', 'bank_card'],
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        for plan in rollups['plans']:
+            plans_dist[plan['plan_nom']] = plans_dist.get(plan['plan_nom'], 0) + plan['entreprises']
 
         return Response({
-            'total_entreprises': total,
-            'active_entreprises': active,
-            'inactive_entreprises': total - active,
+            'total_entreprises': entreprises['total'],
+            'active_entreprises': entreprises['actives'],
+            'inactive_entreprises': entreprises['total'] - entreprises['actives'],
             'plans_distribution': plans_dist,
-            'total_revenue_simulated': int(revenue),
+            'total_revenue_simulated': rollups['revenue'],
+            'mrr': rollups['mrr'],
+            'plans': rollups['plans'],
+            'entreprises_sans_abonnement': entreprises['sans_abonnement'],
+            'utilisateurs': rollups['utilisateurs'],
+            'factures_par_jour': rollups['factures_par_jour'],
+            'calculated_at': rollups['calculated_at'],
         })
 
     @action(detail=False, methods=['post'])
@@ -0,0 +1,291 @@
+# core/perf.py
+"""
+Instrumentation des performances par requête.
+
+- ``RequestMetrics`` : compteurs de la requête en cours (SQL, cache, sérialisation),
+  portés par une ContextVar et alimentés par ``PerformanceMiddleware``.
+- ``LatencyHistogram`` : histogramme glissant des latences par endpoint
+  (tranches d'une minute, seaux logarithmiques), partagé entre workers
+  via le cache partagé.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+_current_metrics = ContextVar('request_metrics', default=None)
+
+# Bornes supérieures des seaux de latence, en millisecondes
+BUCKET_BOUNDS_MS = [5, 10, 25, 50, 75, 100, 150, 250, 400, 600, 1000, 1500, 2500, 5000, 10000, float('inf')]
+
+
+@dataclass
+class RequestMetrics:
+    """Mesures collectées pendant une requête."""
+    started_at: float = field(default_factory=time.perf_counter)
+    sql_count: int = 0
+    sql_time: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    serializer_time: float = 0.0
+    in_serializer: bool = False
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started_at
+
+    def server_timing(self):
+        """Valeur de l'en-tête Server-Timing (durées en ms, texte ASCII pour l'en-tête HTTP)."""
+        return ', '.join([
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.sql_count} requetes SQL"',
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+            f'ser;dur={self.serializer_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current_metrics.set(metrics)
+
+
+def end_request(token):
+    _current_metrics.reset(token)
+
+
+def current_metrics():
+    return _current_metrics.get()
+
+
+def record_cache(hit):
+    """À appeler par les helpers de cache (CacheManager, cache_api_response)."""
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return
+    if hit:
+        metrics.cache_hits += 1
+    else:
+        metrics.cache_misses += 1
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    """Wrapper pour ``connection.execute_wrapper`` : compte et chronomètre les requêtes."""
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.sql_count += 1
+        metrics.sql_time += time.perf_counter() - start
+
+
+@contextmanager
+def serializer_timer():
+    metrics = _current_metrics.get()
+    if metrics is None or metrics.in_serializer:
+        yield
+        return
+    metrics.in_serializer = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - start
+        metrics.in_serializer = False
+
+
+# Propriétés ``data`` d'origine et nombre de requêtes profilées en cours
+_serializer_data = {}
+_profiled_requests = 0
+_patch_lock = threading.Lock()
+
+
+@contextmanager
+def serializer_timing():
+    """
+    Chronomètre ``serializer.data`` (Serializer et ListSerializer) sans modifier
+    chaque serializer. Le temps inclut les requêtes déclenchées par la sérialisation.
+
+    La propriété ``data`` des deux classes DRF est remplacée pour tout le
+    processus, mais seulement tant qu'au moins une requête est profilée
+    (compteur) : elle est restaurée à la fin de la dernière. Pendant ce temps,
+    une sérialisation hors requête profilée (autre thread, tâche de fond) passe
+    par le wrapper sans être mesurée. Les sous-classes qui redéfinissent
+    ``data`` ne sont pas chronométrées.
+    """
+    global _profiled_requests
+    from rest_framework import serializers
+
+    def timed(fget):
+        def data(self):
+            with serializer_timer():
+                return fget(self)
+        return property(data)
+
+    with _patch_lock:
+        if not _profiled_requests:
+            for cls in (serializers.Serializer, serializers.ListSerializer):
+                _serializer_data[cls] = cls.__dict__['data']
+                cls.data = timed(cls.data.fget)
+        _profiled_requests += 1
+    try:
+        yield
+    finally:
+        with _patch_lock:
+            _profiled_requests -= 1
+            if not _profiled_requests:
+                for cls, original in _serializer_data.items():
+                    cls.data = original
+                _serializer_data.clear()
+
+
+class LatencyHistogram:
+    """
+    Histogramme glissant des latences par endpoint.
+
+    Chaque worker agrège ses requêtes par minute et publie périodiquement
+    sa fenêtre dans le cache partagé ; la lecture fusionne tous les workers.
+    """
+    WORKERS_KEY = 'perf:workers'
+
+    def __init__(self, window_minutes=15, flush_interval=10):
+        self.window_minutes = window_minutes
+        self.flush_interval = flush_interval
+        # {minute: {endpoint: {'buckets': [...], 'count', 'total_ms', 'max_ms', 'sql'}}}
+        self._minutes = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self.worker_id = f"{os.getpid()}"
+
+    def record(self, endpoint, duration_ms, sql_count=0):
+        minute = int(time.time() // 60)
+        with self._lock:
+            endpoints = self._minutes.setdefault(minute, {})
+            stats = endpoints.get(endpoint)
+            if stats is None:
+                stats = endpoints[endpoint] = {
+                    'buckets': [0] * len(BUCKET_BOUNDS_MS),
+                    'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'sql': 0,
+                }
+            stats['buckets'][bisect.bisect_left(BUCKET_BOUNDS_MS, duration_ms)] += 1
+            stats['count'] += 1
+            stats['total_ms'] += duration_ms
+            stats['max_ms'] = max(stats['max_ms'], duration_ms)
+            stats['sql'] += sql_count
+            self._prune(minute)
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _prune(self, minute):
+        oldest = minute - self.window_minutes
+        for old in [m for m in self._minutes if m <= oldest]:
+            del self._minutes[old]
+
+    def snapshot(self):
+        with self._lock:
+            self._prune(int(time.time() // 60))
+            return {
+                minute: {endpoint: dict(stats, buckets=list(stats['buckets'])) for endpoint, stats in endpoints.items()}
+                for minute, endpoints in self._minutes.items()
+            }
+
+    def flush(self):
+        """Publie la fenêtre de ce worker dans le cache partagé."""
+        self._last_flush = time.monotonic()
+        timeout = self.window_minutes * 60
+        try:
+            cache.set(f"perf:worker:{self.worker_id}", self.snapshot(), timeout)
+            workers = cache.get(self.WORKERS_KEY) or []
+            if self.worker_id not in workers:
+                cache.set(self.WORKERS_KEY, (workers + [self.worker_id])[-64:], timeout)
+        except Exception:
+            logger.exception("Erreur publication métriques de performance")
+
+    def merged(self):
+        """Fusionne les fenêtres de tous les workers : {endpoint: stats}."""
+        self.flush()
+        fenetres = []
+        for worker_id in cache.get(self.WORKERS_KEY) or []:
+            data = cache.get(f"perf:worker:{worker_id}")
+            if data:
+                fenetres.append(data)
+
+        oldest = int(time.time() // 60) - self.window_minutes
+        merged = {}
+        for fenetre in fenetres:
+            for minute, endpoints in fenetre.items():
+                if int(minute) <= oldest:
+                    continue
+                for endpoint, stats in endpoints.items():
+                    total = merged.setdefault(endpoint, {
+                        'buckets': [0] * len(BUCKET_BOUNDS_MS),
+                        'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'sql': 0,
+                    })
+                    total['buckets'] = [a + b for a, b in zip(total['buckets'], stats['buckets'])]
+                    total['count'] += stats['count']
+                    total['total_ms'] += stats['total_ms']
+                    total['max_ms'] = max(total['max_ms'], stats['max_ms'])
+                    total['sql'] += stats['sql']
+        return merged
+
+
+def percentile(buckets, count, p):
+    """Percentile approché depuis les seaux (interpolation linéaire dans le seau)."""
+    if not count:
+        return 0.0
+    rank = p / 100 * count
+    cumul = 0
+    lower = 0.0
+    for index, bucket_count in enumerate(buckets):
+        upper = BUCKET_BOUNDS_MS[index]
+        if bucket_count and cumul + bucket_count >= rank:
+            if upper == float('inf'):
+                return lower
+            return lower + (upper - lower) * (rank - cumul) / bucket_count
+        cumul += bucket_count
+        lower = upper
+    return lower
+
+
+def performance_report(histogram, top=10):
+    """Percentiles p50/p95/p99 par endpoint et endpoints les plus coûteux."""
+    endpoints = []
+    for endpoint, stats in histogram.merged().items():
+        count = stats['count']
+        # L'interpolation dans un seau ne doit pas dépasser le maximum observé
+        p50, p95, p99 = (min(percentile(stats['buckets'], count, p), stats['max_ms']) for p in (50, 95, 99))
+        endpoints.append({
+            'endpoint': endpoint,
+            'count': count,
+            'p50_ms': round(p50, 1),
+            'p95_ms': round(p95, 1),
+            'p99_ms': round(p99, 1),
+            'max_ms': round(stats['max_ms'], 1),
+            'avg_ms': round(stats['total_ms'] / count, 1) if count else 0,
+            'total_ms': round(stats['total_ms'], 1),
+            'avg_sql': round(stats['sql'] / count, 1) if count else 0,
+        })
+    endpoints.sort(key=lambda e: e['endpoint'])
+    return {
+        'window_minutes': histogram.window_minutes,
+        'endpoints': endpoints,
+        'top_p95': sorted(endpoints, key=lambda e: e['p95_ms'], reverse=True)[:top],
+        'top_temps_total': sorted(endpoints, key=lambda e: e['total_ms'], reverse=True)[:top],
+        'top_sql': sorted(endpoints, key=lambda e: e['avg_sql'], reverse=True)[:top],
+    }
+
+
+histogram = LatencyHistogram(
+    window_minutes=getattr(settings, 'PERFORMANCE_WINDOW_MINUTES', 15),
+)
@@ -7,6 +7,19 @@ class IsSuperAdmin(BasePermission):
     def has_permission(self, request, view):
         return request.user.is_authenticated and request.user.role == 'superadmin'
 
+class IsPlatformSuperAdmin(BasePermission):
+    """
+    Autorise seulement l'administrateur de la plateforme :
+    superadmin sans entreprise, ou compte staff/superuser Django.
+    """
+    def has_permission(self, request, view):
+        user = request.user
+        if not user.is_authenticated:
+            return False
+        return user.is_staff or user.is_superuser or (
+            user.role == 'superadmin' and not user.entreprise_id
+        )
+
 class IsAdminOrSuperAdmin(BasePermission):
     """
     Autorise les admins de boutique et le superadmin.
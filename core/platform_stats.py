@@ -0,0 +1,143 @@
+# core/platform_stats.py
+"""
+Indicateurs de la console d'administration plateforme (PlatformAdminViewSet).
+
+- ``annoter_metriques`` : compteurs par entreprise en sous-requêtes corrélées,
+  une seule requête quel que soit le nombre d'entreprises listées ;
+- ``calculer_rollups`` : agrégats plateforme (entreprises par plan, MRR,
+  utilisateurs actifs, factures par jour) en requêtes groupées, mis en cache
+  sous ``ROLLUPS_KEY`` et rafraîchis par la commande ``refresh_platform_stats``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import (
+    Case, Count, DecimalField, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import (
+    Boutique, Entreprise, EntrepriseSubscription, Facture, PaymentTransaction, Produit, User,
+)
+
+ROLLUPS_KEY = 'platform_rollups'
+
+# Méthodes de paiement réelles (hors attributions manuelles)
+METHODES_PAYANTES = ['orange_money', 'mtn_money', 'stripe', 'bank_card']
+
+
+def _compte(queryset, champ):
+    """Sous-requête corrélée : nombre de lignes de ``queryset`` pour l'entreprise courante."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{champ: OuterRef('pk')})
+            .order_by()
+            .values(champ)
+            .annotate(n=Count('pk'))
+            .values('n')[:1],
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def annoter_metriques(queryset, jours=30):
+    """Ajoute users_count, boutiques_count, produits_count et factures_recentes aux entreprises."""
+    depuis = timezone.now() - timedelta(days=jours)
+    return queryset.annotate(
+        users_count=_compte(User.objects.all(), 'entreprise'),
+        boutiques_count=_compte(Boutique.objects.all(), 'entreprise'),
+        produits_count=_compte(Produit.objects.all(), 'entreprise'),
+        factures_recentes=_compte(
+            Facture.objects.filter(created_at__gte=depuis).exclude(status='Annulée'),
+            'boutique__entreprise',
+        ),
+    )
+
+
+def calculer_rollups(jours=30):
+    """Agrégats plateforme, en un nombre fixe de requêtes."""
+    now = timezone.now()
+    depuis = now - timedelta(days=jours)
+
+    entreprises = Entreprise.objects.aggregate(
+        total=Count('id'),
+        actives=Count('id', filter=Q(is_active=True)),
+        sans_abonnement=Count('id', filter=Q(subscription__isnull=True)),
+    )
+
+    # Revenu mensuel récurrent : abonnements actifs, prix annuel ramené au mois
+    mrr_expr = Case(
+        When(billing_period='yearly', then=F('plan__price_yearly') / 12),
+        default=F('plan__price_monthly'),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+    par_plan = (
+        EntrepriseSubscription.objects
+        .values('plan__name', 'plan__display_name')
+        .annotate(
+            total=Count('id'),
+            actifs=Count('id', filter=Q(status='active')),
+            mrr=Coalesce(Sum(mrr_expr, filter=Q(status='active')), Value(0), output_field=DecimalField()),
+        )
+        .order_by('plan__name')
+    )
+    plans = [
+        {
+            'plan': ligne['plan__name'],
+            'plan_nom': ligne['plan__display_name'],
+            'entreprises': ligne['total'],
+            'actives': ligne['actifs'],
+            'mrr': round(float(ligne['mrr'] or 0), 2),
+        }
+        for ligne in par_plan
+    ]
+
+    utilisateurs = User.objects.filter(entreprise__isnull=False).aggregate(
+        total=Count('id'),
+        actifs=Count('id', filter=Q(is_active=True)),
+        connectes_recemment=Count('id', filter=Q(is_active=True, last_login__gte=depuis)),
+    )
+
+    factures_par_jour = (
+        Facture.objects.filter(created_at__gte=depuis)
+        .exclude(status='Annulée')
+        .annotate(jour=TruncDate('created_at'))
+        .values('jour')
+        .annotate(nb=Count('id'), ca=Sum('total'))
+        .order_by('jour')
+    )
+
+    revenue = PaymentTransaction.objects.filter(
+        status='success', method__in=METHODES_PAYANTES,
+    ).aggregate(total=Sum('amount'))['total'] or 0
+
+    return {
+        'entreprises': entreprises,
+        'plans': plans,
+        'mrr': round(sum(plan['mrr'] for plan in plans), 2),
+        'utilisateurs': utilisateurs,
+        'factures_par_jour': [
+            {'jour': ligne['jour'].isoformat(), 'nb': ligne['nb'], 'ca': round(ligne['ca'] or 0, 2)}
+            for ligne in factures_par_jour
+        ],
+        'revenue': int(revenue),
+        'periode_jours': jours,
+        'calculated_at': now.isoformat(),
+    }
+
+
+def rafraichir_rollups():
+    rollups = calculer_rollups()
+    cache.set(ROLLUPS_KEY, rollups, getattr(settings, 'PLATFORM_ROLLUPS_TTL', 3600))
+    return rollups
+
+
+def get_rollups():
+    """Agrégats en cache ; calculés à la demande si la commande planifiée n'est pas encore passée."""
+    rollups = cache.get(ROLLUPS_KEY)
+    if rollups is None:
+        rollups = rafraichir_rollups()
+    return rollups
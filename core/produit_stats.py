@@ -0,0 +1,168 @@
+# core/produit_stats.py
+"""
+Statistiques de stock par entreprise (``ProduitViewSet.stats``), maintenues en cache.
+
+Les compteurs (nombre de produits, unités, valeur du stock, répartition par
+tranche rupture / critique / faible / normal) sont stockés dans le cache
+partagé, un compteur par clé. Une écriture de produit ou de stock les ajuste
+par ``incr`` à partir de l'état avant / après du produit, au lieu de relancer
+les agrégats sur toute la table. Si une clé manque, les compteurs sont
+supprimés puis recalculés à la lecture suivante.
+
+``incr`` n'est atomique que sur Redis (ou locmem au sein d'un processus). Avec
+le backend fichier, défaut de settings_production.py, c'est une lecture
+suivie d'une écriture : deux écritures simultanées peuvent perdre un
+ajustement. L'écart est alors corrigé par ``verifier_stats_produits``.
+
+Les écritures qui contournent les signaux (``bulk_create``, ``update()``) ne
+sont pas vues : la commande ``verifier_stats_produits`` (nocturne) recalcule
+et corrige les compteurs, et leur durée de vie est bornée (``PRODUIT_STATS_TTL``).
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Q, Sum
+
+from .models import Produit
+
+STATS_KEY = 'produit_stats:{entreprise_id}:{compteur}'
+
+# Tranches de quantité : (compteur, minimum inclus, maximum exclu)
+TRANCHES = (
+    ('nb_rupture', 0, 1),
+    ('nb_critique', 1, 10),
+    ('nb_faible', 10, 50),
+    ('nb_normal', 50, None),
+)
+
+# La valeur du stock est comptée en centimes : incr / decr n'acceptent que des entiers
+COMPTEURS = ('total_produits', 'total_unites', 'valeur_stock_centimes') + tuple(t[0] for t in TRANCHES)
+
+
+def tranche(quantite):
+    """Compteur de tranche d'une quantité (None pour une quantité négative)."""
+    for compteur, minimum, maximum in TRANCHES:
+        if quantite >= minimum and (maximum is None or quantite < maximum):
+            return compteur
+    return None
+
+
+def calculer_stats_produits(queryset):
+    """Agrégats de stock calculés en SQL sur ``queryset``."""
+    totals = queryset.aggregate(
+        total_produits=Count('id'),
+        total_unites=Sum('quantite'),
+        valeur_stock=Sum(
+            ExpressionWrapper(F('quantite') * F('prix_vente'), output_field=FloatField())
+        ),
+        **{
+            compteur: Count('id', filter=Q(quantite__gte=minimum) & (Q(quantite__lt=maximum) if maximum else Q()))
+            for compteur, minimum, maximum in TRANCHES
+        },
+    )
+    return {
+        'total_produits': totals['total_produits'] or 0,
+        'total_unites': totals['total_unites'] or 0,
+        'valeur_stock': round(totals['valeur_stock'] or 0, 2),
+        **{compteur: totals[compteur] or 0 for compteur, _, _ in TRANCHES},
+    }
+
+
+def _cles(entreprise_id):
+    return {compteur: STATS_KEY.format(entreprise_id=entreprise_id, compteur=compteur) for compteur in COMPTEURS}
+
+
+def _centimes(quantite, prix):
+    return int(round(Decimal(quantite) * Decimal(prix or 0) * 100))
+
+
+def compteurs_depuis_stats(stats):
+    compteurs = {compteur: stats.get(compteur, 0) for compteur in COMPTEURS}
+    compteurs['valeur_stock_centimes'] = int(round(Decimal(str(stats['valeur_stock'])) * 100))
+    return compteurs
+
+
+def stats_depuis_compteurs(compteurs):
+    stats = {compteur: compteurs[compteur] for compteur in COMPTEURS if compteur != 'valeur_stock_centimes'}
+    stats['valeur_stock'] = round(compteurs['valeur_stock_centimes'] / 100, 2)
+    # Même ordre de clés que l'agrégat SQL
+    return {cle: stats[cle] for cle in ('total_produits', 'total_unites', 'valeur_stock') + tuple(t[0] for t in TRANCHES)}
+
+
+def recalculer_stats_produits(entreprise_id):
+    """Recalcule les compteurs en SQL et les remet en cache."""
+    stats = calculer_stats_produits(Produit.objects.filter(entreprise_id=entreprise_id))
+    cles = _cles(entreprise_id)
+    compteurs = compteurs_depuis_stats(stats)
+    cache.set_many(
+        {cles[compteur]: valeur for compteur, valeur in compteurs.items()},
+        getattr(settings, 'PRODUIT_STATS_TTL', 86400),
+    )
+    return stats
+
+
+def compteurs_en_cache(entreprise_id):
+    """Compteurs en cache, ou None si l'un d'eux manque."""
+    cles = _cles(entreprise_id)
+    valeurs = cache.get_many(list(cles.values()))
+    if len(valeurs) != len(cles):
+        return None
+    return {compteur: valeurs[cle] for compteur, cle in cles.items()}
+
+
+def get_stats_produits(entreprise_id):
+    """Statistiques de stock d'une entreprise, servies depuis le cache."""
+    compteurs = compteurs_en_cache(entreprise_id)
+    if compteurs is None:
+        return recalculer_stats_produits(entreprise_id)
+    return stats_depuis_compteurs(compteurs)
+
+
+def invalider_stats_produits(entreprise_id):
+    if entreprise_id:
+        cache.delete_many(list(_cles(entreprise_id).values()))
+
+
+def deltas_stats(avant, apres):
+    """
+    Variation des compteurs entre deux états d'un produit.
+
+    Args:
+        avant, apres: ``(quantite, prix_vente)`` ou None (produit absent)
+    """
+    deltas = dict.fromkeys(COMPTEURS, 0)
+    for etat, signe in ((avant, -1), (apres, 1)):
+        if etat is None:
+            continue
+        quantite, prix = etat
+        deltas['total_produits'] += signe
+        deltas['total_unites'] += signe * quantite
+        deltas['valeur_stock_centimes'] += signe * _centimes(quantite, prix)
+        compteur = tranche(quantite)
+        if compteur:
+            deltas[compteur] += signe
+    return {compteur: delta for compteur, delta in deltas.items() if delta}
+
+
+def _appliquer_deltas(entreprise_id, deltas):
+    cles = _cles(entreprise_id)
+    try:
+        for compteur, delta in deltas.items():
+            cache.incr(cles[compteur], delta)
+    except ValueError:
+        # Compteur absent ou expiré : les autres ne sont plus cohérents, recalcul à la lecture
+        invalider_stats_produits(entreprise_id)
+
+
+def ajuster_stats_produits(entreprise_id, avant, apres):
+    """
+    Ajuste les compteurs après l'écriture d'un produit, une fois la transaction validée
+    (une vente annulée par rollback ne doit pas les modifier).
+    """
+    if not entreprise_id:
+        return
+    deltas = deltas_stats(avant, apres)
+    if deltas:
+        transaction.on_commit(lambda: _appliquer_deltas(entreprise_id, deltas))
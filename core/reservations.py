@@ -0,0 +1,168 @@
+# core/reservations.py
+"""
+Réservations de stock des paniers en cours (endpoint ``reservations-stock/``).
+
+Une caisse réserve chaque ligne au moment où elle l'ajoute à son panier
+(identifiant libre, ex. UUID généré par la caisse) :
+
+- ``reserver_lignes`` fixe la quantité réservée par le panier sur chaque
+  stock en une transaction courte : un UPDATE conditionnel de
+  ``Stock.quantite_reservee`` (core.stock_mutations) et l'écriture de la
+  ``ReservationStock`` ; toutes les lignes du panier sont prolongées ;
+- ``liberer`` rend les quantités d'un panier abandonné ;
+- ``expirer`` rend celles des réservations dont la durée
+  (``RESERVATION_DUREE_MINUTES``) est dépassée, appelée par la commande
+  ``expirer_reservations`` ;
+- ``prendre`` retire les réservations d'un panier au passage en caisse
+  (``create_with_stock``) : la vente les convertit dans le même UPDATE que le
+  décompte du stock, sans contrôle ni verrou supplémentaires.
+
+Une réservation n'est rendue qu'une fois : la suppression de sa ligne fait
+office de prise (« claim ») entre la caisse, la libération et l'expiration.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import ReservationStock, Stock
+from .stock_mutations import reserver
+
+TAILLE_LOT = 200
+
+
+def duree_reservation():
+    return timedelta(minutes=getattr(settings, 'RESERVATION_DUREE_MINUTES', 15))
+
+
+def reserver_lignes(panier, lignes, utilisateur=None, entreprise_id=None):
+    """
+    Fixe la quantité réservée par ``panier`` sur chaque stock (0 : ligne retirée
+    du panier) et prolonge toutes les réservations du panier.
+
+    Args:
+        lignes: [(stock, quantite)]
+
+    Raises:
+        StockInsuffisant si un stock ne couvre pas l'augmentation demandée
+        (aucune ligne n'est alors modifiée).
+    """
+    for tentative in range(2):
+        try:
+            with transaction.atomic():
+                return _reserver_lignes(panier, lignes, utilisateur, entreprise_id)
+        except IntegrityError:
+            # Même ligne créée en parallèle par une autre requête du panier : on relit
+            if tentative:
+                raise
+
+
+def _du_panier(panier, entreprise_id=None):
+    """
+    Réservations du panier. L'identifiant est fourni par la caisse : restreint
+    à l'entreprise, un panier d'un autre tenant au même identifiant n'est ni lu
+    ni prolongé.
+    """
+    reservations = ReservationStock.objects.filter(panier=panier)
+    if entreprise_id:
+        reservations = reservations.filter(stock__entrepot__entreprise_id=entreprise_id)
+    return reservations
+
+
+def _reserver_lignes(panier, lignes, utilisateur, entreprise_id):
+    expire_le = timezone.now() + duree_reservation()
+    quantites = {stock.pk: quantite for stock, quantite in lignes}
+    stocks = {stock.pk: stock for stock, _ in lignes}
+    # Lignes propres au panier (une seule caisse) : verrou sans contention
+    existantes = {
+        reservation.stock_id: reservation
+        for reservation in ReservationStock.objects.select_for_update().filter(
+            panier=panier, stock_id__in=list(quantites)
+        )
+    }
+    # Ordre des stocks fixe : pas d'interblocage entre deux paniers
+    for stock_id in sorted(quantites):
+        reservation = existantes.get(stock_id)
+        quantite = quantites[stock_id]
+        delta = quantite - (reservation.quantite if reservation else 0)
+        if delta:
+            reserver(stocks[stock_id], delta, entreprise_id)
+        if reservation and not quantite:
+            reservation.delete()
+        elif reservation:
+            reservation.quantite = quantite
+            reservation.save(update_fields=['quantite', 'updated_at'])
+        elif quantite:
+            ReservationStock.objects.create(
+                stock_id=stock_id, panier=panier, quantite=quantite,
+                expire_le=expire_le, created_by=utilisateur,
+            )
+    _du_panier(panier, entreprise_id).update(expire_le=expire_le)
+    return list(_du_panier(panier, entreprise_id).select_related('stock'))
+
+
+def _rendre(reservations, entreprise_id=None, **conditions):
+    """
+    Supprime les réservations encore valides (mêmes quantités, ``conditions``)
+    et rend leurs quantités aux stocks. Returns: nombre de réservations rendues
+    """
+    rendues = 0
+    par_stock = defaultdict(int)
+    with transaction.atomic():
+        for reservation_id, stock_id, quantite in reservations:
+            supprimees, _ = ReservationStock.objects.filter(
+                pk=reservation_id, quantite=quantite, **conditions
+            ).delete()
+            if supprimees:
+                rendues += 1
+                par_stock[stock_id] += quantite
+        for stock in Stock.objects.filter(pk__in=list(par_stock)).order_by('pk'):
+            reserver(stock, -par_stock[stock.pk], entreprise_id)
+    return rendues
+
+
+def liberer(panier, stock_ids=None, entreprise_id=None):
+    """Rend les quantités réservées par le panier (toutes ou celles de ``stock_ids``)."""
+    reservations = _du_panier(panier, entreprise_id)
+    if stock_ids is not None:
+        reservations = reservations.filter(stock_id__in=stock_ids)
+    return _rendre(list(reservations.values_list('id', 'stock_id', 'quantite')), entreprise_id)
+
+
+def expirer(maintenant=None, taille_lot=TAILLE_LOT):
+    """Rend les quantités des réservations expirées, par lots. Returns: nombre de réservations rendues."""
+    maintenant = maintenant or timezone.now()
+    total = 0
+    while True:
+        lot = list(
+            ReservationStock.objects.filter(expire_le__lte=maintenant)
+            .order_by('expire_le')
+            .values_list('id', 'stock_id', 'quantite')[:taille_lot]
+        )
+        if not lot:
+            return total
+        # Une réservation prolongée entre-temps n'est plus expirée : elle est conservée
+        total += _rendre(lot, expire_le__lte=maintenant)
+        if len(lot) < taille_lot:
+            return total
+
+
+def prendre(panier, entrepot_id):
+    """
+    Retire les réservations du panier sur l'entrepôt, dans la transaction de la
+    vente : les quantités sont converties par ``ajouter(..., reservee=)``, ou
+    rendues si la ligne n'est pas vendue.
+
+    Returns:
+        {stock_id: quantité réservée}
+    """
+    reservations = list(
+        ReservationStock.objects.select_for_update()
+        .filter(panier=panier, stock__entrepot_id=entrepot_id)
+        .values_list('id', 'stock_id', 'quantite')
+    )
+    if reservations:
+        ReservationStock.objects.filter(id__in=[r[0] for r in reservations]).delete()
+    return {stock_id: quantite for _, stock_id, quantite in reservations}
@@ -2,16 +2,28 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from .models import *
+from .sparse_fields import SparseFieldsMixin
+from .categories import charger_sous_arbres
+from .images import url_derivee
 
 User = get_user_model()
 
 class EntrepriseSerializer(serializers.ModelSerializer):
     """Sérialiseur pour le modèle Entreprise"""
+    logo_thumb = serializers.SerializerMethodField()
+    logo_medium = serializers.SerializerMethodField()
+
     class Meta:
         model = Entreprise
         fields = '__all__'
         read_only_fields = ('id_entreprise', 'created_at', 'updated_at')
     
+    def get_logo_thumb(self, obj):
+        return url_derivee(obj.logo, obj.logo_derivees, 'thumb', request=self.context.get('request'))
+    
+    def get_logo_medium(self, obj):
+        return url_derivee(obj.logo, obj.logo_derivees, 'medium', request=self.context.get('request'))
+    
     def validate_annee_creation(self, value):
         """Valider l'année de création"""
         from datetime import datetime
@@ -178,7 +190,8 @@ class UserSerializer(serializers.ModelSerializer):
                 'id': obj.entreprise.id,
                 'nom': obj.entreprise.nom,
                 'id_entreprise': obj.entreprise.id_entreprise,
-                'logo': obj.entreprise.logo.url if obj.entreprise.logo else None
+                'logo': obj.entreprise.logo.url if obj.entreprise.logo else None,
+                'logo_thumb': url_derivee(obj.entreprise.logo, obj.entreprise.logo_derivees, 'thumb'),
             }
         return None
     
@@ -282,6 +295,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
                 'telephone': user.entreprise.telephone,
                 'adresse': user.entreprise.adresse,
                 'logo': user.entreprise.logo.url if user.entreprise.logo else None,
+                'logo_thumb': url_derivee(user.entreprise.logo, user.entreprise.logo_derivees, 'thumb'),
                 'pack_type': user.entreprise.pack_type,
                 'nombre_employes': user.entreprise.nombre_employes,
                 'annee_creation': user.entreprise.annee_creation,
@@ -338,21 +352,38 @@ class UserCreateSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
+class CategorieListSerializer(serializers.ListSerializer):
+    """Liste de catégories : les sous-arbres de toute la page sont chargés en une requête."""
+    def to_representation(self, data):
+        categories = list(data.all() if hasattr(data, 'all') else data)
+        self.child._sous_arbres = charger_sous_arbres(categories)
+        return super().to_representation(categories)
+
 class CategorieSerializer(serializers.ModelSerializer):
     sous_categories = serializers.SerializerMethodField()
     
     class Meta:
         model = Categorie
         fields = '__all__'
+        list_serializer_class = CategorieListSerializer
         extra_kwargs = {
             'entreprise': {'required': False, 'allow_null': True},
             'nom': {'required': True}
         }
     
     def get_sous_categories(self, obj):
-        if obj.sous_categories.exists():
-            return CategorieSerializer(obj.sous_categories.all(), many=True).data
-        return []
+        # Descendants chargés une fois (chemin matérialisé) puis sérialisés sans autre requête
+        if getattr(self, '_sous_arbres', None) is None:
+            self._sous_arbres = charger_sous_arbres([obj])
+        return [self.to_representation(enfant) for enfant in self._sous_arbres.get(obj.pk, [])]
+    
+    def validate_parent(self, value):
+        """Interdire de ranger une catégorie sous elle-même ou l'une de ses sous-catégories"""
+        if value and self.instance and self.instance.chemin and value.chemin.startswith(self.instance.chemin):
+            raise serializers.ValidationError(
+                "Une catégorie ne peut pas être rangée sous elle-même ou l'une de ses sous-catégories."
+            )
+        return value
     
     def validate_nom(self, value):
         """Valider l'unicité du nom par entreprise"""
@@ -404,12 +435,15 @@ class FournisseurSerializer(serializers.ModelSerializer):
             validated_data['entreprise'] = instance.entreprise
         return super().update(instance, validated_data)
 
-class ProduitVarianteSerializer(serializers.ModelSerializer):
+class ProduitVarianteSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     marge = serializers.ReadOnlyField()
     produit_nom = serializers.CharField(source='produit.nom', read_only=True)
     stock_total = serializers.SerializerMethodField()
 
     def get_stock_total(self, obj):
+        # Stocks préchargés (liste des produits) : pas de requête par variante
+        if 'stocks' in getattr(obj, '_prefetched_objects_cache', {}):
+            return sum(stock.quantite for stock in obj.stocks.all())
         from django.db.models import Sum
         result = obj.stocks.aggregate(total=Sum('quantite'))
         return result['total'] or 0
@@ -430,7 +464,7 @@ class ProduitVarianteSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'marge']
 
-class StockSerializer(serializers.ModelSerializer):
+class StockSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     entrepot_nom = serializers.CharField(source='entrepot.nom', read_only=True)
     quantite_disponible = serializers.ReadOnlyField()
     variante_nom = serializers.CharField(source='variante.nom', read_only=True, allow_null=True)
@@ -441,8 +475,11 @@ class StockSerializer(serializers.ModelSerializer):
     class Meta:
         model = Stock
         fields = '__all__'
+        field_profiles = {
+            'lite': ['id', 'produit', 'variante', 'entrepot', 'quantite', 'quantite_disponible'],
+        }
 
-class MouvementStockSerializer(serializers.ModelSerializer):
+class MouvementStockSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     produit_nom = serializers.CharField(source='produit.nom', read_only=True)
     entrepot_nom = serializers.CharField(source='entrepot.nom', read_only=True)
     variante_nom = serializers.CharField(source='variante.nom', read_only=True, allow_null=True)
@@ -455,8 +492,12 @@ class MouvementStockSerializer(serializers.ModelSerializer):
     class Meta:
         model = MouvementStock
         fields = '__all__'
+        field_profiles = {
+            'lite': ['id', 'produit', 'produit_nom', 'variante', 'entrepot', 'type_mouvement',
+                     'quantite', 'quantite_apres', 'created_at'],
+        }
 
-class ProduitSerializer(serializers.ModelSerializer):
+class ProduitSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer optimisé pour les produits"""
     
     # Relations
@@ -476,12 +517,35 @@ class ProduitSerializer(serializers.ModelSerializer):
     variantes = ProduitVarianteSerializer(many=True, read_only=True)
     nb_variantes = serializers.SerializerMethodField()
 
+    # Miniatures (core.images) : l'original tant qu'elles ne sont pas générées
+    image_thumb = serializers.SerializerMethodField()
+    image_medium = serializers.SerializerMethodField()
+
+    def get_image_thumb(self, obj):
+        return url_derivee(obj.image, obj.image_derivees, 'thumb', request=self.context.get('request'))
+
+    def get_image_medium(self, obj):
+        return url_derivee(obj.image, obj.image_derivees, 'medium', request=self.context.get('request'))
+
     def get_nb_variantes(self, obj):
+        # Annotation du ViewSet, ou variantes déjà préchargées : pas de requête par produit
+        if hasattr(obj, 'nb_variantes_actives'):
+            return obj.nb_variantes_actives
+        if 'variantes' in getattr(obj, '_prefetched_objects_cache', {}):
+            return sum(1 for variante in obj.variantes.all() if variante.actif)
         return obj.variantes.filter(actif=True).count()
 
     class Meta:
         model = Produit
         fields = '__all__'
+        # Relations imbriquées omises en représentation allégée, sauf ?expand=
+        expandable_fields = ('stocks', 'variantes')
+        field_profiles = {
+            # Grille de caisse : nom, SKU, prix et quantité
+            'lite': ['id', 'nom', 'sku', 'code_barres', 'reference', 'prix_vente', 'prix_gros',
+                     'quantite', 'stock_minimum', 'stock_low', 'unite_mesure', 'actif',
+                     'categorie', 'categorie_nom', 'image', 'image_thumb', 'nb_variantes'],
+        }
         extra_kwargs = {
             'sku': {'required': False},
             'code_barres': {'required': False},
@@ -606,7 +670,7 @@ class SequenceFactureSerializer(serializers.ModelSerializer):
                  'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
-class ClientSerializer(serializers.ModelSerializer):
+class ClientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer pour le modèle Client"""
     nom_complet = serializers.SerializerMethodField()
     
@@ -615,6 +679,9 @@ class ClientSerializer(serializers.ModelSerializer):
         fields = ['id', 'nom', 'prenom', 'nom_complet', 'telephone', 'email', 'adresse', 
                  'ville', 'entreprise', 'boutique', 'date_creation', 'date_modification', 'actif']
         read_only_fields = ['id', 'date_creation', 'date_modification']
+        field_profiles = {
+            'lite': ['id', 'nom', 'prenom', 'nom_complet', 'telephone'],
+        }
     
     def get_nom_complet(self, obj):
         return f"{obj.prenom} {obj.nom}".strip()
@@ -632,7 +699,7 @@ class ClientSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("Ce numéro de téléphone existe déjà pour cette entreprise")
         return value
 
-class FactureSerializer(serializers.ModelSerializer):
+class FactureSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer pour le modèle Facture"""
     client_nom = serializers.SerializerMethodField()
     partenaire_nom = serializers.SerializerMethodField()
@@ -671,6 +738,10 @@ class FactureSerializer(serializers.ModelSerializer):
                  'client_nom', 'partenaire_nom', 'created_by', 'created_by_username', 'created_by_nom',
                  'entreprise', 'boutique', 'boutique_nom', 'created_at', 'updated_at']
         read_only_fields = ['id', 'numero', 'created_at', 'updated_at']
+        field_profiles = {
+            'lite': ['id', 'numero', 'type', 'total', 'reste', 'status', 'client', 'client_nom',
+                     'partenaire', 'partenaire_nom', 'boutique', 'created_at'],
+        }
         extra_kwargs = {
             'numero': {'required': False},
             # reste est calculé par le backend — ne pas accepter une valeur libre du client
@@ -718,6 +789,10 @@ class FactureTransactionSerializer(serializers.Serializer):
     partenaire = serializers.PrimaryKeyRelatedField(queryset=Partenaire.objects.all(), required=False, allow_null=True)
     boutique = serializers.PrimaryKeyRelatedField(queryset=Boutique.objects.all())
     items = FactureLineItemSerializer(many=True)
+    panier = serializers.CharField(
+        max_length=64, required=False, allow_blank=True, allow_null=True,
+        help_text="Panier dont les réservations de stock sont converties en vente",
+    )
 
     def validate(self, data):
         if data.get('type') == 'client' and not data.get('client'):
@@ -728,7 +803,38 @@ class FactureTransactionSerializer(serializers.Serializer):
             raise serializers.ValidationError("Aucune ligne de facture fournie")
         return data
 
-class CommandeClientSerializer(serializers.ModelSerializer):
+class ReservationStockSerializer(serializers.ModelSerializer):
+    produit = serializers.IntegerField(source='stock.produit_id', read_only=True)
+    variante = serializers.IntegerField(source='stock.variante_id', read_only=True, allow_null=True)
+    entrepot = serializers.IntegerField(source='stock.entrepot_id', read_only=True)
+
+    class Meta:
+        model = ReservationStock
+        fields = ['id', 'panier', 'stock', 'produit', 'variante', 'entrepot', 'quantite', 'expire_le', 'created_at']
+        read_only_fields = fields
+
+class ReservationLigneSerializer(serializers.Serializer):
+    """Ligne de panier à réserver (quantité 0 : ligne retirée du panier)"""
+    produit = serializers.PrimaryKeyRelatedField(queryset=Produit.objects.all())
+    variante = serializers.PrimaryKeyRelatedField(queryset=ProduitVariante.objects.all(), required=False, allow_null=True)
+    quantite = serializers.IntegerField(min_value=0)
+
+class ReservationPanierSerializer(serializers.Serializer):
+    """Payload de réservation des lignes d'un panier"""
+    panier = serializers.CharField(max_length=64)
+    boutique = serializers.PrimaryKeyRelatedField(queryset=Boutique.objects.all())
+    items = ReservationLigneSerializer(many=True)
+
+    def validate(self, data):
+        if not data.get('items'):
+            raise serializers.ValidationError("Aucune ligne de panier fournie")
+        for item in data['items']:
+            variante = item.get('variante')
+            if variante and variante.produit_id != item['produit'].id:
+                raise serializers.ValidationError(f"La variante {variante.id} n'appartient pas au produit {item['produit'].id}")
+        return data
+
+class CommandeClientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer pour le modèle CommandeClient"""
     total = serializers.ReadOnlyField()
     produit_nom = serializers.SerializerMethodField()
@@ -874,7 +980,7 @@ class CommandePartenaireSerializer(serializers.ModelSerializer):
         commande = CommandePartenaire.objects.create(**validated_data)
         return commande
 
-class VersementSerializer(serializers.ModelSerializer):
+class VersementSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
     boutique_nom = serializers.CharField(source='boutique.nom', read_only=True)
     facture_numero = serializers.CharField(source='facture.numero', read_only=True)
@@ -885,6 +991,14 @@ class VersementSerializer(serializers.ModelSerializer):
                  'created_by', 'created_by_username', 'boutique', 'boutique_nom']
         read_only_fields = ['id', 'date_versement']
 
+class VersementLigneSerializer(serializers.Serializer):
+    facture = serializers.IntegerField()
+    montant = serializers.FloatField(min_value=0.01)
+
+class VersementGroupeSerializer(serializers.Serializer):
+    """Payload pour enregistrer plusieurs versements en une transaction (règlement groupé)"""
+    versements = VersementLigneSerializer(many=True, allow_empty=False, max_length=500)
+
 class HistoriqueStockSerializer(serializers.ModelSerializer):
     class Meta:
         model = HistoriqueStock
@@ -909,6 +1023,18 @@ class JournalSerializer(serializers.ModelSerializer):
         return obj.boutique.nom if obj.boutique else None
 
 
+class JournalArchiveSerializer(JournalSerializer):
+    """Même représentation que JournalSerializer, pour les entrées archivées"""
+    archive = serializers.SerializerMethodField()
+
+    class Meta:
+        model = JournalArchive
+        exclude = ('periode', 'archived_at')
+
+    def get_archive(self, obj):
+        return True
+
+
 # ==================== SERIALIZERS D'INVENTAIRE ====================
 
 class InventaireProduitSerializer(serializers.ModelSerializer):
@@ -1,30 +1,216 @@
 """
 Signaux Django pour la logique métier automatique.
 """
-from django.db.models.signals import post_save, post_delete
+import logging
+
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
 from django.db.models import Sum
 
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_init, sender='core.Versement')
+def memoriser_montant_versement(sender, instance, **kwargs):
+    """Montant chargé, pour n'appliquer que la différence en cas de modification."""
+    instance._montant_enregistre = instance.__dict__.get('montant') if instance.pk else 0
+
 
 @receiver([post_save, post_delete], sender='core.Versement')
-def recalculer_reste_facture(sender, instance, **kwargs):
+def appliquer_versement_facture(sender, instance, created=False, **kwargs):
     """
-    Recalcule automatiquement Facture.reste et Facture.status
-    après chaque ajout ou suppression d'un versement.
+    Ajuste Facture.reste et Facture.status de façon incrémentale (core.versements)
+    après chaque ajout, modification ou suppression d'un versement.
     """
-    facture = instance.facture
-    total_verse = facture.versements.aggregate(total=Sum('montant'))['total'] or 0
-    nouveau_reste = max(0, facture.total - total_verse)
-
-    if nouveau_reste <= 0:
-        nouveau_status = 'Payé'
-    elif total_verse > 0:
-        nouveau_status = 'Partiellement payé'
+    from .versements import appliquer_paiements, signaux_suspendus
+    if signaux_suspendus():
+        return
+    if kwargs.get('signal') is post_delete:
+        montant = -(instance._montant_enregistre or 0)
+    elif created or instance._montant_enregistre is None:
+        montant = instance.montant if created else 0
     else:
-        nouveau_status = 'En attente'
+        montant = instance.montant - instance._montant_enregistre
+    instance._montant_enregistre = instance.__dict__.get('montant')
+    appliquer_paiements({instance.facture_id: montant})
+
+
+@receiver([post_save, post_delete], sender='core.EntrepriseSubscription')
+def invalider_plan_entreprise(sender, instance, **kwargs):
+    """
+    Invalide le plan mis en cache (utilisé par le throttling par plan)
+    dès qu'un abonnement change.
+    """
+    from .cache_utils import CacheManager
+    try:
+        CacheManager.invalidate_entreprise_plan(instance.entreprise_id)
+    except Exception:
+        logger.exception("Erreur invalidation cache plan (entreprise %s)", instance.entreprise_id)
+
+
+
+@receiver(post_init, sender='core.Stock')
+def memoriser_quantite_stock(sender, instance, **kwargs):
+    """Quantité chargée, pour calculer la variation à l'enregistrement."""
+    # __dict__ : ne pas déclencher de requête si le champ est différé (only/defer)
+    instance._quantite_enregistree = instance.__dict__.get('quantite') if instance.pk else 0
+
+
+@receiver([post_save, post_delete], sender='core.Stock')
+def synchroniser_quantite_produit(sender, instance, created=False, **kwargs):
+    """
+    Reporte la variation d'un stock sur Produit.quantite (somme des stocks)
+    et ajuste les statistiques de stock de l'entreprise.
+    """
+    from .models import Produit, Stock
+    from .stock_mutations import reporter_variation_produit
+    try:
+        produits = Produit.objects.filter(pk=instance.produit_id)
+        quantite_enregistree = 0 if created else instance._quantite_enregistree
+        if quantite_enregistree is None:
+            # Quantité précédente inconnue (champ différé) : somme complète des stocks
+            avant = produits.values_list('quantite', flat=True).first()
+            if avant is None:
+                return
+            total = Stock.objects.filter(produit_id=instance.produit_id).aggregate(total=Sum('quantite'))['total'] or 0
+            delta = total - avant
+        elif kwargs.get('signal') is post_delete:
+            delta = -quantite_enregistree
+        else:
+            delta = instance.quantite - quantite_enregistree
+        instance._quantite_enregistree = instance.__dict__.get('quantite')
+        if not delta:
+            return
+        reporter_variation_produit(instance.produit_id, delta)
+    except Exception:
+        logger.exception("Erreur synchronisation quantité produit %s", instance.produit_id)
+
 
-    # Mise à jour sans déclencher d'autres signaux (update_fields)
-    type(facture).objects.filter(pk=facture.pk).update(
-        reste=nouveau_reste,
-        status=nouveau_status,
+@receiver(post_delete, sender='core.Produit')
+def invalider_stats_produit_supprime(sender, instance, **kwargs):
+    """Suppression (souvent en cascade) : les statistiques sont recalculées à la lecture suivante."""
+    from django.db import transaction
+    from .produit_stats import invalider_stats_produits
+    entreprise_id = instance.entreprise_id
+    transaction.on_commit(lambda: invalider_stats_produits(entreprise_id))
+
+@receiver(post_save, sender='core.Produit')
+@receiver(post_save, sender='core.Entreprise')
+def planifier_derivees_images(sender, instance, raw=False, **kwargs):
+    """Nouvelle image (produit, logo) : miniatures générées en arrière-plan."""
+    if raw:
+        return
+    from .images import CHAMPS_IMAGES, champ_derivees, derivees_a_jour, planifier_derivees
+    try:
+        for champ in CHAMPS_IMAGES[sender.__name__]:
+            fichier = getattr(instance, champ)
+            if fichier and not derivees_a_jour(fichier, getattr(instance, champ_derivees(champ))):
+                planifier_derivees(instance, champ)
+    except Exception:
+        logger.exception("Erreur planification des dérivées d'image %s %s", sender.__name__, instance.pk)
+
+
+@receiver([post_save, post_delete], sender='core.Stock')
+def signaler_evenement_stock(sender, instance, raw=False, **kwargs):
+    """Niveau de stock modifié : évènement SSE publié après validation (core.evenements)."""
+    if raw:
+        return
+    from .evenements import signaler_stock
+    try:
+        signaler_stock(instance.pk, instance.entrepot_id)
+    except Exception:
+        logger.exception("Erreur signalement évènement stock %s", instance.pk)
+
+
+@receiver(post_save, sender='core.Facture')
+def signaler_evenement_facture(sender, instance, created=False, raw=False, **kwargs):
+    """Nouvelle facture : évènement SSE publié après validation (core.evenements)."""
+    if raw or not created:
+        return
+    from .evenements import signaler_facture
+    try:
+        signaler_facture(instance.pk)
+    except Exception:
+        logger.exception("Erreur signalement évènement facture %s", instance.pk)
+
+
+@receiver(post_delete, sender='core.Categorie')
+@receiver(post_delete, sender='core.Produit')
+@receiver(post_delete, sender='core.ProduitVariante')
+@receiver(post_delete, sender='core.Stock')
+@receiver(post_delete, sender='core.Client')
+def tracer_suppression_sync(sender, instance, **kwargs):
+    """Trace de suppression pour la synchronisation différentielle des caisses (core.sync)."""
+    from .sync import enregistrer_suppression
+    try:
+        enregistrer_suppression(instance)
+    except Exception:
+        logger.exception("Erreur trace de suppression (sync) %s %s", sender.__name__, instance.pk)
+
+
+@receiver(post_delete, sender='core.Produit')
+@receiver(post_delete, sender='core.Entreprise')
+def supprimer_derivees_images(sender, instance, **kwargs):
+    """Les dérivées d'une instance supprimée n'ont plus d'usage (l'original est laissé tel quel)."""
+    from django.db import transaction
+    from .images import CHAMPS_IMAGES, champ_derivees, supprimer_derivees
+    for champ in CHAMPS_IMAGES[sender.__name__]:
+        derivees = getattr(instance, champ_derivees(champ))
+        if derivees:
+            storage = getattr(instance, champ).storage
+            transaction.on_commit(lambda storage=storage, derivees=derivees: supprimer_derivees(storage, derivees))
+
+# Génération d'écriture par entreprise (requêtes conditionnelles ETag / 304,
+# cache des widgets du tableau de bord) :
+# modèle → (ressources invalidées, chemin vers l'entreprise)
+RESSOURCES_CONDITIONNELLES = {
+    'Produit': (('produits', 'stocks'), None),
+    'ProduitVariante': (('produits', 'stocks'), ('Produit', 'produit_id')),
+    'Stock': (('produits', 'stocks'), ('Boutique', 'entrepot_id')),
+    'MouvementStock': (('stocks',), ('Boutique', 'entrepot_id')),
+    'Categorie': (('produits', 'categories'), None),
+    'Fournisseur': (('produits', 'fournisseurs'), None),
+    'Boutique': (('produits', 'stocks', 'factures', 'boutiques'), None),
+    'Client': (('factures', 'clients'), None),
+    'Facture': (('factures',), ('Boutique', 'boutique_id')),
+    'Versement': (('factures',), ('Facture', 'facture_id')),
+    'CommandeClient': (('factures',), ('Facture', 'facture_id')),
+    'CommandePartenaire': (('factures',), ('Facture', 'facture_id')),
+    'EntrepriseSubscription': (('abonnement',), None),
+}
+
+
+def _entreprise_id(instance, chemin):
+    if chemin is None:
+        return getattr(instance, 'entreprise_id', None)
+    from django.apps import apps
+    modele, attribut = chemin
+    pk = getattr(instance, attribut, None)
+    if pk is None:
+        return None
+    # Parent éventuellement déjà supprimé (cascade) : sa propre suppression invalide aussi
+    return (
+        apps.get_model('core', modele).objects
+        .filter(pk=pk)
+        .values_list('boutique__entreprise_id' if modele == 'Facture' else 'entreprise_id', flat=True)
+        .first()
     )
+
+
+def incrementer_generation_ecriture(sender, instance, **kwargs):
+    """Change la génération d'écriture des ressources de l'entreprise concernée."""
+    from .conditional import bump_write_generation
+    try:
+        ressources, chemin = RESSOURCES_CONDITIONNELLES[sender.__name__]
+        bump_write_generation(_entreprise_id(instance, chemin), *ressources)
+    except Exception:
+        logger.exception("Erreur génération d'écriture %s %s", sender.__name__, instance.pk)
+
+
+for _modele in RESSOURCES_CONDITIONNELLES:
+    for _signal in (post_save, post_delete):
+        _signal.connect(
+            incrementer_generation_ecriture,
+            sender=f'core.{_modele}',
+            dispatch_uid=f'generation_ecriture_{_modele}_{id(_signal)}',
+        )
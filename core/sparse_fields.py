@@ -0,0 +1,123 @@
+# core/sparse_fields.py
+"""
+Représentations allégées des serializers (« sparse fieldsets »).
+
+Paramètres de requête (GET uniquement) :
+
+- ``?fields=id,nom,prix_vente`` : seuls ces champs sont renvoyés ;
+- ``?profile=lite`` : jeu de champs nommé, déclaré dans ``Meta.field_profiles`` ;
+- ``?expand=stocks,variantes`` : relations imbriquées (``Meta.expandable_fields``)
+  à inclure.
+
+Sans aucun de ces paramètres, la représentation complète est inchangée. Dès
+qu'un paramètre est présent, les relations imbriquées sont omises sauf si
+elles sont demandées, et ``SparseQuerysetMixin`` retire du queryset les
+``select_related`` / ``prefetch_related`` devenus inutiles.
+"""
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_liste(valeur):
+    """``"a, b,,c"`` → ``{'a', 'b', 'c'}``"""
+    return {part.strip() for part in (valeur or '').split(',') if part.strip()}
+
+
+class SelectionChamps:
+    """Champs demandés pour une requête allégée."""
+
+    def __init__(self, champs, expand, expandables):
+        self.champs = champs  # None = tous les champs non imbriqués
+        self.expand = expand
+        self.expandables = expandables
+
+    def garde(self, nom):
+        if nom in self.expandables:
+            return nom in self.expand or (self.champs is not None and nom in self.champs)
+        return self.champs is None or nom in self.champs
+
+
+def selection_demandee(serializer_class, request):
+    """
+    Sélection de champs demandée par la requête, ou None pour la représentation complète.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    params = getattr(request, 'query_params', request.GET)
+    champs = parse_liste(params.get('fields'))
+    expand = parse_liste(params.get('expand'))
+    profil = params.get('profile')
+    if not (champs or expand or profil):
+        return None
+
+    meta = getattr(serializer_class, 'Meta', None)
+    profils = getattr(meta, 'field_profiles', {})
+    if not champs and profil:
+        if profil not in profils:
+            raise serializers.ValidationError({
+                'profile': f"Profil inconnu: {profil} (disponibles: {', '.join(profils) or 'aucun'})"
+            })
+        champs = set(profils[profil])
+    return SelectionChamps(
+        champs or None,
+        expand,
+        set(getattr(meta, 'expandable_fields', ())),
+    )
+
+
+class SparseFieldsMixin:
+    """
+    Mixin de serializer : applique ``?fields=`` / ``?profile=`` / ``?expand=``
+    au serializer racine (les serializers imbriqués gardent tous leurs champs).
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self._est_racine():
+            return fields
+        selection = selection_demandee(type(self), self.context.get('request'))
+        if selection is None:
+            return fields
+        return {nom: field for nom, field in fields.items() if selection.garde(nom)}
+
+    def _est_racine(self):
+        parent = self.parent
+        if parent is None:
+            return True
+        return isinstance(parent, serializers.ListSerializer) and parent.parent is None
+
+
+class SparseQuerysetMixin:
+    """
+    Mixin de ViewSet : n'applique que les jointures utiles aux champs demandés.
+
+    ``sparse_select_related`` / ``sparse_prefetch_related`` : listes de
+    ``(lookup, champs)``. Le lookup est appliqué en représentation complète,
+    ou si l'un des champs associés est demandé (liste vide = représentation
+    complète uniquement).
+    """
+    sparse_select_related = []
+    sparse_prefetch_related = []
+
+    def get_selection_champs(self):
+        if not hasattr(self, '_selection_champs'):
+            self._selection_champs = selection_demandee(self.get_serializer_class(), self.request)
+        return self._selection_champs
+
+    def champ_demande(self, nom):
+        selection = self.get_selection_champs()
+        return selection is None or selection.garde(nom)
+
+    def _lookups_utiles(self, lookups):
+        if self.get_selection_champs() is None:
+            return [lookup for lookup, _ in lookups]
+        return [lookup for lookup, champs in lookups if any(self.champ_demande(c) for c in champs)]
+
+    def optimiser_queryset(self, queryset):
+        select = self._lookups_utiles(self.sparse_select_related)
+        prefetch = self._lookups_utiles(self.sparse_prefetch_related)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
@@ -0,0 +1,217 @@
+# core/stock_mutations.py
+"""
+Écritures de quantité de stock sans verrou tenu pendant la requête.
+
+Les chemins d'écriture (vente, mouvement, transfert, annulation, inventaire)
+passent par ce module au lieu de ``select_for_update`` + ``save()`` :
+
+- ``ajouter`` applique un delta en un seul ``UPDATE`` conditionnel
+  (``quantite = quantite - n WHERE quantite >= n``) : pas de lecture préalable,
+  pas de mise à jour perdue, et le verrou de ligne n'est pris qu'à l'UPDATE,
+  en fin de transaction, au lieu de l'être dès le début de la requête ;
+- ``fixer`` écrit une quantité calculée à partir des quantités lues
+  (ajustement, inventaire, sortie plafonnée aux quantités réservées) par
+  compare-and-swap (``WHERE quantite = <lue> AND quantite_reservee = <lue>``)
+  et recommence si une autre écriture ou réservation est passée entre-temps ;
+- ``reserver`` fait varier ``quantite_reservee`` (paniers, core.reservations) :
+  un retrait par ``ajouter`` ne peut pas entamer les quantités réservées par
+  d'autres paniers.
+
+Chaque écriture renvoie une ``Variation`` (quantités avant / après) pour le
+mouvement de stock. Un ``UPDATE`` ne déclenche pas les signaux de ``Stock`` :
+leurs effets (``Produit.quantite``, statistiques, génération d'écriture,
+évènement SSE) sont appliqués ici.
+
+Pour éviter les interblocages entre deux ventes de plusieurs produits,
+l'appelant applique ses variations dans l'ordre des identifiants de stock.
+"""
+import logging
+import random
+import time
+from dataclasses import dataclass
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Boutique, Produit, Stock
+
+logger = logging.getLogger(__name__)
+
+MAX_TENTATIVES = 8
+
+
+class StockInsuffisant(Exception):
+    def __init__(self, stock_id, disponible, demande):
+        self.stock_id = stock_id
+        self.disponible = disponible
+        self.demande = demande
+        super().__init__(f"Stock insuffisant (disponible: {disponible}, demandé: {demande})")
+
+
+class ConflitStock(Exception):
+    """Quantité modifiée par d'autres écritures à chaque tentative de ``fixer``."""
+
+
+@dataclass(frozen=True)
+class Variation:
+    stock_id: int
+    produit_id: int
+    variante_id: object
+    entrepot_id: int
+    quantite_avant: int
+    quantite_apres: int
+
+    @property
+    def delta(self):
+        return self.quantite_apres - self.quantite_avant
+
+
+def trouver_stock(produit_id, entrepot_id, variante_id=None, creer=False):
+    """
+    Stock d'un produit (ou d'une variante) dans un entrepôt, lu sans verrou.
+    Avec ``creer``, un stock absent est créé à 0 (création concurrente tolérée).
+    """
+    filtre = dict(produit_id=produit_id, entrepot_id=entrepot_id, variante_id=variante_id)
+    stock = Stock.objects.filter(**filtre).first()
+    if stock is None and creer:
+        try:
+            with transaction.atomic():
+                stock = Stock.objects.create(quantite=0, **filtre)
+        except IntegrityError:
+            # Créé entre-temps par une autre requête (contraintes d'unicité)
+            stock = Stock.objects.filter(**filtre).first()
+    return stock
+
+
+def _lire(stock_id):
+    """(quantite, quantite_reservee) actuelles."""
+    valeurs = Stock.objects.filter(pk=stock_id).values_list('quantite', 'quantite_reservee').first()
+    if valeurs is None:
+        raise Stock.DoesNotExist(f"Stock {stock_id} introuvable")
+    return valeurs
+
+
+def _disponible(stock_id, reservee=0):
+    """Quantité que peut prendre un panier qui a déjà réservé ``reservee`` unités."""
+    quantite, quantite_reservee = _lire(stock_id)
+    return max(0, quantite - quantite_reservee + reservee)
+
+
+def _rafraichir(stock, quantite):
+    # Instance à jour : un save() ultérieur calculera sa variation depuis cette valeur (signaux)
+    stock.quantite = quantite
+    stock._quantite_enregistree = quantite
+
+
+def _variation(stock, avant, apres):
+    return Variation(stock.pk, stock.produit_id, stock.variante_id, stock.entrepot_id, avant, apres)
+
+
+def ajouter(stock, delta, minimum=0, entreprise_id=None, reservee=0):
+    """
+    ``quantite += delta`` en un UPDATE. Un retrait (delta < 0) n'est appliqué
+    que s'il laisse au moins ``minimum`` unités en plus des quantités réservées
+    par les paniers (None : pas de contrôle), sinon ``StockInsuffisant``.
+
+    ``reservee`` : unités réservées par le panier qui effectue le retrait,
+    libérées de ``quantite_reservee`` dans le même UPDATE (core.reservations).
+    """
+    with transaction.atomic():
+        lignes = Stock.objects.filter(pk=stock.pk)
+        if delta < 0 and minimum is not None:
+            lignes = lignes.filter(quantite__gte=F('quantite_reservee') - reservee + minimum - delta)
+        valeurs = {'quantite': F('quantite') + delta, 'updated_at': timezone.now()}
+        if reservee:
+            valeurs['quantite_reservee'] = F('quantite_reservee') - reservee
+        if not lignes.update(**valeurs):
+            raise StockInsuffisant(stock.pk, _disponible(stock.pk, reservee), -delta)
+        # Ligne verrouillée par l'UPDATE jusqu'à la fin de la transaction : lecture exacte
+        apres, stock.quantite_reservee = _lire(stock.pk)
+        variation = _variation(stock, apres - delta, apres)
+        _reporter([variation], entreprise_id)
+    _rafraichir(stock, apres)
+    return variation
+
+
+def reserver(stock, delta, entreprise_id=None):
+    """
+    ``quantite_reservee += delta`` en un UPDATE. Une réservation (delta > 0)
+    n'est appliquée que si la quantité disponible la couvre, sinon ``StockInsuffisant``.
+    """
+    with transaction.atomic():
+        lignes = Stock.objects.filter(pk=stock.pk)
+        if delta > 0:
+            lignes = lignes.filter(quantite__gte=F('quantite_reservee') + delta)
+        if not lignes.update(quantite_reservee=F('quantite_reservee') + delta, updated_at=timezone.now()):
+            raise StockInsuffisant(stock.pk, _disponible(stock.pk), delta)
+        # Quantité physique inchangée : seuls l'évènement et la génération d'écriture sont émis
+        quantite, stock.quantite_reservee = _lire(stock.pk)
+        _reporter([_variation(stock, quantite, quantite)], entreprise_id)
+    _rafraichir(stock, quantite)
+
+
+def fixer(stock, calcul, entreprise_id=None):
+    """
+    ``quantite = calcul(quantite, quantite_reservee)`` par compare-and-swap, avec
+    nouvelles tentatives (attente aléatoire croissante) en cas d'écriture concurrente.
+
+    Une baisse ne peut pas entamer les quantités réservées par les paniers
+    (``StockInsuffisant``) : la réservation lue fait partie de la condition de
+    l'UPDATE, comme pour ``reserver``.
+    """
+    for tentative in range(MAX_TENTATIVES):
+        avant, reservee = _lire(stock.pk)
+        apres = calcul(avant, reservee)
+        if apres < avant and apres < reservee:
+            raise StockInsuffisant(stock.pk, max(0, avant - reservee), avant - apres)
+        with transaction.atomic():
+            if apres == avant or Stock.objects.filter(pk=stock.pk, quantite=avant, quantite_reservee=reservee).update(
+                quantite=apres, updated_at=timezone.now()
+            ):
+                variation = _variation(stock, avant, apres)
+                if variation.delta:
+                    _reporter([variation], entreprise_id)
+                _rafraichir(stock, apres)
+                return variation
+        time.sleep(random.uniform(0, 0.002 * 2 ** tentative))
+    raise ConflitStock(f"Stock {stock.pk} modifié pendant {MAX_TENTATIVES} tentatives")
+
+
+def reporter_variation_produit(produit_id, delta):
+    """Reporte une variation de stock sur ``Produit.quantite`` et les statistiques de l'entreprise."""
+    from .produit_stats import ajuster_stats_produits
+
+    produits = Produit.objects.filter(pk=produit_id)
+    produits.update(quantite=F('quantite') + delta)
+    produit = produits.values('quantite', 'prix_vente', 'entreprise_id').first()
+    if produit:
+        ajuster_stats_produits(
+            produit['entreprise_id'],
+            (produit['quantite'] - delta, produit['prix_vente']),
+            (produit['quantite'], produit['prix_vente']),
+        )
+
+
+def _reporter(variations, entreprise_id=None):
+    """Effets des signaux de Stock, contournés par l'UPDATE."""
+    from .conditional import bump_write_generation
+    from .evenements import signaler_stock
+
+    for variation in variations:
+        if variation.delta:
+            reporter_variation_produit(variation.produit_id, variation.delta)
+        signaler_stock(variation.stock_id, variation.entrepot_id)
+    try:
+        if entreprise_id:
+            entreprises = {entreprise_id}
+        else:
+            entreprises = set(
+                Boutique.objects.filter(id__in={v.entrepot_id for v in variations})
+                .values_list('entreprise_id', flat=True)
+            )
+        for entreprise in entreprises:
+            if entreprise:
+                bump_write_generation(entreprise, 'produits', 'stocks')
+    except Exception:
+        logger.exception("Erreur génération d'écriture (stock)")
@@ -0,0 +1,225 @@
+# core/stock_snapshots.py
+"""
+Stock à une date passée à partir des snapshots de clôture.
+
+Le stock d'un entrepôt à la date D s'obtient à partir du dernier snapshot
+(StockSnapshot) antérieur ou égal à D, complété par le dernier mouvement de
+chaque stock entre ce snapshot et D : ``MouvementStock.quantite_apres`` donne
+directement la quantité après mouvement. Seuls les mouvements de cette fenêtre
+bornée sont lus, jamais tout l'historique.
+"""
+import calendar
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import MouvementStock, Stock, StockSnapshot
+
+KEY_FIELDS = ('entrepot_id', 'produit_id', 'variante_id')
+
+
+def debut_journee(jour):
+    """Datetime aware du début de la journée ``jour`` (fuseau du projet)."""
+    return timezone.make_aware(datetime.combine(jour, time.min))
+
+
+def fin_de_mois(jour):
+    return jour.replace(day=calendar.monthrange(jour.year, jour.month)[1])
+
+
+def dates_de_cloture(debut, fin, granularite, inclure_fin=True):
+    """
+    Dates de clôture entre ``debut`` et ``fin`` inclus (fins de mois si granularité mensuelle).
+    Avec ``inclure_fin``, la date de fin est ajoutée même si ce n'est pas une fin de mois.
+    """
+    dates = []
+    courant = debut if granularite == 'jour' else fin_de_mois(debut)
+    while courant <= fin:
+        dates.append(courant)
+        if granularite == 'jour':
+            courant += timedelta(days=1)
+        else:
+            courant = fin_de_mois(courant + timedelta(days=1))
+    if inclure_fin and granularite == 'mois' and (not dates or dates[-1] != fin):
+        # Dernier point : la date de fin elle-même (mois en cours)
+        dates.append(fin)
+    return dates
+
+
+def _key(row):
+    return tuple(row[field] for field in KEY_FIELDS)
+
+
+def _derniers_mouvements(mouvements):
+    """Quantité après le dernier mouvement de chaque stock du queryset."""
+    derniers_ids = mouvements.values(*KEY_FIELDS).annotate(dernier_id=Max('id')).values('dernier_id')
+    return {
+        _key(row): row['quantite_apres']
+        for row in MouvementStock.objects.filter(id__in=derniers_ids).values(*KEY_FIELDS, 'quantite_apres')
+    }
+
+
+def stock_a_date(jour, entrepot_ids, produit_ids=None):
+    """
+    Quantités de clôture au ``jour`` donné.
+
+    Args:
+        jour: date de clôture (fin de journée)
+        entrepot_ids: entrepôts concernés
+        produit_ids: restreindre à certains produits (optionnel)
+
+    Returns:
+        dict {(entrepot_id, produit_id, variante_id): quantite}
+    """
+    entrepot_ids = list(entrepot_ids)
+    fin = debut_journee(jour + timedelta(days=1))
+    produit_filter = {'produit_id__in': list(produit_ids)} if produit_ids is not None else {}
+
+    # 1. Dernier snapshot de chaque entrepôt
+    snapshot_dates = dict(
+        StockSnapshot.objects
+        .filter(entrepot_id__in=entrepot_ids, date__lte=jour)
+        .values('entrepot_id')
+        .annotate(derniere_date=Max('date'))
+        .values_list('entrepot_id', 'derniere_date')
+    )
+
+    quantites = {}
+    for entrepot_id in entrepot_ids:
+        snapshot_date = snapshot_dates.get(entrepot_id)
+        mouvements = MouvementStock.objects.filter(
+            entrepot_id=entrepot_id, created_at__lt=fin, **produit_filter
+        )
+        if snapshot_date:
+            for row in StockSnapshot.objects.filter(
+                entrepot_id=entrepot_id, date=snapshot_date, **produit_filter
+            ).values(*KEY_FIELDS, 'quantite'):
+                quantites[_key(row)] = row['quantite']
+            # 2. Delta borné : mouvements entre le snapshot et la date demandée
+            mouvements = mouvements.filter(created_at__gte=debut_journee(snapshot_date + timedelta(days=1)))
+        quantites.update(_derniers_mouvements(mouvements))
+
+    # 3. Stocks absents du snapshot et sans mouvement dans la fenêtre :
+    #    quantité avant le premier mouvement postérieur, sinon quantité actuelle
+    restants = {}
+    for row in Stock.objects.filter(
+        entrepot_id__in=entrepot_ids, created_at__lt=fin, **produit_filter
+    ).values(*KEY_FIELDS, 'quantite'):
+        key = _key(row)
+        if key not in quantites:
+            restants[key] = row['quantite']
+    if restants:
+        premiers_ids = (
+            MouvementStock.objects
+            .filter(entrepot_id__in=entrepot_ids, created_at__gte=fin, **produit_filter)
+            .values(*KEY_FIELDS)
+            .annotate(premier_id=Min('id'))
+            .values('premier_id')
+        )
+        for row in MouvementStock.objects.filter(id__in=premiers_ids).values(*KEY_FIELDS, 'quantite_avant'):
+            key = _key(row)
+            if key in restants:
+                restants[key] = row['quantite_avant']
+        quantites.update(restants)
+
+    return quantites
+
+
+def evolution_stock(produit_id, entrepot_ids, debut, fin, granularite='jour'):
+    """
+    Série de quantités totales d'un produit (toutes variantes) aux dates de clôture.
+
+    Part de l'état à ``debut`` puis rejoue uniquement les mouvements de la période.
+    """
+    entrepot_ids = list(entrepot_ids)
+    etat = stock_a_date(debut, entrepot_ids, produit_ids=[produit_id])
+    mouvements = (
+        MouvementStock.objects
+        .filter(
+            entrepot_id__in=entrepot_ids,
+            produit_id=produit_id,
+            created_at__gte=debut_journee(debut + timedelta(days=1)),
+            created_at__lt=debut_journee(fin + timedelta(days=1)),
+        )
+        .order_by('created_at', 'id')
+        .values(*KEY_FIELDS, 'quantite_apres', 'created_at')
+    )
+
+    serie = [{'date': debut.isoformat(), 'quantite': sum(etat.values())}]
+    dates = dates_de_cloture(debut + timedelta(days=1), fin, granularite)
+    index = 0
+    for mouvement in mouvements.iterator():
+        jour = timezone.localtime(mouvement['created_at']).date()
+        while index < len(dates) and dates[index] < jour:
+            serie.append({'date': dates[index].isoformat(), 'quantite': sum(etat.values())})
+            index += 1
+        etat[_key(mouvement)] = mouvement['quantite_apres']
+    while index < len(dates):
+        serie.append({'date': dates[index].isoformat(), 'quantite': sum(etat.values())})
+        index += 1
+    return serie
+
+
+def construire_snapshots(entrepot_ids, granularite='mois', depuis=None, jusqu_a=None):
+    """
+    Construit les snapshots de clôture manquants, de façon incrémentale.
+
+    Sans ``depuis``, reprend après le dernier snapshot existant de la granularité
+    (ou au premier mouvement). Les snapshots d'une date sont remplacés s'ils existent ;
+    ceux des autres granularités sont conservés.
+
+    Returns:
+        dict {date: nombre de lignes créées}
+    """
+    jusqu_a = jusqu_a or (timezone.localdate() - timedelta(days=1))
+    entrepot_ids = list(entrepot_ids)
+    resultat = {}
+    if not entrepot_ids:
+        return resultat
+
+    if depuis is None:
+        derniere = StockSnapshot.objects.filter(
+            entrepot_id__in=entrepot_ids, granularite=granularite
+        ).aggregate(d=Max('date'))['d']
+        if derniere:
+            depuis = derniere + timedelta(days=1)
+        else:
+            premier = MouvementStock.objects.filter(entrepot_id__in=entrepot_ids).aggregate(d=Min('created_at'))['d']
+            if premier is None:
+                return resultat
+            depuis = timezone.localtime(premier).date()
+
+    dates = dates_de_cloture(depuis, jusqu_a, granularite, inclure_fin=False)
+    for jour in dates:
+        quantites = stock_a_date(jour, entrepot_ids)
+        with transaction.atomic():
+            StockSnapshot.objects.filter(
+                entrepot_id__in=entrepot_ids, date=jour, granularite=granularite
+            ).delete()
+            StockSnapshot.objects.bulk_create(
+                [
+                    StockSnapshot(
+                        entrepot_id=entrepot_id,
+                        produit_id=produit_id,
+                        variante_id=variante_id,
+                        date=jour,
+                        granularite=granularite,
+                        quantite=quantite,
+                    )
+                    for (entrepot_id, produit_id, variante_id), quantite in quantites.items()
+                ],
+                batch_size=1000,
+            )
+        resultat[jour] = len(quantites)
+    return resultat
+
+
+def quantites_par_produit(quantites):
+    """Agrège un résultat de stock_a_date par produit."""
+    totaux = defaultdict(int)
+    for (_, produit_id, _), quantite in quantites.items():
+        totaux[produit_id] += quantite or 0
+    return totaux
@@ -0,0 +1,198 @@
+# core/sync.py
+"""
+Synchronisation différentielle pour les caisses hors ligne (endpoint ``sync/``).
+
+Après un premier chargement, une caisse ne demande que les lignes modifiées
+depuis son dernier passage. Pour chaque ressource, le client renvoie le
+*watermark* émis par le serveur à l'appel précédent :
+
+    <horodatage en microsecondes>.<id>.<id de la dernière suppression>
+
+- les lignes sont lues dans l'ordre (date de modification, id), à partir du
+  watermark, via les index ``(entreprise, updated_at)`` ; la paire date + id
+  départage les lignes modifiées dans la même microseconde ;
+- les suppressions sont lues dans ``SuppressionSync`` (alimentée par le signal
+  post_delete) : seuls les identifiants sont renvoyés ;
+- les écritures des ``SYNC_DELAI_STABILITE`` dernières secondes ne sont pas
+  encore livrées : une transaction en cours peut valider une ligne datée avant
+  le watermark émis, elle serait sinon perdue ;
+- la réponse est en colonnes (``champs`` puis ``lignes`` en listes de valeurs)
+  pour ne pas répéter les clés à chaque ligne.
+
+Un watermark plus ancien que la conservation des suppressions
+(``SYNC_RETENTION_SUPPRESSIONS_JOURS``) entraîne un rechargement complet de la
+ressource (``reinitialisation``) : le client vide sa copie locale avant
+d'appliquer les lignes reçues.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Categorie, Client, Produit, ProduitVariante, Stock, SuppressionSync
+
+LIMITE_MAX = 2000
+
+
+class WatermarkInvalide(ValueError):
+    pass
+
+
+@dataclass
+class Ressource:
+    nom: str
+    modele: object
+    champ_date: str
+    champ_entreprise: str
+    champs: tuple
+    champ_entrepot: str = None
+
+
+RESSOURCES = {
+    ressource.nom: ressource for ressource in (
+        Ressource(
+            'categories', Categorie, 'updated_at', 'entreprise_id',
+            ('id', 'nom', 'parent_id', 'chemin', 'actif'),
+        ),
+        Ressource(
+            'produits', Produit, 'updated_at', 'entreprise_id',
+            ('id', 'nom', 'sku', 'code_barres', 'categorie_id', 'prix_vente', 'prix_gros',
+             'unite_mesure', 'actif'),
+        ),
+        Ressource(
+            'variantes', ProduitVariante, 'updated_at', 'produit__entreprise_id',
+            ('id', 'produit_id', 'nom', 'attributs', 'sku', 'code_barres', 'prix_vente', 'prix_gros', 'actif'),
+        ),
+        Ressource(
+            'stocks', Stock, 'updated_at', 'entrepot__entreprise_id',
+            ('id', 'produit_id', 'variante_id', 'entrepot_id', 'quantite', 'quantite_reservee'),
+            champ_entrepot='entrepot_id',
+        ),
+        Ressource(
+            'clients', Client, 'date_modification', 'entreprise_id',
+            ('id', 'nom', 'prenom', 'telephone', 'email', 'ville', 'boutique_id', 'actif'),
+        ),
+    )
+}
+
+# Modèle → (ressource, entreprise de l'instance supprimée)
+ENTREPRISE_INSTANCE = {
+    'Categorie': ('categories', lambda instance: instance.entreprise_id),
+    'Produit': ('produits', lambda instance: instance.entreprise_id),
+    'ProduitVariante': ('variantes', lambda instance: instance.produit.entreprise_id),
+    'Stock': ('stocks', lambda instance: instance.entrepot.entreprise_id),
+    'Client': ('clients', lambda instance: instance.entreprise_id),
+}
+
+
+def _microsecondes(moment):
+    return int(moment.timestamp() * 1_000_000)
+
+
+def encoder_watermark(moment, pk, suppression_id):
+    return f"{_microsecondes(moment) if moment else 0}.{pk or 0}.{suppression_id or 0}"
+
+
+def decoder_watermark(valeur):
+    """'<µs>.<id>.<suppression>' → (datetime ou None, id, id de suppression)."""
+    try:
+        micro, pk, suppression_id = (int(partie) for partie in valeur.split('.'))
+    except (AttributeError, ValueError):
+        raise WatermarkInvalide(f"Watermark invalide: {valeur!r}")
+    if min(micro, pk, suppression_id) < 0:
+        raise WatermarkInvalide(f"Watermark invalide: {valeur!r}")
+    moment = datetime.fromtimestamp(micro / 1_000_000, tz=dt_timezone.utc) if micro else None
+    return moment, pk, suppression_id
+
+
+def enregistrer_suppression(instance):
+    """Trace la suppression d'une instance synchronisée (signal post_delete)."""
+    ressource, entreprise_de = ENTREPRISE_INSTANCE[type(instance).__name__]
+    entreprise_id = entreprise_de(instance)
+    if entreprise_id:
+        SuppressionSync.objects.create(ressource=ressource, objet_id=instance.pk, entreprise_id=entreprise_id)
+
+
+def synchroniser_ressource(ressource, entreprise_id, watermark=None, limite=None, entrepot_id=None, coupure=None):
+    """
+    Lignes modifiées et identifiants supprimés depuis ``watermark`` (chaîne émise
+    par un appel précédent, None pour le premier chargement).
+
+    Returns:
+        {'champs', 'lignes', 'supprimes', 'watermark', 'suite', 'reinitialisation'}
+    """
+    limite = min(limite or getattr(settings, 'SYNC_LIMITE', 500), LIMITE_MAX)
+    coupure = coupure or timezone.now() - timedelta(seconds=getattr(settings, 'SYNC_DELAI_STABILITE', 2))
+    moment, dernier_id, derniere_suppression = decoder_watermark(watermark) if watermark else (None, 0, 0)
+
+    retention = timedelta(days=getattr(settings, 'SYNC_RETENTION_SUPPRESSIONS_JOURS', 30))
+    reinitialisation = moment is not None and moment < coupure - retention
+    if reinitialisation:
+        # Suppressions plus anciennes déjà purgées : la copie locale ne peut plus être corrigée
+        moment, dernier_id, derniere_suppression = None, 0, 0
+    premier_chargement = moment is None
+
+    champ_date = ressource.champ_date
+    lignes = ressource.modele.objects.filter(
+        **{ressource.champ_entreprise: entreprise_id, f'{champ_date}__lte': coupure}
+    )
+    if entrepot_id and ressource.champ_entrepot:
+        lignes = lignes.filter(**{ressource.champ_entrepot: entrepot_id})
+    if not premier_chargement:
+        lignes = lignes.filter(
+            Q(**{f'{champ_date}__gt': moment}) | Q(**{champ_date: moment, 'id__gt': dernier_id})
+        )
+    lignes = list(lignes.order_by(champ_date, 'id').values_list(champ_date, *ressource.champs)[:limite + 1])
+    suite = len(lignes) > limite
+    lignes = lignes[:limite]
+    if lignes:
+        moment, dernier_id = lignes[-1][0], lignes[-1][1]
+
+    suppressions = SuppressionSync.objects.filter(
+        entreprise_id=entreprise_id, ressource=ressource.nom, supprime_le__lte=coupure,
+    )
+    if premier_chargement:
+        # Rien à retirer d'une copie vide : on part de la dernière suppression connue
+        supprimes = []
+        derniere_suppression = suppressions.order_by('-id').values_list('id', flat=True).first() or 0
+    else:
+        traces = list(
+            suppressions.filter(id__gt=derniere_suppression).order_by('id').values_list('id', 'objet_id')[:limite + 1]
+        )
+        suite = suite or len(traces) > limite
+        traces = traces[:limite]
+        supprimes = [objet_id for _, objet_id in traces]
+        if traces:
+            derniere_suppression = traces[-1][0]
+
+    if moment is None:
+        # Ressource encore vide : le prochain appel repart de la coupure
+        moment, dernier_id = coupure, 0
+
+    return {
+        'champs': list(ressource.champs),
+        'lignes': [list(ligne[1:]) for ligne in lignes],
+        'supprimes': supprimes,
+        'watermark': encoder_watermark(moment, dernier_id, derniere_suppression),
+        'suite': suite,
+        'reinitialisation': reinitialisation,
+    }
+
+
+def synchroniser(entreprise_id, watermarks, noms=None, limite=None, entrepot_id=None):
+    """
+    Synchronisation de plusieurs ressources avec une coupure commune.
+
+    Args:
+        watermarks: {ressource: watermark ou None}
+        noms: ressources demandées (défaut: toutes)
+    """
+    coupure = timezone.now() - timedelta(seconds=getattr(settings, 'SYNC_DELAI_STABILITE', 2))
+    return {
+        nom: synchroniser_ressource(
+            RESSOURCES[nom], entreprise_id, watermarks.get(nom), limite, entrepot_id, coupure,
+        )
+        for nom in (noms or RESSOURCES)
+    }
@@ -0,0 +1,105 @@
+# core/telephone.py
+"""
+Numéros de téléphone clients : forme normalisée et recherche par préfixe.
+
+``Client.telephone_normalise`` contient uniquement les chiffres du numéro
+national (``+237 6 99-00 11 22`` → ``699001122``), maintenu à
+l'enregistrement et indexé avec l'entreprise. La recherche par préfixe est
+faite par intervalle (``>= préfixe`` et ``< préfixe suivant``) plutôt que par
+``LIKE 'x%'`` : l'index est utilisé quel que soit le moteur (SQLite compare
+LIKE sans tenir compte de la casse et ne peut pas utiliser un index binaire).
+
+Les résultats sont mis en cache par entreprise ; la clé contient la
+génération d'écriture ``clients``, si bien que toute écriture de client
+invalide les recherches de l'entreprise.
+"""
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .conditional import get_write_generation
+
+INDICATIF_PAYS = '237'
+LONGUEUR_NATIONALE = 9
+
+RECHERCHE_KEY = 'client_tel:{entreprise_id}:{generation}:{empreinte}'
+
+_NON_CHIFFRES = re.compile(r'\D')
+# Saisie qui ressemble à un numéro : chiffres et séparateurs usuels uniquement
+_SAISIE_TELEPHONE = re.compile(r'^[\d\s+().\-/]+$')
+
+
+def normaliser_telephone(valeur):
+    """
+    Chiffres du numéro national : séparateurs et indicatif (+237, 00237) retirés.
+
+    >>> normaliser_telephone('+237 6 99-00 11 22')
+    '699001122'
+    """
+    valeur = (valeur or '').strip()
+    chiffres = _NON_CHIFFRES.sub('', valeur)
+    international = valeur.startswith('+') or chiffres.startswith('00')
+    if chiffres.startswith('00'):
+        chiffres = chiffres[2:]
+    if chiffres.startswith(INDICATIF_PAYS) and (
+        international or len(chiffres) == len(INDICATIF_PAYS) + LONGUEUR_NATIONALE
+    ):
+        chiffres = chiffres[len(INDICATIF_PAYS):]
+    return chiffres
+
+
+def est_saisie_telephone(valeur):
+    return bool(valeur) and bool(_SAISIE_TELEPHONE.match(valeur)) and bool(normaliser_telephone(valeur))
+
+
+def bornes_prefixe(prefixe):
+    """
+    Intervalle ``[debut, fin)`` des chaînes de chiffres commençant par ``prefixe``
+    (``fin`` vaut None si le préfixe n'est composé que de 9).
+
+    >>> bornes_prefixe('6999')
+    ('6999', '7')
+    """
+    reste = prefixe.rstrip('9')
+    if not reste:
+        return prefixe, None
+    return prefixe, reste[:-1] + str(int(reste[-1]) + 1)
+
+
+def filtrer_par_prefixe(queryset, prefixe):
+    debut, fin = bornes_prefixe(prefixe)
+    queryset = queryset.filter(telephone_normalise__gte=debut)
+    if fin is not None:
+        queryset = queryset.filter(telephone_normalise__lt=fin)
+    return queryset
+
+
+def rechercher_clients(queryset, entreprise_id, saisie, serialiser, limite=20, variante=''):
+    """
+    Clients de ``queryset`` dont le téléphone commence par ``saisie``, sérialisés et mis en cache.
+
+    Args:
+        queryset: clients déjà filtrés sur l'entreprise
+        serialiser: fonction liste de clients → données sérialisées
+        variante: distingue les représentations d'une même recherche (ex: ?fields=)
+    """
+    prefixe = normaliser_telephone(saisie)
+    empreinte = hashlib.md5(f"{prefixe}|{limite}|{variante}".encode()).hexdigest()
+    cle = RECHERCHE_KEY.format(
+        entreprise_id=entreprise_id,
+        generation=get_write_generation('clients', entreprise_id),
+        empreinte=empreinte,
+    )
+    resultats = cache.get(cle)
+    if resultats is not None:
+        return resultats
+
+    clients = list(filtrer_par_prefixe(queryset, prefixe).order_by('telephone_normalise')[:limite])
+    if not clients and queryset.filter(telephone_normalise='').exists():
+        # Lignes pas encore normalisées (backfill_telephones non exécuté) : ancienne recherche
+        clients = list(queryset.filter(telephone__icontains=saisie.strip())[:limite])
+    resultats = serialiser(clients)
+    cache.set(cle, resultats, getattr(settings, 'CLIENT_LOOKUP_CACHE_TTL', 300))
+    return resultats
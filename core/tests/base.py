@@ -0,0 +1,82 @@
+"""
+Données et client communs aux tests de l'API.
+
+Chaque test part d'une entreprise (plan pro) avec une boutique, un
+administrateur et un caissier. Les throttles sont désactivés et le cache
+vidé pour que les résultats ne dépendent pas de l'ordre des tests.
+"""
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from core.models import (
+    Boutique, Client, Entreprise, EntrepriseSubscription, Produit, Stock,
+    SubscriptionPlan, User,
+)
+
+
+def creer_entreprise(nom, plan='pro'):
+    entreprise = Entreprise.objects.create(
+        nom=nom,
+        email=f"{nom.lower().replace(' ', '-')}@example.com",
+        secteur_activite="Commerce",
+        adresse="Akwa",
+        ville="Douala",
+        annee_creation=2020,
+    )
+    EntrepriseSubscription.objects.update_or_create(
+        entreprise=entreprise,
+        defaults={'plan': SubscriptionPlan.objects.get(name=plan), 'status': 'active'},
+    )
+    boutique = Boutique.objects.create(entreprise=entreprise, nom=f"Boutique {nom}", ville="Douala")
+    return entreprise, boutique
+
+
+def creer_utilisateur(username, entreprise, boutique, role='admin'):
+    return User.objects.create_user(
+        username=username,
+        password='motdepasse-test',
+        email=f"{username}@example.com",
+        role=role,
+        entreprise=entreprise,
+        boutique=boutique,
+    )
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class APITestCase(TestCase):
+    plan = 'pro'
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_plans', stdout=StringIO())
+        cls.entreprise, cls.boutique = creer_entreprise("Test", cls.plan)
+        cls.admin = creer_utilisateur('admin-test', cls.entreprise, cls.boutique, 'admin')
+        cls.caissier = creer_utilisateur('caissier-test', cls.entreprise, cls.boutique, 'user')
+        cls.client_facture = Client.objects.create(
+            nom="Client", prenom="Test", telephone="690000001",
+            entreprise=cls.entreprise, boutique=cls.boutique,
+        )
+
+    def setUp(self):
+        cache.clear()
+        throttles = mock.patch.object(APIView, 'get_throttles', return_value=[])
+        throttles.start()
+        self.addCleanup(throttles.stop)
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def connecter(self, user):
+        self.api.force_authenticate(user)
+
+    def creer_produit(self, quantite=10, nom='Produit', boutique=None):
+        produit = Produit.objects.create(
+            nom=nom, entreprise=self.entreprise, prix_achat=50, prix_vente=100,
+        )
+        stock = Stock.objects.create(produit=produit, entrepot=boutique or self.boutique, quantite=quantite)
+        return produit, stock
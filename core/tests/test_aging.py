@@ -0,0 +1,29 @@
+from django.urls import reverse
+
+from core.models import Facture
+
+from .base import APITestCase, creer_entreprise
+
+
+class BalanceAgeeTests(APITestCase):
+    url = reverse('facture-aging')
+
+    def setUp(self):
+        super().setUp()
+        Facture.objects.create(
+            type='client', numero='F-AGE-1', total=1000, reste=400, status='Partiellement payé',
+            client=self.client_facture, created_by=self.admin,
+            entreprise=self.entreprise, boutique=self.boutique,
+        )
+
+    def test_boutique(self):
+        response = self.api.get(self.url, {'boutique': self.boutique.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['snapshot'])
+
+    def test_boutique_non_numerique(self):
+        self.assertEqual(self.api.get(self.url, {'boutique': 'abc'}).status_code, 404)
+
+    def test_boutique_d_une_autre_entreprise(self):
+        _, autre_boutique = creer_entreprise('Autre')
+        self.assertEqual(self.api.get(self.url, {'boutique': autre_boutique.id}).status_code, 404)
@@ -0,0 +1,51 @@
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from core.cache_backends import TwoTierCache
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-l2'},
+}
+
+
+@override_settings(CACHES=CACHES)
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        # Deux workers partageant le même L2
+        self.worker_a = self.creer_worker()
+        self.worker_b = self.creer_worker()
+
+    def creer_worker(self):
+        return TwoTierCache('', {
+            'TIMEOUT': 300,
+            'OPTIONS': {'SHARED_ALIAS': 'shared', 'L1_PREFIXES': ['user_'], 'SYNC_INTERVAL': 0},
+        })
+
+    def test_ecriture_ne_vide_pas_le_l1_des_autres_workers(self):
+        self.worker_a.set('user_1', 'a')
+        self.assertEqual(self.worker_b.get('user_1'), 'a')
+        generation = self.worker_b.get_generation('l1:user_')
+
+        self.worker_a.set('user_2', 'b')
+
+        self.assertEqual(self.worker_b.get_generation('l1:user_'), generation)
+        # L'entrée L1 reste servie sans relire le L2
+        caches['shared'].clear()
+        self.assertEqual(self.worker_b.get('user_1'), 'a')
+
+    def test_suppression_invalide_le_l1_des_autres_workers(self):
+        self.worker_a.set('user_1', 'a')
+        self.assertEqual(self.worker_b.get('user_1'), 'a')
+
+        self.worker_a.delete('user_1')
+        self.assertIsNone(self.worker_b.get('user_1'))
+
+        self.worker_a.set('user_1', 'c')
+        self.assertEqual(self.worker_b.get('user_1'), 'c')
+
+    def test_delete_pattern(self):
+        self.worker_a.set('produits:1', 'a')
+        self.worker_b.delete_pattern('produits:*')
+        self.assertIsNone(self.worker_a.get('produits:1'))
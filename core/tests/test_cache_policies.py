@@ -0,0 +1,48 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import viewsets
+
+from core.cache_utils import CachePolicyMixin, cache_api_response
+
+from .base import APITestCase
+
+
+class CachePolicyDeclarationTests(SimpleTestCase):
+    def test_politique_sans_dimension_requise_refusee(self):
+        with self.assertRaises(ImproperlyConfigured):
+            cache_api_response(vary_on=('tenant', 'params'), depends_on=('tenant', 'boutique'))
+
+    def test_dimension_inconnue_refusee(self):
+        with self.assertRaises(ImproperlyConfigured):
+            cache_api_response(vary_on=('tenant', 'entreprise'))
+
+    def test_viewset_sans_dependances_declarees_refuse_vary_on_restreint(self):
+        with self.assertRaises(ImproperlyConfigured):
+            class ListeViewSet(CachePolicyMixin, viewsets.ViewSet):
+                cache_prefix = 'liste'
+                cache_policy = {'list': {'vary_on': ('tenant', 'params')}}
+
+                def list(self, request):
+                    pass
+
+    def test_viewset_avec_dependances_declarees(self):
+        class ListeViewSet(CachePolicyMixin, viewsets.ViewSet):
+            cache_prefix = 'liste'
+            cache_depends_on = ('tenant',)
+            cache_policy = {'list': {'vary_on': ('tenant', 'params')}}
+
+            def list(self, request):
+                pass
+
+        self.assertEqual(ListeViewSet.list._politique_cache, ('liste', 'list'))
+
+
+class CachePolicyRequestTests(APITestCase):
+    def test_liste_des_boutiques_varie_selon_le_role(self):
+        url = reverse('boutique-list')
+        self.assertEqual(self.api.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.api.get(url)['X-Cache'], 'HIT')
+
+        self.connecter(self.caissier)
+        self.assertEqual(self.api.get(url)['X-Cache'], 'MISS')
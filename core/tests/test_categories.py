@@ -0,0 +1,54 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from core.categories import reconstruire_chemins
+from core.models import Categorie, Entreprise, Produit
+
+from .base import APITestCase
+
+
+class CheminsCategoriesTests(APITestCase):
+    def test_chemin_maintenu_par_save(self):
+        racine = Categorie.objects.create(nom="Racine", entreprise=self.entreprise)
+        enfant = Categorie.objects.create(nom="Enfant", entreprise=self.entreprise, parent=racine)
+        self.assertEqual(enfant.chemin, f"/{racine.id}/{enfant.id}/")
+        self.assertEqual(enfant.profondeur, 1)
+
+    def test_reconstruction_apres_bulk_create(self):
+        racine = Categorie.objects.create(nom="Racine", entreprise=self.entreprise)
+        Categorie.objects.bulk_create([
+            Categorie(nom="Boissons", entreprise=self.entreprise, parent=racine),
+            Categorie(nom="Textile", entreprise=self.entreprise),
+        ])
+        boissons = Categorie.objects.get(nom="Boissons")
+        self.assertEqual(boissons.chemin, '')
+
+        self.assertEqual(reconstruire_chemins(self.entreprise.id), 2)
+        boissons.refresh_from_db()
+        self.assertEqual(boissons.chemin, f"/{racine.id}/{boissons.id}/")
+        self.assertEqual(boissons.profondeur, 1)
+        self.assertEqual(reconstruire_chemins(self.entreprise.id), 0)
+
+    def test_filtre_sous_arbre_apres_bulk_create(self):
+        racine = Categorie.objects.create(nom="Racine", entreprise=self.entreprise)
+        Categorie.objects.bulk_create([Categorie(nom="Boissons", entreprise=self.entreprise, parent=racine)])
+        reconstruire_chemins(self.entreprise.id)
+        produit = Produit.objects.create(
+            nom="Jus", entreprise=self.entreprise, categorie=Categorie.objects.get(nom="Boissons"),
+            prix_achat=50, prix_vente=100,
+        )
+        response = self.api.get(reverse('produit-list'), {'categorie_subtree': racine.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['id'] for p in response.data['results']], [produit.id])
+
+    def test_categories_du_jeu_de_donnees(self):
+        call_command(
+            'generate_dataset', entreprises=1, boutiques=1, produits=5, clients=2,
+            jours=1, ventes_par_jour=1, seed=3, stdout=StringIO(),
+        )
+        entreprise = Entreprise.objects.get(email='dataset-3-0@example.com')
+        categories = Categorie.objects.filter(entreprise=entreprise)
+        self.assertTrue(categories.exists())
+        self.assertFalse(categories.filter(chemin='').exists())
@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Produit
+
+from .base import APITestCase
+
+
+class ConditionalGetTests(APITestCase):
+    url = reverse('produit-list')
+
+    def setUp(self):
+        super().setUp()
+        self.produit, self.stock = self.creer_produit()
+
+    def revalider(self, etag):
+        return self.api.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_304_sans_ecriture(self):
+        etag = self.api.get(self.url)['ETag']
+        response = self.revalider(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_200_apres_ecriture_par_signal(self):
+        etag = self.api.get(self.url)['ETag']
+        self.produit.prix_vente = 150
+        self.produit.save()
+        response = self.revalider(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_200_apres_ecriture_par_api(self):
+        etag = self.api.get(self.url)['ETag']
+        response = self.api.patch(reverse('produit-detail', args=[self.produit.id]), {'prix_vente': 180}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.revalider(etag).status_code, 200)
+
+    @override_settings(CONDITIONAL_VALIDATOR_TTL=0)
+    def test_200_apres_update_sans_signal(self):
+        # QuerySet.update() ne déclenche pas les signaux : seul max(updated_at) change
+        etag = self.api.get(self.url)['ETag']
+        Produit.objects.filter(pk=self.produit.pk).update(
+            prix_vente=200, updated_at=timezone.now() + timedelta(seconds=5)
+        )
+        response = self.revalider(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
@@ -0,0 +1,45 @@
+from dataclasses import replace
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+
+from core.dashboard import WIDGETS
+
+from .base import APITestCase
+
+
+@override_settings(DASHBOARD_MAX_WORKERS=1)
+class DashboardSummaryPermissionsTests(APITestCase):
+    url = reverse('dashboard_summary')
+
+    def test_admin_lit_le_tableau_de_bord(self):
+        response = self.api.get(self.url, {'widgets': 'ventes,stats_produits'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['widgets']), {'ventes', 'stats_produits'})
+        self.assertNotIn('erreur', response.data['meta']['ventes'])
+
+    def test_caissier_refuse(self):
+        # Chiffre d'affaires et valorisation du stock : mêmes droits que factures/analytics
+        self.connecter(self.caissier)
+        self.assertEqual(self.api.get(self.url).status_code, 403)
+        self.assertEqual(self.api.get(reverse('facture-analytics')).status_code, 403)
+
+    def test_anonyme_refuse(self):
+        self.api.force_authenticate(None)
+        self.assertIn(self.api.get(self.url).status_code, (401, 403))
+
+    def test_widget_en_erreur_sans_detail_interne(self):
+        def echec(ctx):
+            raise RuntimeError('no such column: core_facture.secret')
+
+        widgets = dict(WIDGETS, ventes=replace(WIDGETS['ventes'], fonction=echec))
+        with mock.patch.dict('core.dashboard.WIDGETS', widgets), self.assertLogs('core.dashboard', 'ERROR') as logs:
+            response = self.api.get(self.url, {'widgets': 'ventes,stats_produits'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['widgets']['ventes'])
+        self.assertEqual(response.data['meta']['ventes']['erreur'], 'indisponible')
+        self.assertNotIn('secret', str(response.data))
+        self.assertIn('core_facture.secret', logs.output[0])
+        self.assertIsNotNone(response.data['widgets']['stats_produits'])
@@ -0,0 +1,40 @@
+from django.urls import reverse
+
+from core.models import Facture, Versement
+
+from .base import APITestCase, creer_entreprise, creer_utilisateur
+
+
+class FactureDocumentPermissionsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.facture = Facture.objects.create(
+            type='client', numero='F-DOC-1', total=1000, reste=1000,
+            client=self.client_facture, created_by=self.admin,
+            entreprise=self.entreprise, boutique=self.boutique,
+        )
+        Versement.objects.create(facture=self.facture, montant=400, created_by=self.admin)
+        self.url = reverse('facture-document', args=[self.facture.id])
+
+    def test_admin_et_caissier_lisent_le_document(self):
+        response = self.api.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['facture']['numero'], 'F-DOC-1')
+        self.assertEqual(len(response.data['versements']), 1)
+        # Mêmes droits que le détail de la facture
+        self.connecter(self.caissier)
+        self.assertEqual(self.api.get(self.url).status_code, 200)
+        self.assertEqual(self.api.get(reverse('facture-detail', args=[self.facture.id])).status_code, 200)
+
+    def test_autre_entreprise_refusee_meme_document_en_cache(self):
+        self.assertEqual(self.api.get(self.url).status_code, 200)
+        autre_entreprise, autre_boutique = creer_entreprise('Autre')
+        self.connecter(creer_utilisateur('admin-autre', autre_entreprise, autre_boutique, 'admin'))
+        self.assertEqual(self.api.get(self.url).status_code, 404)
+
+    def test_anonyme_refuse(self):
+        self.api.force_authenticate(None)
+        self.assertIn(self.api.get(self.url).status_code, (401, 403))
+
+    def test_identifiant_invalide(self):
+        self.assertEqual(self.api.get(reverse('facture-document', args=['abc'])).status_code, 404)
@@ -0,0 +1,35 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from core.models import CommandeClient, Entreprise, Facture, Produit, Stock
+
+
+class GenerateDatasetTests(TestCase):
+    def generer(self):
+        call_command(
+            'generate_dataset', entreprises=1, boutiques=2, produits=20, clients=5,
+            jours=3, ventes_par_jour=4, seed=7, stdout=StringIO(),
+        )
+        return Entreprise.objects.get(email='dataset-7-0@example.com')
+
+    def verifier(self, entreprise):
+        self.assertEqual(entreprise.boutiques.count(), 2)
+        self.assertEqual(Produit.objects.filter(entreprise=entreprise).count(), 20)
+        self.assertTrue(Facture.objects.filter(entreprise=entreprise).exists())
+        self.assertEqual(
+            CommandeClient.objects.filter(facture__entreprise=entreprise).count(),
+            CommandeClient.objects.count(),
+        )
+        self.assertTrue(Stock.objects.filter(entrepot__entreprise=entreprise).exists())
+
+    def test_generation(self):
+        self.verifier(self.generer())
+
+    def test_generation_sans_identifiants_renvoyes(self):
+        # MySQL : bulk_create ne renseigne pas les clés primaires
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            self.verifier(self.generer())
@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.urls import reverse
+from django.utils import timezone
+
+from core.journal_archive import archive_journal_entries
+from core.models import Journal, JournalArchive
+
+from .base import APITestCase
+
+TYPES = ['vente', 'connexion', 'creation', 'vente', 'achat', 'modification', 'connexion', 'retour']
+
+
+class JournalArchivesOrderingTests(APITestCase):
+    url = reverse('journal-list')
+
+    def setUp(self):
+        super().setUp()
+        maintenant = timezone.now()
+        for index, type_operation in enumerate(TYPES):
+            journal = Journal.objects.create(
+                utilisateur=self.caissier if index % 2 else self.admin,
+                entreprise=self.entreprise, boutique=self.boutique,
+                type_operation=type_operation, description=f"Opération {index}",
+            )
+            # Une entrée sur deux devient assez ancienne pour être archivée
+            anciennete = timedelta(days=400 + index) if index % 2 == 0 else timedelta(hours=index)
+            Journal.objects.filter(pk=journal.pk).update(date_operation=maintenant - anciennete)
+        archive_journal_entries(older_than_days=180)
+
+    def lister(self, **params):
+        resultats = []
+        page = 1
+        while True:
+            response = self.api.get(self.url, {**params, 'page': page, 'page_size': 3})
+            self.assertEqual(response.status_code, 200)
+            resultats.extend(response.data['results'])
+            if not response.data['next']:
+                return resultats
+            page += 1
+
+    def test_archives_presentes(self):
+        self.assertEqual(JournalArchive.objects.count(), 4)
+        self.assertEqual(Journal.objects.count(), 4)
+
+    def test_tri_par_date(self):
+        dates = [entree['date_operation'] for entree in self.lister()]
+        self.assertEqual(len(dates), len(TYPES))
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+    def test_tri_par_type_interclasse(self):
+        for ordering, inverse in (('type_operation', False), ('-type_operation', True)):
+            entrees = self.lister(ordering=ordering)
+            types = [entree['type_operation'] for entree in entrees]
+            self.assertEqual(types, sorted(TYPES, reverse=inverse))
+            # Ni doublon ni omission d'une page à l'autre
+            self.assertEqual(len({entree['id'] for entree in entrees}), len(TYPES))
+
+    def test_tri_par_utilisateur(self):
+        utilisateurs = [entree['utilisateur'] for entree in self.lister(ordering='utilisateur')]
+        self.assertEqual(utilisateurs, sorted(utilisateurs))
+
+    def test_sans_archives(self):
+        self.assertEqual(len(self.lister(archives='0', ordering='type_operation')), 4)
@@ -0,0 +1,18 @@
+from django.test import SimpleTestCase
+
+from core.management.commands.load_test import Command
+
+
+class LoadTestSummaryTests(SimpleTestCase):
+    def test_debit_d_un_scenario_rapporte_a_sa_propre_fenetre(self):
+        # 4 requêtes d'un scénario entre t=10 s et t=12 s, dans un test de 100 s
+        results = [
+            ('pos_sale', 500.0, 3, 201, None, 10.0 + i * 0.5, 10.5 + i * 0.5)
+            for i in range(4)
+        ]
+        resume = Command().summarize(results)
+        self.assertEqual(resume['throughput_rps'], 2.0)
+        self.assertEqual(Command().summarize(results, 100)['throughput_rps'], 0.04)
+
+    def test_sans_requete(self):
+        self.assertEqual(Command().summarize([])['throughput_rps'], 0)
@@ -0,0 +1,41 @@
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import serializers
+
+from core import perf
+
+from .base import APITestCase
+
+
+class LigneSerializer(serializers.Serializer):
+    nom = serializers.CharField()
+
+
+class SerializerTimingTests(SimpleTestCase):
+    def test_data_chronometre_seulement_pendant_une_requete_profilee(self):
+        original = serializers.Serializer.__dict__['data']
+        original_liste = serializers.ListSerializer.__dict__['data']
+        metrics, token = perf.start_request()
+        try:
+            with perf.serializer_timing():
+                with perf.serializer_timing():
+                    self.assertIsNot(serializers.Serializer.__dict__['data'], original)
+                # Requête imbriquée terminée : l'autre est toujours profilée
+                self.assertIsNot(serializers.Serializer.__dict__['data'], original)
+                self.assertEqual(LigneSerializer({'nom': 'a'}).data, {'nom': 'a'})
+                self.assertEqual(LigneSerializer([{'nom': 'b'}], many=True).data, [{'nom': 'b'}])
+        finally:
+            perf.end_request(token)
+        self.assertGreater(metrics.serializer_time, 0)
+        self.assertIs(serializers.Serializer.__dict__['data'], original)
+        self.assertIs(serializers.ListSerializer.__dict__['data'], original_liste)
+
+
+@override_settings(PERFORMANCE_INSTRUMENTATION=True)
+class PerformanceMiddlewareTests(APITestCase):
+    def test_server_timing(self):
+        original = serializers.Serializer.__dict__['data']
+        response = self.api.get(reverse('categorie-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ser;dur=', response['Server-Timing'])
+        self.assertIs(serializers.Serializer.__dict__['data'], original)
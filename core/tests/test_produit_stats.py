@@ -0,0 +1,128 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from core.models import Produit, Stock
+from core.produit_stats import (
+    calculer_stats_produits, compteurs_depuis_stats, compteurs_en_cache, get_stats_produits,
+)
+from core.stock_mutations import ajouter, fixer
+
+from .base import APITestCase
+
+TRANCHES = ('nb_rupture', 'nb_critique', 'nb_faible', 'nb_normal')
+
+
+class StatsProduitsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.produit, self.stock = self.creer_produit(quantite=0)
+        self.creer_produit(quantite=60, nom='Autre')
+        # Compteurs amorcés depuis la base
+        get_stats_produits(self.entreprise.id)
+
+    def compteurs(self):
+        return compteurs_en_cache(self.entreprise.id)
+
+    def attendus(self):
+        return compteurs_depuis_stats(calculer_stats_produits(Produit.objects.filter(entreprise=self.entreprise)))
+
+    def assertTranches(self, rupture, critique, faible, normal):
+        compteurs = self.compteurs()
+        self.assertEqual(tuple(compteurs[t] for t in TRANCHES), (rupture, critique, faible, normal))
+        # Les ajustements incrémentaux rejoignent l'agrégat SQL
+        self.assertEqual(compteurs, self.attendus())
+
+    def test_ajouter_fait_changer_de_tranche(self):
+        self.assertTranches(1, 0, 0, 1)
+        for delta, tranches in (
+            (5, (0, 1, 0, 1)),      # rupture → critique
+            (15, (0, 0, 1, 1)),     # critique → faible
+            (40, (0, 0, 0, 2)),     # faible → normal
+            (-60, (1, 0, 0, 1)),    # normal → rupture
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                ajouter(self.stock, delta)
+            self.assertTranches(*tranches)
+
+    def test_fixer_fait_changer_de_tranche(self):
+        for quantite, tranches in (
+            (50, (0, 0, 0, 2)),
+            (9, (0, 1, 0, 1)),
+            (10, (0, 0, 1, 1)),
+            (0, (1, 0, 0, 1)),
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                fixer(self.stock, lambda avant, reservee: quantite)
+            self.assertTranches(*tranches)
+
+    def test_ajustement_applique_apres_validation(self):
+        avant = self.compteurs()
+        with self.captureOnCommitCallbacks() as callbacks:
+            ajouter(self.stock, 20)
+        # Transaction non validée : compteurs inchangés (un rollback ne les touche pas)
+        self.assertEqual(self.compteurs(), avant)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.compteurs()['total_unites'], avant['total_unites'] + 20)
+        self.assertEqual(self.compteurs()['valeur_stock_centimes'], avant['valeur_stock_centimes'] + 20 * 100 * 100)
+        self.assertTranches(0, 0, 1, 1)
+
+    def test_produit_save(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.creer_produit(quantite=0, nom='Nouveau')
+        self.assertEqual(self.compteurs()['total_produits'], 3)
+        self.assertTranches(2, 0, 0, 1)
+
+        # Stock modifié sans signal : save() recalcule la quantité et change de tranche
+        Stock.objects.filter(pk=self.stock.pk).update(quantite=12)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.produit.save()
+        self.assertTranches(1, 0, 1, 1)
+
+        # Changement de prix : seule la valeur du stock varie
+        self.produit.prix_vente = 150
+        with self.captureOnCommitCallbacks(execute=True):
+            self.produit.save()
+        self.assertTranches(1, 0, 1, 1)
+
+
+class VerifierStatsProduitsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.produit, self.stock = self.creer_produit(quantite=5)
+        get_stats_produits(self.entreprise.id)
+
+    def compteurs(self):
+        return compteurs_en_cache(self.entreprise.id)
+
+    def verifier(self, *args):
+        out = StringIO()
+        call_command('verifier_stats_produits', *args, stdout=out)
+        return out.getvalue()
+
+    def test_ecart_detecte_et_corrige(self):
+        # Écritures en masse : ni Stock.save ni Produit.save, les compteurs dérivent
+        Stock.objects.filter(pk=self.stock.pk).update(quantite=80)
+        Produit.objects.filter(pk=self.produit.pk).update(quantite=80)
+        self.assertEqual(self.compteurs()['nb_critique'], 1)
+
+        sortie = self.verifier()
+        self.assertIn('nb_critique: 1 → 0', sortie)
+        self.assertIn('nb_normal: 0 → 1', sortie)
+        self.assertIn('1 entreprise(s) corrigée(s)', sortie)
+        self.assertEqual(self.compteurs()['nb_normal'], 1)
+        self.assertEqual(self.compteurs()['total_unites'], 80)
+
+        self.assertIn('aucun écart', self.verifier())
+
+    def test_resync_quantites(self):
+        # Seul le stock est modifié : Produit.quantite est aussi à recalculer
+        Stock.objects.filter(pk=self.stock.pk).update(quantite=30)
+
+        sortie = self.verifier('--resync-quantites')
+        self.assertIn('1 quantité(s) produit corrigée(s)', sortie)
+        self.assertEqual(Produit.objects.get(pk=self.produit.pk).quantite, 30)
+        self.assertEqual(self.compteurs()['nb_faible'], 1)
+        self.assertEqual(self.compteurs()['total_unites'], 30)
@@ -0,0 +1,29 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from core.models import PaymentTransaction
+
+from .base import APITestCase
+
+
+class PurgeExpiredDataTests(APITestCase):
+    def creer_paiement(self, status, jours):
+        paiement = PaymentTransaction.objects.create(
+            entreprise=self.entreprise, amount=5000, method='orange_money', status=status,
+        )
+        PaymentTransaction.objects.filter(pk=paiement.pk).update(created_at=timezone.now() - timedelta(days=jours))
+        return paiement
+
+    def test_seuls_les_brouillons_anciens_sont_supprimes(self):
+        brouillon = self.creer_paiement('pending', 10)
+        recent = self.creer_paiement('pending', 1)
+        en_cours = self.creer_paiement('processing', 10)
+
+        call_command('purge_expired_data', stdout=StringIO())
+
+        restants = set(PaymentTransaction.objects.values_list('pk', flat=True))
+        self.assertNotIn(brouillon.pk, restants)
+        self.assertEqual(restants, {recent.pk, en_cours.pk})
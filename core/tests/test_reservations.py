@@ -0,0 +1,134 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Inventaire, InventaireProduit, Produit, ReservationStock, Stock
+from core.reservations import expirer, liberer, reserver_lignes
+from core.stock_mutations import StockInsuffisant, ajouter, fixer
+
+from .base import APITestCase, creer_entreprise, creer_utilisateur
+
+
+class ReservationsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.produit, self.stock = self.creer_produit(quantite=10)
+
+    def quantites(self):
+        self.stock.refresh_from_db()
+        return self.stock.quantite, self.stock.quantite_reservee
+
+    def test_reservation_bloque_les_autres_paniers(self):
+        reserver_lignes('panier-a', [(self.stock, 8)], self.admin)
+        with self.assertRaises(StockInsuffisant):
+            reserver_lignes('panier-b', [(self.stock, 3)], self.admin)
+        with self.assertRaises(StockInsuffisant):
+            ajouter(self.stock, -3)
+        # Le panier qui a réservé prend ses unités
+        ajouter(self.stock, -8, reservee=8)
+        self.assertEqual(self.quantites(), (2, 0))
+
+    def test_modification_et_liberation_du_panier(self):
+        reserver_lignes('panier-a', [(self.stock, 4)], self.admin)
+        reserver_lignes('panier-a', [(self.stock, 6)], self.admin)
+        self.assertEqual(self.quantites(), (10, 6))
+        self.assertEqual(liberer('panier-a'), 1)
+        self.assertEqual(self.quantites(), (10, 0))
+        self.assertFalse(ReservationStock.objects.exists())
+
+    def test_expiration(self):
+        reserver_lignes('panier-a', [(self.stock, 4)], self.admin)
+        self.assertEqual(expirer(), 0)
+
+        self.assertEqual(expirer(timezone.now() + timedelta(hours=1)), 1)
+        self.assertEqual(self.quantites(), (10, 0))
+        self.assertFalse(ReservationStock.objects.exists())
+        # Une réservation n'est rendue qu'une fois
+        self.assertEqual(expirer(timezone.now() + timedelta(hours=1)), 0)
+        self.assertEqual(self.quantites(), (10, 0))
+
+    def test_expiration_par_lots_et_prolongation(self):
+        _, autre_stock = self.creer_produit(quantite=5, nom='Autre')
+        reserver_lignes('panier-a', [(self.stock, 2)], self.admin)
+        reserver_lignes('panier-b', [(self.stock, 3), (autre_stock, 1)], self.admin)
+        ReservationStock.objects.filter(panier='panier-b').update(expire_le=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(expirer(taille_lot=1), 2)
+        self.assertEqual(self.quantites(), (10, 2))
+        autre_stock.refresh_from_db()
+        self.assertEqual(autre_stock.quantite_reservee, 0)
+        self.assertEqual(list(ReservationStock.objects.values_list('panier', flat=True)), ['panier-a'])
+
+    def test_commande_expirer_reservations(self):
+        reserver_lignes('panier-a', [(self.stock, 4)], self.admin)
+        ReservationStock.objects.update(expire_le=timezone.now() - timedelta(minutes=1))
+        call_command('expirer_reservations', stdout=StringIO())
+        self.assertEqual(self.quantites(), (10, 0))
+
+    def test_fixer_n_entame_pas_les_reservations(self):
+        reserver_lignes('panier-a', [(self.stock, 4)], self.admin)
+        with self.assertRaises(StockInsuffisant):
+            fixer(self.stock, lambda avant, reservee: 3)
+        self.assertEqual(self.quantites(), (10, 4))
+        # Hausse ou baisse jusqu'aux quantités réservées : acceptées
+        fixer(self.stock, lambda avant, reservee: 4)
+        self.assertEqual(self.quantites(), (4, 4))
+
+    def test_sortie_plafonnee_aux_quantites_libres(self):
+        reserver_lignes('panier-a', [(self.stock, 4)], self.admin)
+        response = self.api.post(reverse('mouvementstock-list'), {
+            'produit': self.produit.id, 'entrepot': self.boutique.id,
+            'type_mouvement': 'sortie', 'quantite': 8,
+        })
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(self.quantites(), (4, 4))
+
+    def test_ajustement_sous_les_reservations_refuse(self):
+        reserver_lignes('panier-a', [(self.stock, 4)], self.admin)
+        response = self.api.post(reverse('mouvementstock-list'), {
+            'produit': self.produit.id, 'entrepot': self.boutique.id,
+            'type_mouvement': 'ajustement', 'quantite': 2,
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.quantites(), (10, 4))
+
+    def test_inventaire_sous_les_reservations_refuse(self):
+        reserver_lignes('panier-a', [(self.stock, 4)], self.admin)
+        inventaire = Inventaire.objects.create(
+            numero='INV-TEST', nom='Inventaire', entreprise=self.entreprise, entrepot=self.boutique,
+            date_debut=timezone.now(), date_fin_prevue=timezone.now(), statut='en_cours',
+        )
+        InventaireProduit.objects.create(
+            inventaire=inventaire, produit=self.produit, quantite_theorique=10, quantite_reelle=2, est_compte=True,
+        )
+
+        resultat = inventaire.ajuster_stocks(self.admin)
+
+        self.assertIn('error', resultat)
+        self.assertEqual(self.quantites(), (10, 4))
+        inventaire.refresh_from_db()
+        self.assertFalse(inventaire.stocks_ajustes)
+
+    def test_panier_d_une_autre_entreprise_ni_prolonge_ni_renvoye(self):
+        reserver_lignes('panier-a', [(self.stock, 2)], self.admin, self.entreprise.id)
+        ReservationStock.objects.update(expire_le=timezone.now() - timedelta(minutes=1))
+
+        autre_entreprise, autre_boutique = creer_entreprise('Autre')
+        autre_admin = creer_utilisateur('admin-autre', autre_entreprise, autre_boutique, 'admin')
+        autre_produit = Produit.objects.create(nom='Ailleurs', entreprise=autre_entreprise, prix_achat=1, prix_vente=2)
+        Stock.objects.create(produit=autre_produit, entrepot=autre_boutique, quantite=5)
+        self.connecter(autre_admin)
+        response = self.api.post(reverse('reservationstock-reserver'), {
+            'panier': 'panier-a', 'boutique': autre_boutique.id,
+            'items': [{'produit': autre_produit.id, 'quantite': 1}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(response.data['reservations']), 1)
+        self.assertNotEqual(response.data['reservations'][0]['stock'], self.stock.id)
+        # La réservation du premier tenant reste expirée
+        self.assertEqual(expirer(), 1)
+        self.assertEqual(self.quantites(), (10, 0))
@@ -0,0 +1,108 @@
+from unittest import mock
+
+from django.db.models import F
+from django.urls import reverse
+
+from core.models import MouvementStock, Produit, Stock
+from core.stock_mutations import MAX_TENTATIVES, ConflitStock, StockInsuffisant, ajouter, fixer, reserver
+
+from .base import APITestCase
+
+
+class StockMutationsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.produit, self.stock = self.creer_produit(quantite=10)
+
+    def quantite(self):
+        return Stock.objects.get(pk=self.stock.pk).quantite
+
+    def ecriture_concurrente(self, delta):
+        Stock.objects.filter(pk=self.stock.pk).update(quantite=F('quantite') + delta)
+
+    def test_ajouter(self):
+        variation = ajouter(self.stock, -4)
+        self.assertEqual((variation.quantite_avant, variation.quantite_apres), (10, 6))
+        self.assertEqual(self.quantite(), 6)
+        self.assertEqual(self.stock.quantite, 6)
+        # Report sur Produit.quantite, contourné par l'UPDATE
+        self.assertEqual(Produit.objects.get(pk=self.produit.pk).quantite, 6)
+
+    def test_ajouter_refuse_un_retrait_superieur_au_stock(self):
+        with self.assertRaises(StockInsuffisant) as erreur:
+            ajouter(self.stock, -11)
+        self.assertEqual((erreur.exception.disponible, erreur.exception.demande), (10, 11))
+        self.assertEqual(self.quantite(), 10)
+        # Sans contrôle (minimum=None), le stock peut devenir négatif
+        ajouter(self.stock, -11, minimum=None)
+        self.assertEqual(self.quantite(), -1)
+
+    def test_ajouter_sur_une_instance_perimee(self):
+        # L'UPDATE part de la valeur en base, pas de celle de l'instance
+        self.ecriture_concurrente(-3)
+        variation = ajouter(self.stock, -7)
+        self.assertEqual((variation.quantite_avant, variation.quantite_apres), (7, 0))
+        with self.assertRaises(StockInsuffisant):
+            ajouter(self.stock, -1)
+
+    def test_reserver(self):
+        reserver(self.stock, 6)
+        self.assertEqual(self.stock.quantite_reservee, 6)
+        with self.assertRaises(StockInsuffisant):
+            reserver(self.stock, 5)
+        reserver(self.stock, -6)
+        self.assertEqual(Stock.objects.get(pk=self.stock.pk).quantite_reservee, 0)
+
+    def test_fixer(self):
+        variation = fixer(self.stock, lambda avant, reservee: avant * 2)
+        self.assertEqual((variation.quantite_avant, variation.quantite_apres), (10, 20))
+        self.assertEqual(self.quantite(), 20)
+
+    def test_fixer_recommence_apres_une_ecriture_concurrente(self):
+        calculs = []
+
+        def calcul(avant, reservee):
+            calculs.append(avant)
+            if len(calculs) == 1:
+                # Vente passée entre la lecture et le compare-and-swap
+                self.ecriture_concurrente(-2)
+            return avant - 5
+
+        with mock.patch('core.stock_mutations.time.sleep'):
+            variation = fixer(self.stock, calcul)
+
+        self.assertEqual(calculs, [10, 8])
+        self.assertEqual((variation.quantite_avant, variation.quantite_apres), (8, 3))
+        self.assertEqual(self.quantite(), 3)
+
+    def test_fixer_abandonne_apres_max_tentatives(self):
+        def calcul(avant, reservee):
+            self.ecriture_concurrente(1)
+            return 0
+
+        with mock.patch('core.stock_mutations.time.sleep'), self.assertRaises(ConflitStock):
+            fixer(self.stock, calcul)
+        self.assertEqual(self.quantite(), 10 + MAX_TENTATIVES)
+
+    def test_fixer_recommence_apres_une_reservation_concurrente(self):
+        calculs = []
+
+        def calcul(avant, reservee):
+            calculs.append(reservee)
+            if len(calculs) == 1:
+                Stock.objects.filter(pk=self.stock.pk).update(quantite_reservee=6)
+            return 5
+
+        with mock.patch('core.stock_mutations.time.sleep'), self.assertRaises(StockInsuffisant):
+            fixer(self.stock, calcul)
+        self.assertEqual(calculs, [0, 6])
+        self.assertEqual(self.quantite(), 10)
+
+    def test_mouvement_de_sortie_trace_les_quantites(self):
+        response = self.api.post(reverse('mouvementstock-list'), {
+            'produit': self.produit.id, 'entrepot': self.boutique.id, 'type_mouvement': 'sortie', 'quantite': 15,
+        })
+        self.assertEqual(response.status_code, 201, response.data)
+        mouvement = MouvementStock.objects.get(pk=response.data['id'])
+        self.assertEqual((mouvement.quantite_avant, mouvement.quantite_apres), (10, 0))
+        self.assertEqual(self.quantite(), 0)
@@ -0,0 +1,57 @@
+from datetime import date, datetime
+
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Stock, StockSnapshot
+from core.stock_snapshots import construire_snapshots
+
+from .base import APITestCase
+
+
+class StockSnapshotsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.produit, self.stock = self.creer_produit(quantite=7)
+        Stock.objects.filter(pk=self.stock.pk).update(
+            created_at=timezone.make_aware(datetime(2026, 1, 1))
+        )
+
+    def test_reconstruction_journaliere_conserve_les_snapshots_mensuels(self):
+        fin_janvier = date(2026, 1, 31)
+        construire_snapshots([self.boutique.id], 'mois', depuis=date(2026, 1, 1), jusqu_a=date(2026, 2, 1))
+        construire_snapshots([self.boutique.id], 'jour', depuis=fin_janvier, jusqu_a=date(2026, 2, 1))
+
+        snapshots = StockSnapshot.objects.filter(
+            entrepot=self.boutique, produit=self.produit, date=fin_janvier
+        )
+        self.assertEqual(
+            sorted(snapshots.values_list('granularite', 'quantite')),
+            [('jour', 7), ('mois', 7)],
+        )
+
+    def test_evolution_parametres_non_numeriques(self):
+        for params in ({'produit': 'abc'}, {'produit': self.produit.id, 'entrepot': 'abc'}):
+            with self.subTest(params):
+                self.assertEqual(self.api.get(reverse('stock-evolution'), params).status_code, 400)
+
+    def test_a_date_parametres_non_numeriques(self):
+        for params in ({'produit': 'abc'}, {'entrepot': 'abc'}):
+            with self.subTest(params):
+                response = self.api.get(reverse('stock-a-date'), {'date': '2026-01-31', **params})
+                self.assertEqual(response.status_code, 400)
+
+    def test_a_date(self):
+        response = self.api.get(reverse('stock-a-date'), {
+            'date': '2026-01-31', 'produit': self.produit.id, 'entrepot': self.boutique.id,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_unites'], 7)
+
+    def test_evolution(self):
+        response = self.api.get(reverse('stock-evolution'), {
+            'produit': self.produit.id, 'date_debut': '2026-01-30', 'date_fin': '2026-01-31',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['produit'], self.produit.id)
+        self.assertEqual([point['quantite'] for point in response.data['serie']], [7, 7])
@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+
+from core.models import Produit, ProduitVariante, SuppressionSync
+
+from .base import APITestCase, creer_entreprise
+
+
+@override_settings(SYNC_DELAI_STABILITE=0)
+class SyncSuppressionsTests(APITestCase):
+    url = reverse('sync_delta')
+
+    def synchroniser(self, **watermarks):
+        response = self.api.get(self.url, {'ressources': ','.join(watermarks), **{
+            nom: watermark for nom, watermark in watermarks.items() if watermark
+        }})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['ressources']
+
+    def test_suppression_transmise_au_passage_suivant(self):
+        produit, _ = self.creer_produit()
+        autre, _ = self.creer_produit(nom='Autre')
+        premier = self.synchroniser(produits=None)['produits']
+        self.assertEqual(sorted(ligne[0] for ligne in premier['lignes']), sorted([produit.id, autre.id]))
+        self.assertEqual(premier['supprimes'], [])
+
+        produit_id = produit.id
+        produit.delete()
+
+        suivant = self.synchroniser(produits=premier['watermark'])['produits']
+        self.assertEqual(suivant['supprimes'], [produit_id])
+        self.assertEqual(suivant['lignes'], [])
+        # Trace déjà livrée : plus renvoyée
+        self.assertEqual(self.synchroniser(produits=suivant['watermark'])['produits']['supprimes'], [])
+
+    def test_suppressions_en_cascade(self):
+        produit, stock = self.creer_produit()
+        variante = ProduitVariante.objects.create(produit=produit, nom='500ml')
+        watermarks = {nom: r['watermark'] for nom, r in self.synchroniser(
+            produits=None, variantes=None, stocks=None,
+        ).items()}
+
+        Produit.objects.filter(pk=produit.pk).delete()
+
+        ressources = self.synchroniser(**watermarks)
+        self.assertEqual(ressources['produits']['supprimes'], [produit.id])
+        self.assertEqual(ressources['variantes']['supprimes'], [variante.id])
+        self.assertIn(stock.id, ressources['stocks']['supprimes'])
+
+    def test_premier_chargement_sans_suppressions(self):
+        produit, _ = self.creer_produit()
+        produit.delete()
+        premier = self.synchroniser(produits=None)['produits']
+        self.assertEqual((premier['lignes'], premier['supprimes']), ([], []))
+
+    def test_suppressions_cloisonnees_par_entreprise(self):
+        watermark = self.synchroniser(produits=None)['produits']['watermark']
+        autre_entreprise, _ = creer_entreprise('Autre')
+        Produit.objects.create(nom='Ailleurs', entreprise=autre_entreprise, prix_achat=1, prix_vente=2).delete()
+
+        self.assertTrue(SuppressionSync.objects.filter(entreprise_id=autre_entreprise.id).exists())
+        self.assertEqual(self.synchroniser(produits=watermark)['produits']['supprimes'], [])
+
+    def test_echec_de_la_trace_journalise(self):
+        produit, _ = self.creer_produit()
+        produit_id = produit.pk
+        with mock.patch('core.sync.enregistrer_suppression', side_effect=RuntimeError('base indisponible')), \
+                self.assertLogs('core.signals', 'ERROR') as logs:
+            produit.delete()
+        self.assertTrue(any(f'Erreur trace de suppression (sync) Produit {produit_id}' in ligne for ligne in logs.output))
+        # La suppression elle-même n'est pas annulée
+        self.assertFalse(Produit.objects.filter(pk=produit_id).exists())
@@ -0,0 +1,128 @@
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.models import EntrepriseSubscription, SubscriptionPlan
+from core.throttling import (
+    AnonSlidingWindowRateThrottle, PlanRateThrottle, SlidingWindowRateThrottle,
+)
+
+from .base import APITestCase, creer_entreprise, creer_utilisateur
+
+# Début d'une fenêtre d'une minute (6000 = 100 * 60)
+DEBUT = 6000.0
+
+
+def requete(user=None, ip='10.0.0.1'):
+    request = Request(APIRequestFactory().get('/', REMOTE_ADDR=ip))
+    request.user = user or AnonymousUser()
+    return request
+
+
+def passer(classe, request, instant):
+    """Instancie le throttle (un par requête, comme DRF) à l'instant donné."""
+    throttle = classe()
+    throttle.timer = lambda: instant
+    return throttle.allow_request(request, None), throttle
+
+
+def autorisees(classe, request, essais, instant=DEBUT):
+    return sum(passer(classe, request, instant)[0] for _ in range(essais))
+
+
+class FenetreGlissanteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        rates = mock.patch.dict(SlidingWindowRateThrottle.THROTTLE_RATES, {'anon': '10/min'})
+        rates.start()
+        self.addCleanup(rates.stop)
+
+    def test_limite_atteinte_dans_la_fenetre_courante(self):
+        request = requete()
+        self.assertEqual(autorisees(AnonSlidingWindowRateThrottle, request, 10, DEBUT + 50), 10)
+
+        autorise, throttle = passer(AnonSlidingWindowRateThrottle, request, DEBUT + 50)
+        self.assertFalse(autorise)
+        # Fenêtre courante pleine : attendre la fin de la fenêtre
+        self.assertEqual(throttle.wait(), 10)
+
+    def test_estimation_ponderee_par_la_fenetre_precedente(self):
+        request = requete()
+        autorisees(AnonSlidingWindowRateThrottle, request, 10, DEBUT + 50)
+
+        # 15 s dans la fenêtre suivante : 10 * (1 - 15/60) = 7.5, reste 3 places
+        instant = DEBUT + 60 + 15
+        self.assertEqual(autorisees(AnonSlidingWindowRateThrottle, request, 5, instant), 3)
+
+        autorise, throttle = passer(AnonSlidingWindowRateThrottle, request, instant)
+        self.assertFalse(autorise)
+        # 10 * (1 - t/60) + 3 < 10 dès que t > 18 s
+        self.assertEqual(throttle.wait(), 3)
+        self.assertFalse(passer(AnonSlidingWindowRateThrottle, request, instant + 2)[0])
+        self.assertTrue(passer(AnonSlidingWindowRateThrottle, request, instant + 4)[0])
+
+    def test_compteurs_par_adresse_ip(self):
+        autorisees(AnonSlidingWindowRateThrottle, requete(ip='10.0.0.1'), 10)
+
+        self.assertFalse(passer(AnonSlidingWindowRateThrottle, requete(ip='10.0.0.1'), DEBUT)[0])
+        self.assertTrue(passer(AnonSlidingWindowRateThrottle, requete(ip='10.0.0.2'), DEBUT)[0])
+
+
+class PlanRateThrottleTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        rates = mock.patch.dict(SlidingWindowRateThrottle.THROTTLE_RATES, {
+            'user_free': '2/hour',
+            'user_pro': '4/hour',
+        })
+        rates.start()
+        self.addCleanup(rates.stop)
+        entreprise, boutique = creer_entreprise("Gratuite", 'free')
+        self.utilisateur_free = creer_utilisateur('free-test', entreprise, boutique)
+
+    def test_limite_selon_le_plan(self):
+        self.assertEqual(autorisees(PlanRateThrottle, requete(self.admin), 10), 4)
+        self.assertEqual(autorisees(PlanRateThrottle, requete(self.utilisateur_free), 10), 2)
+
+    def test_changement_d_abonnement_applique_le_nouveau_taux(self):
+        request = requete(self.utilisateur_free)
+        self.assertEqual(autorisees(PlanRateThrottle, request, 5), 2)
+
+        # Le signal de l'abonnement invalide le plan en cache ; le compteur est conservé
+        subscription = EntrepriseSubscription.objects.get(entreprise=self.utilisateur_free.entreprise)
+        subscription.plan = SubscriptionPlan.objects.get(name='pro')
+        subscription.save()
+
+        self.assertEqual(autorisees(PlanRateThrottle, request, 5), 2)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class LoginRateThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        rates = mock.patch.dict(SlidingWindowRateThrottle.THROTTLE_RATES, {'login': '3/hour'})
+        rates.start()
+        self.addCleanup(rates.stop)
+
+    def connexion(self, username, ip='10.0.0.1'):
+        return APIClient().post(
+            reverse('api_token_auth'),
+            {'username': username, 'password': 'mauvais'},
+            format='json', REMOTE_ADDR=ip,
+        )
+
+    def test_blocage_par_ip_et_identifiant(self):
+        for _ in range(3):
+            self.assertEqual(self.connexion('gerant').status_code, 400)
+        self.assertEqual(self.connexion('gerant').status_code, 429)
+        # L'identifiant est normalisé avant hachage
+        self.assertEqual(self.connexion(' GERANT ').status_code, 429)
+
+        # Autre compte derrière la même IP, ou même compte depuis une autre IP
+        self.assertEqual(self.connexion('caissier').status_code, 400)
+        self.assertEqual(self.connexion('gerant', ip='10.0.0.2').status_code, 400)
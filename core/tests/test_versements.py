@@ -0,0 +1,79 @@
+from django.urls import reverse
+
+from core.models import Facture, Versement
+from core.versements import appliquer_paiements
+
+from .base import APITestCase
+
+
+class VersementsTests(APITestCase):
+    def creer_facture(self, numero, total=1000, status='En attente'):
+        return Facture.objects.create(
+            type='client', numero=numero, total=total, reste=total, status=status,
+            client=self.client_facture, created_by=self.admin,
+            entreprise=self.entreprise, boutique=self.boutique,
+        )
+
+    def etat(self, facture):
+        facture.refresh_from_db()
+        return facture.reste, facture.status
+
+    def test_creation_modification_suppression(self):
+        facture = self.creer_facture('F-1')
+
+        response = self.api.post(reverse('versement-list'), {'facture': facture.id, 'montant': 300})
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(self.etat(facture), (700, 'Partiellement payé'))
+
+        url = reverse('versement-detail', args=[response.data['id']])
+        self.assertEqual(self.api.patch(url, {'montant': 1000}).status_code, 200)
+        self.assertEqual(self.etat(facture), (0, 'Payé'))
+
+        self.assertEqual(self.api.patch(url, {'montant': 400}).status_code, 200)
+        self.assertEqual(self.etat(facture), (600, 'Partiellement payé'))
+
+        self.assertEqual(self.api.delete(url).status_code, 204)
+        self.assertEqual(self.etat(facture), (1000, 'En attente'))
+
+    def test_versements_successifs_et_trop_percu(self):
+        facture = self.creer_facture('F-1')
+        Versement.objects.create(facture=facture, montant=600, created_by=self.admin)
+        versement = Versement.objects.create(facture=facture, montant=600, created_by=self.admin)
+        # Reste borné à 0
+        self.assertEqual(self.etat(facture), (0, 'Payé'))
+        # Instance rechargée : seule la différence est appliquée
+        versement = Versement.objects.get(pk=versement.pk)
+        versement.montant = 100
+        versement.save()
+        self.assertEqual(self.etat(facture), (500, 'Partiellement payé'))
+
+    def test_facture_annulee_inchangee(self):
+        facture = self.creer_facture('F-1', status='Annulée')
+        appliquer_paiements({facture.id: 300})
+        self.assertEqual(self.etat(facture), (700, 'Annulée'))
+
+    def test_reglement_groupe(self):
+        factures = [self.creer_facture(f'F-{i}', total=1000) for i in range(3)]
+        response = self.api.post(reverse('versement-bulk'), {'versements': [
+            {'facture': factures[0].id, 'montant': 1000},
+            {'facture': factures[1].id, 'montant': 250},
+            {'facture': factures[1].id, 'montant': 250},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['versements'], 3)
+
+        self.assertEqual(self.etat(factures[0]), (0, 'Payé'))
+        self.assertEqual(self.etat(factures[1]), (500, 'Partiellement payé'))
+        self.assertEqual(self.etat(factures[2]), (1000, 'En attente'))
+        self.assertEqual(Versement.objects.filter(facture=factures[1]).count(), 2)
+
+    def test_reglement_groupe_refuse_une_facture_annulee(self):
+        facture = self.creer_facture('F-1')
+        annulee = self.creer_facture('F-2', status='Annulée')
+        response = self.api.post(reverse('versement-bulk'), {'versements': [
+            {'facture': facture.id, 'montant': 100},
+            {'facture': annulee.id, 'montant': 100},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.etat(facture), (1000, 'En attente'))
+        self.assertFalse(Versement.objects.exists())
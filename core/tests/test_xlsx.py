@@ -0,0 +1,37 @@
+import zipfile
+from io import BytesIO
+
+from django.urls import reverse
+
+from .base import APITestCase
+
+EXPORTS = ('produit-export-xlsx', 'stock-export-xlsx', 'mouvementstock-export-xlsx', 'facture-export-xlsx', 'journal-export-xlsx')
+
+
+class ExportXlsxPermissionsTests(APITestCase):
+    def test_admin_avec_export_excel(self):
+        self.creer_produit()
+        for nom in EXPORTS:
+            with self.subTest(nom):
+                response = self.api.get(reverse(nom))
+                self.assertEqual(response.status_code, 200)
+                classeur = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+                self.assertIn('xl/workbook.xml', classeur.namelist())
+
+    def test_caissier_refuse(self):
+        self.connecter(self.caissier)
+        for nom in EXPORTS:
+            with self.subTest(nom):
+                self.assertEqual(self.api.get(reverse(nom)).status_code, 403)
+
+
+class ExportXlsxSansOptionTests(APITestCase):
+    # Plan sans export Excel
+    plan = 'starter'
+
+    def test_admin_refuse(self):
+        for nom in EXPORTS:
+            with self.subTest(nom):
+                response = self.api.get(reverse(nom))
+                self.assertEqual(response.status_code, 403)
+                self.assertIn('plan', str(response.data['detail']))
@@ -0,0 +1,149 @@
+# core/throttling.py
+"""
+Limitation de débit (throttling) stockée dans le cache partagé.
+
+Les throttles DRF par défaut conservent, pour chaque clé, la liste complète
+des horodatages des requêtes : lecture et réécriture d'une liste qui grossit
+à chaque appel. Ici on utilise un compteur à fenêtre glissante : deux
+compteurs entiers par clé (fenêtre courante et précédente) dans le cache
+partagé, donc un état O(1) commun à tous les workers.
+
+``cache.incr`` n'est atomique que sur les backends qui le supportent (Redis,
+locmem au sein d'un processus). Avec le backend fichier, défaut de
+settings_production.py, c'est une lecture suivie d'une écriture : des
+requêtes simultanées peuvent perdre un incrément, la limite est alors
+approximative (légèrement permissive). Utiliser ``CACHE_SHARED_BACKEND=redis``
+pour une limite stricte.
+"""
+import hashlib
+import math
+
+from django.core.cache import cache as default_cache
+from rest_framework.throttling import SimpleRateThrottle
+
+from .cache_utils import CacheManager
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """
+    Throttle à fenêtre glissante.
+
+    Le nombre de requêtes sur la dernière période est estimé par
+    ``précédente * (1 - écoulé / durée) + courante``.
+    """
+    cache = default_cache
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.elapsed = self.now - window * self.duration
+        current_key = f"{self.key}:{window}"
+        previous_key = f"{self.key}:{window - 1}"
+
+        counts = self.cache.get_many([current_key, previous_key])
+        self.current_count = counts.get(current_key, 0)
+        self.previous_count = counts.get(previous_key, 0)
+        estimated = self.previous_count * (1 - self.elapsed / self.duration) + self.current_count
+        if estimated >= self.num_requests:
+            return self.throttle_failure()
+
+        self._increment(current_key)
+        return self.throttle_success()
+
+    def _increment(self, key):
+        # La clé vit deux fenêtres : elle sert ensuite de fenêtre « précédente »
+        timeout = 2 * self.duration
+        if self.cache.add(key, 1, timeout):
+            return
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # Clé expirée entre add() et incr()
+            self.cache.set(key, 1, timeout)
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        """Secondes avant que l'estimation repasse sous la limite."""
+        remaining = self.duration - self.elapsed
+        if self.current_count >= self.num_requests or not self.previous_count:
+            return remaining
+        # Part de la fenêtre précédente qui doit s'écouler pour libérer une place
+        # (calcul sur les entiers : évite qu'un arrondi ajoute une seconde)
+        excess = self.previous_count + self.current_count - self.num_requests
+        delay = self.duration * excess / self.previous_count - self.elapsed
+        return max(1, math.ceil(min(delay, remaining)))
+
+
+class AnonSlidingWindowRateThrottle(SlidingWindowRateThrottle):
+    """Limite les requêtes anonymes par adresse IP (scope ``anon``)."""
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request),
+        }
+
+
+class PlanRateThrottle(SlidingWindowRateThrottle):
+    """
+    Limite les requêtes authentifiées selon le plan d'abonnement de l'entreprise.
+
+    Le taux est lu dans ``DEFAULT_THROTTLE_RATES['user_<plan>']`` (ex: ``user_pro``),
+    avec repli sur le scope ``user``.
+    """
+    scope = 'user'
+
+    def allow_request(self, request, view):
+        user = request.user
+        if user and user.is_authenticated and getattr(user, 'entreprise_id', None):
+            plan_name = CacheManager.get_entreprise_plan_name(user.entreprise_id)
+            plan_rate = self.THROTTLE_RATES.get(f"user_{plan_name}")
+            if plan_rate:
+                self.rate = plan_rate
+                self.num_requests, self.duration = self.parse_rate(plan_rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        if not (request.user and request.user.is_authenticated):
+            return None
+        # Clé indépendante du plan : un changement d'offre conserve le compteur
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': request.user.pk,
+        }
+
+
+class LoginRateThrottle(SlidingWindowRateThrottle):
+    """
+    Limite les tentatives de connexion (scope ``login``).
+
+    La clé combine l'adresse IP et l'identifiant saisi : un bureau partageant
+    la même IP n'est pas bloqué par les erreurs d'un seul compte.
+    """
+    scope = 'login'
+
+    def get_cache_key(self, request, view):
+        identifier = ''
+        try:
+            identifier = request.data.get('email') or request.data.get('username') or ''
+        except Exception:
+            pass
+        # Identifiant haché : clé de cache sûre quel que soit le texte saisi
+        identifier_hash = hashlib.md5(str(identifier).strip().lower().encode()).hexdigest()[:16]
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': f"{self.get_ident(request)}:{identifier_hash}",
+        }
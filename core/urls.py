@@ -4,6 +4,7 @@ from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
 from .views import *
 from .subscription_views import SubscriptionPlanViewSet, EntrepriseSubscriptionViewSet, UsageTrackingViewSet
 from .payment_views import PaymentViewSet, PlatformAdminViewSet
+from .evenements_views import flux_evenements
 from django.contrib import admin
 from django.urls import path,include
 
@@ -18,6 +19,7 @@ router.register(r'variantes-produit', ProduitVarianteViewSet, basename='variante
 router.register(r'categories', CategorieViewSet)
 router.register(r'fournisseurs', FournisseurViewSet)
 router.register(r'stocks', StockViewSet)
+router.register(r'reservations-stock', ReservationStockViewSet)
 router.register(r'mouvements-stock', MouvementStockViewSet)
 router.register(r'prix-produits', PrixProduitViewSet)
 router.register(r'clients', ClientViewSet)
@@ -52,6 +54,15 @@ urlpatterns = [
     path('token/verify/', TokenVerifyView.as_view(), name='token_verify'),
     path('auth/jwt/logout/', logout_view, name='api_jwt_logout'),
     path('contact/submit/', contact_form_submit, name='contact_form_submit'),
+    # Supervision (administrateur plateforme)
+    path('monitoring/performance/', performance_stats, name='monitoring_performance'),
+    path('monitoring/cache/', api_cache_stats, name='monitoring_cache'),
+    # Tableau de bord consolidé
+    path('dashboard/summary/', dashboard_summary, name='dashboard_summary'),
+    # Synchronisation différentielle des caisses hors ligne
+    path('sync/', sync_delta, name='sync_delta'),
+    # Flux temps réel (SSE, serveur ASGI) des stocks et factures
+    path('evenements/stream/', flux_evenements, name='flux_evenements'),
     # Password reset endpoints
     path('password-reset/request/', request_password_reset, name='password_reset_request'),
     path('password-reset/confirm/', confirm_password_reset, name='password_reset_confirm'),
@@ -0,0 +1,74 @@
+# core/versements.py
+"""
+Application des versements sur ``Facture.reste`` / ``Facture.status``.
+
+Un versement ajuste la facture de façon incrémentale, en une requête
+``UPDATE`` avec des expressions ``F()`` (pas de relecture ni de somme de tous
+les versements, pas de course entre deux paiements simultanés) :
+
+- ``reste`` = reste - montant, borné entre 0 et le total ;
+- ``status`` = Payé (reste nul), En attente (reste = total) ou Partiellement payé.
+
+Un montant négatif annule un versement (suppression, correction). Plusieurs
+factures sont ajustées dans le même ``UPDATE`` (règlement groupé).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Greatest, Least
+from django.db.models.lookups import GreaterThanOrEqual, LessThanOrEqual
+
+from .models import Facture
+
+_suspendus = ContextVar('versements_signaux_suspendus', default=False)
+
+
+@contextmanager
+def signaux_versement_suspendus():
+    """
+    Désactive l'application automatique des versements (signaux) dans le bloc :
+    l'appelant ajuste lui-même les factures, en une fois, avec ``appliquer_paiements``.
+    """
+    jeton = _suspendus.set(True)
+    try:
+        yield
+    finally:
+        _suspendus.reset(jeton)
+
+
+def signaux_suspendus():
+    return _suspendus.get()
+
+
+def appliquer_paiements(montants_par_facture):
+    """
+    Ajuste reste et statut des factures en un seul UPDATE.
+
+    Args:
+        montants_par_facture: {facture_id: montant versé (négatif pour une annulation)}
+    """
+    montants = {pk: float(m) for pk, m in montants_par_facture.items() if m}
+    if not montants:
+        return 0
+    if len(montants) == 1:
+        [(pk, montant)] = montants.items()
+        delta = Value(montant, output_field=FloatField())
+    else:
+        delta = Case(
+            *[When(pk=pk, then=Value(montant)) for pk, montant in montants.items()],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    nouveau_reste = F('reste') - delta
+    # status avant reste : MySQL évalue les affectations de gauche à droite avec
+    # les valeurs déjà modifiées, les autres moteurs avec les valeurs d'origine
+    return Facture.objects.filter(pk__in=montants).update(
+        status=Case(
+            When(status='Annulée', then=F('status')),
+            When(LessThanOrEqual(nouveau_reste, 0), then=Value('Payé')),
+            When(GreaterThanOrEqual(nouveau_reste, F('total')), then=Value('En attente')),
+            default=Value('Partiellement payé'),
+        ),
+        reste=Greatest(Value(0.0), Least(F('total'), nouveau_reste)),
+    )
@@ -13,6 +13,8 @@ from django.contrib.auth import get_user_model
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
+from django.http import Http404
+from django.shortcuts import get_object_or_404
 import django_filters
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import *
@@ -30,8 +32,18 @@ from .subscription_permissions import (
     CanExportExcel,
     CanImportCSV,
 )
-from .cache_utils import cache_api_response, CacheManager
+from .cache_utils import cache_api_response, cache_stats, CacheManager, CachePolicyMixin
+from .throttling import AnonSlidingWindowRateThrottle, LoginRateThrottle
 from .pagination import OptimizedPageNumberPagination, SmartPagination
+from .sparse_fields import SparseQuerysetMixin
+from .conditional import ConditionalGetMixin
+from .dashboard import WIDGETS, ContexteDashboard, calculer_analytics, calculer_dashboard, periode_analytics
+from .produit_stats import calculer_stats_produits, get_stats_produits
+from .categories import filtrer_sous_arbre
+from .facture_document import construire_document, get_document, queryset_document
+from .xlsx import reponse_xlsx
+from .creances import REGROUPEMENTS, calculer_balance_agee, get_snapshot
+from .telephone import est_saisie_telephone, filtrer_par_prefixe, normaliser_telephone, rechercher_clients
 from .password_reset import PasswordResetManager
 from django.db import transaction
 import secrets
@@ -41,6 +53,7 @@ import string
 class CustomJWTTokenObtainPairView(TokenObtainPairView):
     """Vue d'authentification JWT personnalisée qui retourne le maximum d'informations"""
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = [AnonSlidingWindowRateThrottle, LoginRateThrottle]
 
     def post(self, request, *args, **kwargs):
         response = super().post(request, *args, **kwargs)
@@ -113,6 +126,7 @@ class EmailAuthTokenSerializer(serializers.Serializer):
 class CustomAuthTokenView(ObtainAuthToken):
     """Vue d'authentification Token (legacy) qui retourne plus d'informations et supporte l'email"""
     serializer_class = EmailAuthTokenSerializer
+    throttle_classes = [AnonSlidingWindowRateThrottle, LoginRateThrottle]
     
     def post(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data,
@@ -509,8 +523,22 @@ class FactureFilter(django_filters.FilterSet):
     def filter_by_date(self, queryset, name, value):
         return queryset.annotate(date_only=TruncDate('created_at')).filter(date_only=value)
 
+class ProduitFilter(django_filters.FilterSet):
+    # Catégorie et toutes ses sous-catégories (chemin matérialisé, sans récursion)
+    categorie_subtree = django_filters.NumberFilter(method='filter_categorie_subtree')
+
+    class Meta:
+        model = Produit
+        fields = ['entreprise', 'actif', 'categorie', 'fournisseur_principal', 'etat_produit', 'categorie_subtree']
+
+    def filter_categorie_subtree(self, queryset, name, value):
+        chemin = Categorie.objects.filter(pk=value).values_list('chemin', flat=True).first()
+        if not chemin:
+            return queryset.none()
+        return filtrer_sous_arbre(queryset, chemin, champ='categorie__chemin')
+
 # Boutique : uniquement superadmin peut y toucher
-class BoutiqueViewSet(viewsets.ModelViewSet):
+class BoutiqueViewSet(CachePolicyMixin, viewsets.ModelViewSet):
     queryset = Boutique.objects.all()
     serializer_class = BoutiqueSerializer
     permission_classes = [IsAuthenticated]
@@ -518,6 +546,12 @@ class BoutiqueViewSet(viewsets.ModelViewSet):
     filterset_fields = ['entreprise']
     search_fields = ['nom', 'ville']
     ordering_fields = ['nom']
+    cache_prefix = 'boutiques'
+    # get_queryset distingue l'administrateur plateforme (rôle)
+    cache_depends_on = ('tenant', 'role', 'params')
+    cache_policy = {
+        'list': {'timeout': 600, 'vary_on': ('tenant', 'role', 'params'), 'tags': ('boutiques',)},
+    }
     
     def get_queryset(self):
         """Filtrer les boutiques par entreprise de l'utilisateur connecté"""
@@ -572,7 +606,7 @@ class BoutiqueViewSet(viewsets.ModelViewSet):
             print(f"Erreur invalidation cache boutiques destroy: {e}")
 
 # Catégorie : gestion des catégories de produits
-class CategorieViewSet(viewsets.ModelViewSet):
+class CategorieViewSet(CachePolicyMixin, viewsets.ModelViewSet):
     queryset = Categorie.objects.all()
     serializer_class = CategorieSerializer
     permission_classes = [IsAdminOrSuperAdmin]
@@ -580,6 +614,11 @@ class CategorieViewSet(viewsets.ModelViewSet):
     filterset_fields = ['entreprise', 'actif', 'parent']
     search_fields = ['nom', 'description']
     ordering_fields = ['nom', 'created_at']
+    cache_prefix = 'categories'
+    cache_depends_on = ('tenant', 'params')
+    cache_policy = {
+        'list': {'timeout': 600, 'vary_on': ('tenant', 'params'), 'tags': ('categories',)},
+    }
     
     def get_queryset(self):
         """Filtrer les catégories par entreprise de l'utilisateur connecté (tous rôles)."""
@@ -624,7 +663,7 @@ class CategorieViewSet(viewsets.ModelViewSet):
             print(f"Erreur invalidation cache categories destroy: {e}")
 
 # Fournisseur : gestion des fournisseurs
-class FournisseurViewSet(viewsets.ModelViewSet):
+class FournisseurViewSet(CachePolicyMixin, viewsets.ModelViewSet):
     queryset = Fournisseur.objects.all()
     serializer_class = FournisseurSerializer
     permission_classes = [IsAdminOrSuperAdmin]
@@ -632,6 +671,11 @@ class FournisseurViewSet(viewsets.ModelViewSet):
     filterset_fields = ['entreprise', 'actif']
     search_fields = ['nom', 'code_fournisseur', 'email', 'telephone']
     ordering_fields = ['nom', 'created_at']
+    cache_prefix = 'fournisseurs'
+    cache_depends_on = ('tenant', 'params')
+    cache_policy = {
+        'list': {'timeout': 600, 'vary_on': ('tenant', 'params'), 'tags': ('fournisseurs',)},
+    }
     
     def get_queryset(self):
         """Filtrer les fournisseurs par entreprise de l'utilisateur connecté (tous rôles)."""
@@ -697,7 +741,7 @@ class ProduitVarianteViewSet(viewsets.ModelViewSet):
         return qs.none()
 
 # Stock : gestion des stocks par entrepôt
-class StockViewSet(viewsets.ModelViewSet):
+class StockViewSet(CachePolicyMixin, ConditionalGetMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Stock.objects.all()
     serializer_class = StockSerializer
     permission_classes = [IsAuthenticated]
@@ -705,6 +749,19 @@ class StockViewSet(viewsets.ModelViewSet):
     filterset_fields = ['produit', 'entrepot', 'variante']
     search_fields = ['produit__nom', 'emplacement']
     ordering_fields = ['quantite', 'updated_at']
+    conditional_resource = 'stocks'
+    conditional_tenant_lookup = 'entrepot__entreprise_id'
+    cache_prefix = 'stocks'
+    cache_depends_on = ('tenant', 'params')
+    cache_policy = {
+        'list': {'timeout': 120, 'vary_on': ('tenant', 'params'), 'tags': ('stocks',)},
+    }
+    sparse_select_related = [
+        ('produit', []),
+        ('entrepot', ['entrepot_nom']),
+        ('entrepot__entreprise', []),
+        ('variante', ['variante_nom', 'variante_prix_vente', 'variante_prix_achat', 'variante_sku']),
+    ]
 
     def get_queryset(self):
         """Filtrer les stocks par entreprise de l'utilisateur connecté"""
@@ -715,9 +772,7 @@ class StockViewSet(viewsets.ModelViewSet):
         else:
             queryset = queryset.none()
 
-        return queryset.select_related(
-            'produit', 'entrepot', 'entrepot__entreprise', 'variante'
-        )
+        return self.optimiser_queryset(queryset)
 
     def perform_create(self, serializer):
         instance = serializer.save()
@@ -760,8 +815,178 @@ class StockViewSet(viewsets.ModelViewSet):
         except Exception as e:
             print(f"Erreur invalidation cache stocks destroy: {e}")
 
+    def _parametre_invalide(self, request, *noms):
+        """Réponse 400 si l'un des identifiants passés en paramètre n'est pas numérique, sinon None"""
+        for nom in noms:
+            valeur = request.query_params.get(nom)
+            if valeur and not valeur.isdigit():
+                return Response({'error': f'Paramètre {nom} invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        return None
+
+    def _entrepots_autorises(self, request):
+        """Entrepôts de l'entreprise de l'utilisateur, éventuellement restreints par ?entrepot= (validé par l'appelant)"""
+        if not request.user.entreprise:
+            return []
+        entrepots = Boutique.objects.filter(entreprise=request.user.entreprise)
+        entrepot_id = request.query_params.get('entrepot')
+        if entrepot_id:
+            entrepots = entrepots.filter(id=int(entrepot_id))
+        return list(entrepots.values_list('id', flat=True))
+
+    @action(detail=False, methods=['get'], url_path='a-date')
+    def a_date(self, request):
+        """Stock à une date passée (?date=AAAA-MM-JJ&entrepot=&produit=), calculé depuis les snapshots"""
+        from datetime import date
+        from .stock_snapshots import stock_a_date
+        try:
+            jour = date.fromisoformat(request.query_params.get('date', ''))
+        except ValueError:
+            return Response({'error': 'Paramètre date requis (AAAA-MM-JJ)'}, status=status.HTTP_400_BAD_REQUEST)
+        erreur = self._parametre_invalide(request, 'produit', 'entrepot')
+        if erreur:
+            return erreur
+
+        produit_id = request.query_params.get('produit')
+        quantites = stock_a_date(
+            jour,
+            self._entrepots_autorises(request),
+            produit_ids=[int(produit_id)] if produit_id else None,
+        )
+        resultats = [
+            {'entrepot': entrepot_id, 'produit': produit_id, 'variante': variante_id, 'quantite': quantite}
+            for (entrepot_id, produit_id, variante_id), quantite in quantites.items()
+        ]
+        return Response({
+            'date': jour.isoformat(),
+            'total_unites': sum(r['quantite'] for r in resultats),
+            'stocks': resultats,
+        })
+
+    @action(detail=False, methods=['get'], url_path='evolution')
+    def evolution(self, request):
+        """Évolution du stock d'un produit (?produit=&date_debut=&date_fin=&granularite=jour|mois&entrepot=)"""
+        from datetime import date, timedelta
+        from .stock_snapshots import evolution_stock
+        produit_id = request.query_params.get('produit')
+        if not produit_id:
+            return Response({'error': 'Paramètre produit requis'}, status=status.HTTP_400_BAD_REQUEST)
+        erreur = self._parametre_invalide(request, 'produit', 'entrepot')
+        if erreur:
+            return erreur
+        produit_id = int(produit_id)
+        try:
+            date_fin = date.fromisoformat(request.query_params.get('date_fin') or timezone.localdate().isoformat())
+            date_debut = date.fromisoformat(request.query_params.get('date_debut') or (date_fin - timedelta(days=30)).isoformat())
+        except ValueError:
+            return Response({'error': 'Format de date invalide (AAAA-MM-JJ)'}, status=status.HTTP_400_BAD_REQUEST)
+        if date_debut > date_fin:
+            return Response({'error': 'date_debut doit précéder date_fin'}, status=status.HTTP_400_BAD_REQUEST)
+
+        granularite = request.query_params.get('granularite', 'jour')
+        if granularite not in ('jour', 'mois'):
+            granularite = 'jour'
+        serie = evolution_stock(produit_id, self._entrepots_autorises(request), date_debut, date_fin, granularite)
+        return Response({'produit': produit_id, 'granularite': granularite, 'serie': serie})
+
+    @action(detail=False, methods=['get'], url_path='export-xlsx', permission_classes=[IsAdminOrSuperAdmin, CanExportExcel])
+    def export_xlsx(self, request):
+        """Export Excel de l'état des stocks (mêmes filtres que la liste), en flux"""
+        return reponse_xlsx(self.filter_queryset(self.get_queryset()), [
+            ('Produit', 'produit__nom'), ('SKU', 'produit__sku'), ('Variante', 'variante__nom'),
+            ('Entrepôt', 'entrepot__nom'), ('Quantité', 'quantite'), ('Quantité réservée', 'quantite_reservee'),
+            ('Emplacement', 'emplacement'), ('Mis à jour le', 'updated_at'),
+        ], 'stocks_export', 'Stocks')
+
+# ReservationStock : quantités retenues par les paniers en cours (core.reservations)
+class ReservationStockViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = ReservationStock.objects.select_related('stock').order_by('id')
+    serializer_class = ReservationStockSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['panier', 'stock']
+
+    def get_queryset(self):
+        """Filtrer les réservations par entreprise de l'utilisateur connecté"""
+        queryset = super().get_queryset()
+        if self.request.user.entreprise:
+            queryset = queryset.filter(stock__entrepot__entreprise=self.request.user.entreprise)
+        else:
+            queryset = queryset.none()
+        return queryset
+
+    @action(detail=False, methods=['post'], url_path='reserver')
+    def reserver(self, request):
+        """
+        Réserver les lignes d'un panier au moment où elles y sont ajoutées.
+        Chaque ligne fixe la quantité réservée (0 : ligne libérée) ; l'échéance
+        de toutes les réservations du panier est repoussée.
+        """
+        from .reservations import reserver_lignes
+        from .stock_mutations import StockInsuffisant, trouver_stock
+
+        serializer = ReservationPanierSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        boutique = data['boutique']
+
+        if boutique.entreprise_id != request.user.entreprise_id:
+            return Response({'error': "Boutique non autorisée"}, status=status.HTTP_403_FORBIDDEN)
+
+        lignes = []
+        for item in data['items']:
+            produit, variante = item['produit'], item.get('variante')
+            if produit.entreprise_id != boutique.entreprise_id:
+                return Response({'error': "Produit non autorisé"}, status=status.HTTP_403_FORBIDDEN)
+            stock = trouver_stock(produit.id, boutique.id, variante.id if variante else None)
+            if stock is None:
+                if item['quantite']:
+                    return Response(
+                        {'error': f"Stock introuvable pour {produit.nom}{(' — ' + variante.nom) if variante else ''}"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                continue
+            lignes.append((stock, item['quantite']))
+
+        try:
+            reservations = reserver_lignes(data['panier'], lignes, request.user, boutique.entreprise_id)
+        except StockInsuffisant as e:
+            return Response({
+                'error': f"Stock insuffisant pour réserver {e.demande} unité(s) de plus. Disponible: {e.disponible}",
+                'stock': e.stock_id,
+                'disponible': e.disponible,
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'panier': data['panier'],
+            'expire_le': max((r.expire_le for r in reservations), default=None),
+            'reservations': ReservationStockSerializer(reservations, many=True).data,
+        })
+
+    @action(detail=False, methods=['post'], url_path='liberer')
+    def liberer(self, request):
+        """Libérer les réservations d'un panier abandonné (toutes, ou celles des stocks indiqués)"""
+        from .reservations import liberer
+
+        panier = request.data.get('panier')
+        if not panier:
+            return Response({'error': 'panier est requis'}, status=status.HTTP_400_BAD_REQUEST)
+        reservations = self.get_queryset().filter(panier=panier)
+        stocks = request.data.get('stocks')
+        if stocks:
+            try:
+                reservations = reservations.filter(stock_id__in=[int(stock_id) for stock_id in stocks])
+            except (TypeError, ValueError):
+                return Response({'error': 'stocks doit être une liste d\'identifiants'}, status=status.HTTP_400_BAD_REQUEST)
+
+        liberees = liberer(
+            panier,
+            stock_ids=list(reservations.values_list('stock_id', flat=True)),
+            entreprise_id=request.user.entreprise_id,
+        )
+        return Response({'panier': panier, 'liberees': liberees})
+
 # MouvementStock : historique des mouvements de stock
-class MouvementStockViewSet(viewsets.ModelViewSet):
+class MouvementStockViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = MouvementStock.objects.all()
     serializer_class = MouvementStockSerializer
     permission_classes = [IsAdminOrSuperAdmin]
@@ -769,6 +994,13 @@ class MouvementStockViewSet(viewsets.ModelViewSet):
     filterset_fields = ['produit', 'entrepot', 'type_mouvement', 'utilisateur', 'variante']
     search_fields = ['produit__nom', 'motif', 'reference_document']
     ordering_fields = ['created_at', 'quantite']
+    sparse_select_related = [
+        ('produit', ['produit_nom']),
+        ('entrepot', ['entrepot_nom']),
+        ('utilisateur', ['utilisateur_nom']),
+        ('entrepot__entreprise', []),
+        ('variante', ['variante_nom']),
+    ]
     
     def get_queryset(self):
         """Filtrer les mouvements par entreprise de l'utilisateur connecté"""
@@ -781,18 +1013,34 @@ class MouvementStockViewSet(viewsets.ModelViewSet):
             # Si pas d'entreprise, retourner un queryset vide
             queryset = queryset.none()
         
-        return queryset.select_related('produit', 'entrepot', 'utilisateur', 'entrepot__entreprise')
+        return self.optimiser_queryset(queryset)
     
     def get_permissions(self):
         if self.action in ('list', 'retrieve', 'transfert_stock'):
             permission_classes = [IsAuthenticated]
+        elif self.action == 'export_xlsx':
+            permission_classes = [IsAdminOrSuperAdmin, CanExportExcel]
         else:
             permission_classes = [IsAdminOrSuperAdmin]
         return [permission() for permission in permission_classes]
+
+    @action(detail=False, methods=['get'], url_path='export-xlsx', permission_classes=[IsAdminOrSuperAdmin, CanExportExcel])
+    def export_xlsx(self, request):
+        """Export Excel de l'historique des mouvements (mêmes filtres que la liste), en flux"""
+        return reponse_xlsx(self.filter_queryset(self.get_queryset()), [
+            ('Date', 'created_at'), ('Type', 'type_mouvement'),
+            ('Produit', 'produit__nom'), ('SKU', 'produit__sku'), ('Variante', 'variante__nom'),
+            ('Entrepôt', 'entrepot__nom'), ('Quantité', 'quantite'),
+            ('Quantité avant', 'quantite_avant'), ('Quantité après', 'quantite_apres'),
+            ('Référence document', 'reference_document'), ('Motif', 'motif'),
+            ('Utilisateur', 'utilisateur__username'),
+        ], 'mouvements_export', 'Mouvements', conversions={
+            'type_mouvement': dict(MouvementStock.TYPE_CHOICES).get,
+        })
     
     def create(self, request, *args, **kwargs):
-        from .models import Stock, ProduitVariante
         from django.db import transaction
+        from .stock_mutations import StockInsuffisant, ajouter, fixer, trouver_stock
 
         produit_id = request.data.get('produit')
         entrepot_id = request.data.get('entrepot')
@@ -804,32 +1052,23 @@ class MouvementStockViewSet(viewsets.ModelViewSet):
             return Response({'error': 'produit, entrepot et quantite sont requis'}, status=400)
 
         with transaction.atomic():
-            # Récupérer ou créer le stock approprié
-            stock_filter = dict(produit_id=produit_id, entrepot_id=entrepot_id)
-            if variante_id:
-                stock_filter['variante_id'] = variante_id
-            else:
-                stock_filter['variante__isnull'] = True
-
-            stock = Stock.objects.select_for_update().filter(**stock_filter).first()
-            if not stock:
-                create_kwargs = dict(produit_id=produit_id, entrepot_id=entrepot_id, quantite=0)
-                if variante_id:
-                    create_kwargs['variante_id'] = variante_id
-                stock = Stock.objects.create(**create_kwargs)
-
-            quantite_avant = stock.quantite
-            if type_mouvement == 'entree':
-                quantite_apres = quantite_avant + quantite
-            elif type_mouvement == 'sortie':
-                quantite_apres = max(0, quantite_avant - quantite)
-            elif type_mouvement == 'ajustement':
-                quantite_apres = quantite
-            else:
-                quantite_apres = quantite_avant + quantite
+            # Récupérer ou créer le stock approprié, sans verrou : la quantité est
+            # modifiée par un UPDATE conditionnel (core.stock_mutations)
+            stock = trouver_stock(produit_id, entrepot_id, variante_id, creer=True)
 
-            stock.quantite = quantite_apres
-            stock.save(update_fields=['quantite', 'updated_at'])
+            try:
+                if type_mouvement == 'sortie':
+                    # Plafonnée à la quantité libre : les unités réservées par les paniers restent
+                    variation = fixer(stock, lambda avant, reservee: max(min(avant, reservee), avant - quantite))
+                elif type_mouvement == 'ajustement':
+                    variation = fixer(stock, lambda avant, reservee: quantite)
+                else:
+                    variation = ajouter(stock, quantite)
+            except StockInsuffisant as e:
+                return Response({
+                    'error': f"Quantité inférieure aux réservations des paniers en cours. Disponible: {e.disponible}, Demandé: {e.demande}"
+                }, status=status.HTTP_400_BAD_REQUEST)
+            quantite_avant, quantite_apres = variation.quantite_avant, variation.quantite_apres
 
             # Construire la data enrichie pour le serializer
             data = request.data.copy() if hasattr(request.data, 'copy') else dict(request.data)
@@ -862,8 +1101,10 @@ class MouvementStockViewSet(viewsets.ModelViewSet):
     def transfert_stock(self, request):
         """Effectuer un transfert de stock entre entrepôts avec envoi d'emails"""
         try:
+            from django.db import transaction
             from .utils import send_transfer_notification_emails
-            from .models import Boutique, Stock, Produit
+            from .models import Boutique, Produit
+            from .stock_mutations import StockInsuffisant, ajouter, trouver_stock
             
             # Récupérer les données du transfert
             produit_id = request.data.get('produit')
@@ -877,6 +1118,14 @@ class MouvementStockViewSet(viewsets.ModelViewSet):
                 return Response({
                     'error': 'Tous les champs sont obligatoires'
                 }, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                quantite = int(quantite)
+            except (TypeError, ValueError):
+                quantite = 0
+            if quantite < 1:
+                return Response({
+                    'error': 'La quantité doit être un entier positif'
+                }, status=status.HTTP_400_BAD_REQUEST)
             
             # Vérifier que les entrepôts appartiennent à la même entreprise
             entrepot_source = Boutique.objects.get(id=entrepot_source_id)
@@ -888,67 +1137,53 @@ class MouvementStockViewSet(viewsets.ModelViewSet):
                 }, status=status.HTTP_400_BAD_REQUEST)
             
             # Vérifier le stock disponible
-            try:
-                stock_source = Stock.objects.get(
-                    produit_id=produit_id,
-                    entrepot_id=entrepot_source_id
-                )
-            except Stock.DoesNotExist:
+            stock_source = trouver_stock(produit_id, entrepot_source_id)
+            if stock_source is None:
                 return Response({
                     'error': 'Stock non trouvé dans l\'entrepôt source'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            if stock_source.quantite < quantite:
-                return Response({
-                    'error': f'Stock insuffisant. Disponible: {stock_source.quantite}, Demandé: {quantite}'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
             # Récupérer le produit
             produit = Produit.objects.get(id=produit_id)
             
             # Générer la référence du transfert
             reference_transfert = f"TRF-{entrepot_source.nom}-{entrepot_destination.nom}"
             
-            # Créer le mouvement de sortie
-            mouvement_sortie = MouvementStock.objects.create(
-                produit=produit,
-                entrepot=entrepot_source,
-                type_mouvement='transfert',
-                quantite=quantite,
-                quantite_avant=stock_source.quantite,
-                quantite_apres=stock_source.quantite - quantite,
-                motif=f'Transfert vers {entrepot_destination.nom} - {motif}',
-                reference_document=reference_transfert,
-                utilisateur=request.user
-            )
-            
-            # Mettre à jour le stock source
-            stock_source.quantite -= quantite
-            stock_source.save()
-            
-            # Créer ou mettre à jour le stock destination
-            stock_destination, created = Stock.objects.get_or_create(
-                produit=produit,
-                entrepot=entrepot_destination,
-                defaults={'quantite': quantite}
-            )
-            
-            if not created:
-                stock_destination.quantite += quantite
-                stock_destination.save()
-            
-            # Créer le mouvement d'entrée
-            mouvement_entree = MouvementStock.objects.create(
-                produit=produit,
-                entrepot=entrepot_destination,
-                type_mouvement='transfert',
-                quantite=quantite,
-                quantite_avant=stock_destination.quantite - quantite if not created else 0,
-                quantite_apres=stock_destination.quantite,
-                motif=f'Transfert depuis {entrepot_source.nom} - {motif}',
-                reference_document=reference_transfert,
-                utilisateur=request.user
-            )
+            # Sortie puis entrée en une transaction ; la sortie n'est appliquée que si
+            # le stock source suffit au moment de l'UPDATE (pas de vente concurrente perdue)
+            entreprise_id = entrepot_source.entreprise_id
+            try:
+                with transaction.atomic():
+                    sortie = ajouter(stock_source, -quantite, entreprise_id=entreprise_id)
+                    stock_destination = trouver_stock(produit_id, entrepot_destination_id, creer=True)
+                    entree = ajouter(stock_destination, quantite, entreprise_id=entreprise_id)
+                    
+                    mouvement_sortie = MouvementStock.objects.create(
+                        produit=produit,
+                        entrepot=entrepot_source,
+                        type_mouvement='transfert',
+                        quantite=quantite,
+                        quantite_avant=sortie.quantite_avant,
+                        quantite_apres=sortie.quantite_apres,
+                        motif=f'Transfert vers {entrepot_destination.nom} - {motif}',
+                        reference_document=reference_transfert,
+                        utilisateur=request.user
+                    )
+                    mouvement_entree = MouvementStock.objects.create(
+                        produit=produit,
+                        entrepot=entrepot_destination,
+                        type_mouvement='transfert',
+                        quantite=quantite,
+                        quantite_avant=entree.quantite_avant,
+                        quantite_apres=entree.quantite_apres,
+                        motif=f'Transfert depuis {entrepot_source.nom} - {motif}',
+                        reference_document=reference_transfert,
+                        utilisateur=request.user
+                    )
+            except StockInsuffisant as e:
+                return Response({
+                    'error': f'Stock insuffisant. Disponible: {e.disponible}, Demandé: {quantite}'
+                }, status=status.HTTP_400_BAD_REQUEST)
             
             # Préparer les données pour l'envoi d'emails
             transfer_data = {
@@ -980,14 +1215,30 @@ class MouvementStockViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 # Produit : gestion complète des produits
-class ProduitViewSet(viewsets.ModelViewSet):
+class ProduitViewSet(CachePolicyMixin, ConditionalGetMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Produit.objects.all()
     serializer_class = ProduitSerializer
     permission_classes = [IsAdminOrSuperAdmin]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['entreprise', 'actif', 'categorie', 'fournisseur_principal', 'etat_produit']
+    filterset_class = ProduitFilter
     search_fields = ['nom', 'sku', 'reference', 'code_barres', 'description', 'marque', 'modele']
     ordering_fields = ['nom', 'prix_vente', 'quantite', 'created_at']
+    conditional_resource = 'produits'
+    conditional_actions = ('list', 'stats')
+    cache_prefix = 'produits'
+    cache_depends_on = ('tenant', 'params')
+    cache_policy = {
+        'list': {'timeout': 300, 'vary_on': ('tenant', 'params'), 'tags': ('produits', 'fournisseurs')},
+    }
+    sparse_select_related = [
+        ('categorie', ['categorie_nom']),
+        ('fournisseur_principal', ['fournisseur_nom']),
+    ]
+    sparse_prefetch_related = [
+        # Jointures des champs imbriqués préchargées une fois pour toute la page
+        (django_models.Prefetch('stocks', queryset=Stock.objects.select_related('entrepot', 'variante')), ['stocks']),
+        (django_models.Prefetch('variantes', queryset=ProduitVariante.objects.prefetch_related('stocks')), ['variantes']),
+    ]
     # pagination_class = SmartPagination  # Désactivé pour maintenir la compatibilité
     
     def list(self, request, *args, **kwargs):
@@ -1003,12 +1254,15 @@ class ProduitViewSet(viewsets.ModelViewSet):
         else:
             # Si pas d'entreprise, retourner un queryset vide
             queryset = queryset.none()
-        
-        return queryset.select_related(
-            'categorie',
-            'entreprise',
-            'fournisseur_principal'
-        ).prefetch_related('stocks', 'variantes')
+
+        # nb_variantes : compté en SQL si les variantes ne sont pas préchargées
+        if self.champ_demande('nb_variantes') and not self.champ_demande('variantes'):
+            queryset = queryset.annotate(
+                nb_variantes_actives=django_models.Count(
+                    'variantes', filter=django_models.Q(variantes__actif=True)
+                )
+            )
+        return self.optimiser_queryset(queryset)
     
     def get_permissions(self):
         """Permissions dynamiques selon l'action"""
@@ -1020,6 +1274,8 @@ class ProduitViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAdminOrSuperAdmin, CanImportCSV]
         elif self.action == 'export_produits':
             permission_classes = [IsAdminOrSuperAdmin, CanExportCSV]
+        elif self.action == 'export_xlsx':
+            permission_classes = [IsAdminOrSuperAdmin, CanExportExcel]
         else:
             permission_classes = [IsAdminOrSuperAdmin]
         return [permission() for permission in permission_classes]
@@ -1262,31 +1518,25 @@ class ProduitViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=False, methods=['get'], url_path='export-xlsx', permission_classes=[IsAdminOrSuperAdmin, CanExportExcel])
+    def export_xlsx(self, request):
+        """Export Excel des produits (mêmes filtres que la liste), en flux"""
+        return reponse_xlsx(self.filter_queryset(self.get_queryset()), [
+            ('Nom', 'nom'), ('SKU', 'sku'), ('Description', 'description'),
+            ('Code-barres', 'code_barres'), ('Référence', 'reference'),
+            ("Prix d'achat", 'prix_achat'), ('Prix de vente', 'prix_vente'), ('Prix de gros', 'prix_gros'),
+            ('Stock minimum', 'stock_minimum'), ('Stock maximum', 'stock_maximum'), ('Quantité actuelle', 'quantite'),
+            ('Catégorie', 'categorie__nom'), ('Fournisseur', 'fournisseur_principal__nom'),
+            ('Unité de mesure', 'unite_mesure'), ('Marque', 'marque'), ('Modèle', 'modele'),
+            ('État', 'etat_produit'), ('Actif', 'actif'), ('Créé le', 'created_at'),
+        ], 'produits_export', 'Produits')
+
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def stats(self, request):
-        """Agrégats stock calculés côté backend pour le dashboard."""
-        from django.db.models import Sum, Count, F, ExpressionWrapper, FloatField
-        qs = self.get_queryset()
-        totals = qs.aggregate(
-            total_produits=Count('id'),
-            total_unites=Sum('quantite'),
-            valeur_stock=Sum(
-                ExpressionWrapper(F('quantite') * F('prix_vente'), output_field=FloatField())
-            ),
-            nb_rupture=Count('id', filter=django_models.Q(quantite=0)),
-            nb_critique=Count('id', filter=django_models.Q(quantite__gt=0, quantite__lt=10)),
-            nb_faible=Count('id', filter=django_models.Q(quantite__gte=10, quantite__lt=50)),
-            nb_normal=Count('id', filter=django_models.Q(quantite__gte=50)),
-        )
-        return Response({
-            'total_produits': totals['total_produits'] or 0,
-            'total_unites': totals['total_unites'] or 0,
-            'valeur_stock': round(totals['valeur_stock'] or 0, 2),
-            'nb_rupture': totals['nb_rupture'] or 0,
-            'nb_critique': totals['nb_critique'] or 0,
-            'nb_faible': totals['nb_faible'] or 0,
-            'nb_normal': totals['nb_normal'] or 0,
-        })
+        """Agrégats stock pour le dashboard, servis depuis les compteurs en cache (core.produit_stats)."""
+        if not request.user.entreprise_id:
+            return Response(calculer_stats_produits(Produit.objects.none()))
+        return Response(get_stats_produits(request.user.entreprise_id))
 
 # PrixProduit : visible uniquement par superadmin
 class PrixProduitViewSet(viewsets.ModelViewSet):
@@ -1347,11 +1597,23 @@ class SequenceFactureViewSet(viewsets.ModelViewSet):
         except Boutique.DoesNotExist:
             return Response({'error': 'Boutique non trouvée'}, status=status.HTTP_404_NOT_FOUND)
 
+class ClientSearchFilter(filters.SearchFilter):
+    """
+    ?search= : une saisie de type téléphone est cherchée par préfixe sur le
+    numéro normalisé (indexé) ; sinon recherche texte habituelle.
+    """
+    def filter_queryset(self, request, queryset, view):
+        saisie = request.query_params.get(self.search_param, '')
+        if est_saisie_telephone(saisie):
+            return filtrer_par_prefixe(queryset, normaliser_telephone(saisie))
+        return super().filter_queryset(request, queryset, view)
+
+
 class ClientViewSet(viewsets.ModelViewSet):
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ClientSearchFilter, filters.OrderingFilter]
     filterset_fields = ['boutique', 'entreprise', 'actif']
     search_fields = ['nom', 'prenom', 'telephone', 'email']
     ordering_fields = ['nom', 'prenom', 'date_creation']
@@ -1379,14 +1641,30 @@ class ClientViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def search_by_phone(self, request):
-        """Rechercher un client par numéro de téléphone"""
+        """
+        Rechercher un client par numéro de téléphone (préfixe, formats +237 / espaces / tirets acceptés).
+        Params: phone, limit (défaut 20, max 50)
+        """
         phone = request.query_params.get('phone', '')
-        if not phone:
+        if not est_saisie_telephone(phone):
             return Response({'error': 'Numéro de téléphone requis'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        clients = self.get_queryset().filter(telephone__icontains=phone)
-        serializer = self.get_serializer(clients, many=True)
-        return Response(serializer.data)
+        if not request.user.entreprise_id:
+            return Response([])
+        try:
+            limite = max(1, min(int(request.query_params.get('limit', 20)), 50))
+        except ValueError:
+            limite = 20
+        
+        variante = '|'.join(request.query_params.get(p, '') for p in ('fields', 'profile', 'expand'))
+        data = rechercher_clients(
+            self.get_queryset(),
+            request.user.entreprise_id,
+            phone,
+            lambda clients: self.get_serializer(clients, many=True).data,
+            limite=limite,
+            variante=variante,
+        )
+        return Response(data)
 
 class PartenaireViewSet(viewsets.ModelViewSet):
     queryset = Partenaire.objects.all()
@@ -1429,7 +1707,7 @@ class PartenaireViewSet(viewsets.ModelViewSet):
         serializer.save(**kwargs)
 
 # Facture : filtrable par type, boutique, status
-class FactureViewSet(viewsets.ModelViewSet):
+class FactureViewSet(ConditionalGetMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Facture.objects.all()
     serializer_class = FactureSerializer
     permission_classes = [IsAdminOrSuperAdmin]
@@ -1437,6 +1715,16 @@ class FactureViewSet(viewsets.ModelViewSet):
     filterset_class = FactureFilter
     search_fields = ['created_by__username']
     ordering_fields = ['total', 'reste', 'created_at']
+    conditional_resource = 'factures'
+    conditional_actions = ('list', 'analytics', 'document')
+    conditional_tenant_lookup = 'boutique__entreprise_id'
+    sparse_select_related = [
+        ('boutique', ['boutique_nom']),
+        ('boutique__entreprise', []),
+        ('created_by', ['created_by_username', 'created_by_nom']),
+        ('client', ['client_nom']),
+        ('partenaire', ['partenaire_nom']),
+    ]
     
     def get_queryset(self):
         """Filtrer les factures par entreprise de l'utilisateur connecté"""
@@ -1456,14 +1744,16 @@ class FactureViewSet(viewsets.ModelViewSet):
         else:
             queryset = queryset.none()
 
-        return queryset.select_related('boutique', 'boutique__entreprise', 'created_by', 'client', 'partenaire')
+        return self.optimiser_queryset(queryset)
 
     def get_permissions(self):
         """Permissions dynamiques selon l'action"""
-        if self.action in ('list', 'retrieve'):
+        if self.action in ('list', 'retrieve', 'document'):
             permission_classes = [IsAuthenticated]
         elif self.action in ('create', 'create_with_stock'):
             permission_classes = [IsAuthenticated, CanCreateFacture]
+        elif self.action == 'export_xlsx':
+            permission_classes = [IsAdminOrSuperAdmin, CanExportExcel]
         else:
             permission_classes = [IsAdminOrSuperAdmin]
         return [permission() for permission in permission_classes]
@@ -1504,13 +1794,17 @@ class FactureViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
 
+        from .reservations import prendre
+        from .stock_mutations import StockInsuffisant, ajouter, reserver
+
         items = data['items']
         produit_ids = [item['produit'].id for item in items]
         variante_ids = [item['variante'].id for item in items if item.get('variante')]
 
         with transaction.atomic():
-            # Verrouiller les stocks concernés — produit-niveau ET variante-niveau
-            stocks_qs = Stock.objects.select_for_update().filter(
+            # Stocks concernés — produit-niveau ET variante-niveau — lus sans verrou :
+            # ils ne sont modifiés qu'en fin de transaction, par UPDATE conditionnel
+            stocks_qs = Stock.objects.filter(
                 entrepot=boutique,
                 produit_id__in=produit_ids
             )
@@ -1525,25 +1819,34 @@ class FactureViewSet(viewsets.ModelViewSet):
                 key = (item['produit'].id, v.id if v else None)
                 return stocks_map.get(key)
 
-            # Vérifier stock suffisant
+            def get_label(item):
+                v = item.get('variante')
+                return f"{item['produit'].nom}{(' — ' + v.nom) if v else ''}"
+
+            # Réservations du panier (core.reservations) : ces quantités sont déjà acquises,
+            # elles sont converties en vente par l'UPDATE qui décompte le stock
+            reservees = prendre(data['panier'], boutique.id) if data.get('panier') else {}
+
+            # Vérifier stock suffisant (contrôle définitif au moment de l'UPDATE)
             for item in items:
                 stock = get_stock(item)
-                v = item.get('variante')
-                label = f"{item['produit'].nom}{(' — ' + v.nom) if v else ''}"
+                label = get_label(item)
                 if not stock:
                     raise serializers.ValidationError(
                         f"Stock introuvable pour {label}"
                     )
-                if stock.quantite < item['quantite']:
+                disponible = stock.quantite - stock.quantite_reservee + reservees.get(stock.pk, 0)
+                if disponible < item['quantite']:
                     raise serializers.ValidationError(
-                        f"Stock insuffisant pour {label} (disponible: {stock.quantite})"
+                        f"Stock insuffisant pour {label} (disponible: {max(0, disponible)})"
                     )
 
-            # Créer la facture
+            # Créer la facture ; le versement initial ramène ensuite reste à la valeur saisie
+            montant_verse_initial = float(data['total']) - float(data['reste'])
             facture = Facture.objects.create(
                 type=data['type'],
                 total=data['total'],
-                reste=data['reste'],
+                reste=data['total'] if montant_verse_initial > 0 else data['reste'],
                 status=data.get('status', 'En attente'),
                 client=data.get('client'),
                 partenaire=data.get('partenaire'),
@@ -1553,7 +1856,6 @@ class FactureViewSet(viewsets.ModelViewSet):
             )
 
             # Enregistrer le versement initial saisi à la facturation
-            montant_verse_initial = float(data['total']) - float(data['reste'])
             if montant_verse_initial > 0:
                 Versement.objects.create(
                     facture=facture,
@@ -1561,16 +1863,13 @@ class FactureViewSet(viewsets.ModelViewSet):
                     created_by=request.user,
                     boutique=boutique,
                 )
+                facture.refresh_from_db(fields=['reste', 'status'])
 
             commandes = []
-            mouvements = []
 
-            # Créer commandes + mouvements + mise à jour stock
+            # Créer commandes
             for item in items:
                 variante = item.get('variante')
-                stock = get_stock(item)
-                quantite_avant = stock.quantite
-                quantite_apres = quantite_avant - item['quantite']
 
                 commande_kwargs = dict(
                     facture=facture,
@@ -1588,25 +1887,6 @@ class FactureViewSet(viewsets.ModelViewSet):
 
                 commandes.append(commande)
 
-                # Mettre à jour le stock
-                stock.quantite = quantite_apres
-                stock.save(update_fields=['quantite', 'updated_at'])
-
-                # Créer mouvement stock
-                mouvement = MouvementStock.objects.create(
-                    produit=item['produit'],
-                    variante=variante,
-                    entrepot=boutique,
-                    type_mouvement='sortie',
-                    quantite=item['quantite'],
-                    quantite_avant=quantite_avant,
-                    quantite_apres=quantite_apres,
-                    motif=f"Vente - Facture {facture.numero}",
-                    reference_document=facture.numero,
-                    utilisateur=request.user,
-                )
-                mouvements.append(mouvement)
-
                 # Journal par ligne
                 try:
                     create_journal_entry(
@@ -1625,6 +1905,48 @@ class FactureViewSet(viewsets.ModelViewSet):
                 except Exception:
                     pass
 
+            # Mettre à jour les stocks en dernier : les verrous de ligne ne sont tenus que
+            # jusqu'à la validation. Ordre des stocks fixe : pas d'interblocage entre deux ventes.
+            # Les réservations de lignes retirées du panier sont rendues dans le même ordre
+            vendus = {get_stock(item).pk for item in items}
+            non_vendus = Stock.objects.in_bulk([pk for pk in reservees if pk not in vendus])
+            operations = sorted(
+                [(get_stock(item).pk, index) for index, item in enumerate(items)]
+                + [(pk, -1) for pk in non_vendus]
+            )
+            variations = {}
+            for stock_id, index in operations:
+                if index < 0:
+                    reserver(non_vendus[stock_id], -reservees.pop(stock_id), entreprise_id=boutique.entreprise_id)
+                    continue
+                item = items[index]
+                try:
+                    variations[index] = ajouter(
+                        get_stock(item), -item['quantite'], entreprise_id=boutique.entreprise_id,
+                        reservee=reservees.pop(stock_id, 0),
+                    )
+                except StockInsuffisant as e:
+                    raise serializers.ValidationError(
+                        f"Stock insuffisant pour {get_label(item)} (disponible: {e.disponible})"
+                    )
+
+            # Mouvements de stock (quantités avant / après renvoyées par l'UPDATE)
+            MouvementStock.objects.bulk_create([
+                MouvementStock(
+                    produit=item['produit'],
+                    variante=item.get('variante'),
+                    entrepot=boutique,
+                    type_mouvement='sortie',
+                    quantite=item['quantite'],
+                    quantite_avant=variations[index].quantite_avant,
+                    quantite_apres=variations[index].quantite_apres,
+                    motif=f"Vente - Facture {facture.numero}",
+                    reference_document=facture.numero,
+                    utilisateur=request.user,
+                )
+                for index, item in enumerate(items)
+            ])
+
             # Journal facture
             try:
                 create_journal_entry(
@@ -1653,21 +1975,21 @@ class FactureViewSet(viewsets.ModelViewSet):
             except Exception:
                 pass
 
-            # Réponse
-            facture_data = FactureSerializer(facture).data
-            if data['type'] == 'client':
-                commandes_data = CommandeClientSerializer(commandes, many=True).data
-            else:
-                commandes_data = CommandePartenaireSerializer(commandes, many=True).data
+        # Réponse (après validation : la sérialisation ne prolonge pas les verrous)
+        facture_data = FactureSerializer(facture).data
+        if data['type'] == 'client':
+            commandes_data = CommandeClientSerializer(commandes, many=True).data
+        else:
+            commandes_data = CommandePartenaireSerializer(commandes, many=True).data
 
-            return Response(
-                {
-                    'success': True,
-                    'facture': facture_data,
-                    'commandes': commandes_data
-                },
-                status=status.HTTP_201_CREATED
-            )
+        return Response(
+            {
+                'success': True,
+                'facture': facture_data,
+                'commandes': commandes_data
+            },
+            status=status.HTTP_201_CREATED
+        )
 
     def perform_update(self, serializer):
         instance = serializer.save()
@@ -1698,6 +2020,8 @@ class FactureViewSet(viewsets.ModelViewSet):
         if facture.status == 'Annulée':
             return Response({'error': 'Cette facture est déjà annulée.'}, status=status.HTTP_400_BAD_REQUEST)
 
+        from .stock_mutations import ajouter, trouver_stock
+
         with transaction.atomic():
             # Récupérer toutes les commandes
             if facture.type == 'client':
@@ -1705,29 +2029,29 @@ class FactureViewSet(viewsets.ModelViewSet):
             else:
                 commandes = list(facture.commandes_partenaire.select_related('produit').all())
 
+            # Remise en stock par UPDATE (pas de relecture), dans l'ordre des stocks
+            retours = []
             for commande in commandes:
-                # Retrouver ou créer le stock
-                stock = Stock.objects.select_for_update().filter(
-                    entrepot=facture.boutique,
-                    produit=commande.produit
-                ).first()
-
+                # Stock du produit (ou de la variante) vendu dans la boutique de la facture
+                stock = trouver_stock(commande.produit_id, facture.boutique_id, commande.variante_id)
                 if stock:
-                    quantite_avant = stock.quantite
-                    stock.quantite += commande.quantite
-                    stock.save()
-
-                    MouvementStock.objects.create(
-                        produit=commande.produit,
-                        entrepot=facture.boutique,
-                        type_mouvement='entree',
-                        quantite=commande.quantite,
-                        quantite_avant=quantite_avant,
-                        quantite_apres=stock.quantite,
-                        motif=f"Annulation facture {facture.numero}",
-                        reference_document=facture.numero,
-                        utilisateur=request.user,
-                    )
+                    retours.append((stock, commande))
+
+            for stock, commande in sorted(retours, key=lambda retour: retour[0].pk):
+                variation = ajouter(stock, commande.quantite, entreprise_id=facture.boutique.entreprise_id)
+
+                MouvementStock.objects.create(
+                    produit=commande.produit,
+                    variante_id=commande.variante_id,
+                    entrepot=facture.boutique,
+                    type_mouvement='entree',
+                    quantite=commande.quantite,
+                    quantite_avant=variation.quantite_avant,
+                    quantite_apres=variation.quantite_apres,
+                    motif=f"Annulation facture {facture.numero}",
+                    reference_document=facture.numero,
+                    utilisateur=request.user,
+                )
 
             # Annuler la facture
             facture.status = 'Annulée'
@@ -1761,150 +2085,100 @@ class FactureViewSet(viewsets.ModelViewSet):
 
         return Response({'success': True, 'message': f'Facture {facture.numero} annulée avec succès.'})
 
+    @action(detail=True, methods=['get'], url_path='document')
+    def document(self, request, pk=None):
+        """
+        Facture complète en une requête HTTP : en-tête, lignes (produit, variante),
+        versements et totaux calculés. Mise en cache jusqu'à la prochaine écriture
+        sur les factures de l'entreprise.
+        """
+        def charger():
+            facture = get_object_or_404(queryset_document(self.get_queryset()), pk=pk)
+            self.check_object_permissions(request, facture)
+            return facture
+
+        entreprise_id = request.user.entreprise_id
+        if not entreprise_id:
+            # Administrateur plateforme : pas de cache par entreprise
+            return Response(construire_document(charger()))
+        if not str(pk).isdigit():
+            raise Http404
+        return Response(get_document(entreprise_id, int(pk), charger))
+
+    @action(detail=False, methods=['get'], url_path='export-xlsx', permission_classes=[IsAdminOrSuperAdmin, CanExportExcel])
+    def export_xlsx(self, request):
+        """Export Excel des factures (mêmes filtres que la liste), en flux"""
+        return reponse_xlsx(self.filter_queryset(self.get_queryset()), [
+            ('Numéro', 'numero'), ('Date', 'created_at'), ('Type', 'type'), ('Statut', 'status'),
+            ('Client', 'client__nom'), ('Prénom client', 'client__prenom'), ('Partenaire', 'partenaire__nom'),
+            ('Boutique', 'boutique__nom'), ('Total', 'total'), ('Reste', 'reste'),
+            ('Créée par', 'created_by__username'),
+        ], 'factures_export', 'Factures', conversions={
+            'type': dict(Facture.TYPES).get,
+        })
+
     @action(detail=False, methods=['get'], url_path='analytics', permission_classes=[IsAuthenticated])
     def analytics(self, request):
         """
         Statistiques CA par période (jour/semaine/mois).
         Params: date_debut, date_fin, boutique, granularite (jour|semaine|mois)
         """
-        from django.db.models import Sum, Count, Q, F
-        from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
-        from datetime import datetime, timedelta
-        import json
-
         boutique_id = request.query_params.get('boutique')
-        date_debut_str = request.query_params.get('date_debut')
-        date_fin_str = request.query_params.get('date_fin')
         granularite = request.query_params.get('granularite', 'jour')
 
-        qs = self.get_queryset().exclude(status='Annulée')
-
+        qs = self.get_queryset()
         if boutique_id:
             qs = qs.filter(boutique_id=boutique_id)
 
         # Période par défaut : 30 derniers jours
-        now = timezone.now()
-        if date_debut_str:
-            try:
-                date_debut = datetime.strptime(date_debut_str, '%Y-%m-%d').date()
-            except ValueError:
-                date_debut = (now - timedelta(days=30)).date()
-        else:
-            date_debut = (now - timedelta(days=30)).date()
+        date_debut, date_fin = periode_analytics(request.query_params)
+        return Response(calculer_analytics(qs, date_debut, date_fin, granularite))
 
-        if date_fin_str:
-            try:
-                date_fin = datetime.strptime(date_fin_str, '%Y-%m-%d').date()
-            except ValueError:
-                date_fin = now.date()
-        else:
-            date_fin = now.date()
-
-        qs = qs.filter(created_at__date__gte=date_debut, created_at__date__lte=date_fin)
-
-        # Choisir la granularité
-        trunc_fn = {'semaine': TruncWeek, 'mois': TruncMonth}.get(granularite, TruncDay)
-
-        serie = (
-            qs.annotate(periode=trunc_fn('created_at'))
-            .values('periode')
-            .annotate(
-                ca=Sum('total'),
-                nb_factures=Count('id'),
-                montant_verse=Sum('total') - Sum('reste'),
+    @action(detail=False, methods=['get'], url_path='aging')
+    def aging(self, request):
+        """
+        Balance âgée des créances : factures non soldées par tranche 0-30 / 31-60 / 61-90 / 90+ jours.
+        Params: par (client|partenaire|boutique), type (client|partenaire), boutique, limit, live=1
+        Sans boutique ni live, la balance du jour est servie depuis le snapshot en cache.
+        """
+        par = request.query_params.get('par') or None
+        if par and par not in REGROUPEMENTS:
+            return Response(
+                {'error': f"Regroupement inconnu: {par} (disponibles: {', '.join(REGROUPEMENTS)})"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            .order_by('periode')
-        )
-
-        # KPIs globaux de la période
-        totaux = qs.aggregate(
-            ca_total=Sum('total'),
-            total_verse=Sum('total') - Sum('reste'),
-            total_reste=Sum('reste'),
-            nb_factures=Count('id'),
-            nb_payees=Count('id', filter=Q(status='Payé')),
-            nb_partielles=Count('id', filter=Q(status='Partiellement payé')),
-            nb_attente=Count('id', filter=Q(status='En attente')),
-        )
-
-        ca_clients = qs.filter(type='client').aggregate(ca=Sum('total'))['ca'] or 0
-        ca_partenaires = qs.filter(type='partenaire').aggregate(ca=Sum('total'))['ca'] or 0
-
-        # Top 5 produits (par CA) via commandes_client + commandes_partenaire
-        from .models import CommandeClient, CommandePartenaire
-        facture_ids = list(qs.values_list('id', flat=True))
-
-        top_produits_client = (
-            CommandeClient.objects.filter(facture_id__in=facture_ids)
-            .values('produit__nom')
-            .annotate(ca=Sum(F('quantite') * F('prix_unitaire_fcfa')), qte=Sum('quantite'))
-            .order_by('-ca')[:5]
-        )
-        top_produits_partenaire = (
-            CommandePartenaire.objects.filter(facture_id__in=facture_ids)
-            .values('produit__nom')
-            .annotate(ca=Sum(F('quantite') * F('prix_unitaire_fcfa')), qte=Sum('quantite'))
-            .order_by('-ca')[:5]
-        )
-
-        # Fusionner + trier top produits
-        produits_dict = {}
-        for p in list(top_produits_client) + list(top_produits_partenaire):
-            nom = p['produit__nom']
-            if nom not in produits_dict:
-                produits_dict[nom] = {'nom': nom, 'ca': 0, 'qte': 0}
-            produits_dict[nom]['ca'] += p['ca'] or 0
-            produits_dict[nom]['qte'] += p['qte'] or 0
-        top_produits = sorted(produits_dict.values(), key=lambda x: x['ca'], reverse=True)[:5]
-
-        # Top 5 clients
-        top_clients = (
-            qs.filter(type='client', client__isnull=False)
-            .values('client__nom', 'client__prenom')
-            .annotate(ca=Sum('total'), nb=Count('id'))
-            .order_by('-ca')[:5]
-        )
-
-        # Top 5 partenaires
-        top_partenaires = (
-            qs.filter(type='partenaire', partenaire__isnull=False)
-            .values('partenaire__nom', 'partenaire__prenom')
-            .annotate(ca=Sum('total'), nb=Count('id'))
-            .order_by('-ca')[:5]
-        )
+        type_facture = request.query_params.get('type') or None
+        if type_facture and type_facture not in dict(Facture.TYPES):
+            return Response({'error': f"Type de facture inconnu: {type_facture}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limite = max(1, min(int(request.query_params.get('limit', 100)), 500))
+        except ValueError:
+            limite = 100
 
-        return Response({
-            'periode': {'debut': str(date_debut), 'fin': str(date_fin), 'granularite': granularite},
-            'kpis': {
-                'ca_total': round(totaux['ca_total'] or 0, 2),
-                'total_verse': round(totaux['total_verse'] or 0, 2),
-                'total_reste': round(totaux['total_reste'] or 0, 2),
-                'nb_factures': totaux['nb_factures'] or 0,
-                'nb_payees': totaux['nb_payees'] or 0,
-                'nb_partielles': totaux['nb_partielles'] or 0,
-                'nb_attente': totaux['nb_attente'] or 0,
-                'ca_clients': round(ca_clients, 2),
-                'ca_partenaires': round(ca_partenaires, 2),
-            },
-            'serie': [
-                {
-                    'date': s['periode'].strftime('%Y-%m-%d') if s['periode'] else None,
-                    'ca': round(s['ca'] or 0, 2),
-                    'nb_factures': s['nb_factures'] or 0,
-                    'montant_verse': round(s['montant_verse'] or 0, 2),
-                }
-                for s in serie
-            ],
-            'top_produits': list(top_produits),
-            'top_clients': [
-                {'nom': f"{c['client__prenom']} {c['client__nom']}".strip(), 'ca': round(c['ca'] or 0, 2), 'nb': c['nb']}
-                for c in top_clients
-            ],
-            'top_partenaires': [
-                {'nom': f"{p['partenaire__prenom']} {p['partenaire__nom']}".strip(), 'ca': round(p['ca'] or 0, 2), 'nb': p['nb']}
-                for p in top_partenaires
-            ],
-        })
+        boutique_id = request.query_params.get('boutique')
+        if boutique_id:
+            boutiques = Boutique.objects.filter(id=boutique_id) if boutique_id.isdigit() else Boutique.objects.none()
+            if request.user.entreprise_id:
+                boutiques = boutiques.filter(entreprise_id=request.user.entreprise_id)
+            if not boutiques.exists():
+                return Response({'error': 'Boutique introuvable'}, status=status.HTTP_404_NOT_FOUND)
+            boutique_id = int(boutique_id)
+
+        live = request.query_params.get('live') in ('1', 'true')
+        if request.user.entreprise_id and not live and not boutique_id:
+            balance = dict(get_snapshot(request.user.entreprise_id, par, type_facture))
+            if par:
+                balance['details'] = balance['details'][:limite]
+            return Response(balance)
+
+        queryset = self.get_queryset()
+        if boutique_id:
+            queryset = queryset.filter(boutique_id=boutique_id)
+        if type_facture:
+            queryset = queryset.filter(type=type_facture)
+        balance = calculer_balance_agee(queryset, par=par, limite=limite)
+        balance['snapshot'] = False
+        return Response(balance)
 
 # Commande Client
 class CommandeClientViewSet(viewsets.ModelViewSet):
@@ -1997,7 +2271,7 @@ class VersementViewSet(viewsets.ModelViewSet):
     filterset_fields = ['facture']
 
     def get_permissions(self):
-        if self.action in ('list', 'retrieve', 'create'):
+        if self.action in ('list', 'retrieve', 'create', 'bulk'):
             permission_classes = [IsAuthenticated]
         else:
             permission_classes = [IsAdminOrSuperAdmin]
@@ -2012,23 +2286,92 @@ class VersementViewSet(viewsets.ModelViewSet):
             return qs.filter(facture__boutique__entreprise=user.entreprise)
         return qs.none()
 
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Enregistrer plusieurs versements en une transaction (ex: un partenaire règle 50 factures).
+        Body: {"versements": [{"facture": 12, "montant": 5000}, ...]}
+        """
+        from .conditional import bump_write_generation
+        from .versements import appliquer_paiements, signaux_versement_suspendus
+
+        payload = VersementGroupeSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+        lignes = payload.validated_data['versements']
+        user = request.user
+
+        with transaction.atomic():
+            factures = Facture.objects.select_for_update().select_related('boutique').filter(
+                id__in={ligne['facture'] for ligne in lignes}
+            )
+            if not (user.role == 'superadmin' and not user.entreprise):
+                factures = factures.filter(boutique__entreprise_id=user.entreprise_id)
+            factures = {f.id: f for f in factures}
+            introuvables = sorted({ligne['facture'] for ligne in lignes} - set(factures))
+            if introuvables:
+                return Response(
+                    {'error': f"Factures introuvables: {', '.join(map(str, introuvables))}"},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            annulees = sorted(f.numero for f in factures.values() if f.status == 'Annulée')
+            if annulees:
+                return Response(
+                    {'error': f"Factures annulées: {', '.join(annulees)}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            boutique_user = getattr(user, 'boutique', None)
+            montants = {}
+            for ligne in lignes:
+                montants[ligne['facture']] = montants.get(ligne['facture'], 0) + ligne['montant']
+
+            # Un seul INSERT et un seul UPDATE : les signaux par versement sont suspendus
+            with signaux_versement_suspendus():
+                versements = Versement.objects.bulk_create([
+                    Versement(
+                        facture=factures[ligne['facture']],
+                        montant=ligne['montant'],
+                        created_by=user,
+                        boutique=boutique_user or factures[ligne['facture']].boutique,
+                    )
+                    for ligne in lignes
+                ])
+                appliquer_paiements(montants)
+
+            mises_a_jour = list(Facture.objects.filter(id__in=montants).values('id', 'numero', 'reste', 'status'))
+            entreprise_ids = {f.boutique.entreprise_id for f in factures.values()}
+            transaction.on_commit(lambda: [
+                bump_write_generation(entreprise_id, 'factures') for entreprise_id in entreprise_ids
+            ])
+
+            total = sum(montants.values())
+            create_journal_entry(
+                user=user,
+                type_operation='modification',
+                description=f"Règlement groupé de {total} XAF sur {len(montants)} facture(s)",
+                boutique=boutique_user,
+                details={
+                    'versements': len(versements),
+                    'montant_total': total,
+                    'factures': [f['numero'] for f in mises_a_jour],
+                }
+            )
+
+        return Response({
+            'versements': len(versements),
+            'montant_total': total,
+            'factures': mises_a_jour,
+        }, status=status.HTTP_201_CREATED)
+
     def perform_create(self, serializer):
-        from django.db.models import Sum
         boutique = self.request.user.boutique if hasattr(self.request.user, 'boutique') else None
         if not boutique:
             boutique = serializer.validated_data['facture'].boutique
 
+        # Reste et statut de la facture ajustés par le signal (core.versements)
         instance = serializer.save(created_by=self.request.user, boutique=boutique)
-
-        # Recalculer reste et statut automatiquement à partir de tous les versements
         facture = instance.facture
-        total_verse = facture.versements.aggregate(total=Sum('montant'))['total'] or 0
-        facture.reste = max(0.0, float(facture.total) - float(total_verse))
-        if facture.reste <= 0:
-            facture.status = 'Payé'
-        elif total_verse > 0:
-            facture.status = 'Partiellement payé'
-        facture.save(update_fields=['reste', 'status'])
+        facture.refresh_from_db(fields=['reste', 'status'])
 
         create_journal_entry(
             user=self.request.user,
@@ -2063,6 +2406,10 @@ class HistoriqueStockViewSet(viewsets.ModelViewSet):
         return qs.none()
 
 class JournalViewSet(viewsets.ModelViewSet):
+    """
+    Journal d'activité. Les entrées archivées (JournalArchive) sont incluses
+    dans la liste, dans l'ordre demandé ; ?archives=0 les exclut.
+    """
     queryset = Journal.objects.all()
     serializer_class = JournalSerializer
     permission_classes = [IsAuthenticated, IsAdminOrSuperAdmin]
@@ -2070,15 +2417,15 @@ class JournalViewSet(viewsets.ModelViewSet):
     ordering_fields = ['date_operation', 'type_operation', 'utilisateur']
     ordering = ['-date_operation']
 
-    def get_queryset(self):
+    def _filtrer_journal(self, queryset):
+        """Isolation par entreprise et filtres de requête, communs au journal vivant et archivé"""
         user = self.request.user
-        # Isolation par entreprise
         if user.role == 'superadmin' and not user.entreprise:
-            queryset = Journal.objects.all()
+            pass
         elif user.entreprise:
-            queryset = Journal.objects.filter(boutique__entreprise=user.entreprise)
+            queryset = queryset.filter(boutique__entreprise=user.entreprise)
         else:
-            return Journal.objects.none()
+            return queryset.none()
 
         boutique = self.request.query_params.get('boutique')
         type_operation = self.request.query_params.get('type_operation')
@@ -2099,6 +2446,78 @@ class JournalViewSet(viewsets.ModelViewSet):
 
         return queryset.select_related('utilisateur', 'boutique')
 
+    def get_queryset(self):
+        return self._filtrer_journal(Journal.objects.all())
+
+    def get_archive_queryset(self):
+        return self._filtrer_journal(JournalArchive.objects.all())
+
+    def _archive_count(self, archive_queryset):
+        """Nombre d'entrées archivées, mis en cache : l'archive ne change qu'à l'archivage"""
+        import hashlib
+        from django.core.cache import cache
+        from .journal_archive import get_archive_generation
+        user = self.request.user
+        params = sorted(
+            (k, v) for k, v in self.request.query_params.items()
+            if k in ('boutique', 'type_operation', 'utilisateur', 'date_debut', 'date_fin')
+        )
+        params_hash = hashlib.md5(f"{user.entreprise_id}:{user.role}:{params}".encode()).hexdigest()[:16]
+        cache_key = f"journal_archive_count:{get_archive_generation()}:{params_hash}"
+        count = cache.get(cache_key)
+        if count is None:
+            count = archive_queryset.count()
+            cache.set(cache_key, count, 3600)
+        return count
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('archives') == '0':
+            return super().list(request, *args, **kwargs)
+
+        from .journal_archive import JournalChain, JournalMerge
+        live = self.filter_queryset(self.get_queryset())
+        order_by = list(live.query.order_by) or list(self.ordering)
+        archived = self.get_archive_queryset().order_by(*order_by)
+
+        # L'archive ne contient que des entrées plus anciennes que le journal vivant :
+        # triées par date, les deux tables se suivent ; sinon elles sont interclassées
+        if order_by and order_by[0] == 'date_operation':
+            chain = JournalChain(archived, live, first_count=self._archive_count(archived))
+        elif order_by and order_by[0] == '-date_operation':
+            chain = JournalChain(live, archived, second_count=self._archive_count(archived))
+        else:
+            chain = JournalMerge(live, archived, order_by, second_count=self._archive_count(archived))
+
+        page = self.paginate_queryset(chain)
+        items = page if page is not None else chain[:]
+        data = []
+        for item in items:
+            if isinstance(item, JournalArchive):
+                data.append(JournalArchiveSerializer(item, context=self.get_serializer_context()).data)
+            else:
+                data.append(self.get_serializer(item).data)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if not self.get_queryset().filter(pk=lookup).exists():
+            archive = self.get_archive_queryset().filter(pk=lookup).first()
+            if archive is not None:
+                return Response(JournalArchiveSerializer(archive, context=self.get_serializer_context()).data)
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(detail=False, methods=['get'], url_path='export-xlsx', permission_classes=[IsAdminOrSuperAdmin, CanExportExcel])
+    def export_xlsx(self, request):
+        """Export Excel du journal vivant (mêmes filtres que la liste, sans les archives), en flux"""
+        return reponse_xlsx(self.filter_queryset(self.get_queryset()), [
+            ('Date', 'date_operation'), ('Type', 'type_operation'), ('Description', 'description'),
+            ('Utilisateur', 'utilisateur__username'), ('Boutique', 'boutique__nom'), ('Adresse IP', 'ip_address'),
+        ], 'journal_export', 'Journal', conversions={
+            'type_operation': dict(Journal.OPERATION_TYPES).get,
+        })
+
     def perform_create(self, serializer):
         try:
             serializer.save(utilisateur=self.request.user)
@@ -2134,6 +2553,124 @@ def create_journal_entry(user, type_operation, description, boutique=None, detai
     except Exception as e:
         print(f"Erreur lors de la création du journal: {str(e)}")
 
+@api_view(['GET'])
+@permission_classes([IsPlatformSuperAdmin])
+def performance_stats(request):
+    """
+    Latences p50/p95/p99 par endpoint et endpoints les plus coûteux,
+    sur la fenêtre glissante de PerformanceMiddleware (?top=10).
+    """
+    from .perf import histogram, performance_report
+    if not getattr(settings, 'PERFORMANCE_INSTRUMENTATION', False):
+        return Response(
+            {'error': 'Instrumentation désactivée (PERFORMANCE_INSTRUMENTATION=False)'},
+            status=status.HTTP_409_CONFLICT,
+        )
+    try:
+        top = max(1, min(int(request.query_params.get('top', 10)), 50))
+    except ValueError:
+        top = 10
+    return Response(performance_report(histogram, top=top))
+
+@api_view(['GET'])
+@permission_classes([IsPlatformSuperAdmin])
+def api_cache_stats(request):
+    """Hits, misses, attentes (stampede) et taux de hit des réponses d'API mises en cache, par endpoint."""
+    return Response({'endpoints': cache_stats()})
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_delta(request):
+    """
+    Synchronisation différentielle des caisses hors ligne : lignes modifiées et
+    identifiants supprimés depuis le dernier passage (core.sync).
+    Params: ressources (ex: produits,stocks), <ressource>=<watermark> (absent au premier
+    chargement), entrepot (stocks d'un seul entrepôt), limite,
+    entreprise (administrateur plateforme uniquement)
+    """
+    from .sync import RESSOURCES, WatermarkInvalide, synchroniser
+    user = request.user
+    entreprise_id = user.entreprise_id
+    entreprise_param = request.query_params.get('entreprise', '')
+    if user.role == 'superadmin' and not user.entreprise and entreprise_param.isdigit():
+        entreprise_id = Entreprise.objects.filter(id=entreprise_param).values_list('id', flat=True).first()
+    if not entreprise_id:
+        return Response({'error': 'Aucune entreprise associée'}, status=status.HTTP_400_BAD_REQUEST)
+
+    noms = [nom.strip() for nom in request.query_params.get('ressources', '').split(',') if nom.strip()]
+    inconnues = [nom for nom in noms if nom not in RESSOURCES]
+    if inconnues:
+        return Response(
+            {'error': f"Ressources inconnues: {', '.join(inconnues)} (disponibles: {', '.join(RESSOURCES)})"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    entrepot_id = request.query_params.get('entrepot')
+    if entrepot_id:
+        if not entrepot_id.isdigit() or not Boutique.objects.filter(id=entrepot_id, entreprise_id=entreprise_id).exists():
+            return Response({'error': 'Entrepôt introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        entrepot_id = int(entrepot_id)
+
+    limite = request.query_params.get('limite', '')
+    limite = int(limite) if limite.isdigit() and int(limite) > 0 else None
+
+    try:
+        ressources = synchroniser(
+            entreprise_id,
+            {nom: request.query_params.get(nom) for nom in RESSOURCES},
+            noms=noms,
+            limite=limite,
+            entrepot_id=entrepot_id,
+        )
+    except WatermarkInvalide as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'serveur': timezone.now().isoformat(), 'ressources': ressources})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminOrSuperAdmin])
+def dashboard_summary(request):
+    """
+    Tableau de bord consolidé : tous les widgets en une requête.
+    Réservé aux administrateurs, comme factures/analytics qu'il remplace (chiffre d'affaires).
+    Params: widgets (ex: stats_produits,ventes), boutique, date_debut, date_fin, granularite,
+    entreprise (administrateur plateforme uniquement)
+    """
+    user = request.user
+    entreprise = user.entreprise
+    entreprise_id = request.query_params.get('entreprise', '')
+    if user.role == 'superadmin' and not user.entreprise and entreprise_id.isdigit():
+        entreprise = Entreprise.objects.filter(id=entreprise_id).first()
+    if not entreprise:
+        return Response({'error': 'Aucune entreprise associée'}, status=status.HTTP_400_BAD_REQUEST)
+
+    boutique_id = request.query_params.get('boutique')
+    if boutique_id:
+        if not boutique_id.isdigit() or not Boutique.objects.filter(id=boutique_id, entreprise=entreprise).exists():
+            return Response({'error': 'Boutique introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        boutique_id = int(boutique_id)
+
+    noms = [nom.strip() for nom in request.query_params.get('widgets', '').split(',') if nom.strip()]
+    inconnus = [nom for nom in noms if nom not in WIDGETS]
+    if inconnus:
+        return Response(
+            {'error': f"Widgets inconnus: {', '.join(inconnus)} (disponibles: {', '.join(WIDGETS)})"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    params = {
+        cle: request.query_params[cle]
+        for cle in ('date_debut', 'date_fin', 'granularite')
+        if request.query_params.get(cle)
+    }
+    ctx = ContexteDashboard(entreprise=entreprise, boutique_id=boutique_id, params=params)
+    widgets, meta = calculer_dashboard(ctx, noms or list(WIDGETS))
+    return Response({
+        'widgets': widgets,
+        'meta': meta,
+        'generated_at': timezone.now().isoformat(),
+    })
+
 # Vue pour le formulaire de contact
 
 @api_view(['POST'])
@@ -2640,6 +3177,21 @@ class ExerciceFiscalViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'error': str(e)}, status=400)
 
+    def _stocks_cloture(self, exercice, boutiques):
+        """Quantités en stock à la fin de l'exercice (ou aujourd'hui s'il n'est pas terminé)"""
+        from django.utils import timezone
+        from .stock_snapshots import stock_a_date
+        stock_date = min(exercice.date_fin, timezone.localdate())
+        return stock_a_date(stock_date, [b.id for b in boutiques]), stock_date
+
+    def _prix_produits(self, quantites):
+        """Prix de valorisation (prix de vente, sinon prix) des produits présents"""
+        produit_ids = {produit_id for (_, produit_id, _) in quantites}
+        return {
+            p['id']: float(p['prix_vente'] or p['prix'] or 0)
+            for p in Produit.objects.filter(id__in=produit_ids).values('id', 'prix_vente', 'prix')
+        }
+
     @action(detail=True, methods=['post'], url_path='cloture')
     def cloture(self, request, pk=None):
         """Cloturer un exercice : snapshot + verrouillage."""
@@ -2658,10 +3210,11 @@ class ExerciceFiscalViewSet(viewsets.ModelViewSet):
         )
         ca = factures_qs.aggregate(total=Sum('total'))['total'] or 0
         nb_factures = factures_qs.count()
-        stocks = Stock.objects.filter(entrepot__in=boutiques).select_related('produit')
+        quantites, _ = self._stocks_cloture(exercice, boutiques)
+        prix = self._prix_produits(quantites)
         valeur_stock = sum(
-            (s.quantite or 0) * float(s.produit.prix_vente or s.produit.prix or 0)
-            for s in stocks
+            (quantite or 0) * prix.get(produit_id, 0)
+            for (_, produit_id, _), quantite in quantites.items()
         )
         nb_produits = Produit.objects.filter(entreprise=exercice.entreprise, actif=True).count()
         from django.db.models import F
@@ -2706,6 +3259,7 @@ class ExerciceFiscalViewSet(viewsets.ModelViewSet):
         import traceback
         from django.db.models import F, Sum, Count
         from collections import defaultdict
+        from .stock_snapshots import quantites_par_produit
         try:
             exercice = self.get_object()
             boutiques = list(Boutique.objects.filter(entreprise=exercice.entreprise))
@@ -2735,11 +3289,12 @@ class ExerciceFiscalViewSet(viewsets.ModelViewSet):
                 created_at__date__lte=date_fin,
             ).aggregate(total=Sum(F('quantite') * F('produit__prix_achat')))['total'] or 0
 
-            # Stock actuel
-            stocks_qs = Stock.objects.filter(entrepot__in=boutiques).select_related('produit', 'entrepot')
+            # Stock à la clôture de l'exercice (snapshots) ou stock actuel si l'exercice est en cours
+            quantites, stock_date = self._stocks_cloture(exercice, boutiques)
+            prix = self._prix_produits(quantites)
             valeur_stock = sum(
-                (s.quantite or 0) * float(s.produit.prix_vente or s.produit.prix or 0)
-                for s in stocks_qs
+                (quantite or 0) * prix.get(produit_id, 0)
+                for (_, produit_id, _), quantite in quantites.items()
             )
             nb_produits = Produit.objects.filter(entreprise=exercice.entreprise, actif=True).count()
 
@@ -2755,8 +3310,8 @@ class ExerciceFiscalViewSet(viewsets.ModelViewSet):
                     created_at__date__lte=date_fin,
                 ).aggregate(total=Sum(F('quantite') * F('produit__prix_achat')))['total'] or 0
                 stock_b = sum(
-                    (s.quantite or 0) * float(s.produit.prix_vente or s.produit.prix or 0)
-                    for s in stocks_qs if s.entrepot_id == b.id
+                    (quantite or 0) * prix.get(produit_id, 0)
+                    for (entrepot_id, produit_id, _), quantite in quantites.items() if entrepot_id == b.id
                 )
                 par_entrepot.append({
                     'nom': b.nom,
@@ -2788,10 +3343,8 @@ class ExerciceFiscalViewSet(viewsets.ModelViewSet):
                 d['qte'] += cmd.quantite
                 d['ca'] += cmd.quantite * float(cmd.prix_unitaire_fcfa)
 
-            # Ajouter stock actuel par produit
-            stock_par_produit = defaultdict(int)
-            for s in stocks_qs:
-                stock_par_produit[s.produit_id] += s.quantite or 0
+            # Ajouter le stock de clôture par produit
+            stock_par_produit = quantites_par_produit(quantites)
             for pid, d in produit_agg.items():
                 d['stock'] = stock_par_produit.get(pid, 0)
 
@@ -2804,6 +3357,7 @@ class ExerciceFiscalViewSet(viewsets.ModelViewSet):
                 'total_achats': float(total_achats),
                 'nb_factures': nb_factures,
                 'valeur_stock': float(valeur_stock),
+                'stock_date': stock_date.isoformat(),
                 'nb_produits': nb_produits,
                 'benefice_net': float(ca) - float(total_achats),
                 'par_entrepot': par_entrepot,
@@ -0,0 +1,246 @@
+# core/xlsx.py
+"""
+Export Excel (XLSX) en flux, à mémoire constante.
+
+Un fichier XLSX est une archive ZIP de documents XML. ``generer_xlsx`` écrit
+l'archive dans un tampon vidé au fil de l'eau (``zipfile`` sur un flux non
+positionnable : tailles et CRC écrits après chaque entrée) et produit des
+morceaux d'octets pour ``StreamingHttpResponse`` :
+
+- l'en-tête de l'archive et de la feuille part avant l'exécution de la requête ;
+- les lignes viennent d'un ``.values_list(...).iterator()`` : ni instances de
+  modèle ni liste complète en mémoire ;
+- les chaînes sont écrites en ligne (``inlineStr``), sans table de chaînes
+  partagées à construire avant la fin.
+"""
+import io
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Limite Excel : 1 048 576 lignes, dont l'en-tête
+LIGNES_MAX = 1048575
+TAILLE_MORCEAU = 64 * 1024
+TAILLE_LOT_REQUETE = 2000
+
+# Caractères de contrôle interdits en XML 1.0
+_CARACTERES_INVALIDES = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_EPOQUE_EXCEL = datetime(1899, 12, 30)
+
+# Styles (index dans cellXfs) : 0 normal, 1 en-tête gras, 2 date, 3 date et heure
+STYLE_ENTETE, STYLE_DATE, STYLE_DATETIME = 1, 2, 3
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{nom}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="2">'
+    '<numFmt numFmtId="164" formatCode="dd/mm/yyyy"/>'
+    '<numFmt numFmtId="165" formatCode="dd/mm/yyyy hh:mm"/>'
+    '</numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '</cellXfs>'
+    '</styleSheet>'
+)
+
+_DEBUT_FEUILLE = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+    '</sheetView></sheetViews>'
+    '<sheetData>'
+)
+_FIN_FEUILLE = '</sheetData></worksheet>'
+
+
+class _Tampon(io.RawIOBase):
+    """Flux non positionnable : accumule ce que zipfile écrit jusqu'au prochain ``vider``."""
+
+    def __init__(self):
+        self._morceaux = []
+        self._taille = 0
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, donnees):
+        self._morceaux.append(bytes(donnees))
+        self._taille += len(donnees)
+        self._position += len(donnees)
+        return len(donnees)
+
+    def tell(self):
+        return self._position
+
+    @property
+    def taille(self):
+        # Pas de __len__ : zipfile teste ``if not self.fp``, un tampon vide serait « fermé »
+        return self._taille
+
+    def vider(self):
+        donnees = b''.join(self._morceaux)
+        self._morceaux, self._taille = [], 0
+        return donnees
+
+
+def lettre_colonne(index):
+    """0 → A, 25 → Z, 26 → AA."""
+    lettres = ''
+    index += 1
+    while index:
+        index, reste = divmod(index - 1, 26)
+        lettres = chr(65 + reste) + lettres
+    return lettres
+
+
+def _serie_excel(valeur):
+    if isinstance(valeur, datetime):
+        if timezone.is_aware(valeur):
+            valeur = timezone.localtime(valeur).replace(tzinfo=None)
+        delta = valeur - _EPOQUE_EXCEL
+    else:
+        delta = datetime(valeur.year, valeur.month, valeur.day) - _EPOQUE_EXCEL
+    return delta.days + delta.seconds / 86400
+
+
+def _cellule(reference, valeur, style=0):
+    attribut_style = f' s="{style}"' if style else ''
+    if valeur is None or valeur == '':
+        return ''
+    if isinstance(valeur, bool):
+        return f'<c r="{reference}" t="b"{attribut_style}><v>{int(valeur)}</v></c>'
+    if isinstance(valeur, (int, float, Decimal)):
+        return f'<c r="{reference}"{attribut_style}><v>{valeur}</v></c>'
+    if isinstance(valeur, datetime):
+        return f'<c r="{reference}" s="{STYLE_DATETIME}"><v>{_serie_excel(valeur)}</v></c>'
+    if isinstance(valeur, date):
+        return f'<c r="{reference}" s="{STYLE_DATE}"><v>{_serie_excel(valeur)}</v></c>'
+    texte = escape(_CARACTERES_INVALIDES.sub('', str(valeur)))
+    return f'<c r="{reference}" t="inlineStr"{attribut_style}><is><t xml:space="preserve">{texte}</t></is></c>'
+
+
+def _ligne(numero, colonnes, valeurs, style=0):
+    cellules = ''.join(
+        _cellule(f'{colonne}{numero}', valeur, style) for colonne, valeur in zip(colonnes, valeurs)
+    )
+    return f'<row r="{numero}">{cellules}</row>'
+
+
+def generer_xlsx(entetes, lignes, nom_feuille='Export'):
+    """
+    Classeur XLSX d'une feuille, produit par morceaux d'octets.
+
+    Args:
+        entetes: libellés des colonnes
+        lignes: itérable de tuples de valeurs (None, bool, nombre, date, datetime ou texte)
+    """
+    tampon = _Tampon()
+    colonnes = [lettre_colonne(i) for i in range(len(entetes))]
+    nom_feuille = escape(re.sub(r'[\[\]:*?/\\]', ' ', nom_feuille)[:31], {'"': '&quot;'})
+
+    with zipfile.ZipFile(tampon, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _RELS)
+        archive.writestr('xl/workbook.xml', _WORKBOOK.format(nom=nom_feuille))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        archive.writestr('xl/styles.xml', _STYLES)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as feuille:
+            feuille.write((_DEBUT_FEUILLE + _ligne(1, colonnes, entetes, STYLE_ENTETE)).encode())
+            yield tampon.vider()
+            for numero, valeurs in enumerate(lignes, start=2):
+                if numero > LIGNES_MAX + 1:
+                    break
+                feuille.write(_ligne(numero, colonnes, valeurs).encode())
+                if tampon.taille >= TAILLE_MORCEAU:
+                    yield tampon.vider()
+            feuille.write(_FIN_FEUILLE.encode())
+    yield tampon.vider()
+
+
+def reponse_xlsx(queryset, colonnes, nom_fichier, nom_feuille=None, conversions=None):
+    """
+    ``StreamingHttpResponse`` XLSX des lignes de ``queryset``.
+
+    Args:
+        colonnes: [(libellé, champ ou lookup)] lus par ``values_list``
+        conversions: {lookup: fonction} appliquée à la valeur (libellés de choix, etc.)
+    """
+    lookups = [lookup for _, lookup in colonnes]
+    conversions = conversions or {}
+    fonctions = [conversions.get(lookup) for lookup in lookups]
+
+    def lignes():
+        for valeurs in queryset.values_list(*lookups).iterator(chunk_size=TAILLE_LOT_REQUETE):
+            yield [fonction(valeur) if fonction else valeur for fonction, valeur in zip(fonctions, valeurs)]
+
+    response = StreamingHttpResponse(
+        generer_xlsx([libelle for libelle, _ in colonnes], lignes(), nom_feuille or nom_fichier),
+        content_type=CONTENT_TYPE,
+    )
+    horodatage = timezone.localtime().strftime('%Y%m%d_%H%M%S')
+    response['Content-Disposition'] = f'attachment; filename="{nom_fichier}_{horodatage}.xlsx"'
+    # Pas de mise en tampon par un proxy (nginx) : le téléchargement démarre tout de suite
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -3,6 +3,11 @@ ASGI config for storage project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Le flux SSE ``api/evenements/stream/`` (core.evenements_views) n'est servi que
+par cette application, par exemple : ``uvicorn storage.asgi:application``.
+Avec plusieurs processus, ou si les écritures passent par WSGI, utiliser
+EVENEMENTS_BACKEND = 'core.evenements.RedisBackend'.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -0,0 +1,93 @@
+"""
+Documentation OpenAPI (Swagger / ReDoc), sans coût au démarrage des workers.
+
+- drf_yasg n'est importé qu'à la première requête de documentation
+  (``get_schema_view``) ;
+- le schéma complet est généré au déploiement dans un fichier statique
+  (``python manage.py export_openapi``, chemin ``OPENAPI_SCHEMA_FILE``) et
+  servi tel quel par ``schema_json`` ; l'interface Swagger / ReDoc le lit via
+  ``SPEC_URL``. Sans fichier, le schéma est généré à la demande et gardé en
+  cache ``OPENAPI_CACHE_TIMEOUT`` secondes.
+"""
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import include, path
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
+
+API_INFO = {
+    'title': "MuraStorage API",
+    'default_version': 'v1',
+    'description': "API de gestion multi-boutiques",
+}
+
+
+def api_patterns():
+    return [path('api/', include('core.urls'))]
+
+
+def fichier_schema():
+    return Path(getattr(settings, 'OPENAPI_SCHEMA_FILE', settings.BASE_DIR / 'openapi.json'))
+
+
+@lru_cache(maxsize=None)
+def get_schema_view():
+    """SchemaView drf_yasg, construite à la première utilisation."""
+    from drf_yasg import openapi
+    from drf_yasg.views import get_schema_view as construire_schema_view
+
+    # Swagger / ReDoc — réservé aux administrateurs
+    return construire_schema_view(
+        openapi.Info(**API_INFO),
+        public=False,
+        permission_classes=(IsAdminUser,),
+        patterns=api_patterns(),
+    )
+
+
+def generer_schema():
+    """Schéma OpenAPI complet (tous les endpoints), encodé en JSON."""
+    from drf_yasg import openapi
+    from drf_yasg.codecs import OpenAPICodecJson
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    generateur = OpenAPISchemaGenerator(openapi.Info(**API_INFO), patterns=api_patterns())
+    return OpenAPICodecJson(validators=[]).encode(generateur.get_schema(request=None, public=True))
+
+
+@lru_cache(maxsize=None)
+def _vue(renderer=None):
+    cache_timeout = getattr(settings, 'OPENAPI_CACHE_TIMEOUT', 3600)
+    if renderer is None:
+        return get_schema_view().without_ui(cache_timeout=cache_timeout)
+    return get_schema_view().with_ui(renderer, cache_timeout=cache_timeout)
+
+
+class SchemaFichierView(APIView):
+    """Schéma OpenAPI pré-généré (fichier statique), réservé aux administrateurs."""
+    permission_classes = (IsAdminUser,)
+    schema = None  # exclu du schéma lui-même
+
+    def get(self, request, format=None):
+        return HttpResponse(fichier_schema().read_bytes(), content_type='application/json')
+
+
+_schema_fichier = SchemaFichierView.as_view()
+
+
+def schema_json(request, format=None):
+    """Schéma OpenAPI : fichier pré-généré si présent, sinon génération drf_yasg (en cache)."""
+    if format in (None, '.json') and fichier_schema().is_file():
+        return _schema_fichier(request)
+    return _vue()(request, format=format)
+
+
+def swagger_ui(request):
+    return _vue('swagger')(request)
+
+
+def redoc_ui(request):
+    return _vue('redoc')(request)
@@ -33,6 +33,62 @@ ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(','
 # Frontend URL for email links
 FRONTEND_URL = 'https://murastorage.netlify.app'
 
+# Instrumentation des performances par requête (core.middleware.PerformanceMiddleware)
+PERFORMANCE_INSTRUMENTATION = os.environ.get('PERFORMANCE_INSTRUMENTATION', 'False') == 'True'
+PERFORMANCE_WINDOW_MINUTES = int(os.environ.get('PERFORMANCE_WINDOW_MINUTES', '15'))
+
+# Rétention du journal : au-delà, les entrées sont déplacées vers JournalArchive
+# (commande archive_journal)
+JOURNAL_RETENTION_DAYS = int(os.environ.get('JOURNAL_RETENTION_DAYS', '180'))
+
+# Requêtes conditionnelles (core.conditional) : durée max de validité d'un validateur
+# pour rattraper les écritures qui ne passent pas par les signaux mais datent updated_at
+CONDITIONAL_VALIDATOR_TTL = int(os.environ.get('CONDITIONAL_VALIDATOR_TTL', '60'))
+
+# Statistiques de stock (core.produit_stats) : durée de vie max des compteurs incrémentaux
+PRODUIT_STATS_TTL = int(os.environ.get('PRODUIT_STATS_TTL', '86400'))
+
+# Console plateforme (core.platform_stats) : durée de vie des agrégats, rafraîchis par
+# la commande planifiée refresh_platform_stats
+PLATFORM_ROLLUPS_TTL = int(os.environ.get('PLATFORM_ROLLUPS_TTL', '3600'))
+
+# Recherche de clients par téléphone (core.telephone) : durée du cache par entreprise
+CLIENT_LOOKUP_CACHE_TTL = int(os.environ.get('CLIENT_LOOKUP_CACHE_TTL', '300'))
+
+# Balance âgée des créances (core.creances) : lignes de détail conservées par snapshot
+CREANCES_SNAPSHOT_LIMITE = int(os.environ.get('CREANCES_SNAPSHOT_LIMITE', '500'))
+
+# Miniatures des images produits / logos (core.images) : threads de génération,
+# False pour générer de façon synchrone après la transaction (tests, scripts)
+IMAGE_DERIVEES_WORKERS = int(os.environ.get('IMAGE_DERIVEES_WORKERS', '2'))
+IMAGE_DERIVEES_ASYNC = os.environ.get('IMAGE_DERIVEES_ASYNC', 'True') == 'True'
+
+# Document de facture (core.facture_document) : durée de vie en cache, invalidé à chaque écriture
+FACTURE_DOCUMENT_CACHE_TTL = int(os.environ.get('FACTURE_DOCUMENT_CACHE_TTL', '600'))
+
+# Tableau de bord consolidé (core.dashboard) : widgets calculés en parallèle (1 : séquentiel)
+DASHBOARD_MAX_WORKERS = int(os.environ.get('DASHBOARD_MAX_WORKERS', '4'))
+
+# Synchronisation différentielle des caisses hors ligne (core.sync) : lignes par ressource
+# et par appel, délai avant qu'une écriture soit livrée (transactions en cours),
+# conservation des traces de suppression (au-delà : rechargement complet)
+SYNC_LIMITE = int(os.environ.get('SYNC_LIMITE', '500'))
+SYNC_DELAI_STABILITE = int(os.environ.get('SYNC_DELAI_STABILITE', '2'))
+SYNC_RETENTION_SUPPRESSIONS_JOURS = int(os.environ.get('SYNC_RETENTION_SUPPRESSIONS_JOURS', '30'))
+
+# Flux SSE des stocks et factures (core.evenements, servi par storage.asgi) :
+# broker en mémoire pour un seul processus ASGI, core.evenements.RedisBackend sinon.
+# Commentaire keepalive, durée max d'une connexion (EventSource se reconnecte), file par abonné
+EVENEMENTS_BACKEND = os.environ.get('EVENEMENTS_BACKEND', 'core.evenements.MemoireBackend')
+SSE_KEEPALIVE = int(os.environ.get('SSE_KEEPALIVE', '15'))
+SSE_DUREE_MAX = int(os.environ.get('SSE_DUREE_MAX', '300'))
+SSE_RETRY_MS = int(os.environ.get('SSE_RETRY_MS', '3000'))
+SSE_FILE_MAX = int(os.environ.get('SSE_FILE_MAX', '100'))
+
+# Réservations de stock des paniers (core.reservations) : durée sans activité sur le panier
+# avant que la commande expirer_reservations rende les quantités
+RESERVATION_DUREE_MINUTES = int(os.environ.get('RESERVATION_DUREE_MINUTES', '15'))
+
 
 # Application definition
 
@@ -53,6 +109,8 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'core.User'
 
 MIDDLEWARE = [
+    # Instrumentation des performances (inactive sauf PERFORMANCE_INSTRUMENTATION=True)
+    'core.middleware.PerformanceMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -85,18 +143,39 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'core.pagination.StandardPagination',
     'PAGE_SIZE': 25,
+    # Compteurs à fenêtre glissante stockés dans le cache partagé (core/throttling.py)
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
+        'core.throttling.AnonSlidingWindowRateThrottle',
+        'core.throttling.PlanRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/hour',
         'user': '1000/hour',
+        # Taux par plan d'abonnement (SubscriptionPlan.name), repli sur 'user'
+        'user_free': '500/hour',
+        'user_starter': '1000/hour',
+        'user_business': '3000/hour',
+        'user_pro': '10000/hour',
         'login': '30/hour' if DEBUG else '5/hour',
     },
     'MAX_PAGE_SIZE': 100,
 }
 
+# Documentation OpenAPI (storage.openapi) : schéma généré au déploiement
+# (python manage.py export_openapi), lu par Swagger / ReDoc via SPEC_URL
+OPENAPI_SCHEMA_FILE = os.environ.get('OPENAPI_SCHEMA_FILE', str(BASE_DIR / 'openapi.json'))
+# Sans fichier : schéma généré à la demande et gardé en cache (secondes)
+OPENAPI_CACHE_TIMEOUT = int(os.environ.get('OPENAPI_CACHE_TIMEOUT', '3600'))
+# Budget de démarrage d'un worker (imports + chargement de l'application), vérifié
+# par python manage.py import_profile
+IMPORT_BUDGET_MS = int(os.environ.get('IMPORT_BUDGET_MS', '1500'))
+SWAGGER_SETTINGS = {
+    'SPEC_URL': ('schema-json', {'format': '.json'}),
+}
+REDOC_SETTINGS = {
+    'SPEC_URL': ('schema-json', {'format': '.json'}),
+}
+
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
@@ -123,10 +202,16 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_HEADERS = list(default_headers) + [
     "authorization",
+    # Requêtes conditionnelles (revalidation ETag / Last-Modified)
+    "if-none-match",
+    "if-modified-since",
 ]
 
 CORS_ALLOW_CREDENTIALS = False
 
+# En-têtes lisibles par le frontend (mesures de performance, validateurs de cache)
+CORS_EXPOSE_HEADERS = ['Server-Timing', 'ETag', 'Last-Modified', 'X-Cache']
+
 # Pour éviter certains refus de préflight
 CORS_ALLOW_METHODS = [
     "DELETE",
@@ -229,14 +314,53 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# Configuration Cache (cache local pour le développement)
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-        'TIMEOUT': 300,
+# Configuration Cache à deux niveaux (core.cache_backends.TwoTierCache)
+# - L1 : LRU en mémoire par worker pour les clés chaudes
+# - L2 : cache partagé entre workers, choisi par CACHE_SHARED_BACKEND :
+#   'locmem' (développement), 'file' (hébergement mono-serveur type PythonAnywhere)
+#   ou 'redis' (voir setup_redis.sh, nécessite le paquet redis)
+CACHE_SHARED_BACKEND = os.environ.get('CACHE_SHARED_BACKEND', 'locmem')
+CACHE_FILE_LOCATION = os.environ.get('CACHE_FILE_LOCATION', str(BASE_DIR / 'cache'))
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1')
+
+
+def build_caches(shared_backend, default_timeout, file_location=CACHE_FILE_LOCATION):
+    """Construit la configuration CACHES du cache à deux niveaux."""
+    if shared_backend == 'redis':
+        shared = {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    elif shared_backend == 'file':
+        shared = {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': file_location,
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    else:
+        shared = {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+        }
+    shared['TIMEOUT'] = default_timeout
+    return {
+        'default': {
+            'BACKEND': 'core.cache_backends.TwoTierCache',
+            'TIMEOUT': default_timeout,
+            'OPTIONS': {
+                'SHARED_ALIAS': 'shared',
+                'L1_MAX_ENTRIES': 1000,
+                'L1_TIMEOUT': 30,
+                'SYNC_INTERVAL': 1.0,
+                # Clés servies depuis la mémoire du worker
+                'L1_PREFIXES': ['user_entreprise_', 'subscription_plan', 'categories'],
+            },
+        },
+        'shared': shared,
     }
-}
+
+
+CACHES = build_caches(CACHE_SHARED_BACKEND, 300)
 
 # Configuration des sessions
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
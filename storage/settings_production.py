@@ -28,14 +28,13 @@ STATIC_ROOT = '/home/murastorage/walner-durel/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/home/murastorage/walner-durel/media/'
 
-# Cache simple (LocMemCache) avec TTL très court (30s max)
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-        'TIMEOUT': 30,  # 30 secondes
-    }
-}
+# Cache à deux niveaux : L2 partagé entre les workers (fichiers par défaut,
+# Redis si CACHE_SHARED_BACKEND=redis), TTL court (30s) pour rester temps réel
+# Le backend fichier n'incrémente pas atomiquement : les compteurs des throttles
+# et des statistiques produits y sont approximatifs sous concurrence (ces
+# derniers corrigés par verifier_stats_produits), Redis les rend exacts
+CACHE_FILE_LOCATION = os.environ.get('CACHE_FILE_LOCATION', '/home/murastorage/walner-durel/cache/')
+CACHES = build_caches(os.environ.get('CACHE_SHARED_BACKEND', 'file'), 30, CACHE_FILE_LOCATION)
 
 # Configuration CORS pour le frontend
 CORS_ALLOW_ALL_ORIGINS = False
@@ -6,28 +6,14 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from rest_framework.permissions import IsAdminUser
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 
-# Swagger / ReDoc — réservé aux administrateurs
-schema_view = get_schema_view(
-    openapi.Info(
-        title="MuraStorage API",
-        default_version='v1',
-        description="API de gestion multi-boutiques",
-    ),
-    public=False,
-    permission_classes=(IsAdminUser,),
-    patterns=[
-        path('api/', include('core.urls')),
-    ],
-)
+from .openapi import redoc_ui, schema_json, swagger_ui
 
+# Swagger / ReDoc — réservé aux administrateurs (drf_yasg chargé à la première requête)
 urlpatterns = [
-    path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    path('swagger<format>/', schema_json, name='schema-json'),
+    path('swagger/', swagger_ui, name='schema-swagger-ui'),
+    path('redoc/', redoc_ui, name='schema-redoc'),
     path('admin/', admin.site.urls),
     path('api/', include('core.urls')),
 ]